@@ -0,0 +1,126 @@
+import heapq
+import itertools
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AlertScheduler:
+    """Agenda de alertas de monitoramento em memoria, orientada a eventos.
+
+    Guarda o proximo alerta de cada talao em um heap (min por horario) e
+    mantem um unico ``after()`` armado para o mais cedo. Ao vencer, chama
+    ``on_due(talao_ids)`` e fica pausada ate ``resume()``; assim so um alerta
+    e tratado por vez. ``load`` substitui a agenda inteira (carga inicial e
+    ressincronizacao periodica); ``schedule``/``remove`` aplicam as mudancas
+    feitas por este terminal. Horarios sao relativos ao relogio monotonico
+    local, a partir dos segundos restantes calculados pelo banco.
+    """
+
+    MAX_WAIT_MS = 3600000
+    ERROR_RETRY_MS = 5000
+
+    def __init__(self, root, on_due, clock=time.monotonic):
+        self.root = root
+        self.on_due = on_due
+        self.clock = clock
+        self._heap = []
+        self._due_at = {}
+        self._seq = itertools.count()
+        self._after_id = None
+        self._paused = False
+        self._stopped = False
+        self._not_before = 0.0
+
+    def __len__(self):
+        return len(self._due_at)
+
+    def __contains__(self, talao_id):
+        return talao_id in self._due_at
+
+    def load(self, schedule):
+        """Substitui a agenda por linhas ``(talao_id, segundos_restantes)``."""
+        now = self.clock()
+        self._due_at = {int(talao_id): now + float(segundos) for talao_id, segundos in schedule}
+        self._heap = [(due, next(self._seq), talao_id) for talao_id, due in self._due_at.items()]
+        heapq.heapify(self._heap)
+        self._arm()
+
+    def schedule(self, talao_id, segundos):
+        """Agenda (ou reagenda) o alerta do talao para daqui a ``segundos``."""
+        due = self.clock() + segundos
+        self._due_at[talao_id] = due
+        heapq.heappush(self._heap, (due, next(self._seq), talao_id))
+        self._arm()
+
+    def remove(self, talao_id):
+        """Retira o talao da agenda (entrada no heap e descartada de forma preguicosa)."""
+        if self._due_at.pop(talao_id, None) is not None:
+            self._arm()
+
+    def due_ids(self, now=None):
+        """Lista taloes vencidos, do mais atrasado para o mais recente."""
+        now = self.clock() if now is None else now
+        return [talao_id for due, talao_id in sorted((due, tid) for tid, due in self._due_at.items()) if due <= now]
+
+    def next_delay(self):
+        """Segundos ate o proximo alerta, ou None com agenda vazia."""
+        while self._heap:
+            due, _, talao_id = self._heap[0]
+            if self._due_at.get(talao_id) == due:
+                return max(0.0, due - self.clock())
+            heapq.heappop(self._heap)
+        return None
+
+    def pause(self):
+        """Suspende disparos (ex.: enquanto um alerta esta sendo tratado)."""
+        self._paused = True
+        self._cancel()
+
+    def resume(self, delay_ms=0):
+        """Retoma disparos, aguardando ao menos ``delay_ms`` antes do proximo."""
+        self._paused = False
+        self._not_before = self.clock() + delay_ms / 1000
+        self._arm()
+
+    def stop(self):
+        """Cancela o ``after()`` pendente e desativa a agenda."""
+        self._stopped = True
+        self._cancel()
+
+    def _cancel(self):
+        """Cancela o ``after()`` armado, se houver."""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _arm(self):
+        """Arma um unico ``after()`` para o alerta mais cedo da agenda."""
+        self._cancel()
+        if self._paused or self._stopped:
+            return
+        delay = self.next_delay()
+        if delay is None:
+            return
+        delay = max(delay, self._not_before - self.clock())
+        delay_ms = min(int(math.ceil(delay * 1000)), self.MAX_WAIT_MS)
+        self._after_id = self.root.after(delay_ms, self._fire)
+
+    def _fire(self):
+        """Dispara ``on_due`` com os taloes vencidos e pausa ate ``resume()``."""
+        self._after_id = None
+        due = self.due_ids()
+        if not due:
+            self._arm()
+            return
+        self._paused = True
+        try:
+            self.on_due(due)
+        except Exception:
+            logger.exception("Falha ao tratar alertas vencidos")
+            self.resume(self.ERROR_RETRY_MS)
@@ -0,0 +1,312 @@
+"""Backup anual em script SQL gerado em fluxo.
+
+O script e gravado direto no disco, lote a lote, com INSERTs de varias
+linhas (ate ``MAX_ROWS_PER_INSERT``, limite do construtor ``VALUES`` do SQL
+Server) dentro de uma unica transacao ``TRY/CATCH``. A extensao do arquivo
+define a compressao: ``.gz`` (gzip) ou ``.zst`` (``compression.zstd``, Python
+3.14+); qualquer outra grava texto puro.
+
+Backups incrementais levam so o que mudou desde o backup anterior do ano,
+pela versao de linha (``taloes.versao`` e ``monitoramento.versao``): taloes
+alterados (``DELETE`` + ``INSERT``), monitoramento alterado ou de talao
+alterado (``DELETE`` por ``talao_id`` + ``INSERT``) e os ids excluidos. O
+manifesto JSON da pasta (``backup_afis_<ano>_manifesto.json``) registra a
+cadeia completo + incrementais e a marca d'agua de cada arquivo.
+
+Uso em linha de comando (ex.: copia noturna)::
+
+    python -m afis_app.backup 2026 D:/backups --incremental --compressao gzip
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import date, datetime, time
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+from .config import load_env_file
+from .exports import consume_batches, remove_partial
+from .repository import MONITORAMENTO_BACKUP_COLUMNS, TALAO_DETAIL_COLUMNS, build_repository
+
+MAX_ROWS_PER_INSERT = 1000
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+TALOES_TABLE = "dbo.taloes"
+MONITORAMENTO_TABLE = "dbo.monitoramento"
+BACKUP_FULL = "completo"
+BACKUP_INCREMENTAL = "incremental"
+# Chave pela qual o incremental substitui a linha ja existente de cada tabela.
+_REPLACE_KEYS = {TALOES_TABLE: "id", MONITORAMENTO_TABLE: "talao_id"}
+
+
+class BackupManifestError(ValueError):
+    """Manifesto de backup ausente, invalido ou com a cadeia quebrada."""
+
+    pass
+
+
+def sql_literal(value):
+    """Converte valor Python para literal SQL seguro para script."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, datetime):
+        # DATETIME2 guarda microssegundos; atualizado_em e o token de concorrencia otimista.
+        return f"'{value.strftime('%Y-%m-%d %H:%M:%S.%f')}'"
+    if isinstance(value, date):
+        return f"'{value.strftime('%Y-%m-%d')}'"
+    if isinstance(value, time):
+        return f"'{value.strftime('%H:%M:%S')}'"
+    if isinstance(value, (int, float)):
+        return str(value)
+    text = str(value).replace("'", "''")
+    return f"N'{text}'"
+
+
+def backup_compression(path):
+    """Compressao indicada pela extensao do arquivo: None, ``"gzip"`` ou ``"zstd"``."""
+    name = str(path).lower()
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def open_backup(path, mode="rt"):
+    """Abre arquivo de backup em texto UTF-8, (des)comprimindo conforme a extensao."""
+    compression = backup_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, mode, encoding="utf-8-sig", newline="")
+    if compression == "zstd":
+        if zstd is None:
+            raise ValueError("Compressão zstd requer Python 3.14 ou superior.")
+        return zstd.open(path, mode, encoding="utf-8-sig", newline="")
+    return open(path, mode, encoding="utf-8-sig", newline="")
+
+
+class _InsertWriter:
+    """Agrupa linhas de uma tabela em INSERTs de varias linhas."""
+
+    def __init__(self, out, table_name, columns, rows_per_insert, replace=None):
+        self.out = out
+        self.table_name = table_name
+        # Incremental: coluna-chave cuja linha anterior sai antes do INSERT.
+        self.replace = replace
+        self.replace_index = columns.index(replace) if replace else None
+        self.prefix = f"INSERT INTO {table_name} ({', '.join(f'[{col}]' for col in columns)}) VALUES\n"
+        self.rows_per_insert = rows_per_insert
+        self.pending = []
+        self.total = 0
+
+    def write_batch(self, batch):
+        """Acumula o lote e grava os INSERTs completos."""
+        if not self.total and batch:
+            self.out.write(f"SET IDENTITY_INSERT {self.table_name} ON;\n")
+        self.total += len(batch)
+        self.pending.extend(batch)
+        while len(self.pending) >= self.rows_per_insert:
+            self._flush(self.rows_per_insert)
+
+    def close(self):
+        """Grava o restante e desliga ``IDENTITY_INSERT``."""
+        if self.pending:
+            self._flush(len(self.pending))
+        if self.total:
+            self.out.write(f"SET IDENTITY_INSERT {self.table_name} OFF;\n")
+        else:
+            self.out.write(f"-- Nenhum registro para {self.table_name}.\n")
+        self.out.write(f"-- {self.table_name}: {self.total} registros\n")
+
+    def _flush(self, quantidade):
+        """Grava um INSERT com as primeiras ``quantidade`` linhas pendentes."""
+        chunk, self.pending = self.pending[:quantidade], self.pending[quantidade:]
+        if self.replace:
+            # Versao anterior da linha (para taloes, o monitoramento sai junto em cascata).
+            _write_delete(self.out, self.table_name, [row[self.replace_index] for row in chunk], self.replace)
+        values = ",\n".join("(" + ", ".join(sql_literal(v) for v in row) + ")" for row in chunk)
+        self.out.write(self.prefix + values + ";\n")
+
+
+def _write_delete(out, table_name, ids, column="id"):
+    """Grava ``DELETE ... WHERE <column> IN (...)`` em blocos de ate ``MAX_ROWS_PER_INSERT`` ids."""
+    for start in range(0, len(ids), MAX_ROWS_PER_INSERT):
+        chunk = ids[start : start + MAX_ROWS_PER_INSERT]
+        out.write(f"DELETE FROM {table_name} WHERE {column} IN ({', '.join(str(int(i)) for i in chunk)});\n")
+
+
+def write_year_backup(
+    path, ano, tables, rows_per_insert=MAX_ROWS_PER_INSERT, progress=None, cancel=None, deleted_ids=None
+):
+    """Grava o script de backup do ano e retorna ``{tabela: registros}``.
+
+    ``tables`` e uma sequencia de ``(tabela, colunas, lotes)``; os lotes
+    (ex.: ``repo.iter_taloes_by_year``) sao consumidos em ordem, entao so um
+    lote fica em memoria. ``progress(total_gravado)`` acumula todas as tabelas.
+    Com ``deleted_ids`` (lista, possivelmente vazia) o script e incremental:
+    exclui esses taloes e substitui os taloes gravados (por ``id``) e o
+    monitoramento gravado (por ``talao_id``).
+    """
+    rows_per_insert = max(1, min(int(rows_per_insert), MAX_ROWS_PER_INSERT))
+    incremental = deleted_ids is not None
+    totals = {}
+    try:
+        with open_backup(path, "wt") as out:
+            titulo = "Backup incremental AFIS" if incremental else "Backup AFIS"
+            out.write(f"-- {titulo} ano {ano}\nSET NOCOUNT ON;\nBEGIN TRANSACTION;\nBEGIN TRY\n")
+            if incremental:
+                out.write(f"\n-- Taloes excluidos: {len(deleted_ids)}\n")
+                _write_delete(out, TALOES_TABLE, list(deleted_ids))
+            gravados = 0
+            for table_name, columns, batches in tables:
+                out.write(f"\n-- Tabela {table_name}\n")
+                replace = _REPLACE_KEYS.get(table_name) if incremental else None
+                writer = _InsertWriter(out, table_name, columns, rows_per_insert, replace=replace)
+                offset = gravados
+                consume_batches(
+                    batches,
+                    writer.write_batch,
+                    None if progress is None else (lambda total, offset=offset: progress(offset + total)),
+                    cancel,
+                )
+                writer.close()
+                totals[table_name] = writer.total
+                gravados += writer.total
+            out.write(
+                "\nCOMMIT TRANSACTION;\nEND TRY\nBEGIN CATCH\n"
+                "    IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;\n    THROW;\nEND CATCH;\n"
+            )
+        return totals
+    except BaseException:
+        for _, _, batches in tables:
+            close = getattr(batches, "close", None)
+            if close is not None:
+                close()
+        remove_partial(path)
+        raise
+
+
+def manifest_path(folder, ano):
+    """Caminho do manifesto de backups do ano na pasta."""
+    return os.path.join(folder, f"backup_afis_{ano}_manifesto.json")
+
+
+def load_manifest(path):
+    """Le o manifesto; levanta ``BackupManifestError`` se ausente ou invalido."""
+    try:
+        with open(path, encoding="utf-8") as manifest_file:
+            manifesto = json.load(manifest_file)
+    except FileNotFoundError as exc:
+        raise BackupManifestError(f"Manifesto de backup não encontrado: {path}.") from exc
+    except (OSError, ValueError) as exc:
+        raise BackupManifestError(f"Manifesto de backup inválido: {path}.") from exc
+    arquivos = manifesto.get("arquivos") if isinstance(manifesto, dict) else None
+    if not arquivos or arquivos[0].get("tipo") != BACKUP_FULL:
+        raise BackupManifestError(f"Manifesto sem backup completo: {path}.")
+    for anterior, atual in zip(arquivos, arquivos[1:]):
+        if atual.get("de") != anterior.get("ate"):
+            raise BackupManifestError(f"Cadeia de backups quebrada antes de {atual.get('arquivo')}.")
+    return manifesto
+
+
+def manifest_files(path):
+    """Arquivos da cadeia (completo + incrementais), na ordem de aplicacao."""
+    folder = os.path.dirname(os.path.abspath(path))
+    return [os.path.join(folder, item["arquivo"]) for item in load_manifest(path)["arquivos"]]
+
+
+def _save_manifest(path, manifesto):
+    """Grava o manifesto de forma atomica (arquivo temporario + ``os.replace``)."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifesto, manifest_file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def backup_year(repo, path, ano, incremental=False, rows_per_insert=MAX_ROWS_PER_INSERT, progress=None, cancel=None):
+    """Gera backup completo ou incremental do ano e o registra no manifesto da pasta.
+
+    O completo inicia nova cadeia. O incremental le so os taloes e os
+    monitoramentos com versao entre a marca d'agua do ultimo arquivo da
+    cadeia e a atual (lida antes das consultas; o que mudar durante o backup
+    entra no proximo). Retorna ``{tabela: registros}``.
+    """
+    manifesto_path = manifest_path(os.path.dirname(os.path.abspath(path)), ano)
+    if incremental:
+        manifesto = load_manifest(manifesto_path)
+        if manifesto.get("ano") != ano:
+            raise BackupManifestError(f"Manifesto {manifesto_path} não é do ano {ano}.")
+        de = manifesto["arquivos"][-1]["ate"]
+    else:
+        manifesto = {"ano": ano, "arquivos": []}
+        de = None
+    ate = repo.get_backup_watermark()
+
+    if incremental:
+        # Monitoramento entra pela propria versao (adiamento sem mudar o talao) ou pela do talao.
+        taloes, monitoramento = repo.iter_taloes_changed(ano, de, ate), repo.iter_monitoramento_changed(ano, de, ate)
+        deleted_ids = repo.list_deleted_talao_ids(de, ate)
+    else:
+        taloes, monitoramento = repo.iter_taloes_by_year(ano), repo.iter_monitoramento_by_year(ano)
+        deleted_ids = None
+
+    totais = write_year_backup(
+        path,
+        ano,
+        [
+            (TALOES_TABLE, list(TALAO_DETAIL_COLUMNS), taloes),
+            (MONITORAMENTO_TABLE, list(MONITORAMENTO_BACKUP_COLUMNS), monitoramento),
+        ],
+        rows_per_insert=rows_per_insert,
+        progress=progress,
+        cancel=cancel,
+        deleted_ids=deleted_ids,
+    )
+    if incremental:
+        totais["excluidos"] = len(deleted_ids)
+    manifesto["arquivos"].append(
+        {
+            "arquivo": os.path.basename(path),
+            "tipo": BACKUP_INCREMENTAL if incremental else BACKUP_FULL,
+            "de": de,
+            "ate": ate,
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "registros": totais,
+        }
+    )
+    _save_manifest(manifesto_path, manifesto)
+    return totais
+
+
+def main(argv=None):
+    """Linha de comando: gera backup completo ou incremental do ano na pasta informada."""
+    parser = argparse.ArgumentParser(prog="python -m afis_app.backup", description="Backup anual do AFIS.")
+    parser.add_argument("ano", type=int, help="ano de referência dos talões")
+    parser.add_argument("pasta", help="pasta dos arquivos de backup e do manifesto")
+    parser.add_argument("--incremental", action="store_true", help="grava só as mudanças desde o último backup")
+    parser.add_argument("--compressao", choices=("nenhuma", "gzip", "zstd"), default="gzip")
+    args = parser.parse_args(argv)
+
+    suffix = {"nenhuma": ".sql", "gzip": ".sql.gz", "zstd": ".sql.zst"}[args.compressao]
+    tipo = "incremental_" + datetime.now().strftime("%Y%m%d_%H%M%S") if args.incremental else "completo"
+    path = os.path.join(args.pasta, f"backup_afis_{args.ano}_{tipo}{suffix}")
+
+    load_env_file()
+    repo = build_repository()
+    try:
+        totais = backup_year(repo, path, args.ano, incremental=args.incremental)
+    finally:
+        repo.close()
+    print(path)
+    for table_name, total in totais.items():
+        print(f"{table_name}: {total}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
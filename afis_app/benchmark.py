@@ -0,0 +1,384 @@
+"""Suite de benchmarks do repositorio e das exportacoes sobre massa sintetica.
+
+Para cada escala (quantidade aproximada de taloes) cria um banco SQLite
+local, carrega a massa de ``synthetic`` e mede os metodos de leitura do
+``TalaoRepository`` (grade inicial, busca em todas as combinacoes de filtro,
+periodo, alertas vencidos), a gravacao concorrente de taloes e os caminhos
+de exportacao dos botoes da UI (CSV, XLSX pelo modelo e backup anual),
+chamados direto, sem Tk.
+
+O resultado vai para JSON. Com ``--comparar`` cada caso e confrontado com
+o mesmo caso (mesma escala) de um resultado anterior guardado como
+referencia; a mediana acima da tolerancia conta como regressao e o comando
+termina com codigo 1.
+
+Uso em linha de comando::
+
+    python -m afis_app.benchmark --escalas 10000,100000,1000000 --saida baseline.json
+    python -m afis_app.benchmark --escalas 10000,100000 --saida atual.json --comparar baseline.json
+"""
+
+import argparse
+from datetime import date, datetime
+import itertools
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time as _time
+
+from . import backup
+from .constants import SEARCH_MODE_CONTAINS, STATUS_FINALIZADO, STATUS_MONITORADO
+from .exports import report_xlsx_cells, write_csv, write_xlsx_template
+from .repository import TALAO_DETAIL_COLUMNS
+from .sqlite_repository import SQLiteRepository
+from .synthetic import load_repository, per_day_for_rows
+
+RESULTS_VERSION = 1
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000)
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.2
+# Diferenca absoluta minima (ms) para contar regressao: abaixo disso e ruido.
+MIN_REGRESSION_MS = 1.0
+BENCHMARK_YEARS = 3
+INSERT_THREADS = 4
+INSERTS_PER_THREAD = 50
+SEARCH_FILTER_GROUPS = ("talao", "periodo", "boletim", "delegacia", "equipe", "operador")
+CONTAINS_FILTERS = ("boletim", "delegacia", "operador")
+MODELO_PATH = Path(__file__).resolve().parent.parent / "assets" / "modelo.xlsx"
+
+_COLUMN_INDEX = {name: index for index, name in enumerate(TALAO_DETAIL_COLUMNS)}
+
+
+def summarize(tempos_ms, linhas):
+    """Resume os tempos (ms) de um caso: minimo, mediana, p95, maximo e linhas retornadas."""
+    ordenados = sorted(tempos_ms)
+    p95 = ordenados[min(len(ordenados) - 1, int(round(0.95 * (len(ordenados) - 1))))]
+    return {
+        "repeticoes": len(ordenados),
+        "min_ms": round(ordenados[0], 3),
+        "mediana_ms": round(statistics.median(ordenados), 3),
+        "p95_ms": round(p95, 3),
+        "max_ms": round(ordenados[-1], 3),
+        "linhas": linhas,
+    }
+
+
+def measure(fn, repeticoes=DEFAULT_REPEAT):
+    """Executa ``fn`` uma vez para aquecer e mede ``repeticoes`` execucoes; ``fn`` retorna as linhas."""
+    linhas = fn()
+    tempos = []
+    for _ in range(max(1, repeticoes)):
+        inicio = _time.perf_counter()
+        linhas = fn()
+        tempos.append((_time.perf_counter() - inicio) * 1000)
+    return summarize(tempos, linhas)
+
+
+def _sample_row(repo, ano):
+    """Talao finalizado do meio do ano, usado como valor dos filtros de busca."""
+    for batch in repo.iter_taloes_by_period(date(ano, 6, 1), date(ano, 12, 31)):
+        for row in batch:
+            if row[_COLUMN_INDEX["status"]] == STATUS_FINALIZADO and row[_COLUMN_INDEX["equipe"]]:
+                return row
+    raise ValueError(f"Massa sintética sem talão finalizado em {ano}.")
+
+
+def search_cases(amostra):
+    """Filtros de busca por caso: todas as combinacoes de ``SEARCH_FILTER_GROUPS`` e os modos ``contem``."""
+    ano = amostra[_COLUMN_INDEX["ano"]]
+    grupos = {
+        "talao": {"ano": ano, "talao_num": amostra[_COLUMN_INDEX["talao"]]},
+        "periodo": {"data_inicio": f"{ano}-06-01", "data_fim": f"{ano}-06-30"},
+        "boletim": {"boletim": amostra[_COLUMN_INDEX["boletim"]]},
+        "delegacia": {"delegacia": amostra[_COLUMN_INDEX["delegacia"]]},
+        "equipe": {"equipe": amostra[_COLUMN_INDEX["equipe"]]},
+        "operador": {"operador": amostra[_COLUMN_INDEX["operador"]]},
+    }
+    casos = {}
+    for tamanho in range(1, len(SEARCH_FILTER_GROUPS) + 1):
+        for combinacao in itertools.combinations(SEARCH_FILTER_GROUPS, tamanho):
+            filters = {}
+            for grupo in combinacao:
+                filters.update(grupos[grupo])
+            casos[f"search_taloes[{'+'.join(combinacao)}]"] = filters
+    for campo in CONTAINS_FILTERS:
+        valor = str(amostra[_COLUMN_INDEX[campo]])
+        casos[f"search_taloes[{campo}~contem]"] = {campo: valor[1:-1], "modo_texto": SEARCH_MODE_CONTAINS}
+    return casos
+
+
+def _insert_payload(dia, indice):
+    """Payload de talao monitorado para o teste de gravacao concorrente."""
+    return {
+        "data_solic": dia.isoformat(),
+        "hora_solic": f"{8 + indice % 12:02d}:{indice % 60:02d}",
+        "delegacia": "1 DP",
+        "autoridade": "DR. BENCHMARK",
+        "solicitante": "CB PM BENCHMARK",
+        "endereco": f"RUA DO TESTE, {indice}",
+        "boletim": f"ZZ{indice % 10000:04d}",
+        "natureza": "",
+        "data_bo": "",
+        "vitimas": "",
+        "equipe": "",
+        "operador": f"OPERADOR {indice % INSERT_THREADS}",
+        "status": STATUS_MONITORADO,
+        "observacao": "",
+    }
+
+
+def measure_insert_contention(repo, dia, threads=INSERT_THREADS, por_thread=INSERTS_PER_THREAD):
+    """Grava ``threads x por_thread`` taloes em paralelo; retorna o resumo por gravacao e a vazao."""
+    tempos = [[] for _ in range(threads)]
+    erros = []
+    largada = threading.Barrier(threads)
+
+    def _worker(posicao):
+        largada.wait()
+        try:
+            for contador in range(por_thread):
+                payload = _insert_payload(dia, posicao * por_thread + contador)
+                inicio = _time.perf_counter()
+                repo.insert_talao(payload, 30)
+                tempos[posicao].append((_time.perf_counter() - inicio) * 1000)
+        except Exception as exc:
+            erros.append(exc)
+
+    workers = [threading.Thread(target=_worker, args=(posicao,)) for posicao in range(threads)]
+    inicio = _time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    segundos = _time.perf_counter() - inicio
+    if erros:
+        raise erros[0]
+    todos = [tempo for lista in tempos for tempo in lista]
+    resumo = summarize(todos, len(todos))
+    resumo.update(threads=threads, por_segundo=round(len(todos) / segundos) if segundos > 0 else len(todos))
+    return resumo
+
+
+def run_scale(repo, pasta, ano, repeticoes=DEFAULT_REPEAT, progress=None):
+    """Mede todos os casos em ``repo`` ja carregado; ``ano`` e o ultimo ano completo da massa."""
+    amostra = _sample_row(repo, ano)
+    colunas = list(TALAO_DETAIL_COLUMNS)
+    inicio, fim = date(ano, 1, 1), date(ano, 12, 31)
+
+    def _search(filters):
+        return lambda: len(repo.search_taloes(filters)[1])
+
+    def _csv():
+        return write_csv(os.path.join(pasta, "relatorio.csv"), colunas, repo.iter_taloes_by_period(inicio, fim))
+
+    def _xlsx():
+        batches = repo.iter_taloes_by_period(inicio, fim)
+        path = os.path.join(pasta, "relatorio.xlsx")
+        return write_xlsx_template(path, MODELO_PATH, report_xlsx_cells, colunas, batches)
+
+    def _backup():
+        return sum(backup.backup_year(repo, os.path.join(pasta, f"backup_afis_{ano}.sql.gz"), ano).values())
+
+    casos = {"list_initial_taloes": lambda: len(repo.list_initial_taloes())}
+    casos.update((nome, _search(filters)) for nome, filters in search_cases(amostra).items())
+    casos.update(
+        {
+            "list_taloes_by_period[mes]": lambda: len(repo.list_taloes_by_period(date(ano, 6, 1), date(ano, 6, 30))[1]),
+            "list_due_monitoring": lambda: len(repo.list_due_monitoring()),
+            "list_due_monitoring[registros]": lambda: len(repo.list_due_monitoring(with_records=True)),
+            "gerar_csv[ano]": _csv,
+            "gerar_modelo_xlsx[ano]": _xlsx,
+            "gerar_backup[ano]": _backup,
+        }
+    )
+    resultados = {}
+    for nome, fn in casos.items():
+        if progress is not None:
+            progress(nome)
+        resultados[nome] = measure(fn, repeticoes)
+    # Por ultimo: as gravacoes aumentam o banco (no ano seguinte ao medido).
+    if progress is not None:
+        progress("insert_talao[concorrente]")
+    resultados["insert_talao[concorrente]"] = measure_insert_contention(repo, date(ano + 1, 1, 2))
+    return resultados
+
+
+def run_benchmarks(escalas, pasta, seed=0, ate=None, repeticoes=DEFAULT_REPEAT, progress=None):
+    """Carrega e mede cada escala em um banco novo em ``pasta``; retorna o documento de resultados."""
+    ate = ate or date.today().year - 1
+    anos = range(ate - BENCHMARK_YEARS + 1, ate + 1)
+    documento = {
+        "versao": RESULTS_VERSION,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "backend": "sqlite",
+        "semente": seed,
+        "repeticoes": repeticoes,
+        "escalas": [],
+    }
+    for linhas in escalas:
+        path = os.path.join(pasta, f"benchmark_{linhas}.db")
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(path + sufixo):
+                os.remove(path + sufixo)
+        repo = SQLiteRepository(path)
+        try:
+            if progress is not None:
+                progress(f"{linhas}: carga")
+            por_dia = per_day_for_rows(linhas, BENCHMARK_YEARS)
+            carga = load_repository(repo, anos, por_dia, seed, hoje=date(ate + 1, 1, 1))
+            casos = run_scale(
+                repo,
+                pasta,
+                ate,
+                repeticoes,
+                progress=(lambda nome, linhas=linhas: progress(f"{linhas}: {nome}")) if progress else None,
+            )
+        finally:
+            repo.close()
+        documento["escalas"].append(
+            {
+                "linhas_alvo": linhas,
+                "taloes": carga["taloes"],
+                "monitoramento": carga["monitoramento"],
+                "carga_segundos": carga["segundos"],
+                "carga_linhas_por_segundo": carga["linhas_por_segundo"],
+                "casos": casos,
+            }
+        )
+    return documento
+
+
+def compare_results(atual, referencia, tolerancia=DEFAULT_TOLERANCE, minimo_ms=MIN_REGRESSION_MS):
+    """Compara as medianas dos casos presentes nos dois resultados (mesma escala).
+
+    Retorna uma lista de ``{"escala", "caso", "referencia_ms", "atual_ms",
+    "variacao", "regressao"}``; ``variacao`` e relativa (0.25 = 25% mais
+    lento) e ``regressao`` exige passar da tolerancia e de ``minimo_ms``.
+    """
+    base = {
+        (escala["linhas_alvo"], caso): valores["mediana_ms"]
+        for escala in referencia.get("escalas", [])
+        for caso, valores in escala["casos"].items()
+    }
+    comparacao = []
+    for escala in atual.get("escalas", []):
+        for caso, valores in escala["casos"].items():
+            chave = (escala["linhas_alvo"], caso)
+            if chave not in base:
+                continue
+            anterior, agora = base[chave], valores["mediana_ms"]
+            variacao = (agora - anterior) / anterior if anterior > 0 else 0.0
+            comparacao.append(
+                {
+                    "escala": escala["linhas_alvo"],
+                    "caso": caso,
+                    "referencia_ms": anterior,
+                    "atual_ms": agora,
+                    "variacao": round(variacao, 3),
+                    "regressao": variacao > tolerancia and agora - anterior > minimo_ms,
+                }
+            )
+    return comparacao
+
+
+def format_results(documento):
+    """Tabela de texto com a mediana e o p95 de cada caso por escala."""
+    linhas = []
+    for escala in documento["escalas"]:
+        linhas.append(
+            f"== {escala['linhas_alvo']} (talões: {escala['taloes']}, carga: {escala['carga_segundos']:.2f} s, "
+            f"{escala['carga_linhas_por_segundo']} linhas/s)"
+        )
+        for caso, valores in escala["casos"].items():
+            linhas.append(
+                f"{caso:<64} {valores['mediana_ms']:>10.2f} ms  p95 {valores['p95_ms']:>10.2f} ms  "
+                f"linhas {valores['linhas']}"
+            )
+    return "\n".join(linhas)
+
+
+def format_comparison(comparacao):
+    """Tabela de texto da comparacao, com as regressoes marcadas."""
+    linhas = []
+    for item in comparacao:
+        marca = "REGRESSÃO" if item["regressao"] else ""
+        linhas.append(
+            f"{item['escala']:>8} {item['caso']:<64} {item['referencia_ms']:>10.2f} -> {item['atual_ms']:>10.2f} ms "
+            f"({item['variacao']:+.0%}) {marca}".rstrip()
+        )
+    regressoes = sum(item["regressao"] for item in comparacao)
+    linhas.append(f"Casos comparados: {len(comparacao)}; regressões: {regressoes}")
+    return "\n".join(linhas)
+
+
+def _parse_scales(text):
+    """Converte ``10000,100000`` em tupla de inteiros positivos."""
+    try:
+        escalas = tuple(int(parte) for parte in text.split(",") if parte.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError("Informe as escalas como inteiros separados por vírgula.") from None
+    if not escalas or min(escalas) < 1:
+        raise argparse.ArgumentTypeError("Informe ao menos uma escala positiva.")
+    return escalas
+
+
+def main(argv=None):
+    """Linha de comando: mede as escalas, grava o JSON e compara com a referencia informada."""
+    parser = argparse.ArgumentParser(
+        prog="python -m afis_app.benchmark",
+        description="Mede repositório e exportações sobre massa sintética em SQLite local.",
+    )
+    parser.add_argument(
+        "--escalas",
+        type=_parse_scales,
+        default=DEFAULT_SCALES,
+        help="talões aproximados por escala, separados por vírgula (padrão: 10000,100000,1000000)",
+    )
+    parser.add_argument("--repeticoes", type=int, default=DEFAULT_REPEAT, help="medições por caso (padrão: 3)")
+    parser.add_argument("--semente", type=int, default=0, help="semente da massa sintética (padrão: 0)")
+    parser.add_argument("--saida", help="arquivo JSON de resultados")
+    parser.add_argument("--comparar", help="resultado JSON de referência para detectar regressões")
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="aumento relativo da mediana aceito antes de acusar regressão (padrão: 0.2)",
+    )
+    parser.add_argument("--pasta", help="pasta dos bancos e arquivos gerados (padrão: pasta temporária do sistema)")
+    args = parser.parse_args(argv)
+
+    def _progress(etapa):
+        print(f"... {etapa}", file=sys.stderr, flush=True)
+
+    def _run(pasta):
+        return run_benchmarks(args.escalas, pasta, args.semente, repeticoes=args.repeticoes, progress=_progress)
+
+    if args.pasta:
+        os.makedirs(args.pasta, exist_ok=True)
+        documento = _run(args.pasta)
+    else:
+        with tempfile.TemporaryDirectory() as pasta:
+            documento = _run(pasta)
+    print(format_results(documento))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as file:
+            json.dump(documento, file, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as file:
+            referencia = json.load(file)
+        comparacao = compare_results(documento, referencia, args.tolerancia)
+        print(format_comparison(comparacao))
+        if any(item["regressao"] for item in comparacao):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Cache de leitura na frente do repositorio, com invalidacao por alteracao.
+
+``get_talao``, ``get_monitoring_interval`` e ``get_next_talao`` sao lidos
+varias vezes seguidas para os mesmos ids (editar, alerta, atualizacao da
+grade). ``CachedRepository`` guarda esses resultados em um LRU limitado,
+com validade por metodo, e repassa todo o resto ao repositorio real.
+
+Gravacoes feitas por este terminal invalidam as entradas afetadas na hora.
+Gravacoes de outros terminais sao percebidas pela sonda
+``repo.get_cache_version()``, consultada no maximo uma vez a cada
+``probe_interval`` segundos: quando o valor muda, o cache inteiro e
+descartado.
+"""
+
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+from .config import get_env, get_env_number
+from .repository import RESTORE_FAIL
+
+logger = logging.getLogger(__name__)
+
+CACHED_METHODS = ("get_talao", "get_monitoring_interval", "get_next_talao")
+DEFAULT_CACHE_TTL = {"get_talao": 30.0, "get_monitoring_interval": 30.0, "get_next_talao": 5.0}
+
+
+class CachedRepository:
+    """Decorador de ``TalaoRepository`` com cache de leitura e invalidacao na gravacao.
+
+    ``ttl`` define a validade (segundos) por metodo de ``CACHED_METHODS``;
+    ``max_entries`` limita o total de entradas (descarta a menos usada).
+    ``get_talao`` devolve sempre uma copia do dicionario guardado.
+    """
+
+    def __init__(self, repo, max_entries=512, ttl=None, probe_interval=2.0, clock=time.monotonic):
+        if int(max_entries) < 1:
+            raise ValueError("max_entries deve ser maior ou igual a 1.")
+        self.repo = repo
+        self._max_entries = int(max_entries)
+        self._ttl = dict(DEFAULT_CACHE_TTL)
+        self._ttl.update(ttl or {})
+        self._probe_interval = float(probe_interval)
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._version = None
+        self._next_probe = None
+        # Muda a cada invalidacao: leitura iniciada antes dela nao e guardada.
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0, "probes": 0, "resets": 0}
+        self._method_stats = {name: {"hits": 0, "misses": 0} for name in CACHED_METHODS}
+
+    def __getattr__(self, name):
+        """Repassa ao repositorio real os metodos e atributos sem cache."""
+        if name == "repo":
+            raise AttributeError(name)
+        return getattr(self.repo, name)
+
+    def _check_version(self):
+        """Consulta a sonda do banco quando vencida e limpa o cache se houve gravacao."""
+        now = self._clock()
+        with self._lock:
+            if self._next_probe is not None and now < self._next_probe:
+                return
+            self._next_probe = now + self._probe_interval
+            self._stats["probes"] += 1
+        version = self.repo.get_cache_version()
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self._stats["resets"] += 1
+                self._version = version
+                self._entries.clear()
+                self._generation += 1
+
+    def _cached(self, method, *args):
+        """Retorna o valor de ``method(*args)`` do cache ou le do repositorio e guarda."""
+        self._check_version()
+        key = (method,) + args
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                self._method_stats[method]["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            self._method_stats[method]["misses"] += 1
+            generation = self._generation
+        value = getattr(self.repo, method)(*args)
+        if value is None and method == "get_talao":
+            # Id inexistente agora pode ser criado por outro terminal logo depois.
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + self._ttl[method], value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        return value
+
+    def _invalidate(self, keys=None):
+        """Remove as chaves informadas (ou tudo, com ``keys=None``) e invalida leituras em andamento."""
+        with self._lock:
+            self._generation += 1
+            if keys is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                removed = sum(self._entries.pop(key, None) is not None for key in keys)
+            self._stats["invalidations"] += removed
+
+    def _invalidate_taloes(self, talao_ids):
+        """Invalida registro e intervalo de monitoramento dos taloes informados."""
+        keys = []
+        for talao_id in talao_ids:
+            keys.extend((("get_talao", talao_id), ("get_monitoring_interval", talao_id)))
+        self._invalidate(keys)
+
+    def _invalidate_next_talao(self):
+        """Invalida os proximos numeros de talao guardados (todos os anos)."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == "get_next_talao"]
+        self._invalidate(keys)
+
+    def get_talao(self, talao_id):
+        """``repo.get_talao`` com cache; devolve copia para o chamador poder alterar."""
+        record = self._cached("get_talao", talao_id)
+        return dict(record) if record is not None else None
+
+    def get_monitoring_interval(self, talao_id):
+        """``repo.get_monitoring_interval`` com cache."""
+        return self._cached("get_monitoring_interval", talao_id)
+
+    def get_next_talao(self, ano):
+        """``repo.get_next_talao`` com cache."""
+        return self._cached("get_next_talao", ano)
+
+    def insert_talao(self, data, intervalo_min):
+        """Grava no repositorio e invalida o proximo numero de talao."""
+        try:
+            return self.repo.insert_talao(data, intervalo_min)
+        finally:
+            self._invalidate_next_talao()
+
+    def update_talao(self, talao_id, data, intervalo_min, expected_version=None):
+        """Grava no repositorio e invalida registro e intervalo do talao."""
+        try:
+            return self.repo.update_talao(talao_id, data, intervalo_min, expected_version=expected_version)
+        finally:
+            self._invalidate_taloes([talao_id])
+
+    def postpone_monitoring(self, talao_id, intervalo_min):
+        """Adia no repositorio e invalida o intervalo guardado do talao."""
+        try:
+            return self.repo.postpone_monitoring(talao_id, intervalo_min)
+        finally:
+            self._invalidate([("get_monitoring_interval", talao_id)])
+
+    def postpone_monitoring_many(self, talao_ids, intervalo_min):
+        """Adia em lote no repositorio e invalida os intervalos guardados."""
+        talao_ids = list(talao_ids)
+        try:
+            return self.repo.postpone_monitoring_many(talao_ids, intervalo_min)
+        finally:
+            self._invalidate([("get_monitoring_interval", talao_id) for talao_id in talao_ids])
+
+    def finalize_many(self, records):
+        """Finaliza em lote no repositorio e invalida os taloes enviados."""
+        records = list(records)
+        try:
+            return self.repo.finalize_many(records)
+        finally:
+            self._invalidate_taloes([record["id"] for record in records])
+
+    def restore_rows(self, batches, policy=RESTORE_FAIL):
+        """Restaura no repositorio e descarta todo o cache."""
+        try:
+            return self.repo.restore_rows(batches, policy=policy)
+        finally:
+            self._invalidate()
+
+    def cache_stats(self):
+        """Retorna fotografia de acertos, falhas e invalidacoes do cache."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["size"] = len(self._entries)
+            snapshot["max_entries"] = self._max_entries
+            snapshot["methods"] = {name: dict(values) for name, values in self._method_stats.items()}
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 3) if lookups else 0.0
+        return snapshot
+
+    def close(self):
+        """Registra as estatisticas do cache no log e fecha o repositorio real."""
+        logger.info("Cache do repositório: %s", self.cache_stats())
+        self.repo.close()
+
+
+def build_cached_repository(repo):
+    """Envolve ``repo`` em ``CachedRepository`` conforme as variaveis ``DB_CACHE*``.
+
+    ``DB_CACHE=no`` devolve o proprio ``repo``. ``DB_CACHE_TTL`` (segundos)
+    vale para registros e intervalos; o proximo numero de talao usa o menor
+    entre ele e o padrao de 5 s.
+    """
+    if str(get_env("DB_CACHE", default="yes")).strip().lower() in ("0", "false", "no", "n", "off"):
+        return repo
+    ttl = max(0.0, get_env_number("DB_CACHE_TTL", DEFAULT_CACHE_TTL["get_talao"], float))
+    return CachedRepository(
+        repo,
+        max_entries=max(1, get_env_number("DB_CACHE_MAX_ENTRIES", 512)),
+        ttl={
+            "get_talao": ttl,
+            "get_monitoring_interval": ttl,
+            "get_next_talao": min(ttl, DEFAULT_CACHE_TTL["get_next_talao"]),
+        },
+        probe_interval=max(0.0, get_env_number("DB_CACHE_PROBE_SECONDS", 2.0, float)),
+    )
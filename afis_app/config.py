@@ -1,3 +1,4 @@
+import logging
 import os
 from pathlib import Path
 
@@ -6,6 +7,8 @@ from dotenv import load_dotenv
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 ENV_FILE_PATH = PROJECT_ROOT / "assets" / ".env"
 
+logger = logging.getLogger(__name__)
+
 
 def load_env_file():
     """Carrega variaveis de ambiente do arquivo assets/.env quando existir."""
@@ -19,3 +22,15 @@ def get_env(key, default=None):
     if value is not None and str(value).strip() != "":
         return value
     return default
+
+
+def get_env_number(key, default, cast=int):
+    """Le variavel numerica do ambiente, usando o padrao quando ausente ou invalida."""
+    raw = get_env(key, default=None)
+    if raw is None:
+        return default
+    try:
+        return cast(raw)
+    except (TypeError, ValueError):
+        logger.warning("Valor inválido para %s (%r). Usando %r.", key, raw, default)
+        return default
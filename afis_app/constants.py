@@ -3,6 +3,12 @@ STATUS_FINALIZADO = "FINALIZADO"
 STATUS_CANCELADO = "CANCELADO"
 STATUS_OPCOES = (STATUS_MONITORADO, STATUS_FINALIZADO, STATUS_CANCELADO)
 
+# Modos de comparacao dos filtros textuais da busca de taloes.
+SEARCH_MODE_PREFIX = "prefixo"
+SEARCH_MODE_CONTAINS = "contem"
+# Campos com coluna normalizada "<campo>_busca" (maiusculas, sem acento) indexada.
+SEARCH_TEXT_FIELDS = ("delegacia", "equipe", "operador")
+
 CREATE_REQUIRED = [
     "data_solic",
     "hora_solic",
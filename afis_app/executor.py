@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DBTask:
+    """Requisicao submetida ao executor, com suporte a cancelamento."""
+
+    def __init__(self, key, on_success, on_error):
+        self.key = key
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        """Indica se a requisicao foi cancelada ou substituida."""
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """Cancela a requisicao; o resultado, se vier, sera descartado."""
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class DBExecutor:
+    """Executa chamadas de repositorio fora da thread do Tk.
+
+    As funcoes rodam em um pool de threads de trabalho e os resultados voltam
+    para a thread do Tk por uma fila consultada periodicamente com ``after()``;
+    assim os callbacks ``on_success``/``on_error`` podem manipular widgets.
+    Requisicoes submetidas com a mesma ``key`` substituem a anterior ainda
+    pendente, que e cancelada e tem o resultado descartado.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers=2, on_busy_change=None):
+        self.root = root
+        self.on_busy_change = on_busy_change
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="afis-db")
+        self._results = queue.SimpleQueue()
+        self._by_key = {}
+        self._pending = 0
+        self._closed = False
+        self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    @property
+    def busy(self):
+        """Indica se ha requisicoes em andamento."""
+        return self._pending > 0
+
+    def submit(self, fn, *args, on_success=None, on_error=None, key=None, **kwargs):
+        """Agenda ``fn(*args, **kwargs)`` em thread de trabalho (chamar na thread do Tk)."""
+        if self._closed:
+            raise RuntimeError("Executor de banco encerrado.")
+        task = DBTask(key, on_success, on_error)
+        if key is not None:
+            previous = self._by_key.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._by_key[key] = task
+
+        self._set_pending(self._pending + 1)
+        task.future = self._workers.submit(self._run, task, fn, args, kwargs)
+        task.future.add_done_callback(lambda future: self._on_future_done(task, future))
+        return task
+
+    def post(self, callback, *args):
+        """Agenda ``callback(*args)`` na thread do Tk; pode ser chamado de qualquer thread."""
+        self._results.put((None, callback, args))
+
+    def cancel(self, key):
+        """Cancela a requisicao pendente associada a ``key``."""
+        task = self._by_key.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def _on_future_done(self, task, future):
+        """Enfileira conclusao de requisicao cancelada antes de iniciar."""
+        if future.cancelled():
+            self._results.put((task, False, None))
+
+    def _run(self, task, fn, args, kwargs):
+        """Executa a funcao na thread de trabalho e enfileira o resultado."""
+        if task.cancelled:
+            self._results.put((task, False, None))
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self._results.put((task, False, exc))
+        else:
+            self._results.put((task, True, result))
+
+    def _set_pending(self, value):
+        """Atualiza contador de requisicoes e notifica mudanca de estado ocupado."""
+        was_busy = self._pending > 0
+        self._pending = value
+        if self.on_busy_change is not None and was_busy != (value > 0):
+            try:
+                self.on_busy_change(value > 0)
+            except Exception:
+                logger.exception("Falha ao atualizar indicador de ocupado")
+
+    def _poll(self):
+        """Despacha resultados prontos para os callbacks na thread do Tk."""
+        while True:
+            try:
+                task, ok, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if task is None:
+                self._invoke(ok, *payload)
+                continue
+            self._dispatch(task, ok, payload)
+
+        if not self._closed:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def _dispatch(self, task, ok, payload):
+        """Entrega resultado de uma requisicao, descartando as canceladas."""
+        self._set_pending(self._pending - 1)
+        if task.key is not None and self._by_key.get(task.key) is task:
+            del self._by_key[task.key]
+        if task.cancelled:
+            return
+        if ok:
+            if task.on_success is not None:
+                self._invoke(task.on_success, payload)
+            return
+        if task.on_error is not None:
+            self._invoke(task.on_error, payload)
+        else:
+            logger.error("Falha em chamada ao banco de dados", exc_info=payload)
+
+    def _invoke(self, callback, *args):
+        """Chama callback protegendo o laco de eventos contra excecoes."""
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("Falha em callback de chamada ao banco de dados")
+
+    def shutdown(self):
+        """Cancela requisicoes pendentes e encerra as threads de trabalho."""
+        self._closed = True
+        for task in list(self._by_key.values()):
+            task.cancel()
+        self._by_key.clear()
+        try:
+            self.root.after_cancel(self._poll_id)
+        except Exception:
+            pass
+        self._workers.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,254 @@
+"""Gravacao de relatorios em fluxo (lote a lote), com progresso e cancelamento.
+
+Os escritores consomem um iteravel de lotes de linhas (ex.:
+``repo.iter_taloes_by_period``) e nunca mantem o periodo inteiro em memoria.
+Rodam fora da thread do Tk; ``progress(total_gravado)`` e chamado a cada
+lote e ``cancel`` (``threading.Event``) interrompe a gravacao entre lotes,
+removendo o arquivo parcial.
+
+O XLSX e gerado direto no XML da planilha a partir do modelo: todas as
+partes do pacote (estilos, imagem, tabela, configuracao de impressao) sao
+copiadas como estao, as linhas de cabecalho do modelo sao mantidas e as
+linhas de dados sao escritas em fluxo com o estilo de cada coluna do modelo.
+"""
+
+import csv
+from datetime import date
+import os
+import posixpath
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+
+class ExportCancelled(Exception):
+    """Exportacao interrompida a pedido do usuario."""
+
+    pass
+
+
+def consume_batches(batches, write_batch, progress=None, cancel=None):
+    """Aplica ``write_batch`` a cada lote, reportando progresso; retorna o total."""
+    total = 0
+    try:
+        for batch in batches:
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled("Exportação cancelada pelo usuário.")
+            write_batch(batch)
+            total += len(batch)
+            if progress is not None:
+                progress(total)
+    finally:
+        # Fecha o gerador do repositorio para devolver a conexao imediatamente.
+        close = getattr(batches, "close", None)
+        if close is not None:
+            close()
+    return total
+
+
+def remove_partial(path):
+    """Apaga arquivo incompleto deixado por falha ou cancelamento."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_csv(path, columns, batches, progress=None, cancel=None):
+    """Grava CSV (``;``, UTF-8 com BOM) a partir de lotes de linhas; retorna o total."""
+    try:
+        with open(path, "w", encoding="utf-8-sig", newline="") as csv_file:
+            writer = csv.writer(csv_file, delimiter=";")
+            writer.writerow(columns)
+            return consume_batches(batches, writer.writerows, progress, cancel)
+    except BaseException:
+        remove_partial(path)
+        raise
+
+
+_REL_TYPE_TABLE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/table"
+_ROW_PATTERN = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELL_STYLE_PATTERN = re.compile(r'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?\bs="(\d+)"')
+_COL_PATTERN = re.compile(r"<col\b([^>]*)/>")
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _column_letter(index):
+    """Converte indice 1-based de coluna em letras (1 -> A, 27 -> AA)."""
+    letters = ""
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _attr(tag, name):
+    """Le atributo de uma tag XML serializada."""
+    match = re.search(rf'\b{name}="([^"]*)"', tag)
+    return match.group(1) if match else None
+
+
+def _resolve_target(base, target):
+    """Resolve alvo de relacionamento relativo a parte ``base`` do pacote."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+
+def _rels_path(part):
+    """Caminho do arquivo de relacionamentos de uma parte do pacote."""
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+
+def _relationships(package, part):
+    """Mapeia Id -> (Type, parte alvo) dos relacionamentos de ``part``."""
+    path = _rels_path(part)
+    if path not in package.namelist():
+        return {}
+    xml = package.read(path).decode("utf-8")
+    return {
+        _attr(tag, "Id"): (_attr(tag, "Type"), _resolve_target(part, _attr(tag, "Target")))
+        for tag in re.findall(r"<Relationship\b[^>]*>", xml)
+    }
+
+
+def _first_sheet(package):
+    """Retorna (indice, parte XML) da primeira planilha do modelo."""
+    workbook = package.read("xl/workbook.xml").decode("utf-8")
+    tag = re.search(r"<sheet\b[^>]*>", workbook).group(0)
+    rel_id = re.search(r'\br:id="([^"]*)"', tag).group(1)
+    return 0, _relationships(package, "xl/workbook.xml")[rel_id][1]
+
+
+def _column_styles(sheet_xml, first_row, width):
+    """Estilo de cada coluna de dados: celula da primeira linha de dados do modelo ou ``<col>``."""
+    styles = {}
+    for col in _COL_PATTERN.findall(sheet_xml):
+        style = _attr(col, "style")
+        if style is None:
+            continue
+        for index in range(int(_attr(col, "min")), min(int(_attr(col, "max")), width) + 1):
+            styles[index] = style
+    for match in _ROW_PATTERN.finditer(sheet_xml):
+        if int(match.group(1)) == first_row:
+            letters = {_column_letter(i): i for i in range(1, width + 1)}
+            for letter, style in _CELL_STYLE_PATTERN.findall(match.group(0)):
+                if letter in letters:
+                    styles[letters[letter]] = style
+    return [styles.get(index) for index in range(1, width + 1)]
+
+
+def _cell_xml(ref, style, value):
+    """Serializa celula com string inline (sem tabela de strings compartilhadas)."""
+    style_attr = f' s="{style}"' if style is not None else ""
+    if value is None or value == "":
+        return f'<c r="{ref}"{style_attr}/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+
+def _set_last_row(ref, last_row):
+    """Troca a linha final de uma referencia de intervalo (``A6:H34`` -> ``A6:H<n>``)."""
+    return re.sub(r"(:\$?[A-Z]+\$?)\d+$", lambda m: m.group(1) + str(last_row), ref)
+
+
+def _format_report_date(value):
+    """Data no formato do relatorio XLSX (``dd/mm/aaaa``); vazio para ``None``."""
+    if value is None:
+        return ""
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return str(value)
+
+
+def report_xlsx_cells(row, col_idx):
+    """Celulas A..H de uma linha do relatorio de taloes no modelo XLSX (``row_cells`` de ``write_xlsx_template``)."""
+    return [
+        _format_report_date(row[col_idx["data_solic"]]),
+        f"{int(row[col_idx['talao']]):04d}/{int(row[col_idx['ano']])}",
+        _format_report_date(row[col_idx["data_bo"]]),
+        row[col_idx["boletim"]] or "",
+        row[col_idx["delegacia"]] or "",
+        row[col_idx["natureza"]] or "",
+        row[col_idx["vitimas"]] or "",
+        row[col_idx["equipe"]] or "",
+    ]
+
+
+def write_xlsx_template(path, modelo_path, row_cells, columns, batches, progress=None, cancel=None, first_row=7):
+    """Gera XLSX a partir do modelo, escrevendo as linhas de dados em fluxo; retorna o total.
+
+    ``row_cells(row, col_idx)`` devolve os valores das celulas de uma linha
+    (``col_idx`` mapeia nome da coluna -> posicao em ``columns``). As linhas
+    do modelo anteriores a ``first_row`` (cabecalho) sao preservadas; as
+    demais sao substituidas pelos dados. A tabela e a area de impressao do
+    modelo passam a cobrir todas as linhas gravadas.
+    """
+    col_idx = {name: idx for idx, name in enumerate(columns)}
+    try:
+        with zipfile.ZipFile(modelo_path) as modelo, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as saida:
+            sheet_index, sheet_part = _first_sheet(modelo)
+            tables = [target for kind, target in _relationships(modelo, sheet_part).values() if kind == _REL_TYPE_TABLE]
+            patched = {sheet_part, "xl/workbook.xml", *tables}
+            for item in modelo.infolist():
+                if item.filename not in patched:
+                    saida.writestr(item, modelo.read(item.filename))
+
+            sheet_xml = modelo.read(sheet_part).decode("utf-8").replace("<sheetData/>", "<sheetData></sheetData>")
+            # A dimensao so seria conhecida no fim do fluxo; e opcional e o Excel a recalcula.
+            sheet_xml = re.sub(r"<dimension\b[^>]*/>", "", sheet_xml)
+            data_start = sheet_xml.index("<sheetData>") + len("<sheetData>")
+            data_end = sheet_xml.index("</sheetData>")
+            header_rows = "".join(
+                m.group(0) for m in _ROW_PATTERN.finditer(sheet_xml, data_start, data_end) if int(m.group(1)) < first_row
+            )
+            state = {"styles": None, "letters": None, "row": first_row}
+
+            def _write_batch(batch):
+                parts = []
+                for row in batch:
+                    values = row_cells(row, col_idx)
+                    if state["styles"] is None:
+                        state["styles"] = _column_styles(sheet_xml, first_row, len(values))
+                        state["letters"] = [_column_letter(i) for i in range(1, len(values) + 1)]
+                    n = state["row"]
+                    cells = "".join(
+                        _cell_xml(f"{letter}{n}", style, value)
+                        for letter, style, value in zip(state["letters"], state["styles"], values)
+                    )
+                    parts.append(f'<row r="{n}">{cells}</row>')
+                    state["row"] += 1
+                sheet.write("".join(parts).encode("utf-8"))
+
+            with saida.open(sheet_part, "w", force_zip64=True) as sheet:
+                sheet.write(sheet_xml[:data_start].encode("utf-8"))
+                sheet.write(header_rows.encode("utf-8"))
+                total = consume_batches(batches, _write_batch, progress, cancel)
+                sheet.write(sheet_xml[data_end:].encode("utf-8"))
+
+            # A tabela do modelo precisa de ao menos uma linha de dados.
+            last_row = max(state["row"] - 1, first_row)
+            for table in tables:
+                xml = modelo.read(table).decode("utf-8")
+                xml = re.sub(
+                    r'(<(?:table|autoFilter)\b[^>]*?\bref=")([^"]+)"',
+                    lambda m: m.group(1) + _set_last_row(m.group(2), last_row) + '"',
+                    xml,
+                )
+                saida.writestr(table, xml)
+
+            workbook = modelo.read("xl/workbook.xml").decode("utf-8")
+            workbook = re.sub(
+                rf'(<definedName\b[^>]*name="_xlnm\.Print_Area"[^>]*localSheetId="{sheet_index}"[^>]*>)([^<]*)(</definedName>)',
+                lambda m: m.group(1) + _set_last_row(m.group(2), last_row) + m.group(3),
+                workbook,
+            )
+            saida.writestr("xl/workbook.xml", workbook)
+        return total
+    except BaseException:
+        remove_partial(path)
+        raise
@@ -0,0 +1,522 @@
+"""Medicao das chamadas ao repositorio: histogramas de latencia e log de consultas lentas.
+
+``InstrumentedRepository`` envolve o repositorio real e mede cada metodo
+publico. Dentro da chamada, a conexao emprestada por ``repo._connect()``
+(por um hook registrado com ``repo.add_connection_hook``) e trocada por um
+intermediario que separa o tempo em tres fases:
+
+- ``connect``: emprestimo e devolucao da conexao (pool, rollback);
+- ``execute``: ``execute``/``executemany``/``nextset``;
+- ``fetch``: leitura das linhas (``fetchone``/``fetchmany``/``fetchall``/iteracao).
+
+A parte da execucao gasta em comandos que esperam lock de escrita
+(``LOCK_STATEMENT_PATTERN``) tambem vai para ``lock``, registrada so nas
+chamadas que passaram por esses comandos.
+
+Os tempos vao para histogramas em memoria por metodo (p50/p95/p99), lidos
+com ``metrics_snapshot()``. Chamadas acima do limite de lentidao sao
+gravadas no logger ``afis_app.slow_queries`` com o SQL e o formato dos
+parametros (tipo e tamanho, nunca o valor).
+"""
+
+from contextlib import contextmanager
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+
+from .config import get_env, get_env_number
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_LOGGER = "afis_app.slow_queries"
+PHASES = ("total", "connect", "execute", "fetch")
+PERCENTILES = (50, 95, 99)
+# SQL registrado no log de lentas e cortado neste tamanho.
+SLOW_SQL_MAX_CHARS = 2000
+# Comandos cujo tempo e espera de lock de escrita: ``BEGIN IMMEDIATE`` (SQLite),
+# dicas ``UPDLOCK``/``HOLDLOCK`` e o UPDATE do contador de numeracao (SQL Server).
+LOCK_STATEMENT_PATTERN = re.compile(
+    r"\bBEGIN\s+IMMEDIATE\b|\bUPDLOCK\b|\bHOLDLOCK\b|\bUPDATE\s+dbo\.talao_contador\b", re.IGNORECASE
+)
+
+
+def _bucket_bounds():
+    """Limites superiores (ms) dos baldes: crescimento de 25% de 0,05 ms ate 10 min."""
+    bounds = []
+    bound = 0.05
+    while bound < 600000.0:
+        bounds.append(bound)
+        bound *= 1.25
+    return tuple(bounds)
+
+
+_BUCKET_BOUNDS = _bucket_bounds()
+
+
+class LatencyHistogram:
+    """Histograma de latencias em baldes logaritmicos (erro maximo de 25% nos percentis).
+
+    Memoria constante, qualquer que seja o numero de amostras.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, value_ms):
+        """Registra uma amostra em milissegundos."""
+        low, high = 0, len(_BUCKET_BOUNDS)
+        while low < high:
+            mid = (low + high) // 2
+            if _BUCKET_BOUNDS[mid] < value_ms:
+                low = mid + 1
+            else:
+                high = mid
+        self.counts[low] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def merge(self, other):
+        """Soma as amostras de ``other`` (ex.: histogramas de varios terminais)."""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, pct):
+        """Limite superior do balde que contem o percentil ``pct`` (0 sem amostras)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for index, quantity in enumerate(self.counts):
+            seen += quantity
+            if seen >= rank:
+                bound = _BUCKET_BOUNDS[index] if index < len(_BUCKET_BOUNDS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        """Resumo com contagem, media, maximo e percentis (ms)."""
+        result = {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+        for pct in PERCENTILES:
+            result[f"p{pct}_ms"] = round(self.percentile(pct), 3)
+        return result
+
+
+class _CallStats:
+    """Acumuladores de uma chamada em andamento (fases, linhas e comandos SQL)."""
+
+    __slots__ = ("method", "connect", "execute", "fetch", "lock", "locked", "rows", "statements", "depth")
+
+    def __init__(self, method):
+        self.method = method
+        # ``_connect`` aninhado (ex.: ``_write_transaction`` no SQLite) conta so uma vez.
+        self.depth = 0
+        self.connect = 0.0
+        self.execute = 0.0
+        self.fetch = 0.0
+        self.lock = 0.0
+        self.locked = False
+        self.rows = 0
+        self.statements = []
+
+
+_current = threading.local()
+
+
+def _active_call():
+    """Chamada instrumentada em andamento na thread atual, ou None."""
+    return getattr(_current, "call", None)
+
+
+def _value_shape(value):
+    """Formato de um parametro: tipo e tamanho, sem o valor."""
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes, bytearray)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shapes(params, many=False):
+    """Descreve os parametros de um comando para o log (``executemany`` mostra a primeira linha)."""
+    if many:
+        rows = list(params) if not isinstance(params, (list, tuple)) else params
+        first = parameter_shapes(rows[0]) if rows else "()"
+        return f"{len(rows)} x {first}"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {_value_shape(value)}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(_value_shape(value) for value in params) + ")"
+
+
+def _compact_sql(sql):
+    """SQL em uma linha, cortado em ``SLOW_SQL_MAX_CHARS``."""
+    text = re.sub(r"\s+", " ", str(sql)).strip()
+    return text if len(text) <= SLOW_SQL_MAX_CHARS else text[:SLOW_SQL_MAX_CHARS] + "..."
+
+
+class _TimedCursor:
+    """Cursor intermediario que mede execucao e leitura na chamada em andamento."""
+
+    def __init__(self, cursor, call):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_call", call)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Ex.: ``cur.fast_executemany = True`` precisa chegar ao cursor do pyodbc.
+        setattr(self._cursor, name, value)
+
+    def execute(self, sql, *args):
+        # pyodbc recebe parametros soltos; sqlite3, uma sequencia ou dicionario unico.
+        params = args[0] if len(args) == 1 and isinstance(args[0], (list, tuple, dict)) else args
+        self._call.statements.append((_compact_sql(sql), parameter_shapes(params)))
+        inicio = time.perf_counter()
+        try:
+            result = self._cursor.execute(sql, *args)
+        finally:
+            elapsed = time.perf_counter() - inicio
+            self._call.execute += elapsed
+            if LOCK_STATEMENT_PATTERN.search(sql):
+                self._call.lock += elapsed
+                self._call.locked = True
+        self._count_affected()
+        return self if result is self._cursor else result
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._call.statements.append((_compact_sql(sql), parameter_shapes(seq_of_params, many=True)))
+        inicio = time.perf_counter()
+        try:
+            result = self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._call.execute += time.perf_counter() - inicio
+        self._count_affected()
+        return self if result is self._cursor else result
+
+    def _count_affected(self):
+        """Soma as linhas afetadas de comandos sem resultado (INSERT/UPDATE/DELETE)."""
+        if getattr(self._cursor, "description", None) is None:
+            self._call.rows += max(getattr(self._cursor, "rowcount", 0) or 0, 0)
+
+    def nextset(self):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.nextset()
+        finally:
+            self._call.execute += time.perf_counter() - inicio
+
+    def _fetch(self, method, *args):
+        """Le linhas medindo o tempo de leitura."""
+        inicio = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._call.fetch += time.perf_counter() - inicio
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._call.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, *(() if size is None else (size,)))
+        self._call.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._call.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+
+class _TimedConnection:
+    """Conexao intermediaria: cursores e ``conn.execute`` (sqlite3) passam a ser medidos."""
+
+    def __init__(self, conn, call):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_call", call)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs), self._call)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class RepositoryMetrics:
+    """Histogramas por metodo (total e fases), linhas lidas e registro das chamadas lentas.
+
+    ``slow_ms`` e o limite (ms) acima do qual a chamada vai para
+    ``slow_logger`` (padrao: logger ``afis_app.slow_queries``).
+    """
+
+    def __init__(self, slow_ms=500.0, slow_logger=None):
+        self.slow_ms = float(slow_ms)
+        self.slow_logger = slow_logger or logging.getLogger(SLOW_QUERY_LOGGER)
+        self._methods = {}
+        self._slow_calls = 0
+        self._lock = threading.Lock()
+
+    def _method_entry(self, method):
+        """Acumuladores do metodo, criados no primeiro uso (chamar com o lock)."""
+        entry = self._methods.get(method)
+        if entry is None:
+            entry = {"calls": 0, "errors": 0, "rows": 0, "max_rows": 0}
+            entry.update((phase, LatencyHistogram()) for phase in PHASES + ("lock",))
+            self._methods[method] = entry
+        return entry
+
+    def record(self, call, total_s, error=False):
+        """Registra uma chamada concluida e grava no log de lentas se passou do limite."""
+        total_ms = total_s * 1000.0
+        with self._lock:
+            entry = self._method_entry(call.method)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["rows"] += call.rows
+            entry["max_rows"] = max(entry["max_rows"], call.rows)
+            entry["total"].add(total_ms)
+            entry["connect"].add(call.connect * 1000.0)
+            entry["execute"].add(call.execute * 1000.0)
+            entry["fetch"].add(call.fetch * 1000.0)
+            if call.locked:
+                entry["lock"].add(call.lock * 1000.0)
+            slow = total_ms >= self.slow_ms
+            if slow:
+                self._slow_calls += 1
+        if slow:
+            self._log_slow(call, total_ms, error)
+
+    def _log_slow(self, call, total_ms, error):
+        """Grava a chamada lenta com tempos por fase, linhas e os comandos SQL executados."""
+        lines = [
+            f"{call.method}: {total_ms:.1f} ms (conexão {call.connect * 1000:.1f} ms, "
+            f"execução {call.execute * 1000:.1f} ms, leitura {call.fetch * 1000:.1f} ms), "
+            f"{call.rows} linhas{', com erro' if error else ''}"
+        ]
+        for sql, shapes in call.statements:
+            lines.append(f"  SQL: {sql}")
+            lines.append(f"  parâmetros: {shapes}")
+        self.slow_logger.warning("\n".join(lines))
+
+    def snapshot(self):
+        """Fotografia das metricas: por metodo, chamadas, erros, linhas e resumo de cada fase."""
+        with self._lock:
+            methods = {}
+            for method, entry in self._methods.items():
+                item = {key: entry[key] for key in ("calls", "errors", "rows", "max_rows")}
+                item.update((phase, entry[phase].summary()) for phase in PHASES + ("lock",))
+                methods[method] = item
+            return {"methods": methods, "slow_calls": self._slow_calls, "slow_ms": self.slow_ms}
+
+    def reset(self):
+        """Descarta todas as medicoes."""
+        with self._lock:
+            self._methods.clear()
+            self._slow_calls = 0
+
+    def merge(self, other):
+        """Soma as medicoes de ``other`` as desta instancia (ex.: terminais do simulador de carga)."""
+        with other._lock:
+            methods = {method: dict(entry) for method, entry in other._methods.items()}
+            slow_calls = other._slow_calls
+        with self._lock:
+            for method, theirs in methods.items():
+                entry = self._method_entry(method)
+                for key in ("calls", "errors", "rows"):
+                    entry[key] += theirs[key]
+                entry["max_rows"] = max(entry["max_rows"], theirs["max_rows"])
+                for phase in PHASES + ("lock",):
+                    entry[phase].merge(theirs[phase])
+            self._slow_calls += slow_calls
+
+    def __getstate__(self):
+        """Permite enviar as medicoes entre processos (sem o lock)."""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class InstrumentedRepository:
+    """Decorador de ``TalaoRepository`` que mede cada metodo publico em ``metrics``.
+
+    Registra no repositorio um hook de conexao (``add_connection_hook``)
+    que mede o emprestimo da conexao e devolve o intermediario das fases de
+    execucao e leitura; o hook so age dentro de chamadas feitas por este
+    decorador e ``detach`` o remove. Geradores (``iter_*``) sao medidos ate
+    o fim da iteracao, somando so o tempo gasto dentro deles.
+    """
+
+    def __init__(self, repo, metrics=None):
+        self.repo = repo
+        self.metrics = metrics or RepositoryMetrics()
+        repo.add_connection_hook(self._timed_connect)
+
+    def detach(self):
+        """Remove o hook de conexao do repositorio; as chamadas seguem medidas so no total."""
+        self.repo.remove_connection_hook(self._timed_connect)
+
+    @contextmanager
+    def _timed_connect(self, connect):
+        """Hook de conexao: mede emprestimo/devolucao de ``connect()`` e troca a conexao pelo intermediario."""
+        call = _active_call()
+        if call is None:
+            with connect() as conn:
+                yield conn
+            return
+        outermost = call.depth == 0
+        call.depth += 1
+        inicio = time.perf_counter()
+        try:
+            with connect() as conn:
+                if outermost:
+                    call.connect += time.perf_counter() - inicio
+                try:
+                    yield conn if isinstance(conn, _TimedConnection) else _TimedConnection(conn, call)
+                finally:
+                    # Daqui em diante conta a devolucao (rollback, retorno ao pool).
+                    inicio = time.perf_counter()
+        finally:
+            if outermost:
+                call.connect += time.perf_counter() - inicio
+            call.depth -= 1
+
+    def __getattr__(self, name):
+        """Metodos publicos do repositorio real voltam medidos; o resto e repassado."""
+        if name == "repo":
+            raise AttributeError(name)
+        attr = getattr(self.repo, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        wrapped = self._instrument(name, attr)
+        # Guarda o metodo medido na instancia: proximos acessos nao passam por aqui.
+        self.__dict__[name] = wrapped
+        return wrapped
+
+    def _instrument(self, name, method):
+        """Envolve ``method`` medindo a chamada sob o nome ``name``."""
+
+        @functools.wraps(method)
+        def _measured(*args, **kwargs):
+            call = _CallStats(name)
+            anterior = _active_call()
+            _current.call = call
+            inicio = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except BaseException:
+                self.metrics.record(call, time.perf_counter() - inicio, error=True)
+                raise
+            finally:
+                _current.call = anterior
+            elapsed = time.perf_counter() - inicio
+            if inspect.isgenerator(result):
+                return self._measured_generator(call, result, elapsed)
+            self.metrics.record(call, elapsed)
+            return result
+
+        return _measured
+
+    def _measured_generator(self, call, generator, elapsed):
+        """Itera ``generator`` com a chamada ativa a cada retomada e registra ao terminar."""
+        error = False
+        try:
+            while True:
+                anterior = _active_call()
+                _current.call = call
+                inicio = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - inicio
+                    _current.call = anterior
+                yield item
+        finally:
+            generator.close()
+            self.metrics.record(call, elapsed, error=error)
+
+    def metrics_snapshot(self):
+        """Fotografia das metricas de ``metrics`` (ver ``RepositoryMetrics.snapshot``)."""
+        return self.metrics.snapshot()
+
+    def close(self):
+        """Registra o resumo das metricas no log e fecha o repositorio real."""
+        snapshot = self.metrics.snapshot()
+        for method, item in sorted(snapshot["methods"].items()):
+            total = item["total"]
+            logger.info(
+                "Repositório %s: %d chamadas, p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, máx %.1f ms",
+                method,
+                item["calls"],
+                total["p50_ms"],
+                total["p95_ms"],
+                total["p99_ms"],
+                total["max_ms"],
+            )
+        self.repo.close()
+
+
+def configure_slow_query_log(path):
+    """Grava o logger ``afis_app.slow_queries`` em ``path``, separado do log principal."""
+    slow_logger = logging.getLogger(SLOW_QUERY_LOGGER)
+    if any(isinstance(handler, logging.FileHandler) for handler in slow_logger.handlers):
+        return slow_logger
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_logger.addHandler(handler)
+    slow_logger.setLevel(logging.WARNING)
+    slow_logger.propagate = False
+    return slow_logger
+
+
+def build_instrumented_repository(repo):
+    """Envolve ``repo`` em ``InstrumentedRepository`` conforme as variaveis ``DB_METRICS*``.
+
+    ``DB_METRICS=no`` devolve o proprio ``repo``; ``DB_SLOW_QUERY_MS`` e o
+    limite de lentidao e ``DB_SLOW_QUERY_LOG`` o arquivo do log de lentas.
+    """
+    if str(get_env("DB_METRICS", default="yes")).strip().lower() in ("0", "false", "no", "n", "off"):
+        return repo
+    configure_slow_query_log(get_env("DB_SLOW_QUERY_LOG", default="afis_slow_queries.log"))
+    metrics = RepositoryMetrics(slow_ms=max(0.0, get_env_number("DB_SLOW_QUERY_MS", 500.0, float)))
+    return InstrumentedRepository(repo, metrics)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import Any, Protocol
+from typing import Any, Iterable, Iterator, Protocol
 
 
 class TalaoRepository(Protocol):
@@ -20,9 +20,9 @@ class TalaoRepository(Protocol):
         talao_id: int,
         data: dict[str, Any],
         intervalo_min: int,
-        expected_updated_at: Any = None,
+        expected_version: Any = None,
     ) -> None:
-        """Atualiza um talao existente com opcao de controle de concorrencia."""
+        """Atualiza um talao existente; ``expected_version`` e a ``versao`` lida em get_talao."""
         ...
 
     def get_talao(self, talao_id: int) -> dict[str, Any] | None:
@@ -33,8 +33,42 @@ class TalaoRepository(Protocol):
         """Lista taloes exibidos inicialmente no dashboard."""
         ...
 
-    def list_due_monitoring(self) -> list[Any]:
-        """Lista monitoramentos com alerta vencido."""
+    def list_initial_taloes_changes(self, watermark: Any = None, latest_id: int | None = None) -> dict[str, Any]:
+        """Retorna linhas alteradas e ids removidos da grade inicial desde a marca d'agua."""
+        ...
+
+    def get_dashboard_snapshot(
+        self, ano: int, watermark: Any = None, latest_id: int | None = None
+    ) -> dict[str, Any]:
+        """Retorna mudancas da grade, proximo talao e contadores do dashboard em uma consulta."""
+        ...
+
+    def list_due_monitoring(self, with_records: bool = False) -> list[Any]:
+        """Lista monitoramentos com alerta vencido (registros completos com ``with_records``)."""
+        ...
+
+    def claim_due_monitoring(self, limit: int = 1, with_records: bool = False) -> list[Any]:
+        """Reserva para este terminal alertas vencidos e livres (formato de list_due_monitoring)."""
+        ...
+
+    def renew_monitoring_claim(self, talao_id: int) -> bool:
+        """Prorroga a reserva deste terminal sobre o alerta do talao."""
+        ...
+
+    def release_monitoring_claim(self, talao_id: int) -> None:
+        """Libera a reserva deste terminal sobre o alerta do talao."""
+        ...
+
+    def renew_monitoring_claims(self, talao_ids: Iterable[int]) -> int:
+        """Prorroga em lote as reservas deste terminal; retorna quantas seguem validas."""
+        ...
+
+    def release_monitoring_claims(self, talao_ids: Iterable[int]) -> None:
+        """Libera em lote as reservas deste terminal."""
+        ...
+
+    def list_monitoring_schedule(self) -> list[tuple[int, float]]:
+        """Lista talao_id e segundos restantes ate o proximo alerta de cada monitorado."""
         ...
 
     def get_monitoring_interval(self, talao_id: int) -> int | None:
@@ -45,8 +79,39 @@ class TalaoRepository(Protocol):
         """Retorna colunas e linhas de taloes dentro de um periodo."""
         ...
 
+    def count_taloes_by_period(self, data_inicio: date, data_fim: date) -> int:
+        """Conta taloes dentro de um periodo."""
+        ...
+
+    def iter_taloes_by_period(self, data_inicio: date, data_fim: date, batch_size: int = ...) -> Iterator[list[Any]]:
+        """Gera lotes de linhas (colunas TALAO_DETAIL_COLUMNS) de taloes dentro de um periodo."""
+        ...
+
     def search_taloes(self, filters: dict[str, Any]) -> tuple[list[str], list[Any]]:
-        """Pesquisa taloes aplicando filtros combinados por E."""
+        """Pesquisa taloes aplicando filtros combinados por E.
+
+        Chaves aceitas: ``ano``, ``talao_num``, ``data_solic`` ou
+        ``data_inicio``/``data_fim``, ``delegacia``, ``boletim``, ``equipe``,
+        ``operador`` e ``modo_texto`` (``prefixo`` padrao ou ``contem``).
+        """
+        ...
+
+    def search_taloes_page(self, filters: dict[str, Any], page_size: int = ..., cursor: str | None = None) -> dict[str, Any]:
+        """Pagina da busca (ordem de ``search_taloes``) por cursor de chave.
+
+        Retorna ``{"columns", "rows", "next_cursor"}``; ``next_cursor`` (opaco)
+        pede a pagina seguinte e e None na ultima.
+        """
+        ...
+
+    def list_taloes_by_period_page(
+        self, data_inicio: date, data_fim: date, page_size: int = ..., cursor: str | None = None
+    ) -> dict[str, Any]:
+        """Pagina do relatorio por periodo, no mesmo formato de ``search_taloes_page``."""
+        ...
+
+    def estimate_search_count(self, filters: dict[str, Any], cap: int = ...) -> tuple[int, bool]:
+        """Total da busca limitado a ``cap``: ``(total, exato)``; ``exato`` False acima do teto."""
         ...
 
     def list_taloes_by_year(self, ano: int) -> tuple[list[str], list[Any]]:
@@ -57,6 +122,48 @@ class TalaoRepository(Protocol):
         """Retorna colunas e linhas de monitoramento de um ano especifico."""
         ...
 
+    def iter_taloes_by_year(self, ano: int, batch_size: int = ...) -> Iterator[list[Any]]:
+        """Gera lotes de linhas (colunas TALAO_DETAIL_COLUMNS) dos taloes de um ano."""
+        ...
+
+    def iter_monitoramento_by_year(self, ano: int, batch_size: int = ...) -> Iterator[list[Any]]:
+        """Gera lotes de linhas (colunas MONITORAMENTO_BACKUP_COLUMNS) do monitoramento de um ano."""
+        ...
+
+    def get_backup_watermark(self) -> int:
+        """Marca d'agua (versao de linha) a partir da qual o proximo incremental le."""
+        ...
+
+    def get_cache_version(self) -> Any:
+        """Valor opaco que muda sempre que taloes ou intervalos de monitoramento sao gravados."""
+        ...
+
+    def iter_taloes_changed(self, ano: int, since: int, until: int, batch_size: int = ...) -> Iterator[list[Any]]:
+        """Gera lotes de taloes do ano alterados com versao em [since, until)."""
+        ...
+
+    def iter_monitoramento_changed(
+        self, ano: int, since: int, until: int, batch_size: int = ...
+    ) -> Iterator[list[Any]]:
+        """Gera lotes de monitoramento do ano com versao propria ou do talao em [since, until)."""
+        ...
+
+    def list_deleted_talao_ids(self, since: int, until: int) -> list[int]:
+        """Ids de taloes excluidos com versao em [since, until)."""
+        ...
+
+    def restore_rows(self, batches: Iterable[tuple[str, list[Any]]], policy: str = ...) -> dict[str, int]:
+        """Grava lotes (tabela, linhas) de um backup em uma transacao e retorna as contagens."""
+        ...
+
     def postpone_monitoring(self, talao_id: int, intervalo_min: int) -> None:
-        """Posterga o proximo alerta de monitoramento de um talao."""
+        """Posterga o proximo alerta de monitoramento de um talao e libera a reserva."""
+        ...
+
+    def postpone_monitoring_many(self, talao_ids: Iterable[int], intervalo_min: int) -> int:
+        """Posterga em um unico UPDATE os alertas de varios taloes; retorna quantos foram adiados."""
+        ...
+
+    def finalize_many(self, records: Iterable[dict[str, Any]]) -> list[int]:
+        """Finaliza em lote taloes monitorados (id + versao); retorna os ids finalizados."""
         ...
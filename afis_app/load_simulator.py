@@ -0,0 +1,457 @@
+"""Simulador de carga com varios terminais sobre o mesmo banco SQLite local.
+
+Cada terminal virtual (thread ou processo) abre o proprio repositorio, como
+uma instancia do app, e executa em laco uma mistura configuravel de
+operacoes ate o fim da duracao:
+
+- ``insert``: novo talao monitorado (``insert_talao``), repetido em
+  ``DuplicateTalaoError``;
+- ``update``: le e grava um dos taloes monitorados mais recentes
+  (``get_talao`` + ``update_talao`` com ``expected_version``), repetido em
+  ``ConcurrencyError``; ``edicao_ms`` simula o tempo do operador na tela;
+- ``postpone``: atende um alerta vencido (``claim_due_monitoring`` +
+  ``postpone_monitoring``);
+- ``refresh``: atualizacao incremental do dashboard (``get_dashboard_snapshot``).
+
+Com ``tempestade`` todos os monitorados comecam com alerta vencido. O
+relatorio traz vazao, percentis de latencia, conflitos e repeticoes por
+operacao, alem da espera de lock medida pela instrumentacao do repositorio
+(``BEGIN IMMEDIATE`` no SQLite).
+
+Uso em linha de comando::
+
+    python -m afis_app.load_simulator --terminais 8 --duracao 30 --mix insert=4,update=3,postpone=2,refresh=6
+    python -m afis_app.load_simulator --terminais 16 --modo processos --tempestade --saida carga.json
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time as _time
+
+from .constants import STATUS_MONITORADO
+from .instrumentation import InstrumentedRepository, LatencyHistogram, RepositoryMetrics
+from .repository import ConcurrencyError, DatabaseError, DuplicateTalaoError
+from .sqlite_repository import SQLiteRepository
+from .synthetic import load_repository
+
+OPERATIONS = ("insert", "update", "postpone", "refresh")
+DEFAULT_MIX = {"insert": 3, "update": 2, "postpone": 2, "refresh": 5}
+SIMULATION_MODES = ("threads", "processos")
+DEFAULT_RETRIES = 3
+DEFAULT_EDIT_MS = 20.0
+# Taloes monitorados mais recentes disputados pelas edicoes (concentra os conflitos).
+DEFAULT_HOT_SET = 20
+ALERT_INTERVALS = (15, 30, 60)
+# Tempo para todos os terminais abrirem o banco antes da largada comum.
+STARTUP_SECONDS = {"threads": 0.2, "processos": 3.0}
+
+
+def _new_stats():
+    """Contadores e histograma de latencia de uma operacao."""
+    return {
+        "total": 0,
+        "ok": 0,
+        "conflitos": 0,
+        "repeticoes": 0,
+        "falhas": 0,
+        "sem_alvo": 0,
+        "erros": {},
+        "latencia": LatencyHistogram(),
+    }
+
+
+def _merge_stats(total, parcial):
+    """Soma os contadores de ``parcial`` em ``total`` (mesma operacao, outro terminal)."""
+    for chave in ("total", "ok", "conflitos", "repeticoes", "falhas", "sem_alvo"):
+        total[chave] += parcial[chave]
+    for nome, quantidade in parcial["erros"].items():
+        total["erros"][nome] = total["erros"].get(nome, 0) + quantidade
+    total["latencia"].merge(parcial["latencia"])
+
+
+class VirtualTerminal:
+    """Terminal virtual: executa a mistura de operacoes em ``repo`` e acumula os resultados em ``stats``.
+
+    ``config`` traz ``indice``, ``semente``, ``mix``, ``largada`` e ``fim``
+    (``time.time()``), ``pausa_ms``, ``edicao_ms``, ``tentativas`` e ``quentes``.
+    """
+
+    def __init__(self, repo, config):
+        self.repo = repo
+        self.config = config
+        self.indice = config["indice"]
+        self.rng = random.Random(f"afis-carga:{config['semente']}:{self.indice}")
+        self.stats = {operacao: _new_stats() for operacao in OPERATIONS}
+        self._ops = [operacao for operacao in OPERATIONS if config["mix"].get(operacao)]
+        self._pesos = [config["mix"][operacao] for operacao in self._ops]
+        self._watermark = None
+        self._latest_id = None
+        self._monitorados = set()
+        self._quentes = []
+        self._inseridos = 0
+        # Tempo de edicao simulado na operacao em andamento (fora da latencia).
+        self._pausado = 0.0
+
+    def run(self):
+        """Carrega a grade, espera a largada e executa operacoes ate ``fim``."""
+        self._refresh()
+        espera = self.config["largada"] - _time.time()
+        if espera > 0:
+            _time.sleep(espera)
+        pausa_ms = self.config["pausa_ms"]
+        while _time.time() < self.config["fim"]:
+            operacao = self.rng.choices(self._ops, weights=self._pesos)[0]
+            self._execute(operacao)
+            if pausa_ms > 0:
+                _time.sleep(self.rng.expovariate(1000.0 / pausa_ms))
+
+    def _execute(self, operacao):
+        """Executa uma operacao medindo a latencia (sem o tempo de edicao simulado)."""
+        stats = self.stats[operacao]
+        stats["total"] += 1
+        self._pausado = 0.0
+        inicio = _time.perf_counter()
+        try:
+            resultado = getattr(self, f"_{operacao}")(stats)
+        except Exception as exc:
+            stats["falhas"] += 1
+            nome = type(exc).__name__
+            stats["erros"][nome] = stats["erros"].get(nome, 0) + 1
+            return
+        stats["latencia"].add((_time.perf_counter() - inicio - self._pausado) * 1000.0)
+        stats["ok" if resultado else "sem_alvo"] += 1
+
+    def _retrying(self, stats, conflito, acao):
+        """Executa ``acao()`` repetindo em ``conflito`` ate ``tentativas``; o ultimo conflito e relancado."""
+        tentativas = self.config["tentativas"]
+        for tentativa in range(tentativas):
+            if tentativa:
+                stats["repeticoes"] += 1
+            try:
+                return acao()
+            except conflito:
+                stats["conflitos"] += 1
+                if tentativa + 1 == tentativas:
+                    raise
+
+    def _insert(self, stats):
+        """Grava um novo talao monitorado com a data de hoje."""
+        self._inseridos += 1
+        agora = datetime.now()
+        payload = {
+            "data_solic": agora.date().isoformat(),
+            "hora_solic": agora.strftime("%H:%M"),
+            "delegacia": f"{1 + self.rng.randrange(30)}ª DP",
+            "autoridade": "DR. SIMULADOR",
+            "solicitante": "CB PM SIMULADOR",
+            "endereco": f"RUA DO TERMINAL {self.indice}, {self._inseridos}",
+            "boletim": f"SM{self.rng.randrange(10000):04d}",
+            "natureza": "",
+            "data_bo": "",
+            "vitimas": "",
+            "equipe": "",
+            "operador": f"OPERADOR {self.indice}",
+            "status": STATUS_MONITORADO,
+            "observacao": "",
+        }
+        intervalo = self.rng.choice(ALERT_INTERVALS)
+        self._retrying(stats, DuplicateTalaoError, lambda: self.repo.insert_talao(payload, intervalo))
+        return True
+
+    def _update(self, stats):
+        """Le e grava um talao monitorado recente; outra leitura a cada conflito de versao."""
+        if not self._quentes:
+            return False
+        talao_id = self.rng.choice(self._quentes)
+
+        def _editar():
+            record = self.repo.get_talao(talao_id)
+            if record is None or record["status"] != STATUS_MONITORADO:
+                self._monitorados.discard(talao_id)
+                return False
+            pausa = self.rng.uniform(0.5, 1.5) * self.config["edicao_ms"] / 1000.0
+            _time.sleep(pausa)
+            self._pausado += pausa
+            payload = {
+                key: "" if record[key] is None else str(record[key])
+                for key in ("delegacia", "autoridade", "solicitante", "endereco", "boletim", "natureza", "vitimas")
+            }
+            payload.update(
+                data_solic=record["data_solic"].isoformat(),
+                hora_solic=record["hora_solic"].strftime("%H:%M"),
+                data_bo=record["data_bo"].isoformat() if record["data_bo"] else "",
+                equipe=record["equipe"] or "",
+                operador=f"OPERADOR {self.indice}",
+                status=STATUS_MONITORADO,
+                observacao=f"EDITADO NO TERMINAL {self.indice}",
+            )
+            try:
+                self.repo.update_talao(
+                    talao_id, payload, self.rng.choice(ALERT_INTERVALS), expected_version=record["versao"]
+                )
+            except ConcurrencyError:
+                raise
+            except DatabaseError:
+                # Finalizado ou cancelado entre a leitura e a gravacao.
+                self._monitorados.discard(talao_id)
+                return False
+            return True
+
+        return self._retrying(stats, ConcurrencyError, _editar)
+
+    def _postpone(self, stats):
+        """Reserva um alerta vencido e adia o proximo alerta, como a resposta "manter monitorado"."""
+        reservados = self.repo.claim_due_monitoring(limit=1)
+        if not reservados:
+            return False
+        self.repo.postpone_monitoring(reservados[0][0], self.rng.choice(ALERT_INTERVALS))
+        return True
+
+    def _refresh(self, stats=None):
+        """Atualizacao incremental do dashboard, acompanhando os taloes monitorados da grade."""
+        snapshot = self.repo.get_dashboard_snapshot(date.today().year, self._watermark, self._latest_id)
+        self._watermark, self._latest_id = snapshot["watermark"], snapshot["latest_id"]
+        if snapshot["full"]:
+            self._monitorados.clear()
+        self._monitorados.difference_update(snapshot["removed_ids"])
+        for row in snapshot["rows"]:
+            if row[6] == STATUS_MONITORADO:
+                self._monitorados.add(row[0])
+            else:
+                self._monitorados.discard(row[0])
+        self._quentes = sorted(self._monitorados, reverse=True)[: self.config["quentes"]]
+        return True
+
+
+def run_terminal(config):
+    """Abre o banco ``config["banco"]`` como um terminal e executa a simulacao (thread ou processo).
+
+    Retorna ``{"operacoes": {...}, "metricas": RepositoryMetrics}``.
+    """
+    base = SQLiteRepository(
+        config["banco"], talao_block_size=config["bloco"], terminal_id=f"simulador-{config['indice']}"
+    )
+    metrics = RepositoryMetrics(slow_ms=float("inf"))
+    terminal = VirtualTerminal(InstrumentedRepository(base, metrics), config)
+    try:
+        terminal.run()
+    finally:
+        base.close()
+    return {"operacoes": terminal.stats, "metricas": metrics}
+
+
+def prepare_database(banco, por_dia=50, seed=0, tempestade=False):
+    """Carrega a massa sintetica do ano ate hoje (banco vazio) e, com ``tempestade``, vence todos os alertas.
+
+    Retorna a quantidade de alertas vencidos na largada.
+    """
+    hoje = date.today()
+    repo = SQLiteRepository(banco)
+    try:
+        if not repo.count_taloes_by_period(date(hoje.year, 1, 1), hoje):
+            load_repository(repo, [hoje.year], por_dia, seed, hoje=hoje)
+        if tempestade:
+            monitorados = [row[0] for row in repo.list_initial_taloes() if row[6] == STATUS_MONITORADO]
+            repo.postpone_monitoring_many(monitorados, 0)
+        return len(repo.list_due_monitoring())
+    finally:
+        repo.close()
+
+
+def simulate(
+    banco,
+    terminais=4,
+    duracao=10.0,
+    mix=None,
+    modo="threads",
+    seed=0,
+    pausa_ms=0.0,
+    edicao_ms=DEFAULT_EDIT_MS,
+    tentativas=DEFAULT_RETRIES,
+    bloco=None,
+    quentes=DEFAULT_HOT_SET,
+):
+    """Roda ``terminais`` terminais virtuais por ``duracao`` segundos em ``banco`` e retorna o relatorio."""
+    if modo not in SIMULATION_MODES:
+        raise ValueError(f"Modo inválido: {modo}.")
+    mix = dict(mix or DEFAULT_MIX)
+    largada = _time.time() + STARTUP_SECONDS[modo]
+    configs = [
+        {
+            "banco": banco,
+            "indice": indice,
+            "semente": seed,
+            "mix": mix,
+            "largada": largada,
+            "fim": largada + duracao,
+            "pausa_ms": pausa_ms,
+            "edicao_ms": edicao_ms,
+            "tentativas": max(1, tentativas),
+            "bloco": bloco,
+            "quentes": max(1, quentes),
+        }
+        for indice in range(1, terminais + 1)
+    ]
+    executor_class = ThreadPoolExecutor if modo == "threads" else ProcessPoolExecutor
+    with executor_class(max_workers=terminais) as executor:
+        resultados = list(executor.map(run_terminal, configs))
+    return build_report(resultados, terminais, duracao, mix, modo, bloco)
+
+
+def build_report(resultados, terminais, duracao, mix, modo, bloco):
+    """Soma os resultados dos terminais: vazao, latencia, conflitos e espera de lock."""
+    operacoes = {operacao: _new_stats() for operacao in OPERATIONS}
+    metricas = RepositoryMetrics(slow_ms=float("inf"))
+    for resultado in resultados:
+        for operacao, stats in resultado["operacoes"].items():
+            _merge_stats(operacoes[operacao], stats)
+        metricas.merge(resultado["metricas"])
+
+    relatorio_ops = {}
+    for operacao, stats in operacoes.items():
+        if not stats["total"]:
+            continue
+        item = {chave: stats[chave] for chave in ("total", "ok", "conflitos", "repeticoes", "falhas", "sem_alvo")}
+        item["erros"] = dict(stats["erros"])
+        item["por_segundo"] = round(stats["total"] / duracao, 1)
+        item["latencia"] = stats["latencia"].summary()
+        relatorio_ops[operacao] = item
+
+    metodos = metricas.snapshot()["methods"]
+    tentativas_insert = operacoes["insert"]["total"] + operacoes["insert"]["repeticoes"]
+    total = sum(stats["total"] for stats in operacoes.values())
+    return {
+        "terminais": terminais,
+        "modo": modo,
+        "duracao_s": duracao,
+        "mix": mix,
+        "bloco": bloco,
+        "operacoes": relatorio_ops,
+        "total": {
+            "operacoes": total,
+            "por_segundo": round(total / duracao, 1),
+            "conflitos": sum(stats["conflitos"] for stats in operacoes.values()),
+            "repeticoes": sum(stats["repeticoes"] for stats in operacoes.values()),
+            "falhas": sum(stats["falhas"] for stats in operacoes.values()),
+        },
+        "taxa_talao_duplicado": (
+            round(operacoes["insert"]["conflitos"] / tentativas_insert, 4) if tentativas_insert else 0.0
+        ),
+        "espera_lock": {metodo: item["lock"] for metodo, item in sorted(metodos.items()) if item["lock"]["count"]},
+        "repositorio": {
+            metodo: {"chamadas": item["calls"], "erros": item["errors"], "latencia": item["total"]}
+            for metodo, item in sorted(metodos.items())
+        },
+    }
+
+
+def format_report(relatorio):
+    """Resumo em texto do relatorio de ``simulate``."""
+    total = relatorio["total"]
+    linhas = [
+        f"Terminais: {relatorio['terminais']} ({relatorio['modo']}), {relatorio['duracao_s']:.0f} s: "
+        f"{total['operacoes']} operações ({total['por_segundo']}/s), conflitos {total['conflitos']}, "
+        f"repetições {total['repeticoes']}, falhas {total['falhas']}",
+        f"Taxa de talão duplicado: {relatorio['taxa_talao_duplicado']:.2%}",
+    ]
+    for operacao, item in relatorio["operacoes"].items():
+        latencia = item["latencia"]
+        linhas.append(
+            f"{operacao:<9} {item['total']:>7} ({item['por_segundo']}/s)  p50 {latencia['p50_ms']:.1f} ms  "
+            f"p95 {latencia['p95_ms']:.1f} ms  p99 {latencia['p99_ms']:.1f} ms  máx {latencia['max_ms']:.1f} ms  "
+            f"conflitos {item['conflitos']}  repetições {item['repeticoes']}  falhas {item['falhas']}  "
+            f"sem alvo {item['sem_alvo']}"
+        )
+        if item["erros"]:
+            linhas.append(f"          erros: {item['erros']}")
+    for metodo, lock in relatorio["espera_lock"].items():
+        linhas.append(
+            f"Espera de lock {metodo}: {lock['count']} chamadas, média {lock['mean_ms']:.1f} ms, "
+            f"p95 {lock['p95_ms']:.1f} ms, máx {lock['max_ms']:.1f} ms"
+        )
+    return "\n".join(linhas)
+
+
+def _parse_mix(text):
+    """Converte ``insert=3,update=2`` em dicionario de pesos por operacao."""
+    mix = {}
+    for parte in text.split(","):
+        if not parte.strip():
+            continue
+        nome, _, peso = parte.partition("=")
+        nome = nome.strip()
+        if nome not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Operação desconhecida: {nome} (use {', '.join(OPERATIONS)}).")
+        try:
+            mix[nome] = float(peso)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Peso inválido para {nome}: {peso}.") from None
+    if not any(peso > 0 for peso in mix.values()) or min(mix.values()) < 0:
+        raise argparse.ArgumentTypeError("Informe ao menos uma operação com peso positivo.")
+    return mix
+
+
+def main(argv=None):
+    """Linha de comando: prepara o banco, roda a simulacao e mostra (ou grava) o relatorio."""
+    parser = argparse.ArgumentParser(
+        prog="python -m afis_app.load_simulator",
+        description="Simula vários terminais gravando talões e atendendo alertas no mesmo banco SQLite.",
+    )
+    parser.add_argument("--terminais", type=int, default=8, help="terminais virtuais (padrão: 8)")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos de simulação (padrão: 10)")
+    parser.add_argument("--modo", choices=SIMULATION_MODES, default="threads")
+    parser.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=DEFAULT_MIX,
+        help="pesos das operações (padrão: insert=3,update=2,postpone=2,refresh=5)",
+    )
+    parser.add_argument("--pausa-ms", type=float, default=0.0, help="pausa média entre operações (padrão: 0)")
+    parser.add_argument("--edicao-ms", type=float, default=DEFAULT_EDIT_MS, help="tempo de edição (padrão: 20)")
+    parser.add_argument("--tentativas", type=int, default=DEFAULT_RETRIES, help="tentativas em conflito (padrão: 3)")
+    parser.add_argument("--bloco", type=int, help="talões reservados por terminal (padrão: TALAO_BLOCK_SIZE)")
+    parser.add_argument("--quentes", type=int, default=DEFAULT_HOT_SET, help="talões disputados nas edições")
+    parser.add_argument("--tempestade", action="store_true", help="todos os alertas monitorados vencidos na largada")
+    parser.add_argument("--por-dia", type=int, default=50, help="talões por dia da massa inicial (padrão: 50)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--banco", help="arquivo SQLite (padrão: banco novo em pasta temporária)")
+    parser.add_argument("--saida", help="grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    def _run(banco):
+        vencidos = prepare_database(banco, max(1, args.por_dia), args.semente, args.tempestade)
+        print(f"Alertas vencidos na largada: {vencidos}")
+        return simulate(
+            banco,
+            max(1, args.terminais),
+            max(0.1, args.duracao),
+            args.mix,
+            args.modo,
+            args.semente,
+            args.pausa_ms,
+            args.edicao_ms,
+            args.tentativas,
+            args.bloco,
+            args.quentes,
+        )
+
+    if args.banco:
+        relatorio = _run(args.banco)
+    else:
+        with tempfile.TemporaryDirectory() as pasta:
+            relatorio = _run(os.path.join(pasta, "afis_carga.db"))
+    print(format_report(relatorio))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as file:
+            json.dump(relatorio, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,433 @@
+"""Migracoes versionadas do schema AFIS (SQL Server e SQLite).
+
+Cada migracao e aplicada uma unica vez, em ordem de versao, e registrada na
+tabela ``schema_version``. ``apply_migrations`` e chamado por
+``ensure_schema_is_ready`` dos repositorios; com ``auto_apply=False`` apenas
+verifica se o banco esta atualizado. Para DBAs que preferem aplicar os
+scripts manualmente: ``python -m afis_app.migrations > migracoes.sql``.
+"""
+
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+SQLSERVER = "sqlserver"
+SQLITE = "sqlite"
+
+
+class MigrationError(Exception):
+    """Erro de schema desatualizado ou de falha na aplicacao de migracao."""
+
+    pass
+
+
+class Migration:
+    """Migracao de schema com os comandos de cada dialeto suportado."""
+
+    def __init__(self, version, description, sqlserver=(), sqlite=()):
+        self.version = version
+        self.description = description
+        self.statements = {SQLSERVER: tuple(sqlserver), SQLITE: tuple(sqlite)}
+
+
+def _sqlserver_index(name, table, definition):
+    """Monta CREATE INDEX idempotente para SQL Server."""
+    return (
+        f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' "
+        f"AND object_id = OBJECT_ID('{table}'))\n"
+        f"    CREATE NONCLUSTERED INDEX {name} ON {table} {definition};"
+    )
+
+
+# Campos de texto pesquisaveis e o tamanho da coluna original em dbo.taloes.
+_SEARCH_COLUMNS = (("delegacia", 255), ("equipe", 255), ("operador", 100))
+
+_SQLITE_FOLD_ASSIGNMENTS = ", ".join(f"{field}_busca = afis_fold(NEW.{field})" for field, _ in _SEARCH_COLUMNS)
+
+
+def _sqlserver_search_column(field, length):
+    """Monta coluna computada persistida ``<campo>_busca`` para SQL Server.
+
+    UPPER/LTRIM/RTRIM sao deterministicos e a colacao CI_AI torna a
+    comparacao insensivel a acentos, de modo que ``LIKE 'SAO%'`` encontra
+    "São Paulo" usando busca por faixa no indice.
+    """
+    return (
+        f"IF COL_LENGTH('dbo.taloes', '{field}_busca') IS NULL\n"
+        f"    ALTER TABLE dbo.taloes ADD {field}_busca AS "
+        f"CAST(UPPER(LTRIM(RTRIM(ISNULL({field}, N'')))) AS NVARCHAR({length})) "
+        f"COLLATE Latin1_General_CI_AI PERSISTED;"
+    )
+
+
+# Colunas de negocio cuja alteracao gera nova versao de linha no SQLite
+# (as colunas auxiliares *_busca e a propria versao ficam de fora).
+_SQLITE_VERSIONED_COLUMNS = (
+    "ano",
+    "talao",
+    "data_solic",
+    "hora_solic",
+    "delegacia",
+    "autoridade",
+    "solicitante",
+    "endereco",
+    "boletim",
+    "natureza",
+    "data_bo",
+    "vitimas",
+    "equipe",
+    "operador",
+    "status",
+    "observacao",
+    "atualizado_em",
+)
+
+_SQLITE_BUMP_VERSION = """
+                UPDATE db_versao SET valor = valor + 1 WHERE id = 1;
+                UPDATE taloes SET versao = (SELECT valor FROM db_versao WHERE id = 1) WHERE id = NEW.id;"""
+
+_SQLITE_BUMP_MONITORAMENTO_VERSION = """
+                UPDATE db_versao SET valor = valor + 1 WHERE id = 1;
+                UPDATE monitoramento SET versao = (SELECT valor FROM db_versao WHERE id = 1) WHERE id = NEW.id;"""
+
+
+MIGRATIONS = (
+    Migration(
+        1,
+        "Indices de cobertura para grade inicial, periodo e alertas vencidos",
+        sqlserver=(
+            # list_initial_taloes (data_solic >= ontem) e list_taloes_by_period (ordem data/hora/id).
+            _sqlserver_index(
+                "ix_taloes_data_solic",
+                "dbo.taloes",
+                "(data_solic, hora_solic) INCLUDE (ano, talao, boletim, delegacia, natureza, status)",
+            ),
+            # list_initial_taloes (ramo MONITORADO); filtrado para ficar pequeno.
+            _sqlserver_index(
+                "ix_taloes_monitorados",
+                "dbo.taloes",
+                "(ano DESC, talao DESC) INCLUDE (boletim, delegacia, natureza, status) "
+                "WHERE status = 'MONITORADO'",
+            ),
+            # list_due_monitoring, executado a cada ciclo por todos os terminais.
+            _sqlserver_index(
+                "ix_monitoramento_proximo_alerta",
+                "dbo.monitoramento",
+                "(proximo_alerta) INCLUDE (talao_id, intervalo_min)",
+            ),
+        ),
+        sqlite=(
+            "CREATE INDEX IF NOT EXISTS ix_taloes_data_solic ON taloes (data_solic, hora_solic, id)",
+            "CREATE INDEX IF NOT EXISTS ix_taloes_monitorados ON taloes (ano DESC, talao DESC) "
+            "WHERE status = 'MONITORADO'",
+            "CREATE INDEX IF NOT EXISTS ix_monitoramento_proximo_alerta ON monitoramento (proximo_alerta)",
+        ),
+    ),
+    Migration(
+        2,
+        "Colunas normalizadas e indices para busca por prefixo",
+        sqlserver=(
+            *(_sqlserver_search_column(field, length) for field, length in _SEARCH_COLUMNS),
+            *(
+                _sqlserver_index(f"ix_taloes_{field}_busca", "dbo.taloes", f"({field}_busca)")
+                for field, _ in _SEARCH_COLUMNS
+            ),
+            _sqlserver_index("ix_taloes_boletim", "dbo.taloes", "(boletim)"),
+        ),
+        sqlite=(
+            *(f"ALTER TABLE taloes ADD COLUMN {field}_busca TEXT" for field, _ in _SEARCH_COLUMNS),
+            # afis_fold e registrada em cada conexao por sqlite_repository.
+            "UPDATE taloes SET "
+            + ", ".join(f"{field}_busca = afis_fold({field})" for field, _ in _SEARCH_COLUMNS),
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tg_taloes_busca_insert AFTER INSERT ON taloes
+            BEGIN
+                UPDATE taloes SET {_SQLITE_FOLD_ASSIGNMENTS} WHERE id = NEW.id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tg_taloes_busca_update
+            AFTER UPDATE OF {", ".join(field for field, _ in _SEARCH_COLUMNS)} ON taloes
+            BEGIN
+                UPDATE taloes SET {_SQLITE_FOLD_ASSIGNMENTS} WHERE id = NEW.id;
+            END
+            """,
+            *(
+                f"CREATE INDEX IF NOT EXISTS ix_taloes_{field}_busca ON taloes ({field}_busca)"
+                for field, _ in _SEARCH_COLUMNS
+            ),
+            "CREATE INDEX IF NOT EXISTS ix_taloes_boletim ON taloes (boletim)",
+        ),
+    ),
+    Migration(
+        3,
+        "Contador de numeracao de talao por ano",
+        sqlserver=(
+            """
+            IF OBJECT_ID('dbo.talao_contador', 'U') IS NULL
+                CREATE TABLE dbo.talao_contador (
+                    ano INT NOT NULL PRIMARY KEY,
+                    proximo INT NOT NULL
+                );
+            """,
+            """
+            INSERT INTO dbo.talao_contador (ano, proximo)
+            SELECT t.ano, MAX(t.talao) + 1
+            FROM dbo.taloes t
+            WHERE NOT EXISTS (SELECT 1 FROM dbo.talao_contador c WHERE c.ano = t.ano)
+            GROUP BY t.ano;
+            """,
+        ),
+        sqlite=(
+            """
+            CREATE TABLE IF NOT EXISTS talao_contador (
+                ano INTEGER NOT NULL PRIMARY KEY,
+                proximo INTEGER NOT NULL
+            )
+            """,
+            "INSERT OR IGNORE INTO talao_contador (ano, proximo) SELECT ano, MAX(talao) + 1 FROM taloes GROUP BY ano",
+        ),
+    ),
+    Migration(
+        4,
+        "Versao de linha (rowversion) e registro de exclusoes para atualizacao incremental",
+        sqlserver=(
+            """
+            IF COL_LENGTH('dbo.taloes', 'versao') IS NULL
+                ALTER TABLE dbo.taloes ADD versao ROWVERSION;
+            """,
+            _sqlserver_index(
+                "ix_taloes_versao",
+                "dbo.taloes",
+                "(versao) INCLUDE (ano, talao, boletim, delegacia, natureza, status, data_solic)",
+            ),
+            """
+            IF OBJECT_ID('dbo.taloes_excluidos', 'U') IS NULL
+                CREATE TABLE dbo.taloes_excluidos (
+                    talao_id INT NOT NULL,
+                    versao ROWVERSION NOT NULL
+                );
+            """,
+            _sqlserver_index("ix_taloes_excluidos_versao", "dbo.taloes_excluidos", "(versao) INCLUDE (talao_id)"),
+            """
+            CREATE OR ALTER TRIGGER dbo.tg_taloes_excluidos ON dbo.taloes AFTER DELETE AS
+            BEGIN
+                SET NOCOUNT ON;
+                INSERT INTO dbo.taloes_excluidos (talao_id) SELECT id FROM deleted;
+            END
+            """,
+        ),
+        sqlite=(
+            # Emula rowversion: contador unico do banco incrementado por gatilho.
+            """
+            CREATE TABLE IF NOT EXISTS db_versao (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                valor INTEGER NOT NULL
+            )
+            """,
+            "INSERT OR IGNORE INTO db_versao (id, valor) VALUES (1, 1)",
+            "ALTER TABLE taloes ADD COLUMN versao INTEGER NOT NULL DEFAULT 1",
+            "CREATE INDEX IF NOT EXISTS ix_taloes_versao ON taloes (versao)",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tg_taloes_versao_insert AFTER INSERT ON taloes
+            BEGIN
+                {_SQLITE_BUMP_VERSION}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tg_taloes_versao_update
+            AFTER UPDATE OF {", ".join(_SQLITE_VERSIONED_COLUMNS)} ON taloes
+            BEGIN
+                {_SQLITE_BUMP_VERSION}
+            END
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS taloes_excluidos (
+                talao_id INTEGER NOT NULL,
+                versao INTEGER NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_taloes_excluidos_versao ON taloes_excluidos (versao)",
+            """
+            CREATE TRIGGER IF NOT EXISTS tg_taloes_excluidos AFTER DELETE ON taloes
+            BEGIN
+                UPDATE db_versao SET valor = valor + 1 WHERE id = 1;
+                INSERT INTO taloes_excluidos (talao_id, versao) SELECT OLD.id, valor FROM db_versao WHERE id = 1;
+            END
+            """,
+        ),
+    ),
+    Migration(
+        5,
+        "Reserva de alertas por terminal (claimed_by/lease_until) no monitoramento",
+        sqlserver=(
+            """
+            IF COL_LENGTH('dbo.monitoramento', 'claimed_by') IS NULL
+                ALTER TABLE dbo.monitoramento ADD claimed_by NVARCHAR(64) NULL, lease_until DATETIME2 NULL;
+            """,
+        ),
+        sqlite=(
+            "ALTER TABLE monitoramento ADD COLUMN claimed_by TEXT",
+            "ALTER TABLE monitoramento ADD COLUMN lease_until TIMESTAMP",
+        ),
+    ),
+    Migration(
+        6,
+        "Versao de linha no monitoramento para o backup incremental de adiamentos",
+        sqlserver=(
+            """
+            IF COL_LENGTH('dbo.monitoramento', 'versao') IS NULL
+                ALTER TABLE dbo.monitoramento ADD versao ROWVERSION;
+            """,
+            _sqlserver_index("ix_monitoramento_versao", "dbo.monitoramento", "(versao) INCLUDE (talao_id)"),
+        ),
+        sqlite=(
+            "ALTER TABLE monitoramento ADD COLUMN versao INTEGER NOT NULL DEFAULT 1",
+            "CREATE INDEX IF NOT EXISTS ix_monitoramento_versao ON monitoramento (versao)",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tg_monitoramento_versao_insert AFTER INSERT ON monitoramento
+            BEGIN
+                {_SQLITE_BUMP_MONITORAMENTO_VERSION}
+            END
+            """,
+            # So as colunas do backup: reservas de alerta (claimed_by/lease_until) nao mudam a versao.
+            f"""
+            CREATE TRIGGER IF NOT EXISTS tg_monitoramento_versao_update
+            AFTER UPDATE OF proximo_alerta, intervalo_min ON monitoramento
+            BEGIN
+                {_SQLITE_BUMP_MONITORAMENTO_VERSION}
+            END
+            """,
+        ),
+    ),
+)
+
+_SCHEMA_VERSION_DDL = {
+    SQLSERVER: """
+    IF OBJECT_ID('dbo.schema_version', 'U') IS NULL
+        CREATE TABLE dbo.schema_version (
+            versao INT NOT NULL PRIMARY KEY,
+            descricao NVARCHAR(255) NOT NULL,
+            aplicado_em DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+        );
+    """,
+    SQLITE: """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        versao INTEGER NOT NULL PRIMARY KEY,
+        descricao TEXT NOT NULL,
+        aplicado_em TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    )
+    """,
+}
+
+_SCHEMA_VERSION_EXISTS = {
+    SQLSERVER: "SELECT CASE WHEN OBJECT_ID('dbo.schema_version', 'U') IS NULL THEN 0 ELSE 1 END",
+    SQLITE: "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'",
+}
+
+_SCHEMA_VERSION_TABLE = {SQLSERVER: "dbo.schema_version", SQLITE: "schema_version"}
+
+# Serializa terminais iniciando ao mesmo tempo: so um aplica cada migracao.
+# sp_getapplock devolve < 0 em timeout/deadlock; nesse caso a migracao nao pode seguir.
+_BEGIN_MIGRATION = {
+    SQLSERVER: (
+        "SET NOCOUNT ON; DECLARE @r INT; "
+        "EXEC @r = sp_getapplock @Resource = 'afis_schema_migrations', @LockMode = 'Exclusive', "
+        "@LockOwner = 'Transaction', @LockTimeout = 60000; "
+        "IF @r < 0 THROW 51000, 'Lock de migracao de schema indisponivel.', 1;"
+    ),
+    SQLITE: "BEGIN IMMEDIATE",
+}
+
+
+def latest_version():
+    """Retorna a versao de schema esperada pelo codigo atual."""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def applied_versions(cur, dialect):
+    """Retorna o conjunto de versoes ja registradas em schema_version."""
+    cur.execute(_SCHEMA_VERSION_EXISTS[dialect])
+    row = cur.fetchone()
+    if not row or not row[0]:
+        return set()
+    cur.execute(f"SELECT versao FROM {_SCHEMA_VERSION_TABLE[dialect]}")
+    return {int(r[0]) for r in cur.fetchall()}
+
+
+def pending_migrations(applied):
+    """Lista migracoes ainda nao aplicadas, em ordem de versao."""
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if m.version not in applied]
+
+
+def apply_migrations(conn, dialect, auto_apply=True):
+    """Aplica (ou apenas verifica) as migracoes pendentes; retorna versoes aplicadas."""
+    cur = conn.cursor()
+    pending = pending_migrations(applied_versions(cur, dialect))
+    conn.commit()
+    if not pending:
+        return []
+
+    if not auto_apply:
+        versions = ", ".join(str(m.version) for m in pending)
+        raise MigrationError(
+            "Schema do banco desatualizado. Aplique as migrações pendentes "
+            f"(python -m afis_app.migrations) antes de iniciar o app. Versões pendentes: {versions}."
+        )
+
+    cur.execute(_SCHEMA_VERSION_DDL[dialect])
+    conn.commit()
+
+    applied_now = []
+    table = _SCHEMA_VERSION_TABLE[dialect]
+    for migration in pending:
+        try:
+            cur.execute(_BEGIN_MIGRATION[dialect])
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE versao = ?", (migration.version,))
+            if cur.fetchone()[0]:
+                # Outro terminal aplicou enquanto aguardavamos o lock.
+                conn.commit()
+                continue
+            for statement in migration.statements[dialect]:
+                cur.execute(statement)
+            cur.execute(
+                f"INSERT INTO {table} (versao, descricao) VALUES (?, ?)",
+                (migration.version, migration.description),
+            )
+            conn.commit()
+        except Exception as exc:
+            conn.rollback()
+            raise MigrationError(f"Falha ao aplicar migração {migration.version}: {migration.description}.") from exc
+        logger.info("Migração de schema %s aplicada: %s", migration.version, migration.description)
+        applied_now.append(migration.version)
+    return applied_now
+
+
+def render_sqlserver_script():
+    """Gera script T-SQL com todas as migracoes para aplicacao manual."""
+    lines = [
+        "-- Migracoes AFIS (gerado por python -m afis_app.migrations)",
+        "SET NOCOUNT ON;",
+        _SCHEMA_VERSION_DDL[SQLSERVER].strip(),
+        "GO",
+    ]
+    for migration in MIGRATIONS:
+        lines.append("")
+        lines.append(f"-- Versao {migration.version}: {migration.description}")
+        lines.append(f"IF NOT EXISTS (SELECT 1 FROM dbo.schema_version WHERE versao = {migration.version})")
+        lines.append("BEGIN")
+        for statement in migration.statements[SQLSERVER]:
+            escaped = statement.replace("'", "''")
+            lines.append(f"    EXEC sp_executesql N'{escaped}';")
+        description = migration.description.replace("'", "''")
+        lines.append(
+            f"    INSERT INTO dbo.schema_version (versao, descricao) VALUES ({migration.version}, N'{description}');"
+        )
+        lines.append("END")
+        lines.append("GO")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    sys.stdout.write(render_sqlserver_script())
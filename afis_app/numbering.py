@@ -0,0 +1,52 @@
+import heapq
+import threading
+
+
+class TalaoBlockCache:
+    """Blocos de numeros de talao reservados por este terminal, por ano.
+
+    Com reserva em bloco o terminal incrementa o contador do ano uma vez a
+    cada ``block_size`` insercoes e distribui os numeros localmente, sem
+    disputar a linha do contador a cada talao. Numeros nao usados quando o
+    app fecha viram lacunas na numeracao; por isso o padrao e ``block_size=1``
+    (sem cache, numeracao sem lacunas).
+    """
+
+    def __init__(self, block_size):
+        if block_size < 2:
+            raise ValueError("block_size deve ser maior que 1 para reserva em bloco.")
+        self.block_size = block_size
+        self._free = {}
+        self._lock = threading.Lock()
+
+    def take(self, ano):
+        """Retira o menor numero livre do ano, ou None se nao houver bloco."""
+        with self._lock:
+            free = self._free.get(ano)
+            if not free:
+                return None
+            return heapq.heappop(free)
+
+    def peek(self, ano):
+        """Retorna o proximo numero livre do ano sem retira-lo."""
+        with self._lock:
+            free = self._free.get(ano)
+            return free[0] if free else None
+
+    def add_block(self, ano, primeiro):
+        """Registra bloco reservado a partir de ``primeiro`` e retorna ``primeiro`` para uso."""
+        with self._lock:
+            free = self._free.setdefault(ano, [])
+            for numero in range(primeiro + 1, primeiro + self.block_size):
+                heapq.heappush(free, numero)
+        return primeiro
+
+    def give_back(self, ano, numero):
+        """Devolve numero cuja insercao falhou para ser reutilizado."""
+        with self._lock:
+            heapq.heappush(self._free.setdefault(ano, []), numero)
+
+    def pending(self):
+        """Quantidade de numeros reservados e ainda nao usados, por ano."""
+        with self._lock:
+            return {ano: len(free) for ano, free in self._free.items() if free}
@@ -0,0 +1,232 @@
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Erro levantado quando nao ha conexao livre dentro do tempo limite."""
+
+    pass
+
+
+class _IdleConnection:
+    """Conexao ociosa mantida pelo pool com instante de devolucao."""
+
+    __slots__ = ("conn", "released_at")
+
+    def __init__(self, conn, released_at):
+        self.conn = conn
+        self.released_at = released_at
+
+
+class ConnectionPool:
+    """Pool limitado e thread-safe de conexoes de banco de dados.
+
+    As conexoes sao criadas sob demanda por ``factory`` ate ``max_size``.
+    Conexoes ociosas alem de ``idle_timeout`` segundos sao descartadas, e
+    ``validate`` (quando informado) e chamado antes de cada emprestimo de
+    conexao ociosa ha mais de ``validate_idle_after`` segundos, descartando
+    conexoes quebradas. Na devolucao, ``reset`` desfaz qualquer
+    transacao pendente para que o proximo uso encontre a conexao limpa.
+    """
+
+    def __init__(
+        self,
+        factory,
+        max_size=5,
+        idle_timeout=300.0,
+        acquire_timeout=30.0,
+        validate=None,
+        validate_idle_after=0.0,
+        reset=None,
+        clock=time.monotonic,
+    ):
+        if int(max_size) < 1:
+            raise ValueError("max_size deve ser maior ou igual a 1.")
+        self._factory = factory
+        self._max_size = int(max_size)
+        self._idle_timeout = float(idle_timeout)
+        self._acquire_timeout = float(acquire_timeout)
+        self._validate = validate
+        self._validate_idle_after = float(validate_idle_after)
+        self._reset = reset
+        self._clock = clock
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "expired": 0,
+            "validation_failures": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    @property
+    def max_size(self):
+        """Retorna o numero maximo de conexoes simultaneas."""
+        return self._max_size
+
+    def _close_quietly(self, conn):
+        """Fecha conexao ignorando falhas de rede ou estado invalido."""
+        try:
+            conn.close()
+        except Exception:
+            logger.debug("Falha ao fechar conexão descartada do pool.", exc_info=True)
+
+    def _is_valid(self, entry):
+        """Executa validacao de emprestimo, quando configurada."""
+        if self._validate is None:
+            return True
+        if self._clock() - entry.released_at < self._validate_idle_after:
+            return True
+        conn = entry.conn
+        try:
+            self._validate(conn)
+            return True
+        except Exception:
+            logger.info("Conexão do pool falhou na validação e será descartada.", exc_info=True)
+            return False
+
+    def _take_idle(self):
+        """Retira a conexao ociosa mais recente e separa as expiradas (chamar com lock)."""
+        expired = []
+        if self._idle_timeout > 0 and self._idle:
+            now = self._clock()
+            keep = []
+            for entry in self._idle:
+                if now - entry.released_at > self._idle_timeout:
+                    expired.append(entry.conn)
+                else:
+                    keep.append(entry)
+            self._idle = keep
+            self._stats["expired"] += len(expired)
+            self._stats["discarded"] += len(expired)
+        entry = self._idle.pop() if self._idle else None
+        return entry, expired
+
+    def _reserve(self, timeout):
+        """Reserva uma vaga no pool, devolvendo entrada ociosa quando houver."""
+        deadline = self._clock() + timeout
+        waited = False
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Pool de conexões encerrado.")
+                    entry, stale = self._take_idle()
+                    expired.extend(stale)
+                    if entry is not None or self._in_use < self._max_size:
+                        self._in_use += 1
+                        return entry
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError("Tempo esgotado aguardando conexão livre com o banco de dados.")
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+        finally:
+            for stale_conn in expired:
+                self._close_quietly(stale_conn)
+
+    def _unreserve(self, discarded):
+        """Libera vaga reservada que nao resultou em emprestimo."""
+        with self._cond:
+            self._in_use -= 1
+            if discarded:
+                self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Empresta uma conexao do pool, criando uma nova quando necessario."""
+        wait_limit = self._acquire_timeout if timeout is None else float(timeout)
+        while True:
+            entry = self._reserve(wait_limit)
+            if entry is None:
+                break
+            if self._is_valid(entry):
+                with self._cond:
+                    self._stats["reused"] += 1
+                return entry.conn
+            self._close_quietly(entry.conn)
+            with self._cond:
+                self._stats["validation_failures"] += 1
+            self._unreserve(discarded=True)
+
+        try:
+            conn = self._factory()
+        except Exception:
+            self._unreserve(discarded=False)
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """Devolve conexao ao pool apos desfazer transacao pendente."""
+        if not discard and self._reset is not None:
+            try:
+                self._reset(conn)
+            except Exception:
+                logger.info("Falha ao reiniciar conexão devolvida ao pool.", exc_info=True)
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._stats["discarded"] += 1
+                to_close = conn
+            else:
+                self._idle.append(_IdleConnection(conn, self._clock()))
+                to_close = None
+            self._cond.notify()
+
+        if to_close is not None:
+            self._close_quietly(to_close)
+
+    @contextmanager
+    def connection(self):
+        """Empresta conexao e a devolve ao final do bloco ``with``."""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except BaseException as exc:
+            discard = self._is_disconnect(exc)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def _is_disconnect(self, exc):
+        """Indica se a excecao sugere conexao quebrada (SQLSTATE 08xxx)."""
+        args = getattr(exc, "args", ())
+        sqlstate = str(args[0]) if args else ""
+        return sqlstate.startswith("08")
+
+    def close(self):
+        """Fecha conexoes ociosas e impede novos emprestimos."""
+        with self._cond:
+            self._closed = True
+            idle = [entry.conn for entry in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Retorna fotografia das estatisticas de uso do pool."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["in_use"] = self._in_use
+            snapshot["idle"] = len(self._idle)
+            snapshot["max_size"] = self._max_size
+        return snapshot
@@ -1,16 +1,83 @@
-from datetime import datetime
+from abc import ABC, abstractmethod
+import base64
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+import functools
+import json
 import logging
+import os
+import socket
 
 try:
     import pyodbc
 except ImportError:
     pyodbc = None
 
-from .constants import STATUS_CANCELADO, STATUS_FINALIZADO, STATUS_MONITORADO
-from .config import get_env
+from .constants import (
+    SEARCH_MODE_CONTAINS,
+    SEARCH_TEXT_FIELDS,
+    STATUS_CANCELADO,
+    STATUS_FINALIZADO,
+    STATUS_MONITORADO,
+)
+from .config import get_env, get_env_number
+from .migrations import SQLSERVER, MigrationError, apply_migrations
+from .numbering import TalaoBlockCache
+from .pool import ConnectionPool
+from .validators import BOLETIM_PATTERN, normalize_search_text
 
 logger = logging.getLogger(__name__)
 
+# Linhas por fetchmany nas leituras em fluxo (exportacoes/backup).
+EXPORT_BATCH_SIZE = 1000
+
+# Paginacao por chave (keyset) da busca e dos relatorios: linhas por pagina e
+# teto da contagem estimada (acima dele a contagem para e informa "mais de").
+SEARCH_PAGE_SIZE = 200
+SEARCH_COUNT_CAP = 10000
+
+# Colunas de negocio de dbo.taloes (sem as colunas auxiliares de busca).
+TALAO_DETAIL_COLUMNS = (
+    "id",
+    "ano",
+    "talao",
+    "data_solic",
+    "hora_solic",
+    "delegacia",
+    "autoridade",
+    "solicitante",
+    "endereco",
+    "boletim",
+    "natureza",
+    "data_bo",
+    "vitimas",
+    "equipe",
+    "operador",
+    "status",
+    "observacao",
+    "criado_em",
+    "atualizado_em",
+)
+
+# Registro completo dos alertas vencidos (get_talao + intervalo), para finalizar sem nova leitura.
+DUE_RECORD_COLUMNS = ("intervalo_min",) + TALAO_DETAIL_COLUMNS + ("versao",)
+
+# Colunas de dbo.monitoramento exportadas em backup (a reserva de alerta e transitoria).
+MONITORAMENTO_BACKUP_COLUMNS = ("id", "talao_id", "proximo_alerta", "intervalo_min", "criado_em")
+
+# Politicas de restauracao para taloes do backup que ja existem no banco (mesmo ano + talao).
+RESTORE_FAIL = "fail"
+RESTORE_SKIP = "skip"
+RESTORE_OVERWRITE = "overwrite"
+RESTORE_POLICIES = (RESTORE_FAIL, RESTORE_SKIP, RESTORE_OVERWRITE)
+
+# Codigos de resultado de update_talao (motivo quando nenhuma linha foi alterada).
+UPDATE_OK = 0
+UPDATE_NOT_FOUND = 1
+UPDATE_CLOSED = 2
+UPDATE_YEAR_CHANGED = 3
+UPDATE_CONFLICT = 4
+
 
 class DatabaseError(Exception):
     """Erro base de acesso a dados e regras de persistencia."""
@@ -30,12 +97,440 @@ class DuplicateTalaoError(DatabaseError):
     pass
 
 
-class SQLServerRepository:
+class RestoreConflictError(DatabaseError):
+    """Backup em conflito com taloes ja gravados; a restauracao e desfeita."""
+
+    pass
+
+
+class RepositoryBase(ABC):
+    """Conversoes e normalizacao de payload comuns as implementacoes de repositorio.
+
+    Os trechos que dependem do backend (emprestimo de conexao, reserva de
+    bloco de numeros, comparacoes da busca) sao metodos abstratos: uma
+    implementacao incompleta falha ja ao ser instanciada.
+    """
+
+    # Ordenacao (e chave do cursor) das listagens paginadas: (coluna, conversor do cursor).
+    _SEARCH_KEYSET = (("ano", int), ("talao", int), ("id", int))
+    _PERIOD_KEYSET = (("data_solic", date.fromisoformat), ("hora_solic", time.fromisoformat), ("id", int))
+    # Hooks em volta de cada emprestimo de conexao (ver ``add_connection_hook``).
+    _connection_hooks = ()
+
+    def add_connection_hook(self, hook):
+        """Registra ``hook`` em volta de cada emprestimo de conexao de ``_connect``.
+
+        ``hook(connect)`` recebe a funcao que empresta a conexao (context
+        manager) e devolve outro context manager, que pode medir o emprestimo
+        ou entregar um intermediario da conexao. ``remove_connection_hook``
+        desfaz o registro.
+        """
+        self._connection_hooks = self._connection_hooks + (hook,)
+
+    def remove_connection_hook(self, hook):
+        """Remove ``hook`` registrado com ``add_connection_hook``."""
+        self._connection_hooks = tuple(item for item in self._connection_hooks if item != hook)
+
+    @contextmanager
+    def _connect(self):
+        """Empresta conexao do backend (``_borrow_connection``) passando pelos hooks registrados."""
+        connect = self._borrow_connection
+        for hook in self._connection_hooks:
+            connect = functools.partial(hook, connect)
+        with connect() as conn:
+            yield conn
+
+    @abstractmethod
+    def _borrow_connection(self):
+        """Context manager que empresta a conexao do backend (pool ou conexao da thread)."""
+
+    def _to_int(self, value, context):
+        """Converte valor para int com mensagem de erro contextualizada."""
+        if value is None:
+            raise DatabaseError(f"Valor nulo retornado para {context}.")
+        try:
+            return int(value)
+        except (TypeError, ValueError) as exc:
+            raise DatabaseError(f"Valor inválido para {context}: {value!r}") from exc
+
+    def _parse_required_date(self, value, field_name):
+        """Converte data obrigatoria no formato AAAA-MM-DD."""
+        if value is None or str(value).strip() == "":
+            raise DatabaseError(f"Campo {field_name} vazio.")
+        return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+    def _parse_optional_date(self, value):
+        """Converte data opcional no formato AAAA-MM-DD."""
+        if value is None or str(value).strip() == "":
+            return None
+        return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+    def _parse_required_time(self, value, field_name):
+        """Converte hora obrigatoria no formato HH:MM."""
+        if value is None or str(value).strip() == "":
+            raise DatabaseError(f"Campo {field_name} vazio.")
+        return datetime.strptime(str(value), "%H:%M").time()
+
+    def _nullable_text(self, value):
+        """Normaliza string para None quando vazia."""
+        if value is None:
+            return None
+        txt = str(value).strip()
+        return txt if txt else None
+
+    def _build_db_payload(self, data):
+        """Monta payload normalizado para escrita no banco."""
+        data_solic = self._parse_required_date(data.get("data_solic"), "data_solic")
+        hora_solic = self._parse_required_time(data.get("hora_solic"), "hora_solic")
+        return {
+            "ano": data_solic.year,
+            "data_solic": data_solic,
+            "hora_solic": hora_solic,
+            "delegacia": str(data["delegacia"]).strip(),
+            "autoridade": str(data["autoridade"]).strip(),
+            "solicitante": str(data["solicitante"]).strip(),
+            "endereco": str(data["endereco"]).strip(),
+            "boletim": self._nullable_text(data.get("boletim")),
+            "natureza": self._nullable_text(data.get("natureza")),
+            "data_bo": self._parse_optional_date(data.get("data_bo")),
+            "vitimas": self._nullable_text(data.get("vitimas")),
+            "equipe": self._nullable_text(data.get("equipe")),
+            "operador": str(data["operador"]).strip(),
+            "status": str(data["status"]).strip(),
+            "observacao": self._nullable_text(data.get("observacao")),
+        }
+
+    def _due_monitoring_columns(self, with_records, monitoramento="m"):
+        """Colunas de ``list_due_monitoring``: resumo da pergunta ou registro completo do talao."""
+        if not with_records:
+            return f"{monitoramento}.talao_id, {monitoramento}.intervalo_min, t.ano, t.talao, t.boletim, t.status"
+        return f"{monitoramento}.intervalo_min, " + ", ".join(f"t.{col}" for col in DUE_RECORD_COLUMNS[1:])
+
+    def _due_monitoring_rows(self, rows, with_records):
+        """Com ``with_records``, converte as linhas em dicionarios no formato de ``get_talao`` + ``intervalo_min``."""
+        if not with_records:
+            return rows
+        return [dict(zip(DUE_RECORD_COLUMNS, row)) for row in rows]
+
+    def _keyset_clause(self, keyset, values, descending=False):
+        """Condicao "depois de ``values``" na ordem de ``keyset``, em forma indexavel.
+
+        Expande a comparacao de tupla (o SQL Server nao tem row values) e
+        repete a primeira coluna como faixa simples, para o otimizador
+        buscar direto no indice.
+        """
+        columns = [f"t.{column}" for column, _ in keyset]
+        op = "<" if descending else ">"
+        clause, params = f"{columns[-1]} {op} ?", [values[-1]]
+        for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+            clause = f"{column} {op} ? OR ({column} = ? AND ({clause}))"
+            params = [value, value] + params
+        return f"{columns[0]} {op}= ? AND ({clause})", [values[0]] + params
+
+    def _order_by(self, keyset, descending=False):
+        """Clausula ORDER BY da listagem paginada."""
+        direction = "DESC" if descending else "ASC"
+        return " ORDER BY " + ", ".join(f"t.{column} {direction}" for column, _ in keyset)
+
+    def _encode_cursor(self, values):
+        """Cursor opaco (base64 de JSON) com a chave da ultima linha entregue."""
+        payload = [value.isoformat() if isinstance(value, (date, time)) else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+    def _decode_cursor(self, cursor, keyset):
+        """Le o cursor de ``_encode_cursor``; ``ValueError`` se nao for desta listagem."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(str(cursor).encode("ascii")))
+            if not isinstance(values, list) or len(values) != len(keyset):
+                raise ValueError(cursor)
+            return [convert(value) for (_, convert), value in zip(keyset, values)]
+        except (ValueError, TypeError) as exc:
+            raise ValueError("Cursor de paginação inválido.") from exc
+
+    def _build_page(self, columns, rows, page_size, keyset):
+        """Monta ``{"columns", "rows", "next_cursor"}`` a partir de ate ``page_size + 1`` linhas."""
+        rows = list(rows)
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            positions = [columns.index(column) for column, _ in keyset]
+            next_cursor = self._encode_cursor([rows[-1][i] for i in positions])
+        return {"columns": columns, "rows": rows, "next_cursor": next_cursor}
+
+    def _search_page_query(self, filters, cursor):
+        """``WHERE ... ORDER BY`` (e parametros) de uma pagina da busca, sem o limite de linhas."""
+        clauses, params = self._search_clauses(filters)
+        if cursor is not None:
+            keyset = self._SEARCH_KEYSET
+            clause, values = self._keyset_clause(keyset, self._decode_cursor(cursor, keyset), descending=True)
+            clauses.append(clause)
+            params.extend(values)
+        where = " WHERE 1 = 1" + "".join(f" AND {clause}" for clause in clauses)
+        return where + self._order_by(self._SEARCH_KEYSET, descending=True), params
+
+    def _period_page_query(self, data_inicio, data_fim, cursor):
+        """``WHERE ... ORDER BY`` (e parametros) de uma pagina do relatorio por periodo."""
+        clauses = ["t.data_solic BETWEEN ? AND ?"]
+        params = [data_inicio, data_fim]
+        if cursor is not None:
+            keyset = self._PERIOD_KEYSET
+            clause, values = self._keyset_clause(keyset, self._decode_cursor(cursor, keyset))
+            clauses.append(clause)
+            params.extend(values)
+        return " WHERE " + " AND ".join(clauses) + self._order_by(self._PERIOD_KEYSET), params
+
+    def _json_ids(self, talao_ids):
+        """Lista de ids em JSON, parametro unico das operacoes em lote (``OPENJSON``/``json_each``)."""
+        return json.dumps(sorted({int(talao_id) for talao_id in talao_ids}))
+
+    def _raise_update_failure(self, reason):
+        """Converte o codigo de resultado de ``update_talao`` na excecao correspondente."""
+        if reason == UPDATE_OK:
+            return
+        if reason == UPDATE_NOT_FOUND:
+            raise DatabaseError("Talão não encontrado para atualização.")
+        if reason == UPDATE_CLOSED:
+            raise DatabaseError("Talões finalizados ou cancelados não podem ser editados.")
+        if reason == UPDATE_YEAR_CHANGED:
+            raise DatabaseError("Não é permitido alterar o ano do talão na edição.")
+        raise ConcurrencyError("Talão alterado em outro terminal. Recarregue e tente novamente.")
+
+    def _is_unique_key_violation(self, exc):
+        """Identifica se a excecao representa violacao de chave unica."""
+        message = str(exc).lower()
+        return "uq_taloes_ano_talao" in message or "unique" in message or "2601" in message or "2627" in message
+
+    def _env_number(self, key, default, cast=int):
+        """Le variavel numerica do ambiente, usando o padrao quando invalida."""
+        return get_env_number(key, default, cast)
+
+    def _configure_alert_claims(self, terminal_id=None, lease_seconds=None):
+        """Define a identificacao deste terminal e a duracao das reservas de alerta.
+
+        ``AFIS_TERMINAL_ID`` (padrao ``host:pid``) identifica o dono da
+        reserva; ``ALERT_LEASE_SECONDS`` e o prazo para responder ao alerta
+        antes que outro terminal possa assumi-lo.
+        """
+        if terminal_id is None:
+            terminal_id = get_env("AFIS_TERMINAL_ID") or f"{socket.gethostname()}:{os.getpid()}"
+        self.terminal_id = str(terminal_id)[:64]
+        if lease_seconds is None:
+            lease_seconds = self._env_number("ALERT_LEASE_SECONDS", 120)
+        self.alert_lease_seconds = max(1, int(lease_seconds))
+
+    def _iter_batches(self, cur, batch_size):
+        """Gera lotes de ``fetchmany`` ate esgotar o cursor."""
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                return
+            yield batch
+
+    def _check_restore_policy(self, policy):
+        """Valida a politica de conflito da restauracao."""
+        if policy not in RESTORE_POLICIES:
+            raise ValueError(f"Política de restauração inválida: {policy!r}.")
+
+    def _restore_lookup(self, cur, table, rows):
+        """Taloes ja gravados que colidem com o lote por ``(ano, talao)`` ou por id.
+
+        Usa faixas (``BETWEEN``) por ano e de ids, pois o backup vem ordenado
+        por id e cada lote costuma cobrir uma faixa continua.
+        """
+        by_key, by_id = {}, {}
+        faixas = {}
+        for row in rows:
+            menor, maior = faixas.get(row[1], (row[2], row[2]))
+            faixas[row[1]] = (min(menor, row[2]), max(maior, row[2]))
+        consultas = [
+            (f"SELECT id, ano, talao FROM {table} WHERE ano = ? AND talao BETWEEN ? AND ?", (ano, menor, maior))
+            for ano, (menor, maior) in faixas.items()
+        ]
+        ids = [row[0] for row in rows]
+        consultas.append((f"SELECT id, ano, talao FROM {table} WHERE id BETWEEN ? AND ?", (min(ids), max(ids))))
+        for query, params in consultas:
+            cur.execute(query, params)
+            for talao_id, ano, talao in cur.fetchall():
+                by_key[(ano, talao)] = talao_id
+                by_id[talao_id] = (ano, talao)
+        return by_key, by_id
+
+    def _restore_plan(self, rows, by_key, by_id, policy):
+        """Separa o lote de taloes em (linhas a inserir, ids a excluir, ids do backup ignorados)."""
+        inserir, excluir, ignorados, conflitos = [], [], set(), []
+        for row in rows:
+            talao_id, ano, talao = row[0], row[1], row[2]
+            atual = by_key.get((ano, talao))
+            if atual is not None:
+                if policy == RESTORE_SKIP:
+                    ignorados.add(talao_id)
+                    continue
+                if policy == RESTORE_FAIL:
+                    conflitos.append(f"{talao:04d}/{ano}")
+                    continue
+                excluir.append(atual)
+            outro = by_id.get(talao_id)
+            if outro is not None and outro != (ano, talao):
+                raise RestoreConflictError(
+                    f"O id {talao_id} do talão {talao:04d}/{ano} já pertence ao talão "
+                    f"{outro[1]:04d}/{outro[0]} neste banco. Restaure em um banco vazio ou no banco de origem."
+                )
+            inserir.append(row)
+        if conflitos:
+            raise RestoreConflictError(
+                f"{len(conflitos)} talão(ões) do backup já existem no banco (ex.: {', '.join(conflitos[:5])}). "
+                "Use a política skip ou overwrite."
+            )
+        return inserir, excluir, ignorados
+
+    def _build_talao_blocks(self, block_size=None):
+        """Cria cache de reserva em bloco (``TALAO_BLOCK_SIZE``); None = numeracao sem lacunas."""
+        if block_size is None:
+            block_size = self._env_number("TALAO_BLOCK_SIZE", 1)
+        return TalaoBlockCache(block_size) if block_size > 1 else None
+
+    @abstractmethod
+    def _reserve_talao_block(self, ano, quantidade):
+        """Reserva ``quantidade`` numeros do contador em transacao propria; retorna o primeiro."""
+
+    def _take_reserved_talao(self, ano):
+        """Retorna numero do bloco deste terminal, reservando novo bloco se preciso.
+
+        Sem reserva em bloco retorna None e o numero e alocado dentro da
+        transacao de insercao (sem lacunas).
+        """
+        if self.talao_blocks is None:
+            return None
+        numero = self.talao_blocks.take(ano)
+        if numero is None:
+            primeiro = self._reserve_talao_block(ano, self.talao_blocks.block_size)
+            numero = self.talao_blocks.add_block(ano, primeiro)
+        return numero
+
+    def _release_reserved_talao(self, ano, numero, exc):
+        """Devolve ao bloco o numero cuja insercao falhou por motivo diferente de duplicidade."""
+        if self.talao_blocks is not None and numero is not None and not self._is_unique_key_violation(exc):
+            self.talao_blocks.give_back(ano, numero)
+
+    def _build_grid_changes(self, rows, removed_ids, watermark, latest_id, full=False):
+        """Monta o retorno de ``list_initial_taloes_changes``.
+
+        Em atualizacao incremental cada linha traz a coluna extra ``visivel``;
+        as que sairam da janela da grade vao para ``removed_ids``.
+        """
+        removed = list(removed_ids)
+        if full:
+            visible = [tuple(row) for row in rows]
+        else:
+            visible = []
+            for row in rows:
+                if row[-1]:
+                    visible.append(tuple(row[:-1]))
+                else:
+                    removed.append(row[0])
+        return {
+            "full": full,
+            "rows": visible,
+            "removed_ids": removed,
+            "watermark": watermark,
+            "latest_id": latest_id,
+        }
+
+    def _build_dashboard_snapshot(self, changes, ano, next_talao, monitored, due_alerts):
+        """Acrescenta ao retorno de ``_build_grid_changes`` o proximo talao e os contadores.
+
+        Com bloco de numeros reservado pelo terminal, o proximo talao e o do
+        bloco, como em ``get_next_talao``.
+        """
+        if self.talao_blocks is not None and self.talao_blocks.peek(ano) is not None:
+            next_talao = self.talao_blocks.peek(ano)
+        changes.update(
+            ano=ano,
+            next_talao=self._to_int(next_talao, "próximo talão"),
+            monitored=int(monitored or 0),
+            due_alerts=int(due_alerts or 0),
+        )
+        return changes
+
+    def _finalize_targets(self, records):
+        """Retorna ``(id, versao)`` de cada registro de ``finalize_many``.
+
+        A versao e obrigatoria: sem ela o lote finalizaria um talao editado
+        em outro terminal depois da leitura.
+        """
+        alvos = []
+        for record in records:
+            if record.get("versao") is None:
+                raise ValueError(f"Talão {record.get('id')} sem versão para a finalização em lote.")
+            alvos.append((int(record["id"]), record["versao"]))
+        return alvos
+
+    @abstractmethod
+    def _prefix_clause(self, column, value):
+        """Retorna (sql, parametros) de comparacao por prefixo indexavel."""
+
+    @abstractmethod
+    def _contains_clause(self, column, value):
+        """Retorna (sql, parametros) de comparacao por trecho (varredura)."""
+
+    def _search_clauses(self, filters):
+        """Monta as condicoes da busca combinada; retorna (clausulas, parametros).
+
+        Todas as condicoes sao indexaveis: data vira faixa semiaberta, boletim
+        completo com sufixo vira igualdade e os textos comparam por prefixo
+        nas colunas ``<campo>_busca``. ``modo_texto=contem`` mantem a busca
+        por trecho em qualquer posicao, que exige varredura da tabela.
+        """
+        clauses = []
+        params = []
+
+        def _add(clause, values):
+            clauses.append(clause)
+            params.extend(values)
+
+        # Talão pode vir isolado (apenas número) ou combinado com ano.
+        if filters.get("ano") is not None:
+            _add("t.ano = ?", [filters["ano"]])
+        if filters.get("talao_num") is not None:
+            _add("t.talao = ?", [filters["talao_num"]])
+
+        data_inicio = filters.get("data_inicio")
+        data_fim = filters.get("data_fim")
+        if filters.get("data_solic") is not None:
+            data_inicio = data_fim = filters["data_solic"]
+        if data_inicio is not None:
+            _add("t.data_solic >= ?", [self._parse_required_date(data_inicio, "Data inicial")])
+        if data_fim is not None:
+            _add("t.data_solic < ?", [self._parse_required_date(data_fim, "Data final") + timedelta(days=1)])
+
+        contains = filters.get("modo_texto") == SEARCH_MODE_CONTAINS
+        match_clause = self._contains_clause if contains else self._prefix_clause
+
+        boletim = str(filters.get("boletim") or "").strip().upper()
+        if boletim:
+            match = BOLETIM_PATTERN.fullmatch(boletim)
+            if not contains and match and match.group(3):
+                _add("t.boletim = ?", [boletim])
+            else:
+                _add(*match_clause("t.boletim", boletim))
+
+        for field in SEARCH_TEXT_FIELDS:
+            value = normalize_search_text(filters.get(field))
+            if value:
+                _add(*match_clause(f"t.{field}_busca", value))
+
+        return clauses, params
+
+
+class SQLServerRepository(RepositoryBase):
     """Repositorio SQL Server com operacoes de talao e monitoramento."""
 
     def __init__(self):
-        """Inicializa conexao e valida presenca do schema obrigatorio."""
+        """Inicializa pool de conexoes e valida presenca do schema obrigatorio."""
         self.connection_string = self._build_connection_string()
+        self.pool = self._build_pool()
+        self.talao_blocks = self._build_talao_blocks()
+        self._configure_alert_claims()
         self.ensure_schema_is_ready()
 
     def _build_connection_string(self):
@@ -83,14 +578,56 @@ class SQLServerRepository:
         logger.warning("Valor inválido para flag booleana (%r). Usando 'no'.", value)
         return "no"
 
-    def _connect(self):
+    def _build_pool(self):
+        """Cria pool de conexoes configurado pelas variaveis DB_POOL_*."""
+        validate = self._to_yes_no(get_env("DB_POOL_VALIDATE", default="yes")) == "yes"
+        return ConnectionPool(
+            self._open_connection,
+            max_size=max(1, self._env_number("DB_POOL_MAX_SIZE", 4)),
+            idle_timeout=self._env_number("DB_POOL_IDLE_TIMEOUT", 300.0, float),
+            acquire_timeout=self._env_number("DB_POOL_ACQUIRE_TIMEOUT", 30.0, float),
+            validate=self._validate_connection if validate else None,
+            validate_idle_after=self._env_number("DB_POOL_VALIDATE_AFTER", 5.0, float),
+            reset=self._reset_connection,
+        )
+
+    def _open_connection(self):
         """Abre conexao pyodbc com autocommit desativado."""
         if pyodbc is None:
             raise DatabaseError("pyodbc não está instalado.")
         return pyodbc.connect(self.connection_string, autocommit=False)
 
+    def _validate_connection(self, conn):
+        """Confere se a conexao emprestada do pool segue utilizavel."""
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        finally:
+            cur.close()
+
+    def _reset_connection(self, conn):
+        """Desfaz transacao pendente antes de devolver a conexao ao pool."""
+        conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+
+    @contextmanager
+    def _borrow_connection(self):
+        """Empresta conexao do pool; escritas precisam chamar commit explicitamente."""
+        with self.pool.connection() as conn:
+            yield conn
+
+    def pool_stats(self):
+        """Retorna estatisticas de uso do pool de conexoes."""
+        return self.pool.stats()
+
+    def close(self):
+        """Fecha as conexoes ociosas mantidas pelo pool."""
+        self.pool.close()
+
     def ensure_schema_is_ready(self):
-        """Confere a existencia das tabelas principais antes do uso."""
+        """Confere as tabelas principais e aplica/verifica migracoes pendentes."""
         with self._connect() as conn:
             cur = conn.cursor()
             cur.execute(
@@ -109,84 +646,95 @@ class SQLServerRepository:
                     "Schema ausente no banco. Execute o arquivo bd_scripts/schema_afis.sql antes de iniciar o app. "
                     f"Tabelas faltantes: {missing_sorted}."
                 )
+            conn.commit()
+            auto_apply = self._to_yes_no(get_env("DB_AUTO_MIGRATE", default="yes")) == "yes"
+            try:
+                apply_migrations(conn, SQLSERVER, auto_apply=auto_apply)
+            except MigrationError as exc:
+                raise DatabaseError(str(exc)) from exc
 
     def get_next_talao(self, ano):
-        """Retorna o proximo numero de talao para um ano."""
+        """Retorna o proximo numero de talao para um ano (leitura pontual do contador)."""
+        if self.talao_blocks is not None and self.talao_blocks.peek(ano) is not None:
+            return self.talao_blocks.peek(ano)
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT ISNULL(MAX(talao), 0) + 1 FROM dbo.taloes WHERE ano = ?", ano)
+            cur.execute(
+                """
+                SELECT ISNULL(
+                    (SELECT proximo FROM dbo.talao_contador WHERE ano = ?),
+                    (SELECT ISNULL(MAX(talao), 0) + 1 FROM dbo.taloes WHERE ano = ?)
+                );
+                """,
+                ano,
+                ano,
+            )
             row = cur.fetchone()
             return self._to_int(row[0] if row else None, "próximo talão")
 
-    def _to_int(self, value, context):
-        """Converte valor para int com mensagem de erro contextualizada."""
-        if value is None:
-            raise DatabaseError(f"Valor nulo retornado para {context}.")
-        try:
-            return int(value)
-        except (TypeError, ValueError) as exc:
-            raise DatabaseError(f"Valor inválido para {context}: {value!r}") from exc
+    def _reserve_talao_numbers(self, cur, ano, quantidade):
+        """Avanca o contador do ano em ``quantidade`` e retorna o primeiro numero reservado.
 
-    def _parse_required_date(self, value, field_name):
-        """Converte data obrigatoria no formato AAAA-MM-DD."""
-        if value is None or str(value).strip() == "":
-            raise DatabaseError(f"Campo {field_name} vazio.")
-        return datetime.strptime(str(value), "%Y-%m-%d").date()
-
-    def _parse_optional_date(self, value):
-        """Converte data opcional no formato AAAA-MM-DD."""
-        if value is None or str(value).strip() == "":
-            return None
-        return datetime.strptime(str(value), "%Y-%m-%d").date()
+        A linha do ano e criada na primeira insercao, a partir do maior talao
+        existente. O UPDATE bloqueia apenas a linha do contador (sem o lock de
+        faixa do antigo MAX(talao) com UPDLOCK, HOLDLOCK em dbo.taloes).
+        """
+        cur.execute(
+            """
+            IF NOT EXISTS (SELECT 1 FROM dbo.talao_contador WITH (UPDLOCK, HOLDLOCK) WHERE ano = ?)
+                INSERT INTO dbo.talao_contador (ano, proximo)
+                SELECT ?, ISNULL(MAX(talao), 0) + 1 FROM dbo.taloes WHERE ano = ?;
+            """,
+            ano,
+            ano,
+            ano,
+        )
+        cur.execute(
+            "UPDATE dbo.talao_contador SET proximo = proximo + ? OUTPUT DELETED.proximo WHERE ano = ?;",
+            quantidade,
+            ano,
+        )
+        row = cur.fetchone()
+        return self._to_int(row[0] if row else None, "sequencia do talao")
 
-    def _parse_required_time(self, value, field_name):
-        """Converte hora obrigatoria no formato HH:MM."""
-        if value is None or str(value).strip() == "":
-            raise DatabaseError(f"Campo {field_name} vazio.")
-        return datetime.strptime(str(value), "%H:%M").time()
+    def _reserve_talao_block(self, ano, quantidade):
+        """Reserva bloco de numeros em transacao curta e independente da insercao."""
+        with self._connect() as conn:
+            primeiro = self._reserve_talao_numbers(conn.cursor(), ano, quantidade)
+            conn.commit()
+            return primeiro
 
-    def _nullable_text(self, value):
-        """Normaliza string para None quando vazia."""
-        if value is None:
-            return None
-        txt = str(value).strip()
-        return txt if txt else None
+    def _resync_talao_counter(self, conn, ano):
+        """Adianta o contador para depois do maior talao gravado (ex.: apos restauracao manual)."""
+        conn.rollback()
+        self._advance_talao_counter(conn.cursor(), ano)
+        conn.commit()
 
-    def _build_db_payload(self, data):
-        """Monta payload normalizado para escrita no banco."""
-        data_solic = self._parse_required_date(data.get("data_solic"), "data_solic")
-        hora_solic = self._parse_required_time(data.get("hora_solic"), "hora_solic")
-        return {
-            "ano": data_solic.year,
-            "data_solic": data_solic,
-            "hora_solic": hora_solic,
-            "delegacia": str(data["delegacia"]).strip(),
-            "autoridade": str(data["autoridade"]).strip(),
-            "solicitante": str(data["solicitante"]).strip(),
-            "endereco": str(data["endereco"]).strip(),
-            "boletim": self._nullable_text(data.get("boletim")),
-            "natureza": self._nullable_text(data.get("natureza")),
-            "data_bo": self._parse_optional_date(data.get("data_bo")),
-            "vitimas": self._nullable_text(data.get("vitimas")),
-            "equipe": self._nullable_text(data.get("equipe")),
-            "operador": str(data["operador"]).strip(),
-            "status": str(data["status"]).strip(),
-            "observacao": self._nullable_text(data.get("observacao")),
-        }
+    def _advance_talao_counter(self, cur, ano):
+        """Leva o contador do ano para depois do maior talao gravado, sem recua-lo."""
+        cur.execute(
+            """
+            UPDATE c SET proximo = m.proximo
+            FROM dbo.talao_contador c
+            CROSS APPLY (SELECT ISNULL(MAX(talao), 0) + 1 AS proximo FROM dbo.taloes WHERE ano = c.ano) m
+            WHERE c.ano = ? AND c.proximo < m.proximo;
+            """,
+            ano,
+        )
 
     def insert_talao(self, data, intervalo_min):
         """Insere um talao e sincroniza o monitoramento inicial."""
         payload = self._build_db_payload(data)
         ano = payload["ano"]
+        numero_reservado = self._take_reserved_talao(ano)
 
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute(
-                "SELECT ISNULL(MAX(talao), 0) + 1 FROM dbo.taloes WITH (UPDLOCK, HOLDLOCK) WHERE ano = ?",
-                ano,
-            )
-            row = cur.fetchone()
-            proximo_talao = self._to_int(row[0] if row else None, "sequencia do talao")
+            if numero_reservado is not None:
+                proximo_talao = numero_reservado
+            else:
+                # Sem reserva em bloco: o numero sai na mesma transacao (sem lacunas).
+                proximo_talao = self._reserve_talao_numbers(cur, ano, 1)
 
             try:
                 cur.execute(
@@ -216,7 +764,10 @@ class SQLServerRepository:
                     payload["observacao"],
                 )
             except Exception as exc:
+                self._release_reserved_talao(ano, numero_reservado, exc)
                 if self._is_unique_key_violation(exc):
+                    # Contador atras dos dados (carga externa); corrige para a proxima tentativa.
+                    self._resync_talao_counter(conn, ano)
                     raise DuplicateTalaoError(
                         "Outro terminal inseriu este número de talão antes. Atualize a tela e tente novamente."
                     ) from exc
@@ -228,25 +779,67 @@ class SQLServerRepository:
             conn.commit()
             return proximo_talao
 
-    def update_talao(self, talao_id, data, intervalo_min, expected_updated_at=None):
-        """Atualiza dados de um talao com validacoes de integridade e concorrencia."""
-        payload = self._build_db_payload(data)
-        novo_ano = payload["ano"]
+    def update_talao(self, talao_id, data, intervalo_min, expected_version=None):
+        """Atualiza dados de um talao com validacoes de integridade e concorrencia.
 
+        Um unico lote: o ``UPDATE`` so casa com talao aberto, do mesmo ano e,
+        com ``expected_version``, na mesma versao de linha (comparacao exata
+        de ``rowversion``, enviado como texto ``0x...``; ver
+        ``_rowversion_param``). O ``OUTPUT`` indica se a linha foi alterada;
+        o monitoramento e sincronizado no mesmo lote e, sem alteracao, o lote
+        devolve o motivo (``UPDATE_*``), convertido em ``DatabaseError`` ou
+        ``ConcurrencyError``.
+        """
+        payload = self._build_db_payload(data)
+        where_clause = (
+            f"WHERE id = @talao_id AND ano = @ano AND status NOT IN ('{STATUS_FINALIZADO}', '{STATUS_CANCELADO}')"
+        )
+        if expected_version is not None:
+            where_clause += " AND versao = @versao"
+        query = f"""
+        SET NOCOUNT ON;
+        DECLARE @talao_id INT = ?, @ano INT = ?, @intervalo INT = ?, @versao BINARY(8) = CONVERT(BINARY(8), ?, 1);
+        DECLARE @alterado TABLE (id INT);
+        UPDATE dbo.taloes
+        SET data_solic = ?,
+            hora_solic = ?,
+            delegacia = ?,
+            autoridade = ?,
+            solicitante = ?,
+            endereco = ?,
+            boletim = ?,
+            natureza = ?,
+            data_bo = ?,
+            vitimas = ?,
+            equipe = ?,
+            operador = ?,
+            status = ?,
+            observacao = ?,
+            atualizado_em = SYSUTCDATETIME()
+        OUTPUT inserted.id INTO @alterado
+        {where_clause};
+        IF EXISTS (SELECT 1 FROM @alterado)
+        BEGIN
+            {self._monitoramento_sync_sql(payload["status"])}
+        END;
+        SELECT CASE
+            WHEN EXISTS (SELECT 1 FROM @alterado) THEN {UPDATE_OK}
+            WHEN t.id IS NULL THEN {UPDATE_NOT_FOUND}
+            WHEN t.status IN ('{STATUS_FINALIZADO}', '{STATUS_CANCELADO}') THEN {UPDATE_CLOSED}
+            WHEN t.ano <> @ano THEN {UPDATE_YEAR_CHANGED}
+            ELSE {UPDATE_CONFLICT}
+        END
+        FROM (SELECT @talao_id AS id) alvo
+        LEFT JOIN dbo.taloes t ON t.id = alvo.id;
+        """
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT ano, status FROM dbo.taloes WHERE id = ?", talao_id)
-            row = cur.fetchone()
-            if not row:
-                raise DatabaseError("Talão não encontrado para atualização.")
-            ano_atual = self._to_int(row[0], "ano atual do talão")
-            status_atual = str(row[1]).strip().upper() if len(row) > 1 and row[1] is not None else ""
-            if status_atual in (STATUS_FINALIZADO, STATUS_CANCELADO):
-                raise DatabaseError("Talões finalizados ou cancelados não podem ser editados.")
-            if novo_ano != ano_atual:
-                raise DatabaseError("Não é permitido alterar o ano do talão na edição.")
-
-            params = [
+            cur.execute(
+                query,
+                talao_id,
+                payload["ano"],
+                intervalo_min,
+                self._rowversion_param(expected_version),
                 payload["data_solic"],
                 payload["hora_solic"],
                 payload["delegacia"],
@@ -261,74 +854,40 @@ class SQLServerRepository:
                 payload["operador"],
                 payload["status"],
                 payload["observacao"],
-                talao_id,
-            ]
-            where_clause = "WHERE id = ?"
-            if expected_updated_at is not None:
-                where_clause += " AND ABS(DATEDIFF_BIG(NANOSECOND, atualizado_em, ?)) <= 1000"
-                params.append(expected_updated_at)
-
-            cur.execute(
-                f"""
-                UPDATE dbo.taloes
-                SET data_solic = ?,
-                    hora_solic = ?,
-                    delegacia = ?,
-                    autoridade = ?,
-                    solicitante = ?,
-                    endereco = ?,
-                    boletim = ?,
-                    natureza = ?,
-                    data_bo = ?,
-                    vitimas = ?,
-                    equipe = ?,
-                    operador = ?,
-                    status = ?,
-                    observacao = ?,
-                    atualizado_em = SYSUTCDATETIME()
-                {where_clause}
-                """,
-                *params,
             )
-            if cur.rowcount == 0:
-                raise ConcurrencyError("Talão alterado em outro terminal. Recarregue e tente novamente.")
-            self._sync_monitoramento(cur, talao_id, payload["status"], intervalo_min)
+            reason = cur.fetchone()[0]
+            self._raise_update_failure(reason)
             conn.commit()
 
-    def _is_unique_key_violation(self, exc):
-        """Identifica se a excecao representa violacao de chave unica."""
-        message = str(exc).lower()
-        return "uq_taloes_ano_talao" in message or "unique" in message or "2601" in message or "2627" in message
+    def _monitoramento_sync_sql(self, status):
+        """SQL que cria/atualiza ou remove o monitoramento de ``@talao_id`` (intervalo em ``@intervalo``)."""
+        if status == STATUS_MONITORADO:
+            return """
+            MERGE dbo.monitoramento AS destino
+            USING (SELECT @talao_id AS talao_id) AS origem
+            ON destino.talao_id = origem.talao_id
+            WHEN MATCHED THEN
+                UPDATE SET proximo_alerta = DATEADD(MINUTE, @intervalo, SYSUTCDATETIME()), intervalo_min = @intervalo,
+                    claimed_by = NULL, lease_until = NULL
+            WHEN NOT MATCHED THEN
+                INSERT (talao_id, proximo_alerta, intervalo_min)
+                VALUES (@talao_id, DATEADD(MINUTE, @intervalo, SYSUTCDATETIME()), @intervalo);
+            """
+        return "DELETE FROM dbo.monitoramento WHERE talao_id = @talao_id;"
 
     def _sync_monitoramento(self, cur, talao_id, status, intervalo_min):
         """Cria/atualiza ou remove monitoramento conforme status do talao."""
-        if status == STATUS_MONITORADO:
-            cur.execute(
-                """
-                MERGE dbo.monitoramento AS destino
-                USING (SELECT ? AS talao_id) AS origem
-                ON destino.talao_id = origem.talao_id
-                WHEN MATCHED THEN
-                    UPDATE SET proximo_alerta = DATEADD(MINUTE, ?, SYSUTCDATETIME()), intervalo_min = ?
-                WHEN NOT MATCHED THEN
-                    INSERT (talao_id, proximo_alerta, intervalo_min)
-                    VALUES (?, DATEADD(MINUTE, ?, SYSUTCDATETIME()), ?);
-                """,
-                talao_id,
-                intervalo_min,
-                intervalo_min,
-                talao_id,
-                intervalo_min,
-                intervalo_min,
-            )
-        else:
-            cur.execute("DELETE FROM dbo.monitoramento WHERE talao_id = ?", talao_id)
+        cur.execute(
+            "DECLARE @talao_id INT = ?, @intervalo INT = ?;" + self._monitoramento_sync_sql(status),
+            talao_id,
+            intervalo_min,
+        )
 
     def get_talao(self, talao_id):
-        """Busca e retorna um talao por ID em formato de dicionario."""
+        """Busca e retorna um talao por ID em formato de dicionario (com ``versao`` para a edicao)."""
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT * FROM dbo.taloes WHERE id = ?", talao_id)
+            cur.execute(self._select_details(("versao",)) + " WHERE t.id = ?", talao_id)
             row = cur.fetchone()
             if not row:
                 return None
@@ -337,31 +896,168 @@ class SQLServerRepository:
 
     def list_initial_taloes(self):
         """Lista taloes para carga inicial da grade principal."""
-        query = """
-        WITH ultimo AS (
-            SELECT TOP 1 id
+        with self._connect() as conn:
+            return self._fetch_initial_taloes(conn.cursor())
+
+    def _fetch_initial_taloes(self, cur):
+        """Executa a consulta da grade inicial no cursor informado."""
+        cur.execute(
+            "DECLARE @data_limite DATE = CAST(DATEADD(DAY, -1, CAST(GETDATE() AS DATE)) AS DATE);"
+            + self._initial_taloes_query()
+        )
+        return cur.fetchall()
+
+    def _initial_taloes_query(self):
+        """SELECT da grade inicial; depende da variavel ``@data_limite`` declarada no lote."""
+        # Cada ramo do UNION usa seu indice: uq_taloes_ano_talao (ultimo),
+        # ix_taloes_monitorados (filtrado) e ix_taloes_data_solic (periodo).
+        # O status vai como literal para o otimizador casar o indice filtrado.
+        return f"""
+        SELECT id, ano, talao, boletim, delegacia, natureza, status
+        FROM (
+            SELECT TOP 1 id, ano, talao, boletim, delegacia, natureza, status
             FROM dbo.taloes
             ORDER BY ano DESC, talao DESC, id DESC
-        ),
-        limite AS (
-            SELECT CAST(DATEADD(DAY, -1, CAST(GETDATE() AS DATE)) AS DATE) AS data_limite
-        )
-        SELECT t.id, t.ano, t.talao, t.boletim, t.delegacia, t.natureza, t.status
-        FROM dbo.taloes t
-        WHERE t.id IN (SELECT id FROM ultimo)
-           OR LOWER(LTRIM(RTRIM(ISNULL(t.status, '')))) = ?
-           OR t.data_solic >= (SELECT data_limite FROM limite)
-        ORDER BY t.ano DESC, t.talao DESC;
+        ) ultimo
+        UNION
+        SELECT id, ano, talao, boletim, delegacia, natureza, status
+        FROM dbo.taloes
+        WHERE status = '{STATUS_MONITORADO}'
+        UNION
+        SELECT id, ano, talao, boletim, delegacia, natureza, status
+        FROM dbo.taloes
+        WHERE data_solic >= @data_limite
+        ORDER BY ano DESC, talao DESC;
+        """
+
+    def list_initial_taloes_changes(self, watermark=None, latest_id=None):
+        """Retorna apenas o que mudou na grade inicial desde ``watermark``.
+
+        A marca d'agua e ``MIN_ACTIVE_ROWVERSION()`` lida antes das consultas:
+        linhas com versao menor ja estao confirmadas, e as demais entram na
+        proxima chamada. Sem ``watermark`` faz a carga completa.
         """
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute(query, STATUS_MONITORADO)
-            return cur.fetchall()
+            cur.execute("SELECT MIN_ACTIVE_ROWVERSION();")
+            novo = cur.fetchone()[0]
+            cur.execute("SELECT TOP 1 id FROM dbo.taloes ORDER BY ano DESC, talao DESC, id DESC;")
+            row = cur.fetchone()
+            ultimo = row[0] if row else None
+            if watermark is None:
+                return self._build_grid_changes(self._fetch_initial_taloes(cur), [], novo, ultimo, full=True)
+
+            # Quando o ultimo talao muda, o antigo e o novo sao rechecados: entram
+            # ou saem da janela sem mudar de versao (ex.: insercao, exclusao).
+            recheck = (latest_id, ultimo) if latest_id != ultimo else (None, None)
+            columns = "id, ano, talao, boletim, delegacia, natureza, status"
+            visivel = f"CASE WHEN id = ? OR status = '{STATUS_MONITORADO}' OR data_solic >= @data_limite THEN 1 ELSE 0 END"
+            cur.execute(
+                f"""
+                DECLARE @data_limite DATE = CAST(DATEADD(DAY, -1, CAST(GETDATE() AS DATE)) AS DATE);
+                SELECT {columns}, {visivel} AS visivel
+                FROM dbo.taloes
+                WHERE versao >= ? AND versao < ?
+                UNION
+                SELECT {columns}, {visivel} AS visivel
+                FROM dbo.taloes
+                WHERE id IN (?, ?);
+                """,
+                ultimo,
+                watermark,
+                novo,
+                ultimo,
+                *recheck,
+            )
+            changed = cur.fetchall()
+            cur.execute(
+                "SELECT talao_id FROM dbo.taloes_excluidos WHERE versao >= ? AND versao < ?;",
+                watermark,
+                novo,
+            )
+            removed = [r[0] for r in cur.fetchall()]
+            return self._build_grid_changes(changed, removed, novo, ultimo)
+
+    def _rowversion_param(self, value):
+        """Converte ``rowversion`` (bytes) em texto ``0x...`` para ``CONVERT(BINARY(8), ?, 1)``.
+
+        O pyodbc envia None como NULL ``varchar``, que o SQL Server nao
+        converte implicitamente para ``BINARY``; com texto e conversao
+        explicita o mesmo parametro serve com ou sem versao.
+        """
+        return None if value is None else "0x" + bytes(value).hex()
 
-    def list_due_monitoring(self):
-        """Lista taloes com alerta vencido no monitoramento."""
-        query = """
-        SELECT m.talao_id, m.intervalo_min, t.ano, t.talao, t.boletim, t.status
+    def get_dashboard_snapshot(self, ano, watermark=None, latest_id=None):
+        """Retorna grade, proximo talao e contadores do dashboard em um unico lote.
+
+        Um so ``execute`` com varios conjuntos de resultado (lidos com
+        ``nextset``): cabecalho com marca d'agua, ultimo talao e contadores;
+        linhas da grade (completa ou alteradas, como em
+        ``list_initial_taloes_changes``); e, na atualizacao incremental, os
+        ids excluidos. A marca d'agua e lida no inicio do lote.
+        """
+        header = f"""
+        SET NOCOUNT ON;
+        DECLARE @data_limite DATE = CAST(DATEADD(DAY, -1, CAST(GETDATE() AS DATE)) AS DATE);
+        DECLARE @novo BINARY(8) = MIN_ACTIVE_ROWVERSION();
+        DECLARE @ultimo INT = (SELECT TOP 1 id FROM dbo.taloes ORDER BY ano DESC, talao DESC, id DESC);
+        DECLARE @ano INT = ?, @watermark BINARY(8) = CONVERT(BINARY(8), ?, 1), @anterior INT = ?;
+        SELECT
+            @novo,
+            @ultimo,
+            ISNULL(
+                (SELECT proximo FROM dbo.talao_contador WHERE ano = @ano),
+                (SELECT ISNULL(MAX(talao), 0) + 1 FROM dbo.taloes WHERE ano = @ano)
+            ),
+            (SELECT COUNT(*) FROM dbo.taloes WHERE status = '{STATUS_MONITORADO}'),
+            (
+                SELECT COUNT(*)
+                FROM dbo.monitoramento m
+                INNER JOIN dbo.taloes t ON t.id = m.talao_id
+                WHERE t.status = '{STATUS_MONITORADO}' AND m.proximo_alerta <= SYSUTCDATETIME()
+            );
+        """
+        if watermark is None:
+            query = header + self._initial_taloes_query()
+        else:
+            # Mesmas regras de list_initial_taloes_changes, com as variaveis do lote.
+            columns = "id, ano, talao, boletim, delegacia, natureza, status"
+            visivel = (
+                f"CASE WHEN id = @ultimo OR status = '{STATUS_MONITORADO}' "
+                "OR data_solic >= @data_limite THEN 1 ELSE 0 END"
+            )
+            query = header + f"""
+            SELECT {columns}, {visivel} AS visivel
+            FROM dbo.taloes
+            WHERE versao >= @watermark AND versao < @novo
+            UNION
+            SELECT {columns}, {visivel} AS visivel
+            FROM dbo.taloes
+            WHERE ISNULL(@anterior, 0) <> ISNULL(@ultimo, 0) AND id IN (@anterior, @ultimo);
+            SELECT talao_id FROM dbo.taloes_excluidos WHERE versao >= @watermark AND versao < @novo;
+            """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(query, ano, self._rowversion_param(watermark), latest_id)
+            novo, ultimo, proximo, monitorados, vencidos = cur.fetchone()
+            cur.nextset()
+            rows = cur.fetchall()
+            removed = []
+            if watermark is not None:
+                cur.nextset()
+                removed = [r[0] for r in cur.fetchall()]
+        changes = self._build_grid_changes(rows, removed, novo, ultimo, full=watermark is None)
+        return self._build_dashboard_snapshot(changes, ano, proximo, monitorados, vencidos)
+
+    def list_due_monitoring(self, with_records=False):
+        """Lista taloes com alerta vencido no monitoramento.
+
+        Por padrao, linhas ``(talao_id, intervalo_min, ano, talao, boletim,
+        status)``; com ``with_records``, dicionarios com todas as colunas de
+        ``get_talao`` (inclusive ``versao``) mais ``intervalo_min``.
+        """
+        query = f"""
+        SELECT {self._due_monitoring_columns(with_records)}
         FROM dbo.monitoramento m
         INNER JOIN dbo.taloes t ON t.id = m.talao_id
         WHERE m.proximo_alerta <= SYSUTCDATETIME()
@@ -371,7 +1067,96 @@ class SQLServerRepository:
         with self._connect() as conn:
             cur = conn.cursor()
             cur.execute(query)
-            return cur.fetchall()
+            return self._due_monitoring_rows(cur.fetchall(), with_records)
+
+    def claim_due_monitoring(self, limit=1, with_records=False):
+        """Reserva para este terminal ate ``limit`` alertas vencidos e livres.
+
+        ``UPDATE ... OUTPUT`` com ``UPDLOCK, READPAST`` faz a reserva de forma
+        atomica: terminais concorrentes pulam linhas travadas e nao recebem o
+        mesmo alerta enquanto ``lease_until`` estiver valido. Retorna linhas no
+        formato de ``list_due_monitoring``.
+        """
+        query = f"""
+        UPDATE m
+        SET claimed_by = ?, lease_until = DATEADD(SECOND, ?, SYSUTCDATETIME())
+        OUTPUT inserted.proximo_alerta, {self._due_monitoring_columns(with_records, "inserted")}
+        FROM dbo.monitoramento m
+        INNER JOIN dbo.taloes t ON t.id = m.talao_id
+        WHERE m.talao_id IN (
+            SELECT TOP (?) m2.talao_id
+            FROM dbo.monitoramento m2 WITH (UPDLOCK, READPAST, ROWLOCK)
+            INNER JOIN dbo.taloes t2 ON t2.id = m2.talao_id
+            WHERE t2.status = '{STATUS_MONITORADO}'
+              AND m2.proximo_alerta <= SYSUTCDATETIME()
+              AND (m2.lease_until IS NULL OR m2.lease_until <= SYSUTCDATETIME() OR m2.claimed_by = ?)
+            ORDER BY m2.proximo_alerta ASC
+        );
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(query, self.terminal_id, self.alert_lease_seconds, limit, self.terminal_id)
+            rows = cur.fetchall()
+            conn.commit()
+        rows = [tuple(row[1:]) for row in sorted(rows, key=lambda row: row[0])]
+        return self._due_monitoring_rows(rows, with_records)
+
+    def renew_monitoring_claim(self, talao_id):
+        """Prorroga a reserva deste terminal; False se ela ja foi perdida."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE dbo.monitoramento
+                SET lease_until = DATEADD(SECOND, ?, SYSUTCDATETIME())
+                WHERE talao_id = ? AND claimed_by = ?
+                """,
+                self.alert_lease_seconds,
+                talao_id,
+                self.terminal_id,
+            )
+            renewed = cur.rowcount == 1
+            conn.commit()
+            return renewed
+
+    def release_monitoring_claim(self, talao_id):
+        """Libera a reserva deste terminal sem alterar o proximo alerta."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE dbo.monitoramento
+                SET claimed_by = NULL, lease_until = NULL
+                WHERE talao_id = ? AND claimed_by = ?
+                """,
+                talao_id,
+                self.terminal_id,
+            )
+            conn.commit()
+
+    def list_monitoring_schedule(self):
+        """Lista (talao_id, segundos ate o proximo alerta) dos taloes monitorados.
+
+        Os segundos sao calculados no servidor, o que dispensa relogios
+        sincronizados entre terminais e banco. Alerta reservado por um
+        terminal so volta a vencer quando a reserva expira.
+        """
+        query = f"""
+        SELECT
+            m.talao_id,
+            DATEDIFF_BIG(
+                MILLISECOND,
+                SYSUTCDATETIME(),
+                CASE WHEN m.lease_until > m.proximo_alerta THEN m.lease_until ELSE m.proximo_alerta END
+            ) / 1000.0
+        FROM dbo.monitoramento m
+        INNER JOIN dbo.taloes t ON t.id = m.talao_id
+        WHERE t.status = '{STATUS_MONITORADO}';
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(query)
+            return [(row[0], float(row[1])) for row in cur.fetchall()]
 
     def get_monitoring_interval(self, talao_id):
         """Retorna intervalo de monitoramento para um talao, quando existir."""
@@ -386,90 +1171,70 @@ class SQLServerRepository:
                 return None
             return self._to_int(row[0], "intervalo de monitoramento")
 
+    def _select_details(self, extra_columns=()):
+        """Retorna clausula SELECT com as colunas detalhadas de talao (mais ``extra_columns``)."""
+        columns = TALAO_DETAIL_COLUMNS + tuple(extra_columns)
+        return "SELECT " + ", ".join(f"t.{col}" for col in columns) + " FROM dbo.taloes t"
+
+    def _period_query(self):
+        """Consulta detalhada de taloes entre duas datas, na ordem dos relatorios."""
+        return (
+            self._select_details()
+            + " WHERE t.data_solic BETWEEN ? AND ? ORDER BY t.data_solic ASC, t.hora_solic ASC, t.id ASC;"
+        )
+
     def list_taloes_by_period(self, data_inicio, data_fim):
         """Retorna dados detalhados de taloes entre duas datas."""
-        query = """
-        SELECT
-            t.id,
-            t.ano,
-            t.talao,
-            t.data_solic,
-            t.hora_solic,
-            t.delegacia,
-            t.autoridade,
-            t.solicitante,
-            t.endereco,
-            t.boletim,
-            t.natureza,
-            t.data_bo,
-            t.vitimas,
-            t.equipe,
-            t.operador,
-            t.status,
-            t.observacao,
-            t.criado_em,
-            t.atualizado_em
-        FROM dbo.taloes t
-        WHERE t.data_solic BETWEEN ? AND ?
-        ORDER BY t.data_solic ASC, t.hora_solic ASC, t.id ASC;
-        """
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute(query, data_inicio, data_fim)
+            cur.execute(self._period_query(), data_inicio, data_fim)
             rows = cur.fetchall()
             columns = [d[0] for d in cur.description]
             return columns, rows
 
-    def search_taloes(self, filters):
-        """Pesquisa taloes por filtros combinados com operador AND."""
-        query = """
-        SELECT
-            t.id,
-            t.ano,
-            t.talao,
-            t.data_solic,
-            t.hora_solic,
-            t.delegacia,
-            t.autoridade,
-            t.solicitante,
-            t.endereco,
-            t.boletim,
-            t.natureza,
-            t.data_bo,
-            t.vitimas,
-            t.equipe,
-            t.operador,
-            t.status,
-            t.observacao,
-            t.criado_em,
-            t.atualizado_em
-        FROM dbo.taloes t
-        WHERE 1 = 1
+    def count_taloes_by_period(self, data_inicio, data_fim):
+        """Conta taloes entre duas datas (indice ``ix_taloes_data_solic``)."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM dbo.taloes WHERE data_solic BETWEEN ? AND ?;", data_inicio, data_fim)
+            return cur.fetchone()[0]
+
+    def list_taloes_by_period_page(self, data_inicio, data_fim, page_size=SEARCH_PAGE_SIZE, cursor=None):
+        """Uma pagina do relatorio por periodo (ordem de ``list_taloes_by_period``), como em ``search_taloes_page``."""
+        where, params = self._period_page_query(data_inicio, data_fim, cursor)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(self._select_details() + where + " OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY;", *params, page_size + 1)
+            columns = [d[0] for d in cur.description]
+            return self._build_page(columns, cur.fetchall(), page_size, self._PERIOD_KEYSET)
+
+    def iter_taloes_by_period(self, data_inicio, data_fim, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de taloes do periodo (colunas ``TALAO_DETAIL_COLUMNS``) sem carregar tudo.
+
+        A conexao fica emprestada do pool ate o gerador terminar ou ser fechado.
         """
-        params = []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(self._period_query(), data_inicio, data_fim)
+            yield from self._iter_batches(cur, batch_size)
 
-        # Talão pode vir isolado (apenas número) ou combinado com ano.
-        ano = filters.get("ano")
-        talao_num = filters.get("talao_num")
-        if ano is not None:
-            query += " AND t.ano = ?"
-            params.append(ano)
-        if talao_num is not None:
-            query += " AND t.talao = ?"
-            params.append(talao_num)
-
-        data_solic = filters.get("data_solic")
-        if data_solic is not None:
-            query += " AND CAST(t.data_solic AS DATE) = ?"
-            params.append(data_solic)
-
-        # Filtros textuais usam LIKE case-insensitive para busca parcial.
-        for field in ("delegacia", "boletim", "equipe", "operador"):
-            value = str(filters.get(field) or "").strip()
-            if value:
-                query += f" AND UPPER(ISNULL(t.{field}, '')) LIKE ?"
-                params.append(f"%{value.upper()}%")
+    def _escape_like(self, value):
+        """Escapa curingas do LIKE (ESCAPE '\\') presentes no texto digitado."""
+        return "".join(f"\\{ch}" if ch in "\\%_[" else ch for ch in value)
+
+    def _prefix_clause(self, column, value):
+        """LIKE 'valor%' vira busca por faixa no indice (colacao CI_AI da coluna)."""
+        return f"{column} LIKE ? ESCAPE '\\'", [self._escape_like(value) + "%"]
+
+    def _contains_clause(self, column, value):
+        """LIKE '%valor%': semantica original, com varredura da tabela."""
+        return f"{column} LIKE ? ESCAPE '\\'", ["%" + self._escape_like(value) + "%"]
 
+    def search_taloes(self, filters):
+        """Pesquisa taloes por filtros combinados com operador AND."""
+        clauses, params = self._search_clauses(filters)
+        query = self._select_details() + " WHERE 1 = 1"
+        query += "".join(f" AND {clause}" for clause in clauses)
         query += " ORDER BY t.ano DESC, t.talao DESC, t.id DESC;"
 
         with self._connect() as conn:
@@ -479,46 +1244,222 @@ class SQLServerRepository:
             columns = [d[0] for d in cur.description]
             return columns, rows
 
+    def search_taloes_page(self, filters, page_size=SEARCH_PAGE_SIZE, cursor=None):
+        """Uma pagina da busca, na ordem de ``search_taloes``.
+
+        Paginacao por chave: ``cursor`` (opaco, de ``next_cursor`` da pagina
+        anterior) vira uma faixa ``(ano, talao, id) < ultima chave`` no
+        indice, entao cada pagina custa o mesmo que a primeira. Retorna
+        ``{"columns", "rows", "next_cursor"}``; ``next_cursor`` e None na
+        ultima pagina.
+        """
+        where, params = self._search_page_query(filters, cursor)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(self._select_details() + where + " OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY;", *params, page_size + 1)
+            columns = [d[0] for d in cur.description]
+            return self._build_page(columns, cur.fetchall(), page_size, self._SEARCH_KEYSET)
+
+    def estimate_search_count(self, filters, cap=SEARCH_COUNT_CAP):
+        """Conta os resultados da busca ate ``cap``; retorna ``(total, exato)``.
+
+        O ``TOP (cap + 1)`` limita o trabalho em filtros amplos: acima do
+        teto a contagem para e ``exato`` e False ("mais de ``cap``").
+        """
+        clauses, params = self._search_clauses(filters)
+        where = "".join(f" AND {clause}" for clause in clauses)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"SELECT COUNT(*) FROM (SELECT TOP (?) 1 AS x FROM dbo.taloes t WHERE 1 = 1{where}) amostra;",
+                cap + 1,
+                *params,
+            )
+            total = cur.fetchone()[0]
+        return min(total, cap), total <= cap
+
+    def _year_query(self):
+        """Consulta de taloes de um ano, na ordem do backup."""
+        return self._select_details() + " WHERE t.ano = ? ORDER BY t.id ASC;"
+
+    def _monitoramento_year_query(self, changed=False):
+        """Consulta de monitoramento dos taloes de um ano, na ordem do backup.
+
+        Com ``changed`` filtra as linhas cuja versao ou a do talao esta em
+        ``[?, ?)`` (parametros repetidos: monitoramento, depois talao).
+        """
+        filtro = " AND ((m.versao >= ? AND m.versao < ?) OR (t.versao >= ? AND t.versao < ?))" if changed else ""
+        return (
+            "SELECT " + ", ".join(f"m.{col}" for col in MONITORAMENTO_BACKUP_COLUMNS)
+            + " FROM dbo.monitoramento m INNER JOIN dbo.taloes t ON t.id = m.talao_id"
+            + " WHERE t.ano = ?" + filtro + " ORDER BY m.id ASC;"
+        )
+
     def list_taloes_by_year(self, ano):
         """Retorna todos os taloes de um ano."""
-        query = """
-        SELECT *
-        FROM dbo.taloes
-        WHERE ano = ?
-        ORDER BY id ASC;
-        """
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute(query, ano)
+            cur.execute(self._year_query(), ano)
             rows = cur.fetchall()
             columns = [d[0] for d in cur.description]
             return columns, rows
 
     def list_monitoramento_by_year(self, ano):
         """Retorna todos os registros de monitoramento de um ano."""
-        query = """
-        SELECT m.*
-        FROM dbo.monitoramento m
-        INNER JOIN dbo.taloes t ON t.id = m.talao_id
-        WHERE t.ano = ?
-        ORDER BY m.id ASC;
-        """
         with self._connect() as conn:
             cur = conn.cursor()
-            cur.execute(query, ano)
+            cur.execute(self._monitoramento_year_query(), ano)
             rows = cur.fetchall()
             columns = [d[0] for d in cur.description]
             return columns, rows
 
+    def iter_taloes_by_year(self, ano, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de taloes do ano (colunas ``TALAO_DETAIL_COLUMNS``)."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(self._year_query(), ano)
+            yield from self._iter_batches(cur, batch_size)
+
+    def iter_monitoramento_by_year(self, ano, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de monitoramento do ano (colunas ``MONITORAMENTO_BACKUP_COLUMNS``)."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(self._monitoramento_year_query(), ano)
+            yield from self._iter_batches(cur, batch_size)
+
+    def _rowversion(self, watermark):
+        """Converte marca d'agua inteira para ``rowversion`` (8 bytes, big-endian)."""
+        return int(watermark).to_bytes(8, "big")
+
+    def get_backup_watermark(self):
+        """Marca d'agua para backup incremental: versoes menores ja estao confirmadas."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT MIN_ACTIVE_ROWVERSION();")
+            return int.from_bytes(cur.fetchone()[0], "big")
+
+    def get_cache_version(self):
+        """Sonda barata de alteracoes para invalidar caches: muda quando qualquer terminal grava.
+
+        ``MIN_ACTIVE_ROWVERSION`` cobre inclusoes, edicoes e exclusoes de
+        taloes (so avanca no commit); o ``CHECKSUM_AGG`` dos intervalos cobre
+        adiamentos de monitoramento, que nao alteram o talao.
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT MIN_ACTIVE_ROWVERSION(), COUNT_BIG(*), CHECKSUM_AGG(CHECKSUM(talao_id, intervalo_min))
+                FROM dbo.monitoramento;
+                """
+            )
+            versao, monitorados, checksum = cur.fetchone()
+            return int.from_bytes(versao, "big"), int(monitorados), checksum
+
+    def iter_taloes_changed(self, ano, since, until, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de taloes do ano com versao em ``[since, until)`` (colunas ``TALAO_DETAIL_COLUMNS``)."""
+        query = self._select_details() + " WHERE t.ano = ? AND t.versao >= ? AND t.versao < ? ORDER BY t.id ASC;"
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(query, ano, self._rowversion(since), self._rowversion(until))
+            yield from self._iter_batches(cur, batch_size)
+
+    def iter_monitoramento_changed(self, ano, since, until, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de monitoramento do ano alterado em ``[since, until)`` (colunas ``MONITORAMENTO_BACKUP_COLUMNS``).
+
+        Entra a linha com versao propria no intervalo (adiamento, reserva) ou
+        cujo talao mudou no intervalo.
+        """
+        desde, ate = self._rowversion(since), self._rowversion(until)
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(self._monitoramento_year_query(changed=True), ano, desde, ate, desde, ate)
+            yield from self._iter_batches(cur, batch_size)
+
+    def list_deleted_talao_ids(self, since, until):
+        """Ids de taloes excluidos com versao em ``[since, until)``."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT DISTINCT talao_id FROM dbo.taloes_excluidos WHERE versao >= ? AND versao < ? ORDER BY talao_id;",
+                self._rowversion(since),
+                self._rowversion(until),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def restore_rows(self, batches, policy=RESTORE_FAIL):
+        """Grava lotes ``(tabela, linhas)`` de um backup em uma unica transacao.
+
+        ``tabela`` e ``"taloes"`` (colunas ``TALAO_DETAIL_COLUMNS``, ids
+        preservados com ``IDENTITY_INSERT``) ou ``"monitoramento"`` (colunas
+        ``MONITORAMENTO_BACKUP_COLUMNS``, id novo, substitui o do mesmo talao) ou ``"excluidos"`` (ids de
+        taloes a excluir, vindos de backup incremental). Cada lote vai em um unico
+        ``executemany`` com ``fast_executemany`` (parametros enviados em bloco).
+        ``policy`` decide o que fazer com taloes ja gravados (mesmo ano + talao):
+        falhar, ignorar ou substituir. Retorna as contagens da restauracao.
+        """
+        self._check_restore_policy(policy)
+        insert_taloes = (
+            f"INSERT INTO dbo.taloes ({', '.join(TALAO_DETAIL_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in TALAO_DETAIL_COLUMNS)});"
+        )
+        insert_monitoramento = (
+            "INSERT INTO dbo.monitoramento (talao_id, proximo_alerta, intervalo_min, criado_em) VALUES (?, ?, ?, ?);"
+        )
+        totais = {"taloes": 0, "monitoramento": 0, "ignorados": 0, "substituidos": 0, "excluidos": 0}
+        ignorados, anos = set(), set()
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.fast_executemany = True
+            for table, rows in batches:
+                if table == "taloes":
+                    inserir, excluir, novos_ignorados = self._restore_plan(
+                        rows, *self._restore_lookup(cur, "dbo.taloes", rows), policy
+                    )
+                    if excluir:
+                        # O monitoramento dos taloes substituidos sai junto (ON DELETE CASCADE).
+                        cur.executemany("DELETE FROM dbo.taloes WHERE id = ?;", [(talao_id,) for talao_id in excluir])
+                    if inserir:
+                        cur.execute("SET IDENTITY_INSERT dbo.taloes ON;")
+                        try:
+                            cur.executemany(insert_taloes, [tuple(row) for row in inserir])
+                        finally:
+                            cur.execute("SET IDENTITY_INSERT dbo.taloes OFF;")
+                    ignorados |= novos_ignorados
+                    anos.update(row[1] for row in inserir)
+                    totais["taloes"] += len(inserir)
+                    totais["ignorados"] += len(novos_ignorados)
+                    totais["substituidos"] += len(excluir)
+                elif table == "monitoramento":
+                    linhas = [tuple(row[1:]) for row in rows if row[1] not in ignorados]
+                    if linhas:
+                        # talao_id e UNIQUE: o monitoramento anterior do talao (adiado no incremental) sai antes.
+                        cur.executemany(
+                            "DELETE FROM dbo.monitoramento WHERE talao_id = ?;", [(row[0],) for row in linhas]
+                        )
+                        cur.executemany(insert_monitoramento, linhas)
+                    totais["monitoramento"] += len(linhas)
+                elif table == "excluidos":
+                    cur.executemany("DELETE FROM dbo.taloes WHERE id = ?;", [tuple(row) for row in rows])
+                    totais["excluidos"] += len(rows)
+                else:
+                    raise ValueError(f"Tabela de backup desconhecida: {table!r}.")
+            for ano in sorted(anos):
+                self._advance_talao_counter(cur, ano)
+            conn.commit()
+        return totais
+
     def postpone_monitoring(self, talao_id, intervalo_min):
-        """Posterga o proximo alerta de monitoramento de um talao."""
+        """Posterga o proximo alerta de monitoramento de um talao e libera a reserva."""
         with self._connect() as conn:
             cur = conn.cursor()
             cur.execute(
                 """
                 UPDATE dbo.monitoramento
                 SET proximo_alerta = DATEADD(MINUTE, ?, SYSUTCDATETIME()),
-                    intervalo_min = ?
+                    intervalo_min = ?,
+                    claimed_by = NULL,
+                    lease_until = NULL
                 WHERE talao_id = ?
                 """,
                 intervalo_min,
@@ -526,3 +1467,122 @@ class SQLServerRepository:
                 talao_id,
             )
             conn.commit()
+
+    def postpone_monitoring_many(self, talao_ids, intervalo_min):
+        """Posterga os alertas de varios taloes em um unico ``UPDATE`` e libera as reservas.
+
+        Os ids vao como um parametro JSON lido por ``OPENJSON``; retorna
+        quantos monitoramentos foram adiados.
+        """
+        if not talao_ids:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE m
+                SET proximo_alerta = DATEADD(MINUTE, ?, SYSUTCDATETIME()),
+                    intervalo_min = ?,
+                    claimed_by = NULL,
+                    lease_until = NULL
+                FROM dbo.monitoramento m
+                INNER JOIN OPENJSON(?) WITH (talao_id INT '$') alvo ON alvo.talao_id = m.talao_id;
+                """,
+                intervalo_min,
+                intervalo_min,
+                self._json_ids(talao_ids),
+            )
+            adiados = cur.rowcount
+            conn.commit()
+            return adiados
+
+    def finalize_many(self, records):
+        """Finaliza de uma vez os taloes monitorados de ``records`` e remove seus monitoramentos.
+
+        ``records`` traz ``id`` e ``versao`` (como em
+        ``claim_due_monitoring(with_records=True)``); so taloes ainda
+        monitorados e na mesma versao sao finalizados, e registro sem
+        ``versao`` gera ``ValueError``. Os dados ja devem ter passado por
+        ``TalaoService.prepare_finalize_from_record``: apenas o status muda.
+        Retorna os ids finalizados; os demais foram alterados em outro
+        terminal.
+        """
+        alvos = [
+            {"id": talao_id, "versao": self._rowversion_param(versao)}
+            for talao_id, versao in self._finalize_targets(records)
+        ]
+        if not alvos:
+            return []
+        query = f"""
+        SET NOCOUNT ON;
+        DECLARE @finalizados TABLE (talao_id INT PRIMARY KEY);
+        UPDATE t
+        SET status = '{STATUS_FINALIZADO}', atualizado_em = SYSUTCDATETIME()
+        OUTPUT inserted.id INTO @finalizados
+        FROM dbo.taloes t
+        INNER JOIN OPENJSON(?) WITH (id INT '$.id', versao VARCHAR(18) '$.versao') alvo ON alvo.id = t.id
+        WHERE t.status = '{STATUS_MONITORADO}'
+          AND t.versao = CONVERT(BINARY(8), alvo.versao, 1);
+        DELETE m
+        FROM dbo.monitoramento m
+        INNER JOIN @finalizados f ON f.talao_id = m.talao_id;
+        SELECT talao_id FROM @finalizados ORDER BY talao_id;
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(query, json.dumps(alvos))
+            finalizados = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            return finalizados
+
+    def renew_monitoring_claims(self, talao_ids):
+        """Prorroga em um so ``UPDATE`` as reservas deste terminal; retorna quantas seguem validas."""
+        if not talao_ids:
+            return 0
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE m
+                SET lease_until = DATEADD(SECOND, ?, SYSUTCDATETIME())
+                FROM dbo.monitoramento m
+                INNER JOIN OPENJSON(?) WITH (talao_id INT '$') alvo ON alvo.talao_id = m.talao_id
+                WHERE m.claimed_by = ?;
+                """,
+                self.alert_lease_seconds,
+                self._json_ids(talao_ids),
+                self.terminal_id,
+            )
+            renovadas = cur.rowcount
+            conn.commit()
+            return renovadas
+
+    def release_monitoring_claims(self, talao_ids):
+        """Libera em um so ``UPDATE`` as reservas deste terminal, sem alterar os proximos alertas."""
+        if not talao_ids:
+            return
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE m
+                SET claimed_by = NULL, lease_until = NULL
+                FROM dbo.monitoramento m
+                INNER JOIN OPENJSON(?) WITH (talao_id INT '$') alvo ON alvo.talao_id = m.talao_id
+                WHERE m.claimed_by = ?;
+                """,
+                self._json_ids(talao_ids),
+                self.terminal_id,
+            )
+            conn.commit()
+
+
+def build_repository():
+    """Instancia o repositorio configurado em DB_BACKEND (sqlserver ou sqlite)."""
+    backend = str(get_env("DB_BACKEND", default="sqlserver")).strip().lower()
+    if backend == "sqlite":
+        # Import tardio: sqlite_repository depende deste modulo.
+        from .sqlite_repository import SQLiteRepository
+
+        return SQLiteRepository()
+    return SQLServerRepository()
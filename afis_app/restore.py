@@ -0,0 +1,270 @@
+"""Restauracao dos backups anuais gerados por ``afis_app.backup``.
+
+O script e lido em fluxo (texto puro, ``.gz`` ou ``.zst``), um comando
+``INSERT`` por vez; os valores sao convertidos de volta para tipos Python e
+entregues ao repositorio em lotes, gravados com ``executemany`` em uma
+unica transacao (``repo.restore_rows``). Aceita tambem os backups antigos,
+com um ``INSERT`` por linha.
+
+Informando o manifesto (``backup_afis_<ano>_manifesto.json``) a cadeia
+completo + incrementais e aplicada em ordem, na mesma transacao; os
+``DELETE`` dos incrementais excluem os taloes removidos ou substituidos.
+
+Uso em linha de comando (banco definido pelo ``.env``, como no app)::
+
+    python -m afis_app.restore backup_afis_2025.sql.gz --politica skip
+    python -m afis_app.restore backup_afis_2025_manifesto.json
+"""
+
+import argparse
+import itertools
+import re
+import sys
+import time as _time
+from datetime import datetime
+
+from .backup import manifest_files, open_backup
+from .config import load_env_file
+from .repository import (
+    EXPORT_BATCH_SIZE,
+    MONITORAMENTO_BACKUP_COLUMNS,
+    RESTORE_FAIL,
+    RESTORE_POLICIES,
+    TALAO_DETAIL_COLUMNS,
+    build_repository,
+)
+
+# Colunas gravadas por tabela do backup (colunas extras de backups antigos sao descartadas).
+RESTORE_COLUMNS = {"taloes": TALAO_DETAIL_COLUMNS, "monitoramento": MONITORAMENTO_BACKUP_COLUMNS}
+
+_DELETE_PATTERN = re.compile(r"DELETE FROM\s+(?:\[?dbo\]?\.)?\[?taloes\]?\s+WHERE\s+\[?id\]?\s+IN\s*\(([^)]*)\)", re.I)
+_MONITORAMENTO_DELETE_PATTERN = re.compile(
+    r"DELETE FROM\s+(?:\[?dbo\]?\.)?\[?monitoramento\]?\s+WHERE\s+\[?talao_id\]?\s+IN\s*\(", re.I
+)
+_INSERT_PATTERN = re.compile(r"INSERT INTO\s+(?:\[?dbo\]?\.)?\[?(\w+)\]?\s*\(([^)]*)\)\s*VALUES\s*", re.I)
+_VALUE_PATTERN = re.compile(
+    r"\s*(?:(NULL)|(N)?'((?:[^']+|'')*)'|(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?))\s*([,)])",
+    re.S,
+)
+# Literais sem prefixo N sao datas/horas gravadas por backup.sql_literal.
+_TEMPORAL_FORMATS = (
+    ("%Y-%m-%d %H:%M:%S.%f", lambda value: value),
+    ("%Y-%m-%d", lambda value: value.date()),
+    ("%H:%M:%S", lambda value: value.time()),
+)
+
+
+class BackupFormatError(ValueError):
+    """Script de backup com comando ou valor fora do formato esperado."""
+
+    pass
+
+
+def _parse_temporal(text):
+    """Converte literal de data/hora do backup para ``datetime``/``date``/``time``."""
+    for fmt, convert in _TEMPORAL_FORMATS:
+        try:
+            return convert(datetime.strptime(text, fmt))
+        except ValueError:
+            continue
+    return text
+
+
+def _parse_number(text):
+    """Converte literal numerico para ``int`` ou ``float``."""
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    return float(text)
+
+
+def parse_insert(statement):
+    """Le um comando ``INSERT ... VALUES (...), (...);`` e retorna ``(tabela, colunas, linhas)``."""
+    header = _INSERT_PATTERN.match(statement)
+    if header is None:
+        raise BackupFormatError(f"Comando INSERT inválido no backup: {statement[:80]!r}.")
+    table = header.group(1).lower()
+    columns = [col.strip().strip("[]") for col in header.group(2).split(",")]
+    rows = []
+    pos = header.end()
+    end = len(statement.rstrip().rstrip(";"))
+    while pos < end:
+        while pos < end and statement[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= end:
+            break
+        if statement[pos] != "(":
+            raise BackupFormatError(f"Valores inválidos na tabela {table}, posição {pos}.")
+        pos += 1
+        row = []
+        while True:
+            match = _VALUE_PATTERN.match(statement, pos)
+            if match is None:
+                raise BackupFormatError(f"Valor inválido na tabela {table}, posição {pos}.")
+            null, national, text, number, terminator = match.groups()
+            if null:
+                row.append(None)
+            elif text is not None:
+                text = text.replace("''", "'")
+                row.append(text if national else _parse_temporal(text))
+            else:
+                row.append(_parse_number(number))
+            pos = match.end()
+            if terminator == ")":
+                break
+        if len(row) != len(columns):
+            raise BackupFormatError(f"Linha com {len(row)} valores para {len(columns)} colunas em {table}.")
+        rows.append(row)
+    return table, columns, rows
+
+
+def parse_delete(statement):
+    """Le ``DELETE FROM dbo.taloes WHERE id IN (...);`` de backup incremental; retorna ``[[id], ...]``."""
+    match = _DELETE_PATTERN.match(statement)
+    if match is None:
+        raise BackupFormatError(f"Comando DELETE inválido no backup: {statement[:80]!r}.")
+    return [[int(value)] for value in match.group(1).split(",") if value.strip()]
+
+
+def iter_statements(lines):
+    """Agrupa as linhas do script em comandos ``INSERT``/``DELETE`` completos (strings podem ter quebras de linha)."""
+    parts = []
+    in_string = False
+    for line in lines:
+        if not parts:
+            if not line.lstrip().upper().startswith(("INSERT INTO", "DELETE FROM")):
+                continue
+        parts.append(line)
+        if line.count("'") % 2:
+            in_string = not in_string
+        if not in_string and line.rstrip().endswith(";"):
+            yield "".join(parts)
+            parts = []
+    if parts:
+        raise BackupFormatError("Backup truncado: último comando INSERT incompleto.")
+
+
+def read_backup(path, batch_size=EXPORT_BATCH_SIZE):
+    """Gera lotes ``(tabela, linhas)`` do backup, com as colunas de ``RESTORE_COLUMNS``.
+
+    So um comando ``INSERT`` (no maximo 1000 linhas) e um lote ficam em
+    memoria por vez. ``DELETE`` de incremental vira o lote ``("excluidos", [[id], ...])``,
+    entregue na posicao em que aparece no script. O ``DELETE`` do monitoramento
+    por ``talao_id`` e descartado: ``restore_rows`` ja substitui o monitoramento
+    do talao ao inseri-lo.
+    """
+    pending_table, pending = None, []
+    with open_backup(path) as backup_file:
+        for statement in iter_statements(backup_file):
+            if _MONITORAMENTO_DELETE_PATTERN.match(statement.lstrip()):
+                continue
+            if statement.lstrip().upper().startswith("DELETE"):
+                if pending:
+                    yield pending_table, pending
+                    pending_table, pending = None, []
+                yield "excluidos", parse_delete(statement)
+                continue
+            table, columns, rows = parse_insert(statement)
+            wanted = RESTORE_COLUMNS.get(table)
+            if wanted is None:
+                raise BackupFormatError(f"Tabela desconhecida no backup: {table}.")
+            missing = [col for col in wanted if col not in columns]
+            if missing:
+                raise BackupFormatError(f"Colunas ausentes em {table}: {', '.join(missing)}.")
+            positions = [columns.index(col) for col in wanted]
+            if table != pending_table and pending:
+                yield pending_table, pending
+                pending = []
+            pending_table = table
+            pending.extend([row[i] for i in positions] for row in rows)
+            while len(pending) >= batch_size:
+                yield table, pending[:batch_size]
+                pending = pending[batch_size:]
+    if pending:
+        yield pending_table, pending
+
+
+def backup_chain(path):
+    """Arquivos a aplicar: a cadeia do manifesto (``.json``) ou o proprio arquivo de backup."""
+    if str(path).lower().endswith(".json"):
+        return manifest_files(path)
+    return [path]
+
+
+def restore_backup(repo, path, policy=RESTORE_FAIL, batch_size=EXPORT_BATCH_SIZE, progress=None):
+    """Restaura o backup (ou a cadeia do manifesto) em ``repo`` e retorna contagens e vazao.
+
+    ``progress(linhas_lidas)`` e chamado apos cada lote gravado. O resultado
+    traz as contagens de ``repo.restore_rows`` mais ``linhas``, ``segundos``
+    e ``linhas_por_segundo``.
+    """
+    lidas = [0]
+
+    def _tracked(batches):
+        for table, rows in batches:
+            yield table, rows
+            # Retomado quando o repositorio pede o proximo lote, ou seja, apos gravar este.
+            lidas[0] += len(rows)
+            if progress is not None:
+                progress(lidas[0])
+
+    inicio = _time.perf_counter()
+    batches = itertools.chain.from_iterable(read_backup(arquivo, batch_size) for arquivo in backup_chain(path))
+    totais = repo.restore_rows(_tracked(batches), policy=policy)
+    segundos = _time.perf_counter() - inicio
+    totais.update(
+        linhas=lidas[0],
+        segundos=round(segundos, 3),
+        linhas_por_segundo=round(lidas[0] / segundos) if segundos > 0 else lidas[0],
+    )
+    return totais
+
+
+def format_report(totais):
+    """Resumo legivel do resultado de ``restore_backup``."""
+    return (
+        f"Talões gravados: {totais['taloes']}\n"
+        f"Monitoramentos gravados: {totais['monitoramento']}\n"
+        f"Talões ignorados (já existentes): {totais['ignorados']}\n"
+        f"Talões substituídos: {totais['substituidos']}\n"
+        f"Exclusões de incrementais: {totais['excluidos']}\n"
+        f"Linhas lidas: {totais['linhas']} em {totais['segundos']:.2f} s "
+        f"({totais['linhas_por_segundo']} linhas/s)"
+    )
+
+
+def main(argv=None):
+    """Linha de comando: restaura um backup no banco configurado no ``.env``."""
+    parser = argparse.ArgumentParser(
+        prog="python -m afis_app.restore",
+        description="Restaura backup anual do AFIS (.sql, .sql.gz ou .sql.zst) ou a cadeia de um manifesto (.json).",
+    )
+    parser.add_argument("arquivo", help="arquivo de backup gerado pelo app ou manifesto da pasta de backups")
+    parser.add_argument(
+        "--politica",
+        choices=RESTORE_POLICIES,
+        default=RESTORE_FAIL,
+        help="talão já existente (mesmo ano e número): fail desfaz tudo, skip mantém o atual, "
+        "overwrite substitui pelo do backup (padrão: fail)",
+    )
+    parser.add_argument("--lote", type=int, default=EXPORT_BATCH_SIZE, help="linhas por executemany (padrão: 1000)")
+    args = parser.parse_args(argv)
+
+    load_env_file()
+    repo = build_repository()
+    try:
+        totais = restore_backup(
+            repo,
+            args.arquivo,
+            policy=args.politica,
+            batch_size=max(1, args.lote),
+            progress=lambda lidas: print(f"\r{lidas} linhas...", end="", file=sys.stderr, flush=True),
+        )
+    finally:
+        print(file=sys.stderr)
+        repo.close()
+    print(format_report(totais))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
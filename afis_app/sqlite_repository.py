@@ -0,0 +1,893 @@
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+
+from .config import get_env
+from .constants import STATUS_CANCELADO, STATUS_FINALIZADO, STATUS_MONITORADO
+from .migrations import SQLITE, MigrationError, apply_migrations
+from .repository import (
+    EXPORT_BATCH_SIZE,
+    MONITORAMENTO_BACKUP_COLUMNS,
+    TALAO_DETAIL_COLUMNS,
+    DatabaseError,
+    DuplicateTalaoError,
+    RESTORE_FAIL,
+    SEARCH_COUNT_CAP,
+    SEARCH_PAGE_SIZE,
+    UPDATE_CLOSED,
+    UPDATE_CONFLICT,
+    UPDATE_NOT_FOUND,
+    UPDATE_YEAR_CHANGED,
+    RepositoryBase,
+)
+from .validators import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS taloes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ano INTEGER NOT NULL,
+        talao INTEGER NOT NULL,
+        data_solic DATE NOT NULL,
+        hora_solic TIME NOT NULL,
+        delegacia TEXT NOT NULL,
+        autoridade TEXT NOT NULL,
+        solicitante TEXT NOT NULL,
+        endereco TEXT NOT NULL,
+        boletim TEXT NULL,
+        natureza TEXT NULL,
+        data_bo DATE NULL,
+        vitimas TEXT NULL,
+        equipe TEXT NULL,
+        operador TEXT NOT NULL,
+        status TEXT NOT NULL,
+        observacao TEXT NULL,
+        criado_em TIMESTAMP NOT NULL,
+        atualizado_em TIMESTAMP NOT NULL,
+        CONSTRAINT uq_taloes_ano_talao UNIQUE (ano, talao),
+        CONSTRAINT ck_taloes_status CHECK (status IN ('MONITORADO', 'FINALIZADO', 'CANCELADO'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS monitoramento (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        talao_id INTEGER NOT NULL UNIQUE,
+        proximo_alerta TIMESTAMP NOT NULL,
+        intervalo_min INTEGER NOT NULL DEFAULT 30,
+        criado_em TIMESTAMP NOT NULL,
+        CONSTRAINT fk_monitoramento_talao
+            FOREIGN KEY (talao_id) REFERENCES taloes(id) ON DELETE CASCADE
+    )
+    """,
+)
+
+
+def _adapt_timestamp(value):
+    """Serializa datetime com largura fixa para manter ordenacao textual."""
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _adapt_time(value):
+    """Serializa hora no formato HH:MM:SS."""
+    return value.strftime("%H:%M:%S")
+
+
+sqlite3.register_adapter(datetime, _adapt_timestamp)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(time, _adapt_time)
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter("TIME", lambda raw: time.fromisoformat(raw.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+
+_memory_ids = itertools.count(1)
+
+
+def register_functions(conn):
+    """Registra as funcoes usadas pelo schema (gatilhos das colunas de busca)."""
+    conn.create_function("afis_fold", 1, normalize_search_text, deterministic=True)
+
+
+class SQLiteRepository(RepositoryBase):
+    """Repositorio SQLite com a mesma semantica do SQLServerRepository.
+
+    Serve como substituto local (testes de carga, benchmarks, uso offline).
+    Cada thread usa sua propria conexao em modo WAL; escritas rodam em
+    ``BEGIN IMMEDIATE``, o que serializa a numeracao por ano como o
+    ``UPDLOCK, HOLDLOCK`` da versao SQL Server. Datas e horarios sao
+    gravados em texto ISO e devolvidos como ``date``/``time``/``datetime``.
+    """
+
+    def __init__(self, path=None, talao_block_size=None, terminal_id=None, alert_lease_seconds=None):
+        """Abre (ou cria) o banco local e garante o schema."""
+        self.path = path or get_env("SQLITE_PATH", default="afis_local.db")
+        self.talao_blocks = self._build_talao_blocks(talao_block_size)
+        self._configure_alert_claims(terminal_id, alert_lease_seconds)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._keeper = None
+        if self.path == ":memory:":
+            # Banco em memoria compartilhado entre as conexoes das threads.
+            self._database = f"file:afis_memoria_{next(_memory_ids)}?mode=memory&cache=shared"
+            self._uri = True
+            self._keeper = self._open_connection()
+        else:
+            self._database = str(self.path)
+            self._uri = False
+        self.ensure_schema_is_ready()
+
+    def _open_connection(self):
+        """Abre conexao SQLite configurada (autocommit, WAL, chaves estrangeiras)."""
+        conn = sqlite3.connect(
+            self._database,
+            uri=self._uri,
+            timeout=30,
+            isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        register_functions(conn)
+        if not self._uri:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _borrow_connection(self):
+        """Fornece a conexao da thread atual, criando-a no primeiro uso."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    @contextmanager
+    def _write_transaction(self):
+        """Abre transacao de escrita com lock reservado desde o inicio."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def _utcnow(self):
+        """Retorna data/hora UTC sem fuso, como SYSUTCDATETIME()."""
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def close(self):
+        """Fecha todas as conexoes abertas pelo repositorio."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                logger.debug("Falha ao fechar conexão SQLite.", exc_info=True)
+        self._local = threading.local()
+
+    def ensure_schema_is_ready(self):
+        """Cria as tabelas base quando ausentes e aplica as migracoes pendentes."""
+        with self._connect() as conn:
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            try:
+                apply_migrations(conn, SQLITE)
+            except MigrationError as exc:
+                raise DatabaseError(str(exc)) from exc
+
+    def get_next_talao(self, ano):
+        """Retorna o proximo numero de talao para um ano (leitura pontual do contador)."""
+        if self.talao_blocks is not None and self.talao_blocks.peek(ano) is not None:
+            return self.talao_blocks.peek(ano)
+        query = """
+        SELECT COALESCE(
+            (SELECT proximo FROM talao_contador WHERE ano = ?),
+            (SELECT COALESCE(MAX(talao), 0) + 1 FROM taloes WHERE ano = ?)
+        )
+        """
+        with self._connect() as conn:
+            row = conn.execute(query, (ano, ano)).fetchone()
+            return self._to_int(row[0] if row else None, "próximo talão")
+
+    def _reserve_talao_numbers(self, cur, ano, quantidade):
+        """Avanca o contador do ano em ``quantidade`` e retorna o primeiro numero reservado."""
+        cur.execute(
+            "INSERT OR IGNORE INTO talao_contador (ano, proximo) "
+            "SELECT ?, COALESCE(MAX(talao), 0) + 1 FROM taloes WHERE ano = ?",
+            (ano, ano),
+        )
+        cur.execute("UPDATE talao_contador SET proximo = proximo + ? WHERE ano = ? RETURNING proximo", (quantidade, ano))
+        row = cur.fetchone()
+        return self._to_int(row[0] if row else None, "sequencia do talao") - quantidade
+
+    def _reserve_talao_block(self, ano, quantidade):
+        """Reserva bloco de numeros em transacao curta e independente da insercao."""
+        with self._write_transaction() as cur:
+            return self._reserve_talao_numbers(cur, ano, quantidade)
+
+    def _resync_talao_counter(self, ano):
+        """Adianta o contador para depois do maior talao gravado (ex.: apos carga externa)."""
+        with self._write_transaction() as cur:
+            self._advance_talao_counter(cur, ano)
+
+    def _advance_talao_counter(self, cur, ano):
+        """Leva o contador do ano para depois do maior talao gravado, sem recua-lo."""
+        cur.execute(
+            """
+            UPDATE talao_contador
+            SET proximo = (SELECT COALESCE(MAX(talao), 0) + 1 FROM taloes WHERE ano = talao_contador.ano)
+            WHERE ano = ? AND proximo < (SELECT COALESCE(MAX(talao), 0) + 1 FROM taloes WHERE ano = ?)
+            """,
+            (ano, ano),
+        )
+
+    def insert_talao(self, data, intervalo_min):
+        """Insere um talao e sincroniza o monitoramento inicial."""
+        payload = self._build_db_payload(data)
+        ano = payload["ano"]
+        numero_reservado = self._take_reserved_talao(ano)
+        try:
+            return self._insert_talao(payload, ano, numero_reservado, intervalo_min)
+        except sqlite3.IntegrityError as exc:
+            self._release_reserved_talao(ano, numero_reservado, exc)
+            if self._is_unique_key_violation(exc):
+                # Contador atras dos dados (carga externa); corrige para a proxima tentativa.
+                self._resync_talao_counter(ano)
+                raise DuplicateTalaoError(
+                    "Outro terminal inseriu este número de talão antes. Atualize a tela e tente novamente."
+                ) from exc
+            raise
+
+    def _insert_talao(self, payload, ano, numero_reservado, intervalo_min):
+        """Grava o talao e o monitoramento em uma unica transacao de escrita."""
+        with self._write_transaction() as cur:
+            if numero_reservado is not None:
+                proximo_talao = numero_reservado
+            else:
+                # Sem reserva em bloco: o numero sai na mesma transacao (sem lacunas).
+                proximo_talao = self._reserve_talao_numbers(cur, ano, 1)
+
+            agora = self._utcnow()
+            cur.execute(
+                """
+                INSERT INTO taloes (
+                    ano, talao, data_solic, hora_solic, delegacia, autoridade, solicitante,
+                    endereco, boletim, natureza, data_bo, vitimas, equipe, operador, status, observacao,
+                    criado_em, atualizado_em
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    ano,
+                    proximo_talao,
+                    payload["data_solic"],
+                    payload["hora_solic"],
+                    payload["delegacia"],
+                    payload["autoridade"],
+                    payload["solicitante"],
+                    payload["endereco"],
+                    payload["boletim"],
+                    payload["natureza"],
+                    payload["data_bo"],
+                    payload["vitimas"],
+                    payload["equipe"],
+                    payload["operador"],
+                    payload["status"],
+                    payload["observacao"],
+                    agora,
+                    agora,
+                ),
+            )
+            talao_id = self._to_int(cur.lastrowid, "id do talão inserido")
+
+            self._sync_monitoramento(cur, talao_id, payload["status"], intervalo_min)
+            return proximo_talao
+
+    def update_talao(self, talao_id, data, intervalo_min, expected_version=None):
+        """Atualiza dados de um talao com validacoes de integridade e concorrencia.
+
+        Mesmas regras do SQL Server no ``WHERE`` do ``UPDATE`` (talao aberto,
+        mesmo ano e, com ``expected_version``, mesma versao); o motivo so e
+        consultado quando nenhuma linha e alterada.
+        """
+        payload = self._build_db_payload(data)
+        params = [
+            payload["data_solic"],
+            payload["hora_solic"],
+            payload["delegacia"],
+            payload["autoridade"],
+            payload["solicitante"],
+            payload["endereco"],
+            payload["boletim"],
+            payload["natureza"],
+            payload["data_bo"],
+            payload["vitimas"],
+            payload["equipe"],
+            payload["operador"],
+            payload["status"],
+            payload["observacao"],
+            self._utcnow(),
+            talao_id,
+            payload["ano"],
+        ]
+        where_clause = f"WHERE id = ? AND ano = ? AND status NOT IN ('{STATUS_FINALIZADO}', '{STATUS_CANCELADO}')"
+        if expected_version is not None:
+            where_clause += " AND versao = ?"
+            params.append(expected_version)
+
+        with self._write_transaction() as cur:
+            cur.execute(
+                f"""
+                UPDATE taloes
+                SET data_solic = ?,
+                    hora_solic = ?,
+                    delegacia = ?,
+                    autoridade = ?,
+                    solicitante = ?,
+                    endereco = ?,
+                    boletim = ?,
+                    natureza = ?,
+                    data_bo = ?,
+                    vitimas = ?,
+                    equipe = ?,
+                    operador = ?,
+                    status = ?,
+                    observacao = ?,
+                    atualizado_em = ?
+                {where_clause}
+                """,
+                params,
+            )
+            if cur.rowcount == 0:
+                cur.execute(
+                    f"""
+                    SELECT CASE
+                        WHEN t.id IS NULL THEN {UPDATE_NOT_FOUND}
+                        WHEN t.status IN ('{STATUS_FINALIZADO}', '{STATUS_CANCELADO}') THEN {UPDATE_CLOSED}
+                        WHEN t.ano <> :ano THEN {UPDATE_YEAR_CHANGED}
+                        ELSE {UPDATE_CONFLICT}
+                    END
+                    FROM (SELECT :talao_id AS id) alvo
+                    LEFT JOIN taloes t ON t.id = alvo.id
+                    """,
+                    {"talao_id": talao_id, "ano": payload["ano"]},
+                )
+                self._raise_update_failure(cur.fetchone()[0])
+            self._sync_monitoramento(cur, talao_id, payload["status"], intervalo_min)
+
+    def _sync_monitoramento(self, cur, talao_id, status, intervalo_min):
+        """Cria/atualiza ou remove monitoramento conforme status do talao."""
+        if status == STATUS_MONITORADO:
+            agora = self._utcnow()
+            cur.execute(
+                """
+                INSERT INTO monitoramento (talao_id, proximo_alerta, intervalo_min, criado_em)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (talao_id) DO UPDATE
+                SET proximo_alerta = excluded.proximo_alerta,
+                    intervalo_min = excluded.intervalo_min,
+                    claimed_by = NULL,
+                    lease_until = NULL
+                """,
+                (talao_id, agora + timedelta(minutes=intervalo_min), intervalo_min, agora),
+            )
+        else:
+            cur.execute("DELETE FROM monitoramento WHERE talao_id = ?", (talao_id,))
+
+    def get_talao(self, talao_id):
+        """Busca e retorna um talao por ID em formato de dicionario (com ``versao`` para a edicao)."""
+        with self._connect() as conn:
+            cur = conn.execute(self._select_details(("versao",)) + " WHERE t.id = ?", (talao_id,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            cols = [d[0] for d in cur.description]
+            return dict(zip(cols, row))
+
+    def list_initial_taloes(self):
+        """Lista taloes para carga inicial da grade principal."""
+        with self._connect() as conn:
+            return self._fetch_initial_taloes(conn)
+
+    def _fetch_initial_taloes(self, conn):
+        """Executa a consulta da grade inicial na conexao informada."""
+        query = f"""
+        SELECT * FROM (
+            SELECT id, ano, talao, boletim, delegacia, natureza, status
+            FROM taloes
+            ORDER BY ano DESC, talao DESC, id DESC
+            LIMIT 1
+        )
+        UNION
+        SELECT id, ano, talao, boletim, delegacia, natureza, status
+        FROM taloes
+        WHERE status = '{STATUS_MONITORADO}'
+        UNION
+        SELECT id, ano, talao, boletim, delegacia, natureza, status
+        FROM taloes
+        WHERE data_solic >= ?
+        ORDER BY ano DESC, talao DESC
+        """
+        data_limite = date.today() - timedelta(days=1)
+        return conn.execute(query, (data_limite,)).fetchall()
+
+    def list_initial_taloes_changes(self, watermark=None, latest_id=None):
+        """Retorna apenas o que mudou na grade inicial desde ``watermark``.
+
+        Versoes vem do contador ``db_versao`` (emulacao de rowversion). As
+        consultas rodam em uma transacao de leitura, sobre o mesmo snapshot do
+        contador; sem ``watermark`` faz a carga completa.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            return self._fetch_grid_changes(conn, watermark, latest_id)
+
+    def _fetch_grid_changes(self, conn, watermark, latest_id):
+        """Consulta de ``list_initial_taloes_changes`` na transacao de leitura ja aberta."""
+        novo = conn.execute("SELECT valor + 1 FROM db_versao WHERE id = 1").fetchone()[0]
+        row = conn.execute("SELECT id FROM taloes ORDER BY ano DESC, talao DESC, id DESC LIMIT 1").fetchone()
+        ultimo = row[0] if row else None
+        if watermark is None:
+            return self._build_grid_changes(self._fetch_initial_taloes(conn), [], novo, ultimo, full=True)
+
+        # Quando o ultimo talao muda, o antigo e o novo sao rechecados: entram
+        # ou saem da janela sem mudar de versao (ex.: insercao, exclusao).
+        columns = "id, ano, talao, boletim, delegacia, natureza, status"
+        visivel = f"id = :ultimo OR status = '{STATUS_MONITORADO}' OR data_solic >= :data_limite"
+        changed = conn.execute(
+            f"""
+            SELECT {columns}, {visivel} AS visivel
+            FROM taloes
+            WHERE versao >= :watermark AND versao < :novo
+            UNION
+            SELECT {columns}, {visivel} AS visivel
+            FROM taloes
+            WHERE id IN (:recheck_antigo, :recheck_novo)
+            """,
+            {
+                "ultimo": ultimo,
+                "data_limite": date.today() - timedelta(days=1),
+                "watermark": watermark,
+                "novo": novo,
+                "recheck_antigo": latest_id if latest_id != ultimo else None,
+                "recheck_novo": ultimo if latest_id != ultimo else None,
+            },
+        ).fetchall()
+        removed = [
+            r[0]
+            for r in conn.execute(
+                "SELECT talao_id FROM taloes_excluidos WHERE versao >= ? AND versao < ?",
+                (watermark, novo),
+            )
+        ]
+        return self._build_grid_changes(changed, removed, novo, ultimo)
+
+    def get_dashboard_snapshot(self, ano, watermark=None, latest_id=None):
+        """Retorna grade, proximo talao e contadores do dashboard.
+
+        Mesmo formato do SQL Server; as consultas rodam na mesma transacao de
+        leitura, sobre um unico snapshot do banco.
+        """
+        query = f"""
+        SELECT
+            COALESCE(
+                (SELECT proximo FROM talao_contador WHERE ano = :ano),
+                (SELECT COALESCE(MAX(talao), 0) + 1 FROM taloes WHERE ano = :ano)
+            ),
+            (SELECT COUNT(*) FROM taloes WHERE status = '{STATUS_MONITORADO}'),
+            (
+                SELECT COUNT(*)
+                FROM monitoramento m
+                INNER JOIN taloes t ON t.id = m.talao_id
+                WHERE t.status = '{STATUS_MONITORADO}' AND m.proximo_alerta <= :agora
+            )
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            changes = self._fetch_grid_changes(conn, watermark, latest_id)
+            proximo, monitorados, vencidos = conn.execute(query, {"ano": ano, "agora": self._utcnow()}).fetchone()
+        return self._build_dashboard_snapshot(changes, ano, proximo, monitorados, vencidos)
+
+    def list_due_monitoring(self, with_records=False):
+        """Lista taloes com alerta vencido no monitoramento (``with_records``: registros completos)."""
+        query = f"""
+        SELECT {self._due_monitoring_columns(with_records)}
+        FROM monitoramento m
+        INNER JOIN taloes t ON t.id = m.talao_id
+        WHERE m.proximo_alerta <= ?
+          AND t.status = 'MONITORADO'
+        ORDER BY m.proximo_alerta ASC
+        """
+        with self._connect() as conn:
+            return self._due_monitoring_rows(conn.execute(query, (self._utcnow(),)).fetchall(), with_records)
+
+    def claim_due_monitoring(self, limit=1, with_records=False):
+        """Reserva para este terminal ate ``limit`` alertas vencidos e livres.
+
+        A leitura e a marcacao ocorrem na mesma transacao ``BEGIN IMMEDIATE``,
+        que serializa os terminais como o ``UPDATE ... OUTPUT`` do SQL Server.
+        O horario de corte e o prazo da reserva sao lidos so depois de obter o
+        lock, para a espera nao antecipar vencimentos nem encurtar a reserva.
+        """
+        with self._write_transaction() as cur:
+            agora = self._utcnow()
+            rows = cur.execute(
+                f"""
+                SELECT m.talao_id, {self._due_monitoring_columns(with_records)}
+                FROM monitoramento m
+                INNER JOIN taloes t ON t.id = m.talao_id
+                WHERE t.status = ?
+                  AND m.proximo_alerta <= ?
+                  AND (m.lease_until IS NULL OR m.lease_until <= ? OR m.claimed_by = ?)
+                ORDER BY m.proximo_alerta ASC
+                LIMIT ?
+                """,
+                (STATUS_MONITORADO, agora, agora, self.terminal_id, limit),
+            ).fetchall()
+            cur.executemany(
+                "UPDATE monitoramento SET claimed_by = ?, lease_until = ? WHERE talao_id = ?",
+                [(self.terminal_id, agora + timedelta(seconds=self.alert_lease_seconds), row[0]) for row in rows],
+            )
+        return self._due_monitoring_rows([row[1:] for row in rows], with_records)
+
+    def renew_monitoring_claim(self, talao_id):
+        """Prorroga a reserva deste terminal; False se ela ja foi perdida."""
+        with self._write_transaction() as cur:
+            cur.execute(
+                "UPDATE monitoramento SET lease_until = ? WHERE talao_id = ? AND claimed_by = ?",
+                (self._utcnow() + timedelta(seconds=self.alert_lease_seconds), talao_id, self.terminal_id),
+            )
+            return cur.rowcount == 1
+
+    def release_monitoring_claim(self, talao_id):
+        """Libera a reserva deste terminal sem alterar o proximo alerta."""
+        with self._write_transaction() as cur:
+            cur.execute(
+                "UPDATE monitoramento SET claimed_by = NULL, lease_until = NULL WHERE talao_id = ? AND claimed_by = ?",
+                (talao_id, self.terminal_id),
+            )
+
+    def list_monitoring_schedule(self):
+        """Lista (talao_id, segundos ate o proximo alerta) dos taloes monitorados.
+
+        Alerta reservado por um terminal so volta a vencer quando a reserva expira.
+        """
+        query = """
+        SELECT m.talao_id, m.proximo_alerta, m.lease_until
+        FROM monitoramento m
+        INNER JOIN taloes t ON t.id = m.talao_id
+        WHERE t.status = ?
+        """
+        agora = self._utcnow()
+        with self._connect() as conn:
+            rows = conn.execute(query, (STATUS_MONITORADO,)).fetchall()
+        return [
+            (talao_id, (max(proximo_alerta, lease_until or proximo_alerta) - agora).total_seconds())
+            for talao_id, proximo_alerta, lease_until in rows
+        ]
+
+    def get_monitoring_interval(self, talao_id):
+        """Retorna intervalo de monitoramento para um talao, quando existir."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT intervalo_min FROM monitoramento WHERE talao_id = ?",
+                (talao_id,),
+            ).fetchone()
+            if not row or row[0] is None:
+                return None
+            return self._to_int(row[0], "intervalo de monitoramento")
+
+    def _select_details(self, extra_columns=()):
+        """Retorna clausula SELECT com as colunas detalhadas de talao (mais ``extra_columns``)."""
+        columns = TALAO_DETAIL_COLUMNS + tuple(extra_columns)
+        return "SELECT " + ", ".join(f"t.{col}" for col in columns) + " FROM taloes t"
+
+    def _period_query(self):
+        """Consulta detalhada de taloes entre duas datas, na ordem dos relatorios."""
+        return (
+            self._select_details()
+            + " WHERE t.data_solic BETWEEN ? AND ? ORDER BY t.data_solic ASC, t.hora_solic ASC, t.id ASC"
+        )
+
+    def list_taloes_by_period(self, data_inicio, data_fim):
+        """Retorna dados detalhados de taloes entre duas datas."""
+        with self._connect() as conn:
+            cur = conn.execute(self._period_query(), (data_inicio, data_fim))
+            rows = cur.fetchall()
+            columns = [d[0] for d in cur.description]
+            return columns, rows
+
+    def count_taloes_by_period(self, data_inicio, data_fim):
+        """Conta taloes entre duas datas."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM taloes WHERE data_solic BETWEEN ? AND ?", (data_inicio, data_fim)
+            ).fetchone()[0]
+
+    def list_taloes_by_period_page(self, data_inicio, data_fim, page_size=SEARCH_PAGE_SIZE, cursor=None):
+        """Uma pagina do relatorio por periodo (paginacao por chave, como no SQL Server)."""
+        where, params = self._period_page_query(data_inicio, data_fim, cursor)
+        with self._connect() as conn:
+            cur = conn.execute(self._select_details() + where + " LIMIT ?", [*params, page_size + 1])
+            columns = [d[0] for d in cur.description]
+            return self._build_page(columns, cur.fetchall(), page_size, self._PERIOD_KEYSET)
+
+    def iter_taloes_by_period(self, data_inicio, data_fim, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de taloes do periodo (colunas ``TALAO_DETAIL_COLUMNS``) sem carregar tudo."""
+        with self._connect() as conn:
+            cur = conn.execute(self._period_query(), (data_inicio, data_fim))
+            yield from self._iter_batches(cur, batch_size)
+
+    def _prefix_clause(self, column, value):
+        """Faixa [valor, valor + maior code point) usa o indice com colacao BINARY."""
+        return f"{column} >= ? AND {column} < ?", [value, value + "\U0010ffff"]
+
+    def _contains_clause(self, column, value):
+        """Busca por trecho em qualquer posicao (varredura da tabela)."""
+        return f"instr({column}, ?) > 0", [value]
+
+    def search_taloes(self, filters):
+        """Pesquisa taloes por filtros combinados com operador AND."""
+        clauses, params = self._search_clauses(filters)
+        query = self._select_details() + " WHERE 1 = 1"
+        query += "".join(f" AND {clause}" for clause in clauses)
+        query += " ORDER BY t.ano DESC, t.talao DESC, t.id DESC"
+
+        with self._connect() as conn:
+            cur = conn.execute(query, params)
+            rows = cur.fetchall()
+            columns = [d[0] for d in cur.description]
+            return columns, rows
+
+    def search_taloes_page(self, filters, page_size=SEARCH_PAGE_SIZE, cursor=None):
+        """Uma pagina da busca (paginacao por chave, como no SQL Server)."""
+        where, params = self._search_page_query(filters, cursor)
+        with self._connect() as conn:
+            cur = conn.execute(self._select_details() + where + " LIMIT ?", [*params, page_size + 1])
+            columns = [d[0] for d in cur.description]
+            return self._build_page(columns, cur.fetchall(), page_size, self._SEARCH_KEYSET)
+
+    def estimate_search_count(self, filters, cap=SEARCH_COUNT_CAP):
+        """Conta os resultados da busca ate ``cap``; retorna ``(total, exato)``."""
+        clauses, params = self._search_clauses(filters)
+        where = "".join(f" AND {clause}" for clause in clauses)
+        with self._connect() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM taloes t WHERE 1 = 1{where} LIMIT ?)",
+                [*params, cap + 1],
+            ).fetchone()[0]
+        return min(total, cap), total <= cap
+
+    def _year_query(self):
+        """Consulta de taloes de um ano, na ordem do backup."""
+        return self._select_details() + " WHERE t.ano = ? ORDER BY t.id ASC"
+
+    def _monitoramento_year_query(self, changed=False):
+        """Consulta de monitoramento dos taloes de um ano, na ordem do backup (``changed`` como no SQL Server)."""
+        filtro = " AND ((m.versao >= ? AND m.versao < ?) OR (t.versao >= ? AND t.versao < ?))" if changed else ""
+        return (
+            "SELECT " + ", ".join(f"m.{col}" for col in MONITORAMENTO_BACKUP_COLUMNS)
+            + " FROM monitoramento m INNER JOIN taloes t ON t.id = m.talao_id"
+            + " WHERE t.ano = ?" + filtro + " ORDER BY m.id ASC"
+        )
+
+    def list_taloes_by_year(self, ano):
+        """Retorna todos os taloes de um ano."""
+        with self._connect() as conn:
+            cur = conn.execute(self._year_query(), (ano,))
+            rows = cur.fetchall()
+            columns = [d[0] for d in cur.description]
+            return columns, rows
+
+    def list_monitoramento_by_year(self, ano):
+        """Retorna todos os registros de monitoramento de um ano."""
+        with self._connect() as conn:
+            cur = conn.execute(self._monitoramento_year_query(), (ano,))
+            rows = cur.fetchall()
+            columns = [d[0] for d in cur.description]
+            return columns, rows
+
+    def iter_taloes_by_year(self, ano, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de taloes do ano (colunas ``TALAO_DETAIL_COLUMNS``)."""
+        with self._connect() as conn:
+            cur = conn.execute(self._year_query(), (ano,))
+            yield from self._iter_batches(cur, batch_size)
+
+    def iter_monitoramento_by_year(self, ano, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de monitoramento do ano (colunas ``MONITORAMENTO_BACKUP_COLUMNS``)."""
+        with self._connect() as conn:
+            cur = conn.execute(self._monitoramento_year_query(), (ano,))
+            yield from self._iter_batches(cur, batch_size)
+
+    def get_backup_watermark(self):
+        """Marca d'agua para backup incremental: proximo valor do contador ``db_versao``."""
+        with self._connect() as conn:
+            return conn.execute("SELECT valor + 1 FROM db_versao WHERE id = 1").fetchone()[0]
+
+    def get_cache_version(self):
+        """Sonda barata de alteracoes para invalidar caches (contador ``db_versao`` e intervalos monitorados)."""
+        with self._connect() as conn:
+            return tuple(
+                conn.execute(
+                    """
+                    SELECT (SELECT valor FROM db_versao WHERE id = 1), COUNT(*),
+                        TOTAL(intervalo_min * (talao_id % 9973 + 1))
+                    FROM monitoramento
+                    """
+                ).fetchone()
+            )
+
+    def iter_taloes_changed(self, ano, since, until, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de taloes do ano com versao em ``[since, until)`` (colunas ``TALAO_DETAIL_COLUMNS``)."""
+        query = self._select_details() + " WHERE t.ano = ? AND t.versao >= ? AND t.versao < ? ORDER BY t.id ASC"
+        with self._connect() as conn:
+            cur = conn.execute(query, (ano, since, until))
+            yield from self._iter_batches(cur, batch_size)
+
+    def iter_monitoramento_changed(self, ano, since, until, batch_size=EXPORT_BATCH_SIZE):
+        """Gera lotes de monitoramento do ano alterado em ``[since, until)`` (mesma semantica do SQL Server)."""
+        with self._connect() as conn:
+            cur = conn.execute(self._monitoramento_year_query(changed=True), (ano, since, until, since, until))
+            yield from self._iter_batches(cur, batch_size)
+
+    def list_deleted_talao_ids(self, since, until):
+        """Ids de taloes excluidos com versao em ``[since, until)``."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT talao_id FROM taloes_excluidos WHERE versao >= ? AND versao < ? ORDER BY talao_id",
+                (since, until),
+            ).fetchall()
+            return [row[0] for row in rows]
+
+    def restore_rows(self, batches, policy=RESTORE_FAIL):
+        """Grava lotes ``(tabela, linhas)`` de um backup em uma unica transacao.
+
+        Mesma semantica da versao SQL Server; cada lote vai em um
+        ``executemany`` (ids dos taloes preservados, monitoramento com id novo).
+        """
+        self._check_restore_policy(policy)
+        insert_taloes = (
+            f"INSERT INTO taloes ({', '.join(TALAO_DETAIL_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in TALAO_DETAIL_COLUMNS)})"
+        )
+        insert_monitoramento = (
+            "INSERT INTO monitoramento (talao_id, proximo_alerta, intervalo_min, criado_em) VALUES (?, ?, ?, ?)"
+        )
+        totais = {"taloes": 0, "monitoramento": 0, "ignorados": 0, "substituidos": 0, "excluidos": 0}
+        ignorados, anos = set(), set()
+        with self._write_transaction() as cur:
+            for table, rows in batches:
+                if table == "taloes":
+                    inserir, excluir, novos_ignorados = self._restore_plan(
+                        rows, *self._restore_lookup(cur, "taloes", rows), policy
+                    )
+                    if excluir:
+                        # O monitoramento dos taloes substituidos sai junto (ON DELETE CASCADE).
+                        cur.executemany("DELETE FROM taloes WHERE id = ?", [(talao_id,) for talao_id in excluir])
+                    cur.executemany(insert_taloes, inserir)
+                    ignorados |= novos_ignorados
+                    anos.update(row[1] for row in inserir)
+                    totais["taloes"] += len(inserir)
+                    totais["ignorados"] += len(novos_ignorados)
+                    totais["substituidos"] += len(excluir)
+                elif table == "monitoramento":
+                    linhas = [tuple(row[1:]) for row in rows if row[1] not in ignorados]
+                    # talao_id e UNIQUE: o monitoramento anterior do talao (adiado no incremental) sai antes.
+                    cur.executemany("DELETE FROM monitoramento WHERE talao_id = ?", [(row[0],) for row in linhas])
+                    cur.executemany(insert_monitoramento, linhas)
+                    totais["monitoramento"] += len(linhas)
+                elif table == "excluidos":
+                    cur.executemany("DELETE FROM taloes WHERE id = ?", rows)
+                    totais["excluidos"] += len(rows)
+                else:
+                    raise ValueError(f"Tabela de backup desconhecida: {table!r}.")
+            for ano in sorted(anos):
+                self._advance_talao_counter(cur, ano)
+        return totais
+
+    def postpone_monitoring(self, talao_id, intervalo_min):
+        """Posterga o proximo alerta de monitoramento de um talao e libera a reserva."""
+        with self._write_transaction() as cur:
+            cur.execute(
+                """
+                UPDATE monitoramento
+                SET proximo_alerta = ?,
+                    intervalo_min = ?,
+                    claimed_by = NULL,
+                    lease_until = NULL
+                WHERE talao_id = ?
+                """,
+                (self._utcnow() + timedelta(minutes=intervalo_min), intervalo_min, talao_id),
+            )
+
+    def postpone_monitoring_many(self, talao_ids, intervalo_min):
+        """Posterga os alertas de varios taloes em um unico ``UPDATE`` (ids via ``json_each``)."""
+        if not talao_ids:
+            return 0
+        with self._write_transaction() as cur:
+            cur.execute(
+                """
+                UPDATE monitoramento
+                SET proximo_alerta = ?,
+                    intervalo_min = ?,
+                    claimed_by = NULL,
+                    lease_until = NULL
+                WHERE talao_id IN (SELECT value FROM json_each(?))
+                """,
+                (self._utcnow() + timedelta(minutes=intervalo_min), intervalo_min, self._json_ids(talao_ids)),
+            )
+            return cur.rowcount
+
+    def finalize_many(self, records):
+        """Finaliza de uma vez os taloes monitorados de ``records`` (mesma semantica do SQL Server)."""
+        alvos = [{"id": talao_id, "versao": versao} for talao_id, versao in self._finalize_targets(records)]
+        if not alvos:
+            return []
+        with self._write_transaction() as cur:
+            finalizados = [
+                row[0]
+                for row in cur.execute(
+                    """
+                    SELECT t.id
+                    FROM taloes t
+                    INNER JOIN json_each(?) alvo ON json_extract(alvo.value, '$.id') = t.id
+                    WHERE t.status = ?
+                      AND json_extract(alvo.value, '$.versao') = t.versao
+                    ORDER BY t.id
+                    """,
+                    (json.dumps(alvos), STATUS_MONITORADO),
+                ).fetchall()
+            ]
+            ids = self._json_ids(finalizados)
+            cur.execute(
+                "UPDATE taloes SET status = ?, atualizado_em = ? WHERE id IN (SELECT value FROM json_each(?))",
+                (STATUS_FINALIZADO, self._utcnow(), ids),
+            )
+            cur.execute("DELETE FROM monitoramento WHERE talao_id IN (SELECT value FROM json_each(?))", (ids,))
+        return finalizados
+
+    def renew_monitoring_claims(self, talao_ids):
+        """Prorroga em um so ``UPDATE`` as reservas deste terminal; retorna quantas seguem validas."""
+        if not talao_ids:
+            return 0
+        with self._write_transaction() as cur:
+            cur.execute(
+                "UPDATE monitoramento SET lease_until = ? "
+                "WHERE talao_id IN (SELECT value FROM json_each(?)) AND claimed_by = ?",
+                (
+                    self._utcnow() + timedelta(seconds=self.alert_lease_seconds),
+                    self._json_ids(talao_ids),
+                    self.terminal_id,
+                ),
+            )
+            return cur.rowcount
+
+    def release_monitoring_claims(self, talao_ids):
+        """Libera em um so ``UPDATE`` as reservas deste terminal."""
+        if not talao_ids:
+            return
+        with self._write_transaction() as cur:
+            cur.execute(
+                "UPDATE monitoramento SET claimed_by = NULL, lease_until = NULL "
+                "WHERE talao_id IN (SELECT value FROM json_each(?)) AND claimed_by = ?",
+                (self._json_ids(talao_ids), self.terminal_id),
+            )
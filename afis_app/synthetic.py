@@ -0,0 +1,439 @@
+"""Gerador deterministico de massa de dados sintetica (taloes e monitoramento).
+
+Produz ``anos`` x ``por_dia`` taloes por dia (media; sabado e domingo tem
+menos movimento) com distribuicoes plausiveis de delegacia, natureza,
+equipe de plantao e status, boletins validos para ``BOLETIM_PATTERN`` e o
+monitoramento dos taloes ainda monitorados. A mesma semente gera sempre os
+mesmos dados.
+
+As linhas saem no formato do backup (colunas ``TALAO_DETAIL_COLUMNS`` e
+``MONITORAMENTO_BACKUP_COLUMNS``), entao podem ser gravadas em qualquer
+repositorio pelo caminho da restauracao (``repo.restore_rows``, com
+``executemany``) ou em arquivos de backup (``backup.write_year_backup``)
+para restaurar depois.
+
+Uso em linha de comando (banco definido pelo ``.env``, como no app)::
+
+    python -m afis_app.synthetic --anos 3 --por-dia 150 --semente 7
+    python -m afis_app.synthetic --anos 3 --por-dia 150 --pasta D:/massa --compressao gzip
+"""
+
+import argparse
+from datetime import date, datetime, time, timedelta
+import itertools
+import os
+import random
+import sys
+import time as _time
+
+from .backup import MONITORAMENTO_TABLE, TALOES_TABLE, write_year_backup
+from .config import load_env_file
+from .constants import STATUS_CANCELADO, STATUS_FINALIZADO, STATUS_MONITORADO
+from .repository import (
+    EXPORT_BATCH_SIZE,
+    MONITORAMENTO_BACKUP_COLUMNS,
+    RESTORE_FAIL,
+    RESTORE_POLICIES,
+    TALAO_DETAIL_COLUMNS,
+    build_repository,
+)
+
+_CIDADES = (
+    "CAPITAL",
+    "SÃO JOSÉ",
+    "CAMPINAS",
+    "SANTOS",
+    "JUNDIAÍ",
+    "SOROCABA",
+    "RIBEIRÃO PRETO",
+    "BAURU",
+    "MARÍLIA",
+    "PIRACICABA",
+    "TAUBATÉ",
+    "FRANCA",
+)
+_SOBRENOMES = (
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "LIMA", "PEREIRA", "FERREIRA", "COSTA", "RODRIGUES", "ALMEIDA",
+    "NASCIMENTO", "ARAÚJO", "CARVALHO", "GOMES", "MARTINS", "ROCHA", "RIBEIRO", "ALVES", "MONTEIRO", "MENDES",
+    "BARROS", "FREITAS", "BARBOSA", "PINTO", "MOURA", "CAVALCANTI", "DIAS", "CASTRO", "CAMPOS", "CARDOSO",
+)
+_NOMES = (
+    "ANA", "JOÃO", "MARIA", "JOSÉ", "PAULO", "CARLOS", "LUCAS", "JULIANA", "FERNANDA", "MARCOS",
+    "PATRÍCIA", "RAFAEL", "BRUNO", "CAMILA", "ANDRÉ", "LETÍCIA", "RODRIGO", "BEATRIZ", "FÁBIO", "SÉRGIO",
+)
+# Delegacias: distritos da capital e de cidades do interior; peso cai com a posicao (Zipf).
+DELEGACIAS = tuple(f"{numero}º DP {cidade}" for cidade in _CIDADES for numero in range(1, 5)) + (
+    "DEIC",
+    "DHPP",
+    "DDM CAPITAL",
+    "DELEGACIA DE ROUBO A BANCOS",
+)
+NATUREZAS = (
+    ("FURTO", 26),
+    ("ROUBO", 20),
+    ("FURTO DE VEÍCULO", 12),
+    ("ROUBO DE VEÍCULO", 9),
+    ("ARROMBAMENTO", 8),
+    ("DANO", 6),
+    ("LOCALIZAÇÃO DE VEÍCULO", 6),
+    ("HOMICÍDIO", 3),
+    ("TENTATIVA DE HOMICÍDIO", 2),
+    ("LATROCÍNIO", 1),
+    ("OUTROS", 7),
+)
+EQUIPES = ("ALFA", "BRAVO", "CHARLIE", "DELTA")
+SOLICITANTES = ("ESCRIVÃO", "INVESTIGADOR", "AGENTE", "DELEGADO DE PLANTÃO", "PERITO")
+CANCEL_REASONS = (
+    "CANCELADO A PEDIDO DA AUTORIDADE",
+    "LOCAL NÃO PRESERVADO",
+    "SOLICITAÇÃO EM DUPLICIDADE",
+    "VÍTIMA NÃO LOCALIZADA",
+)
+# Intervalos de alerta escolhidos na tela (minutos) e peso de cada um.
+ALERT_INTERVALS = ((5, 5), (15, 15), (30, 60), (60, 20))
+# Taloes dos ultimos dias antes de ``hoje`` ainda estao em atendimento (metade monitorada).
+RECENT_DAYS = 3
+
+
+def _cumulative(weights):
+    """Pesos acumulados para ``random.choices`` (mais rapido que pesos simples)."""
+    return list(itertools.accumulate(weights))
+
+
+_DELEGACIA_CUM = _cumulative(1.0 / (posicao + 1) ** 0.8 for posicao in range(len(DELEGACIAS)))
+_NATUREZA_VALUES = tuple(natureza for natureza, _ in NATUREZAS)
+_NATUREZA_CUM = _cumulative(peso for _, peso in NATUREZAS)
+_INTERVAL_VALUES = tuple(intervalo for intervalo, _ in ALERT_INTERVALS)
+_INTERVAL_CUM = _cumulative(peso for _, peso in ALERT_INTERVALS)
+# Prefixo de boletim de cada delegacia: duas letras fixas (AA, AB, ...).
+_BOLETIM_PREFIXOS = {
+    delegacia: chr(65 + indice // 26) + chr(65 + indice % 26) for indice, delegacia in enumerate(DELEGACIAS)
+}
+
+
+def _pessoa(nome, sobrenome):
+    """Nome completo a partir de posicoes (circulares) nas listas de nomes e sobrenomes."""
+    return f"{_NOMES[nome % len(_NOMES)]} {_SOBRENOMES[sobrenome % len(_SOBRENOMES)]}"
+
+
+# Tres autoridades por delegacia e cinco operadores fixos por equipe de plantao.
+_AUTORIDADES = {
+    delegacia: tuple(f"DR. {_pessoa(i + 7 * k, i + 11 * k)}" for k in range(3))
+    for i, delegacia in enumerate(DELEGACIAS)
+}
+_OPERADORES = {equipe: tuple(_pessoa(i * 5 + k, i * 7 + k) for k in range(5)) for i, equipe in enumerate(EQUIPES)}
+_SOLICITANTES = tuple(f"{cargo} {sobrenome}" for cargo in SOLICITANTES for sobrenome in _SOBRENOMES)
+# Enderecos e tabelas de valores montados uma vez: a geracao so sorteia indices.
+_ENDERECOS = tuple(
+    f"{tipo} {nome} {sobrenome}, {(indice * 37) % 3999 + 1}"
+    for indice, (tipo, nome, sobrenome) in enumerate(
+        (tipo, nome, sobrenome) for tipo in ("RUA", "AV.") for nome in _NOMES for sobrenome in _SOBRENOMES
+    )
+)
+_BOLETIM_NUMEROS = tuple(f"{numero:04d}" for numero in range(1, 10000))
+# Sufixo do boletim e peso de cada um; None vira "NÃO INFORMADO".
+_BOLETIM_SUFIXOS = (("", 90), ("-1", 5), ("-2", 3), (None, 2))
+_SUFIXO_VALUES = tuple(sufixo for sufixo, _ in _BOLETIM_SUFIXOS)
+_SUFIXO_CUM = _cumulative(peso for _, peso in _BOLETIM_SUFIXOS)
+_HORAS = tuple(time(minuto // 60, minuto % 60) for minuto in range(1440))
+_SEGUNDOS = tuple(timedelta(seconds=segundo) for segundo in range(60))
+_DURACOES = tuple(timedelta(minutes=minutos) for minutos in range(20, 361))
+_ATRASO_BO = (timedelta(0), timedelta(0), timedelta(0), timedelta(days=1), timedelta(days=2))
+_VITIMAS = ("1", "1", "1", "1", "2", "2", "3", "4")
+_MINUTOS = tuple(timedelta(minutes=minuto) for minuto in range(1440))
+_DIA_SEMANA_FATOR = (1.0, 1.0, 1.0, 1.0, 1.1, 0.8, 0.7)
+
+
+def _equipe_de_plantao(dia, hora):
+    """Equipe do turno: quatro equipes em revezamento 12x36 (dia 07-19h, noite 19-07h)."""
+    turno = dia.toordinal() * 2 + (0 if 7 <= hora < 19 else 1)
+    if hora < 7:
+        turno -= 2
+    return EQUIPES[turno % len(EQUIPES)]
+
+
+def _status(sorteio, recente):
+    """Status do talao: recentes metade monitorados; antigos quase todos encerrados."""
+    if recente:
+        return STATUS_MONITORADO if sorteio < 0.5 else (STATUS_CANCELADO if sorteio > 0.96 else STATUS_FINALIZADO)
+    if sorteio < 0.01:
+        return STATUS_MONITORADO
+    return STATUS_CANCELADO if sorteio > 0.94 else STATUS_FINALIZADO
+
+
+def _dias(ano, hoje):
+    """Dias do ano ate a vespera de ``hoje``."""
+    dia = date(ano, 1, 1)
+    fim = min(date(ano, 12, 31), hoje - timedelta(days=1))
+    while dia <= fim:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def generate_year(ano, por_dia, seed=0, primeiro_id=1, hoje=None, monitoramento=None, primeiro_monitoramento_id=1):
+    """Gera as linhas de taloes do ano (``TALAO_DETAIL_COLUMNS``), dia a dia.
+
+    Ids sequenciais a partir de ``primeiro_id``; numeros de talao de 1 em
+    diante, na ordem de data/hora. ``hoje`` (padrao: 1 de janeiro do ano
+    seguinte) separa os dias recentes, ainda em atendimento, e e a
+    referencia dos alertas. As linhas de monitoramento dos taloes
+    monitorados sao acrescentadas em ``monitoramento`` (lista), quando
+    informada, com ids a partir de ``primeiro_monitoramento_id``. O
+    resultado depende so de ``seed`` e dos parametros.
+    """
+    hoje = hoje or date(ano + 1, 1, 1)
+    agora = datetime.combine(hoje, time(8, 0))
+    rng = random.Random(f"afis-sintetico:{seed}:{ano}")
+    talao_id = primeiro_id
+    numero = 0
+    for dia in _dias(ano, hoje):
+        quantidade = max(0, round(por_dia * _DIA_SEMANA_FATOR[dia.weekday()] * rng.uniform(0.8, 1.2)))
+        if not quantidade:
+            continue
+        recente = (hoje - dia).days <= RECENT_DAYS
+        inicio_dia = datetime.combine(dia, time())
+        # Cada campo e sorteado para o dia inteiro de uma vez (bem mais rapido que
+        # um sorteio por linha) e sempre na mesma ordem, para o resultado so
+        # depender da semente.
+        minutos = sorted(min(1439, int(rng.triangular(0, 1440, 840))) for _ in range(quantidade))
+        sorteios = [rng.random() for _ in range(quantidade)]
+        colunas = zip(
+            minutos,
+            rng.choices(DELEGACIAS, cum_weights=_DELEGACIA_CUM, k=quantidade),
+            rng.choices(_NATUREZA_VALUES, cum_weights=_NATUREZA_CUM, k=quantidade),
+            sorteios,
+            rng.choices(range(3), k=quantidade),
+            rng.choices(range(5), k=quantidade),
+            rng.choices(_SOLICITANTES, k=quantidade),
+            rng.choices(_ENDERECOS, k=quantidade),
+            rng.choices(_BOLETIM_NUMEROS, k=quantidade),
+            rng.choices(_SUFIXO_VALUES, cum_weights=_SUFIXO_CUM, k=quantidade),
+            rng.choices(_ATRASO_BO, k=quantidade),
+            rng.choices(_VITIMAS, k=quantidade),
+            rng.choices(_SEGUNDOS, k=quantidade),
+            rng.choices(_DURACOES, k=quantidade),
+            rng.choices(CANCEL_REASONS, k=quantidade),
+            rng.choices(_INTERVAL_VALUES, cum_weights=_INTERVAL_CUM, k=quantidade),
+            [rng.random() for _ in range(quantidade)],
+        )
+        linhas = []
+        for (
+            minuto,
+            delegacia,
+            natureza,
+            sorteio,
+            autoridade,
+            operador,
+            solicitante,
+            endereco,
+            boletim_numero,
+            boletim_sufixo,
+            atraso_bo,
+            vitimas,
+            segundos,
+            duracao,
+            motivo,
+            intervalo,
+            alerta,
+        ) in colunas:
+            numero += 1
+            hora = _HORAS[minuto]
+            criado_em = inicio_dia + _MINUTOS[minuto] + segundos
+            equipe = _equipe_de_plantao(dia, minuto // 60)
+            status = _status(sorteio, recente)
+            finalizado = status == STATUS_FINALIZADO
+            if boletim_sufixo is None:
+                boletim = "NÃO INFORMADO"
+            else:
+                boletim = _BOLETIM_PREFIXOS[delegacia] + boletim_numero + boletim_sufixo
+            linhas.append(
+                (
+                    talao_id,
+                    ano,
+                    numero,
+                    dia,
+                    hora,
+                    delegacia,
+                    _AUTORIDADES[delegacia][autoridade],
+                    solicitante,
+                    endereco,
+                    boletim,
+                    natureza if finalizado else None,
+                    dia - atraso_bo if finalizado else None,
+                    vitimas if finalizado else None,
+                    equipe if finalizado else None,
+                    _OPERADORES[equipe][operador],
+                    status,
+                    motivo if status == STATUS_CANCELADO else None,
+                    criado_em,
+                    criado_em if status == STATUS_MONITORADO else criado_em + duracao,
+                )
+            )
+            if status == STATUS_MONITORADO and monitoramento is not None:
+                # Parte dos alertas ja vencida em ``hoje``, parte ainda por vir.
+                proximo = agora + timedelta(minutes=round((alerta * 2 - 1) * intervalo))
+                monitoramento_id = primeiro_monitoramento_id + len(monitoramento)
+                monitoramento.append((monitoramento_id, talao_id, proximo, intervalo, criado_em))
+            talao_id += 1
+        yield from linhas
+
+
+def per_day_for_rows(linhas, anos):
+    """Media de taloes por dia que gera cerca de ``linhas`` taloes em ``anos`` anos."""
+    fator = sum(_DIA_SEMANA_FATOR) / len(_DIA_SEMANA_FATOR)
+    return max(1, round(linhas / (anos * 365.25 * fator)))
+
+
+def _batched(rows, batch_size):
+    """Agrupa ``rows`` em listas de ate ``batch_size`` linhas."""
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def year_tables(
+    ano, por_dia, seed=0, primeiro_id=1, hoje=None, batch_size=EXPORT_BATCH_SIZE, primeiro_monitoramento_id=1
+):
+    """Lotes do ano por tabela: ``[(tabela, colunas, lotes), ...]`` no formato de ``write_year_backup``.
+
+    O monitoramento e preenchido enquanto os taloes sao gerados, entao os
+    lotes de taloes precisam ser consumidos primeiro (como no backup).
+    """
+    monitoramento = []
+    taloes = _batched(
+        generate_year(ano, por_dia, seed, primeiro_id, hoje, monitoramento, primeiro_monitoramento_id), batch_size
+    )
+    return [
+        (TALOES_TABLE, list(TALAO_DETAIL_COLUMNS), taloes),
+        # O gerador so le a lista no primeiro lote pedido, depois dos taloes.
+        (MONITORAMENTO_TABLE, list(MONITORAMENTO_BACKUP_COLUMNS), _batched(monitoramento, batch_size)),
+    ]
+
+
+def generate_batches(
+    anos, por_dia, seed=0, primeiro_id=1, hoje=None, batch_size=EXPORT_BATCH_SIZE, primeiro_monitoramento_id=1
+):
+    """Lotes ``(tabela, linhas)`` de varios anos, no formato de ``repo.restore_rows``.
+
+    Os ids (de taloes e de monitoramento) continuam de um ano para o outro;
+    o monitoramento de cada ano vem depois dos seus taloes.
+    """
+    proximo_id, proximo_monitoramento_id = primeiro_id, primeiro_monitoramento_id
+    for ano in anos:
+        tables = year_tables(ano, por_dia, seed, proximo_id, hoje, batch_size, proximo_monitoramento_id)
+        for table_name, _, batches in tables:
+            tabela = "taloes" if table_name == TALOES_TABLE else "monitoramento"
+            for batch in batches:
+                if tabela == "taloes":
+                    proximo_id = batch[-1][0] + 1
+                else:
+                    proximo_monitoramento_id = batch[-1][0] + 1
+                yield tabela, batch
+
+
+def load_repository(
+    repo, anos, por_dia, seed=0, primeiro_id=1, hoje=None, policy=RESTORE_FAIL, batch_size=EXPORT_BATCH_SIZE
+):
+    """Grava a massa sintetica em ``repo`` (uma transacao de ``restore_rows`` por ano) e retorna totais e vazao."""
+    totais = {"taloes": 0, "monitoramento": 0, "ignorados": 0, "substituidos": 0, "excluidos": 0}
+    inicio = _time.perf_counter()
+    proximos = {"taloes": primeiro_id, "monitoramento": 1}
+
+    def _lotes(ano):
+        lotes = generate_batches([ano], por_dia, seed, proximos["taloes"], hoje, batch_size, proximos["monitoramento"])
+        for tabela, linhas in lotes:
+            proximos[tabela] = linhas[-1][0] + 1
+            yield tabela, linhas
+
+    for ano in anos:
+        for chave, valor in repo.restore_rows(_lotes(ano), policy=policy).items():
+            totais[chave] += valor
+    return _with_throughput(totais, inicio, totais["taloes"] + totais["monitoramento"])
+
+
+def write_backup_files(pasta, anos, por_dia, seed=0, primeiro_id=1, hoje=None, suffix=".sql.gz"):
+    """Grava um backup completo por ano em ``pasta`` e retorna ``{"arquivos": [...], ...}`` com totais e vazao."""
+    os.makedirs(pasta, exist_ok=True)
+    inicio = _time.perf_counter()
+    arquivos, linhas, proximo_id, proximo_monitoramento_id = [], 0, primeiro_id, 1
+    for ano in anos:
+        path = os.path.join(pasta, f"backup_afis_{ano}_sintetico{suffix}")
+        # Ids de monitoramento tambem continuam: os scripts de cada ano rodam no mesmo banco.
+        tables = year_tables(ano, por_dia, seed, proximo_id, hoje, primeiro_monitoramento_id=proximo_monitoramento_id)
+        gravados = write_year_backup(path, ano, tables)
+        arquivos.append(path)
+        linhas += sum(gravados.values())
+        proximo_id += gravados[TALOES_TABLE]
+        proximo_monitoramento_id += gravados[MONITORAMENTO_TABLE]
+    return _with_throughput({"arquivos": arquivos}, inicio, linhas)
+
+
+def _with_throughput(totais, inicio, linhas):
+    """Acrescenta ``linhas``, ``segundos`` e ``linhas_por_segundo`` ao resultado."""
+    segundos = _time.perf_counter() - inicio
+    totais.update(
+        linhas=linhas,
+        segundos=round(segundos, 3),
+        linhas_por_segundo=round(linhas / segundos) if segundos > 0 else linhas,
+    )
+    return totais
+
+
+def main(argv=None):
+    """Linha de comando: gera a massa sintetica no banco do ``.env`` ou em arquivos de backup."""
+    parser = argparse.ArgumentParser(
+        prog="python -m afis_app.synthetic",
+        description="Gera talões e monitoramento sintéticos (determinísticos pela semente) "
+        "para testes de desempenho.",
+    )
+    parser.add_argument("--anos", type=int, default=1, help="quantidade de anos, terminando em --ate (padrão: 1)")
+    parser.add_argument(
+        "--ate", type=int, default=date.today().year - 1, help="último ano gerado (padrão: ano passado)"
+    )
+    parser.add_argument("--por-dia", type=int, default=100, help="média de talões por dia (padrão: 100)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do gerador (padrão: 0)")
+    parser.add_argument("--primeiro-id", type=int, default=1, help="id do primeiro talão gerado (padrão: 1)")
+    parser.add_argument(
+        "--hoje",
+        type=date.fromisoformat,
+        default=None,
+        help="data de referência AAAA-MM-DD: dias recentes ficam monitorados (padrão: dia seguinte a --ate)",
+    )
+    parser.add_argument("--pasta", help="grava arquivos de backup nesta pasta em vez de gravar no banco")
+    parser.add_argument("--compressao", choices=("nenhuma", "gzip", "zstd"), default="gzip")
+    parser.add_argument(
+        "--politica",
+        choices=RESTORE_POLICIES,
+        default=RESTORE_FAIL,
+        help="talão já existente no banco: fail desfaz o ano, skip mantém, overwrite substitui (padrão: fail)",
+    )
+    args = parser.parse_args(argv)
+
+    anos = range(args.ate - max(1, args.anos) + 1, args.ate + 1)
+    hoje = args.hoje or date(args.ate + 1, 1, 1)
+    if args.pasta:
+        suffix = {"nenhuma": ".sql", "gzip": ".sql.gz", "zstd": ".sql.zst"}[args.compressao]
+        totais = write_backup_files(
+            args.pasta, anos, max(1, args.por_dia), args.semente, args.primeiro_id, hoje, suffix
+        )
+        for path in totais["arquivos"]:
+            print(path)
+    else:
+        load_env_file()
+        repo = build_repository()
+        try:
+            totais = load_repository(
+                repo, anos, max(1, args.por_dia), args.semente, args.primeiro_id, hoje, policy=args.politica
+            )
+        finally:
+            repo.close()
+        print(f"Talões gravados: {totais['taloes']}\nMonitoramentos gravados: {totais['monitoramento']}")
+    print(f"Linhas: {totais['linhas']} em {totais['segundos']:.2f} s ({totais['linhas_por_segundo']} linhas/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Reconciliacao incremental de ``ttk.Treeview`` por id de linha.
+
+O calculo das diferencas (``compute_diff``) e puro e nao depende de Tk, o
+que permite medir e testar sem display. ``TreeSync`` guarda o estado exibido
+e aplica no widget apenas o necessario: exclusoes e desanexacoes em uma
+chamada cada, insercoes/movimentos por posicao e ``item()`` so para linhas
+com valores ou tags diferentes. Linhas mantidas nao sao recriadas, entao
+selecao, foco e rolagem sao preservados.
+"""
+
+from bisect import bisect_left
+
+
+class TreeDiff:
+    """Operacoes para levar a grade do estado atual ao desejado."""
+
+    def __init__(self):
+        self.removed = []
+        self.detached = []
+        self.placements = []
+        self.updated = []
+
+    @property
+    def empty(self):
+        """Indica se a grade ja esta no estado desejado."""
+        return not (self.removed or self.placements or self.updated)
+
+    def tk_calls(self):
+        """Quantidade de chamadas ao widget necessarias para aplicar a diferenca."""
+        return int(bool(self.removed)) + int(bool(self.detached)) + len(self.placements) + len(self.updated)
+
+
+def _longest_increasing_run(positions):
+    """Retorna os indices de uma maior subsequencia crescente de ``positions``."""
+    tails = []
+    tails_index = []
+    previous = [-1] * len(positions)
+    for index, value in enumerate(positions):
+        slot = bisect_left(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tails_index.append(index)
+        else:
+            tails[slot] = value
+            tails_index[slot] = index
+        previous[index] = tails_index[slot - 1] if slot else -1
+
+    result = set()
+    index = tails_index[-1] if tails_index else -1
+    while index != -1:
+        result.add(index)
+        index = previous[index]
+    return result
+
+
+def compute_diff(current_order, current_items, desired_order, desired_items):
+    """Calcula a diferenca entre duas grades.
+
+    ``*_order`` sao listas de iids na ordem de exibicao e ``*_items`` mapeiam
+    iid -> ``(values, tags)``. Linhas mantidas que pertencem a maior
+    subsequencia ja ordenada ficam paradas; as demais sao desanexadas e
+    reposicionadas, o que minimiza movimentos.
+    """
+    diff = TreeDiff()
+    position = {iid: index for index, iid in enumerate(current_order)}
+    diff.removed = [iid for iid in current_order if iid not in desired_items]
+
+    retained = [iid for iid in desired_order if iid in position]
+    stay = {retained[i] for i in _longest_increasing_run([position[iid] for iid in retained])}
+    diff.detached = [iid for iid in retained if iid not in stay]
+
+    # Depois de excluir e desanexar, o widget contem so as linhas "stay" em
+    # ordem; inserir/mover em indice crescente coloca cada linha no lugar.
+    for index, iid in enumerate(desired_order):
+        if iid not in position:
+            diff.placements.append((index, iid, True))
+            continue
+        if iid not in stay:
+            diff.placements.append((index, iid, False))
+        if current_items[iid] != desired_items[iid]:
+            diff.updated.append(iid)
+    return diff
+
+
+class TreeSync:
+    """Mantem um ``ttk.Treeview`` sincronizado com linhas identificadas por iid.
+
+    Cada linha e ``(iid, chave, values, tags)``; a chave ordena as linhas em
+    ``apply_changes`` (atualizacao incremental).
+    """
+
+    def __init__(self, tree, parent="", descending=True):
+        self.tree = tree
+        self.parent = parent
+        self.descending = descending
+        self.order = []
+        self.items = {}
+        self.keys = {}
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, iid):
+        return iid in self.items
+
+    def reconcile(self, rows):
+        """Leva a grade exatamente para ``rows`` (na ordem informada)."""
+        desired_order = []
+        desired_items = {}
+        keys = {}
+        for iid, key, values, tags in rows:
+            iid = str(iid)
+            desired_order.append(iid)
+            desired_items[iid] = (tuple(values), tuple(tags))
+            keys[iid] = key
+
+        diff = compute_diff(self.order, self.items, desired_order, desired_items)
+        if not diff.empty:
+            self._apply(diff, desired_items)
+        self.order = desired_order
+        self.items = desired_items
+        self.keys = keys
+        return diff
+
+    def apply_changes(self, rows, removed_ids=()):
+        """Mescla linhas alteradas e remocoes ao estado atual e reconcilia pela chave."""
+        merged = {iid: (self.keys[iid], *self.items[iid]) for iid in self.order}
+        for iid in removed_ids:
+            merged.pop(str(iid), None)
+        for iid, key, values, tags in rows:
+            merged[str(iid)] = (key, values, tags)
+        ordered = sorted(merged.items(), key=lambda item: item[1][0], reverse=self.descending)
+        return self.reconcile((iid, key, values, tags) for iid, (key, values, tags) in ordered)
+
+    def clear(self):
+        """Remove todas as linhas controladas."""
+        return self.reconcile(())
+
+    def _apply(self, diff, desired_items):
+        """Executa a diferenca no widget preservando selecao e foco."""
+        tree = self.tree
+        selection = tree.selection()
+        focus = tree.focus()
+
+        if diff.removed:
+            tree.delete(*diff.removed)
+        if diff.detached:
+            tree.detach(*diff.detached)
+        for index, iid, novo in diff.placements:
+            if novo:
+                values, tags = desired_items[iid]
+                tree.insert(self.parent, index, iid=iid, values=values, tags=tags)
+            else:
+                tree.move(iid, self.parent, index)
+        for iid in diff.updated:
+            values, tags = desired_items[iid]
+            tree.item(iid, values=values, tags=tags)
+
+        if diff.detached:
+            # Desanexar pode tirar a linha da selecao; restaura o que continua na grade.
+            kept = [iid for iid in selection if iid in desired_items]
+            if kept:
+                tree.selection_set(kept)
+            if focus and focus in desired_items:
+                tree.focus(focus)
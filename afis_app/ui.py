@@ -1,10 +1,10 @@
 import tkinter as tk
-import csv
 import html
 import logging
 import os
 import re
 import sys
+import threading
 import webbrowser
 from datetime import date, datetime, time
 from pathlib import Path
@@ -16,23 +16,25 @@ try:
 except ImportError:
     ctk = None
 
-try:
-    from openpyxl import load_workbook
-except ImportError:
-    load_workbook = None
-
 from .constants import (
     EDITABLE_FIELDS,
     FIELD_LABELS,
+    SEARCH_MODE_CONTAINS,
+    SEARCH_MODE_PREFIX,
     STATUS_CANCELADO,
     STATUS_FINALIZADO,
     STATUS_MONITORADO,
     STATUS_OPCOES,
 )
 from .config import get_env
+from . import backup
+from .alert_scheduler import AlertScheduler
+from .executor import DBExecutor
+from .exports import ExportCancelled, report_xlsx_cells, write_csv, write_xlsx_template
 from .interfaces import TalaoRepository
-from .repository import ConcurrencyError, DuplicateTalaoError
+from .repository import SEARCH_PAGE_SIZE, TALAO_DETAIL_COLUMNS, ConcurrencyError, DuplicateTalaoError
 from .services import AlertaService, TalaoService
+from .tree_sync import TreeSync
 
 logger = logging.getLogger(__name__)
 
@@ -178,18 +180,22 @@ class TalaoEditor(tk.Toplevel):
         self,
         parent,
         repo: TalaoRepository,
+        db: DBExecutor,
         talao_service: TalaoService,
         alerta_service: AlertaService,
-        talao_id,
+        record,
         intervalo_min,
         on_saved,
     ):
         super().__init__(parent)
         self.repo = repo
+        self.db = db
         self.talao_service = talao_service
         self.alerta_service = alerta_service
-        self.talao_id = talao_id
+        self.record = record
+        self.talao_id = record.get("id")
         self.on_saved = on_saved
+        self.salvando = False
         self.title("Editar Talão")
         self.geometry("450x610")
         self.minsize(450, 610)
@@ -204,12 +210,6 @@ class TalaoEditor(tk.Toplevel):
         _apply_toplevel_theme(self, bg_key="surface")
 
         row = 0
-        record = self.repo.get_talao(talao_id)
-        if not record:
-            messagebox.showerror("Erro", "Talão não encontrado.")
-            self.destroy()
-            return
-        self.record = record
 
         if self.use_ctk:
             self.form_parent = ctk.CTkFrame(
@@ -452,6 +452,8 @@ class TalaoEditor(tk.Toplevel):
 
     def save(self):
         """Valida e persiste alteracoes do talao em edicao."""
+        if self.salvando:
+            return
         data = self._collect()
 
         try:
@@ -481,33 +483,51 @@ class TalaoEditor(tk.Toplevel):
                     parent=self,
                 )
 
-        try:
-            self.repo.update_talao(
-                self.talao_id,
-                normalized,
-                int(self.intervalo_var.get()),
-                expected_updated_at=self.record.get("atualizado_em"),
-            )
-            self.on_saved()
+        intervalo = int(self.intervalo_var.get())
+        self.salvando = True
+        self.db.submit(
+            self.repo.update_talao,
+            self.talao_id,
+            normalized,
+            intervalo,
+            expected_version=self.record.get("versao"),
+            on_success=lambda _result: self._on_save_success(normalized.get("status"), intervalo),
+            on_error=self._on_save_error,
+        )
+
+    def _on_save_success(self, status, intervalo_min):
+        """Fecha o editor e avisa o dashboard do status/intervalo gravados."""
+        self.salvando = False
+        self.on_saved(self.talao_id, status, intervalo_min)
+        if self.winfo_exists():
             self.destroy()
-        except ConcurrencyError as exc:
+
+    def _on_save_error(self, exc):
+        """Trata falha de gravacao vinda da thread de banco."""
+        self.salvando = False
+        if isinstance(exc, ConcurrencyError):
             messagebox.showwarning("Conflito de edição", str(exc))
-            self.on_saved()
-            self.destroy()
-        except Exception:
-            logger.exception("Falha ao atualizar talão %s", self.talao_id)
-            messagebox.showerror("Erro", "Falha ao atualizar talão. Verifique os dados e tente novamente.")
+            self.on_saved(self.talao_id, None, None)
+            if self.winfo_exists():
+                self.destroy()
+            return
+        logger.error("Falha ao atualizar talão %s", self.talao_id, exc_info=exc)
+        messagebox.showerror("Erro", "Falha ao atualizar talão. Verifique os dados e tente novamente.")
 
 
 class RelatorioPeriodoWindow(tk.Toplevel):
     """Janela modal para gerar relatorios por periodo."""
 
-    def __init__(self, parent, repo: TalaoRepository):
+    def __init__(self, parent, repo: TalaoRepository, db: DBExecutor):
         super().__init__(parent)
         self.repo = repo
+        self.db = db
+        self.gerando = False
+        self.cancelar_evento = None
+        self.progresso_var = tk.StringVar(value="")
         self.title("Relatórios por Período")
-        self.geometry("210x180")
-        self.minsize(210, 180)
+        self.geometry("210x210")
+        self.minsize(210, 210)
         self.resizable(True, True)
         self.date_placeholder_active = {"inicio": False, "fim": False}
         self.use_ctk = ctk is not None
@@ -563,7 +583,11 @@ class RelatorioPeriodoWindow(tk.Toplevel):
                 font=BUTTON_FONT_BOLD,
                 width=120,
             ).pack(side="left", padx=(8, 0))
-            _build_button(actions, "Cancelar", self.destroy, "neutral", use_ctk=True, width=120).pack(side="left", padx=(8, 0))
+            _build_button(actions, "Cancelar", self.cancelar, "neutral", use_ctk=True, width=120).pack(side="left", padx=(8, 0))
+
+            ctk.CTkLabel(container, textvariable=self.progresso_var, text_color=UI_THEME["muted"]).grid(
+                row=4, column=0, columnspan=2, sticky="w", padx=14, pady=(0, 10)
+            )
 
             container.columnconfigure(1, weight=1)
         else:
@@ -610,17 +634,30 @@ class RelatorioPeriodoWindow(tk.Toplevel):
             actions.grid(row=3, column=0, columnspan=2, sticky="ew", pady=(14, 0))
             _build_button(actions, "Excel", self.gerar_modelo_xlsx, "success").pack(side="left")
             _build_button(actions, "CSV", self.gerar_csv, "warning").pack(side="left", padx=(8, 0))
-            _build_button(actions, "Cancelar", self.destroy, "neutral").pack(side="left", padx=(8, 0))
+            _build_button(actions, "Cancelar", self.cancelar, "neutral").pack(side="left", padx=(8, 0))
+
+            tk.Label(frame, textvariable=self.progresso_var, bg=UI_THEME["surface"], fg=UI_THEME["muted"]).grid(
+                row=4, column=0, columnspan=2, sticky="w", pady=(8, 0)
+            )
 
         self._bind_date_placeholder(self.data_inicio_entry, "inicio")
         self._bind_date_placeholder(self.data_fim_entry, "fim")
         self._set_date_placeholder(self.data_inicio_entry, "inicio")
         self._set_date_placeholder(self.data_fim_entry, "fim")
 
+        self.protocol("WM_DELETE_WINDOW", self.cancelar)
         _center_toplevel_on_parent(self, parent)
         self.transient(parent)
         self.grab_set()
 
+    def cancelar(self):
+        """Interrompe a exportacao em andamento ou fecha a janela."""
+        if self.gerando and self.cancelar_evento is not None:
+            self.cancelar_evento.set()
+            self.progresso_var.set("Cancelando...")
+            return
+        self.destroy()
+
     def _parse_periodo(self):
         """Converte e valida datas de inicio/fim informadas no formulario."""
         data_inicio_txt = self._get_date_value(self.data_inicio_entry, "inicio")
@@ -677,42 +714,65 @@ class RelatorioPeriodoWindow(tk.Toplevel):
             return ""
         return widget.get().strip()
 
-    def _load_report_rows(self):
-        """Carrega linhas de relatorio para o periodo informado."""
-        try:
-            data_inicio, data_fim = self._parse_periodo()
-        except ValueError as exc:
-            messagebox.showwarning("Validação", str(exc))
-            return None
+    def _set_progresso(self, gravados, total):
+        """Mostra o andamento da exportacao (thread do Tk)."""
+        if self.winfo_exists() and not self.cancelar_evento.is_set():
+            self.progresso_var.set(f"Gravando... {gravados}/{total}")
+
+    def _exportar(self, data_inicio, data_fim, writer_fn, on_done, error_message, path, *args):
+        """Le o periodo em lotes e grava o arquivo em segundo plano, com progresso e cancelamento.
+
+        ``writer_fn(path, *args, columns, batches, progress=..., cancel=...)`` consome
+        ``repo.iter_taloes_by_period`` sem carregar o periodo inteiro em memoria.
+        """
+        self.gerando = True
+        cancel = self.cancelar_evento = threading.Event()
+        self.progresso_var.set("Consultando...")
+
+        def _job():
+            total = self.repo.count_taloes_by_period(data_inicio, data_fim)
+            self.db.post(self._set_progresso, 0, total)
+            return writer_fn(
+                path,
+                *args,
+                list(TALAO_DETAIL_COLUMNS),
+                self.repo.iter_taloes_by_period(data_inicio, data_fim),
+                progress=lambda gravados: self.db.post(self._set_progresso, gravados, total),
+                cancel=cancel,
+            )
 
-        try:
-            columns, rows = self.repo.list_taloes_by_period(data_inicio, data_fim)
-        except Exception:
-            logger.exception("Falha ao consultar talões para relatório")
-            messagebox.showerror("Erro", "Falha ao consultar dados para o relatório.")
-            return None
-        return data_inicio, data_fim, columns, rows
+        def _on_success(result):
+            self.gerando = False
+            on_done(result)
+            if self.winfo_exists():
+                self.destroy()
+
+        def _on_error(exc):
+            self.gerando = False
+            if isinstance(exc, ExportCancelled):
+                if self.winfo_exists():
+                    self.progresso_var.set("Exportação cancelada.")
+                return
+            logger.error("Falha ao gravar relatório em %s", path, exc_info=exc)
+            if self.winfo_exists():
+                self.progresso_var.set("")
+            messagebox.showerror("Erro", error_message)
+
+        self.db.submit(_job, on_success=_on_success, on_error=_on_error)
 
     def _resolve_modelo_path(self):
         """Retorna caminho absoluto do template XLSX de relatorio."""
         return Path(__file__).resolve().parent.parent / "assets" / "modelo.xlsx"
 
-    def _format_excel_date(self, value):
-        """Converte valores de data para formato de exibicao no Excel."""
-        if value is None:
-            return ""
-        if isinstance(value, datetime):
-            return value.strftime("%d/%m/%Y")
-        if isinstance(value, date):
-            return value.strftime("%d/%m/%Y")
-        return str(value)
-
     def gerar_csv(self):
         """Exporta relatorio de periodo para arquivo CSV."""
-        loaded = self._load_report_rows()
-        if loaded is None:
+        if self.gerando:
+            return
+        try:
+            data_inicio, data_fim = self._parse_periodo()
+        except ValueError as exc:
+            messagebox.showwarning("Validação", str(exc))
             return
-        data_inicio, data_fim, columns, rows = loaded
 
         nome_base = f"relatorio_taloes_{data_inicio.strftime('%Y%m%d')}_{data_fim.strftime('%Y%m%d')}.csv"
         path = filedialog.asksaveasfilename(
@@ -724,33 +784,24 @@ class RelatorioPeriodoWindow(tk.Toplevel):
         if not path:
             return
 
-        try:
-            with open(path, "w", encoding="utf-8-sig", newline="") as csv_file:
-                writer = csv.writer(csv_file, delimiter=";")
-                writer.writerow(columns)
-                for row in rows:
-                    writer.writerow(list(row))
-        except Exception:
-            logger.exception("Falha ao gravar relatório CSV em %s", path)
-            messagebox.showerror("Erro", "Falha ao gravar arquivo CSV.")
-            return
-
-        messagebox.showinfo("Relatório", f"Relatório gerado com sucesso.\nRegistros exportados: {len(rows)}")
-        self.destroy()
+        self._exportar(
+            data_inicio,
+            data_fim,
+            write_csv,
+            lambda total: messagebox.showinfo("Relatório", f"Relatório gerado com sucesso.\nRegistros exportados: {total}"),
+            "Falha ao gravar arquivo CSV.",
+            path,
+        )
 
     def gerar_modelo_xlsx(self):
         """Exporta relatorio para XLSX usando template institucional."""
-        if load_workbook is None:
-            messagebox.showerror(
-                "Dependência ausente",
-                "A biblioteca openpyxl não está instalada.\nInstale para habilitar a geração de XLSX pelo modelo.",
-            )
+        if self.gerando:
             return
-
-        loaded = self._load_report_rows()
-        if loaded is None:
+        try:
+            data_inicio, data_fim = self._parse_periodo()
+        except ValueError as exc:
+            messagebox.showwarning("Validação", str(exc))
             return
-        data_inicio, data_fim, columns, rows = loaded
 
         modelo_path = self._resolve_modelo_path()
         if not modelo_path.exists():
@@ -767,50 +818,33 @@ class RelatorioPeriodoWindow(tk.Toplevel):
         if not path:
             return
 
-        try:
-            wb = load_workbook(modelo_path)
-            ws = wb.active
-            col_idx = {name: idx for idx, name in enumerate(columns)}
-
-            max_row = max(ws.max_row, 7)
-            for row_idx in range(7, max_row + 1):
-                for col in range(1, 9):
-                    ws.cell(row=row_idx, column=col, value=None)
-
-            row_excel = 7
-            for row in rows:
-                values = list(row)
-                ano = values[col_idx["ano"]]
-                talao = values[col_idx["talao"]]
-                ws.cell(row=row_excel, column=1, value=self._format_excel_date(values[col_idx["data_solic"]]))
-                ws.cell(row=row_excel, column=2, value=format_talao(ano, talao))
-                ws.cell(row=row_excel, column=3, value=self._format_excel_date(values[col_idx["data_bo"]]))
-                ws.cell(row=row_excel, column=4, value=values[col_idx["boletim"]] or "")
-                ws.cell(row=row_excel, column=5, value=values[col_idx["delegacia"]] or "")
-                ws.cell(row=row_excel, column=6, value=values[col_idx["natureza"]] or "")
-                ws.cell(row=row_excel, column=7, value=values[col_idx["vitimas"]] or "")
-                ws.cell(row=row_excel, column=8, value=values[col_idx["equipe"]] or "")
-                row_excel += 1
-
-            wb.save(path)
-        except Exception:
-            logger.exception("Falha ao gerar XLSX de relatório com modelo em %s", path)
-            messagebox.showerror("Erro", "Falha ao gerar arquivo XLSX pelo modelo.")
-            return
-
-        messagebox.showinfo("Relatório", f"Relatório XLSX gerado com sucesso.\nRegistros exportados: {len(rows)}")
-        self.destroy()
+        self._exportar(
+            data_inicio,
+            data_fim,
+            write_xlsx_template,
+            lambda total: messagebox.showinfo(
+                "Relatório", f"Relatório XLSX gerado com sucesso.\nRegistros exportados: {total}"
+            ),
+            "Falha ao gerar arquivo XLSX pelo modelo.",
+            path,
+            modelo_path,
+            report_xlsx_cells,
+        )
 
 
 class BackupAnoWindow(tk.Toplevel):
     """Janela modal para gerar backup SQL por ano de referencia."""
 
-    def __init__(self, parent, repo: TalaoRepository):
+    def __init__(self, parent, repo: TalaoRepository, db: DBExecutor):
         super().__init__(parent)
         self.repo = repo
+        self.db = db
+        self.gerando = False
+        self.cancelar_evento = None
+        self.progresso_var = tk.StringVar(value="")
         self.title("Backup por Ano")
-        self.geometry("210x130")
-        self.minsize(210, 130)
+        self.geometry("210x160")
+        self.minsize(210, 160)
         self.resizable(True, True)
         self.ano_var = tk.StringVar(value=str(datetime.now().year - 1))
         self.use_ctk = ctk is not None
@@ -859,7 +893,13 @@ class BackupAnoWindow(tk.Toplevel):
                 font=BUTTON_FONT_BOLD,
                 width=160,
             ).pack(side="left")
-            _build_button(actions, "Cancelar", self.destroy, "neutral", use_ctk=True, width=120).pack(side="left", padx=(8, 0))
+            _build_button(
+                actions, "Incremental", lambda: self.gerar_backup(incremental=True), "warning", use_ctk=True, width=120
+            ).pack(side="left", padx=(8, 0))
+            _build_button(actions, "Cancelar", self.cancelar, "neutral", use_ctk=True, width=120).pack(side="left", padx=(8, 0))
+            ctk.CTkLabel(container, textvariable=self.progresso_var, text_color=UI_THEME["muted"]).grid(
+                row=3, column=0, columnspan=2, sticky="w", padx=14, pady=(0, 10)
+            )
             container.columnconfigure(1, weight=1)
         else:
             frame = tk.Frame(self, padx=12, pady=12, bg=UI_THEME["surface"])
@@ -889,43 +929,36 @@ class BackupAnoWindow(tk.Toplevel):
             actions = tk.Frame(frame, bg=UI_THEME["surface"])
             actions.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(6, 0))
             _build_button(actions, "Backup SQL", self.gerar_backup, "danger").pack(side="left")
-            _build_button(actions, "Cancelar", self.destroy, "neutral").pack(side="left", padx=(8, 0))
+            _build_button(actions, "Incremental", lambda: self.gerar_backup(incremental=True), "warning").pack(
+                side="left", padx=(8, 0)
+            )
+            _build_button(actions, "Cancelar", self.cancelar, "neutral").pack(side="left", padx=(8, 0))
+            tk.Label(frame, textvariable=self.progresso_var, bg=UI_THEME["surface"], fg=UI_THEME["muted"]).grid(
+                row=3, column=0, columnspan=2, sticky="w", pady=(8, 0)
+            )
 
+        self.protocol("WM_DELETE_WINDOW", self.cancelar)
         _center_toplevel_on_parent(self, parent)
         self.transient(parent)
         self.grab_set()
 
-    def _sql_literal(self, value):
-        """Converte valor Python para literal SQL seguro para script."""
-        if value is None:
-            return "NULL"
-        if isinstance(value, bool):
-            return "1" if value else "0"
-        if isinstance(value, datetime):
-            return f"'{value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}'"
-        if isinstance(value, date):
-            return f"'{value.strftime('%Y-%m-%d')}'"
-        if isinstance(value, time):
-            return f"'{value.strftime('%H:%M:%S')}'"
-        if isinstance(value, (int, float)):
-            return str(value)
-        text = str(value).replace("'", "''")
-        return f"N'{text}'"
-
-    def _build_insert_block(self, table_name, columns, rows):
-        """Monta bloco de INSERTs para uma tabela e conjunto de linhas."""
-        if not rows:
-            return [f"-- Nenhum registro para {table_name}."]
-        cols_sql = ", ".join(f"[{col}]" for col in columns)
-        lines = [f"SET IDENTITY_INSERT {table_name} ON;"]
-        for row in rows:
-            values_sql = ", ".join(self._sql_literal(v) for v in row)
-            lines.append(f"INSERT INTO {table_name} ({cols_sql}) VALUES ({values_sql});")
-        lines.append(f"SET IDENTITY_INSERT {table_name} OFF;")
-        return lines
+    def cancelar(self):
+        """Interrompe o backup em andamento ou fecha a janela."""
+        if self.gerando and self.cancelar_evento is not None:
+            self.cancelar_evento.set()
+            self.progresso_var.set("Cancelando...")
+            return
+        self.destroy()
 
-    def gerar_backup(self):
-        """Gera arquivo SQL de backup contendo dados de um ano."""
+    def _set_progresso(self, gravados):
+        """Mostra o andamento do backup (thread do Tk)."""
+        if self.winfo_exists() and not self.cancelar_evento.is_set():
+            self.progresso_var.set(f"Gravando... {gravados} registros")
+
+    def gerar_backup(self, incremental=False):
+        """Gera arquivo SQL de backup do ano: completo ou so as mudancas desde o ultimo backup da pasta."""
+        if self.gerando:
+            return
         ano_txt = self.ano_var.get().strip()
         try:
             ano = int(ano_txt)
@@ -936,73 +969,85 @@ class BackupAnoWindow(tk.Toplevel):
             messagebox.showwarning("Validação", "Informe um ano válido entre 1900 e 9999.")
             return
 
-        try:
-            taloes_cols, taloes_rows = self.repo.list_taloes_by_year(ano)
-            mon_cols, mon_rows = self.repo.list_monitoramento_by_year(ano)
-        except Exception:
-            logger.exception("Falha ao coletar dados para backup do ano %s", ano)
-            messagebox.showerror("Erro", "Falha ao consultar dados para backup.")
-            return
-
-        nome_base = f"backup_afis_{ano}.sql"
+        filetypes = [("SQL", "*.sql"), ("SQL gzip", "*.sql.gz")]
+        if backup.zstd is not None:
+            filetypes.append(("SQL zstd", "*.sql.zst"))
+        filetypes.append(("Todos os arquivos", "*.*"))
+        if incremental:
+            nome_base = f"backup_afis_{ano}_incremental_{datetime.now():%Y%m%d_%H%M%S}.sql"
+        else:
+            nome_base = f"backup_afis_{ano}.sql"
         path = filedialog.asksaveasfilename(
-            title="Salvar backup SQL",
+            title="Salvar backup incremental (pasta do backup completo)" if incremental else "Salvar backup SQL",
             defaultextension=".sql",
             initialfile=nome_base,
-            filetypes=[("SQL", "*.sql"), ("Todos os arquivos", "*.*")],
+            filetypes=filetypes,
         )
         if not path:
             return
 
-        lines = [
-            f"-- Backup AFIS ano {ano}",
-            "SET NOCOUNT ON;",
-            "BEGIN TRANSACTION;",
-            "BEGIN TRY",
-            "",
-            f"-- Tabela dbo.taloes ({len(taloes_rows)} registros)",
-        ]
-        lines.extend(self._build_insert_block("dbo.taloes", taloes_cols, taloes_rows))
-        lines.append("")
-        lines.append(f"-- Tabela dbo.monitoramento ({len(mon_rows)} registros)")
-        lines.extend(self._build_insert_block("dbo.monitoramento", mon_cols, mon_rows))
-        lines.extend(
-            [
-                "",
-                "COMMIT TRANSACTION;",
-                "END TRY",
-                "BEGIN CATCH",
-                "    IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;",
-                "    THROW;",
-                "END CATCH;",
-                "",
-            ]
-        )
+        self.gerando = True
+        cancel = self.cancelar_evento = threading.Event()
+        self.progresso_var.set("Consultando...")
 
-        try:
-            with open(path, "w", encoding="utf-8-sig", newline="") as f:
-                f.write("\n".join(lines))
-        except Exception:
-            logger.exception("Falha ao gravar backup SQL em %s", path)
+        def _job():
+            return backup.backup_year(
+                self.repo,
+                path,
+                ano,
+                incremental=incremental,
+                progress=lambda gravados: self.db.post(self._set_progresso, gravados),
+                cancel=cancel,
+            )
+
+        def _on_success(totais):
+            self.gerando = False
+            resumo = f"Talões: {totais['dbo.taloes']}\nMonitoramento: {totais['dbo.monitoramento']}"
+            if incremental:
+                resumo += f"\nExcluídos: {totais['excluidos']}"
+            messagebox.showinfo("Backup concluído", "Arquivo gerado com sucesso.\n" + resumo)
+            if self.winfo_exists():
+                self.destroy()
+
+        def _on_error(exc):
+            self.gerando = False
+            if isinstance(exc, ExportCancelled):
+                if self.winfo_exists():
+                    self.progresso_var.set("Backup cancelado.")
+                return
+            if isinstance(exc, backup.BackupManifestError):
+                if self.winfo_exists():
+                    self.progresso_var.set("")
+                messagebox.showwarning("Backup incremental", f"{exc}\nGere um backup completo nesta pasta primeiro.")
+                return
+            logger.error("Falha ao gerar backup SQL do ano %s em %s", ano, path, exc_info=exc)
+            if self.winfo_exists():
+                self.progresso_var.set("")
             messagebox.showerror("Erro", "Falha ao gravar arquivo de backup.")
-            return
 
-        messagebox.showinfo(
-            "Backup concluído",
-            f"Arquivo gerado com sucesso.\nTalões: {len(taloes_rows)}\nMonitoramento: {len(mon_rows)}",
-        )
-        self.destroy()
+        self.db.submit(_job, on_success=_on_success, on_error=_on_error)
 
 
 class BuscaTaloesWindow(tk.Toplevel):
-    """Janela modal para pesquisa de taloes com exportacao de resultado em HTML."""
+    """Janela modal para pesquisa de taloes com exportacao de resultado em HTML.
+
+    O resultado vem em paginas de ``SEARCH_PAGE_SIZE`` (cursor de chave do
+    repositorio); cada pagina abre em um HTML e a seguinte so e lida quando
+    o usuario pede "Próxima página".
+    """
 
-    def __init__(self, parent, repo: TalaoRepository):
+    def __init__(self, parent, repo: TalaoRepository, db: DBExecutor):
         super().__init__(parent)
         self.repo = repo
+        self.db = db
+        self._filters = None
+        self._next_cursor = None
+        self._pagina = 0
+        self._estimativa = None
+        self.pagina_var = tk.StringVar(value="")
         self.title("Busca de Talões")
-        self.geometry("540x250")
-        self.minsize(540, 250)
+        self.geometry("540x280")
+        self.minsize(540, 280)
         self.resizable(True, True)
 
         _apply_toplevel_theme(self)
@@ -1069,20 +1114,45 @@ class BuscaTaloesWindow(tk.Toplevel):
             else:
                 col = 2
 
+        # Busca por trecho nao usa indice; fica como opcao explicita.
+        self.busca_trecho_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            frame,
+            text="Buscar trecho em qualquer posição do texto (mais lento)",
+            variable=self.busca_trecho_var,
+            bg=UI_THEME["surface"],
+            fg=UI_THEME["text"],
+            activebackground=UI_THEME["surface"],
+            selectcolor=UI_THEME["surface_alt"],
+            font=("Segoe UI", 9),
+        ).grid(row=row + 1, column=0, columnspan=4, sticky="w", padx=0, pady=(6, 0))
+
         info = tk.Label(
             frame,
-            text="Preencha um ou mais campos. Quando houver mais de um, a busca usa condição E.",
+            text="Preencha um ou mais campos. Quando houver mais de um, a busca usa condição E.\n"
+            "Textos são comparados pelo início, sem diferenciar acentos e maiúsculas.",
+            justify="left",
             bg=UI_THEME["surface"],
             fg=UI_THEME["muted"],
             font=("Segoe UI", 9),
         )
-        info.grid(row=row + 1, column=0, columnspan=4, sticky="w", padx=4, pady=(8, 6))
+        info.grid(row=row + 2, column=0, columnspan=4, sticky="w", padx=4, pady=(4, 6))
 
         actions = tk.Frame(frame, bg=UI_THEME["surface"])
-        actions.grid(row=row + 2, column=0, columnspan=4, sticky="ew", padx=4, pady=(4, 0))
+        actions.grid(row=row + 3, column=0, columnspan=4, sticky="ew", padx=4, pady=(4, 0))
         _build_button(actions, "Buscar", self.buscar, "gold").pack(side="left")
         _build_button(actions, "Limpar", self.limpar_campos, "neutral").pack(side="left", padx=(8, 0))
         _build_button(actions, "Cancelar", self.destroy, "neutral").pack(side="left", padx=(8, 0))
+        self.proxima_btn = _build_button(actions, "Próxima página", self.proxima_pagina, "primary")
+        self.proxima_btn.pack(side="left", padx=(8, 0))
+        self.proxima_btn.configure(state="disabled")
+        tk.Label(
+            actions,
+            textvariable=self.pagina_var,
+            bg=UI_THEME["surface"],
+            fg=UI_THEME["muted"],
+            font=("Segoe UI", 9),
+        ).pack(side="left", padx=(8, 0))
 
         _center_toplevel_on_parent(self, parent)
         self.transient(parent)
@@ -1131,6 +1201,7 @@ class BuscaTaloesWindow(tk.Toplevel):
             if values[key]:
                 filters[key] = values[key]
 
+        filters["modo_texto"] = SEARCH_MODE_CONTAINS if self.busca_trecho_var.get() else SEARCH_MODE_PREFIX
         return filters
 
     def _format_html_value(self, value):
@@ -1145,8 +1216,18 @@ class BuscaTaloesWindow(tk.Toplevel):
             return value.strftime("%H:%M:%S")
         return str(value)
 
-    def _build_result_html(self, columns, rows):
+    def _describe_page(self, quantidade):
+        """Texto "Registros X–Y de N" da pagina atual, com a estimativa de total."""
+        inicio = (self._pagina - 1) * SEARCH_PAGE_SIZE + 1
+        fim = inicio + quantidade - 1
+        total, exato = self._estimativa
+        total_txt = f"{total:,}".replace(",", ".")
+        return f"Registros {inicio}–{fim} de {total_txt if exato else 'mais de ' + total_txt}"
+
+    def _build_result_html(self, columns, rows, meta=None):
         """Monta documento HTML com resultados da pesquisa."""
+        if meta is None:
+            meta = f"Registros encontrados: {len(rows)}"
         header_cells = "".join(f"<th>{html.escape(col)}</th>" for col in columns)
         body_lines = []
         for row in rows:
@@ -1174,7 +1255,7 @@ class BuscaTaloesWindow(tk.Toplevel):
 </head>
 <body>
   <h1>Resultado da Busca de Talões</h1>
-  <div class="meta">Registros encontrados: {len(rows)}</div>
+  <div class="meta">{html.escape(meta)}</div>
   <table>
     <thead><tr>{header_cells}</tr></thead>
     <tbody>
@@ -1192,19 +1273,63 @@ class BuscaTaloesWindow(tk.Toplevel):
             messagebox.showwarning("Validação", str(exc))
             return
 
-        try:
-            columns, rows = self.repo.search_taloes(filters)
-        except Exception:
-            logger.exception("Falha ao buscar taloes com filtros")
-            messagebox.showerror("Erro", "Falha ao pesquisar no banco de dados.")
+        self.db.submit(
+            self._load_first_page,
+            filters,
+            on_success=lambda result: self._on_primeira_pagina(filters, *result),
+            on_error=self._on_busca_error,
+            key="busca_taloes",
+        )
+
+    def _load_first_page(self, filters):
+        """Executa na thread do banco: primeira pagina e estimativa de total."""
+        return self.repo.search_taloes_page(filters, SEARCH_PAGE_SIZE), self.repo.estimate_search_count(filters)
+
+    def _on_primeira_pagina(self, filters, page, estimativa):
+        """Guarda o estado da paginacao da nova busca e exibe a primeira pagina."""
+        self._filters = filters
+        self._estimativa = estimativa
+        self._pagina = 0
+        self._exibir_pagina(page)
+
+    def proxima_pagina(self):
+        """Le a pagina seguinte da busca atual a partir do cursor."""
+        if self._next_cursor is None:
             return
+        self.proxima_btn.configure(state="disabled")
+        self.db.submit(
+            self.repo.search_taloes_page,
+            self._filters,
+            SEARCH_PAGE_SIZE,
+            self._next_cursor,
+            on_success=self._exibir_pagina,
+            on_error=self._on_busca_error,
+            key="busca_taloes",
+        )
 
-        if not rows:
+    def _exibir_pagina(self, page):
+        """Atualiza cursor, rotulo e botao de paginacao e abre a pagina no navegador."""
+        self._next_cursor = page["next_cursor"]
+        self.proxima_btn.configure(state="normal" if self._next_cursor else "disabled")
+        if not page["rows"]:
+            self.pagina_var.set("")
             messagebox.showinfo("Busca", "Nenhum registro encontrado para os filtros informados.")
             return
-
-        html_content = self._build_result_html(columns, rows)
-        file_name = f"busca_taloes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        self._pagina += 1
+        meta = self._describe_page(len(page["rows"]))
+        self.pagina_var.set(f"Página {self._pagina} — {meta}")
+        self._exibir_resultado(page["columns"], page["rows"], meta)
+
+    def _on_busca_error(self, exc):
+        """Informa falha de pesquisa vinda da thread de banco."""
+        self.proxima_btn.configure(state="normal" if self._next_cursor else "disabled")
+        logger.error("Falha ao buscar taloes com filtros", exc_info=exc)
+        messagebox.showerror("Erro", "Falha ao pesquisar no banco de dados.")
+
+    def _exibir_resultado(self, columns, rows, meta=None):
+        """Gera HTML com o resultado da pesquisa e abre no navegador."""
+        html_content = self._build_result_html(columns, rows, meta)
+        file_name = f"busca_taloes_{datetime.now().strftime('%Y%m%d_%H%M%S')}_p{self._pagina}.html"
         file_path = Path(gettempdir()) / file_name
         try:
             file_path.write_text(html_content, encoding="utf-8")
@@ -1217,12 +1342,323 @@ class BuscaTaloesWindow(tk.Toplevel):
         """Limpa todos os campos de filtro da janela de busca."""
         for var in self.vars.values():
             var.set("")
+        self.busca_trecho_var.set(False)
+
+
+class AlertasPainelWindow(tk.Toplevel):
+    """Janela modal com todos os alertas vencidos reservados, para tratamento em lote.
+
+    Finalizar e adiar os selecionados viram um unico comando no banco
+    (``finalize_many``/``postpone_monitoring_many``). Fechar adia os
+    restantes pelo intervalo de cada talao, como responder "Não" no alerta.
+    """
+
+    def __init__(
+        self,
+        parent,
+        repo: TalaoRepository,
+        db: DBExecutor,
+        talao_service: TalaoService,
+        alerta_service: AlertaService,
+        records,
+        alertas: AlertScheduler,
+        on_edit,
+        on_close,
+    ):
+        super().__init__(parent)
+        self.repo = repo
+        self.db = db
+        self.alerta_service = alerta_service
+        self.alertas = alertas
+        self.on_edit = on_edit
+        self.on_close = on_close
+        self.processando = False
+        self.records = {record["id"]: record for record in records}
+        self.pendencias = {}
+        for talao_id, record in self.records.items():
+            try:
+                _, missing = talao_service.prepare_finalize_from_record(record)
+            except ValueError as exc:
+                missing = [str(exc)]
+            self.pendencias[talao_id] = missing
+        self.intervalo_map = dict(ALERT_INTERVAL_OPTIONS)
+        self.intervalo_var = tk.StringVar(value=DEFAULT_ALERT_INTERVAL_LABEL)
+        self.resumo_var = tk.StringVar(value="")
+        self.title("Alertas de Monitoramento")
+        self.geometry("860x440")
+        self.minsize(640, 320)
+        self.resizable(True, True)
+
+        _apply_toplevel_theme(self)
+
+        frame = tk.Frame(self, padx=12, pady=12, bg=UI_THEME["surface"])
+        frame.pack(fill="both", expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+
+        tk.Label(
+            frame,
+            textvariable=self.resumo_var,
+            font=("Segoe UI", 13, "bold"),
+            bg=UI_THEME["surface"],
+            fg=UI_THEME["text"],
+        ).grid(row=0, column=0, sticky="w", pady=(0, 8))
+
+        lista = tk.Frame(frame, bg=UI_THEME["surface"])
+        lista.grid(row=1, column=0, sticky="nsew")
+        cols = ("talao", "boletim", "delegacia", "natureza", "intervalo", "pendencias")
+        self.tree = ttk.Treeview(lista, columns=cols, show="headings", selectmode="extended", style="AFIS.Treeview")
+        for col, titulo, largura, anchor in (
+            ("talao", "Talão", 90, "center"),
+            ("boletim", "Boletim", 100, "center"),
+            ("delegacia", "Delegacia", 160, "w"),
+            ("natureza", "Natureza", 160, "w"),
+            ("intervalo", "Alerta (min)", 90, "center"),
+            ("pendencias", "Pendências", 220, "w"),
+        ):
+            self.tree.heading(col, text=titulo)
+            self.tree.column(col, width=largura, anchor=anchor)
+        self.tree.tag_configure("pendente", foreground=UI_THEME["danger"])
+        scroll = ttk.Scrollbar(lista, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+
+        for talao_id, record in self.records.items():
+            missing = self.pendencias[talao_id]
+            self.tree.insert(
+                "",
+                "end",
+                iid=str(talao_id),
+                values=(
+                    format_talao(record["ano"], record["talao"]),
+                    record.get("boletim") or "",
+                    record.get("delegacia") or "",
+                    record.get("natureza") or "",
+                    record["intervalo_min"],
+                    ", ".join(missing),
+                ),
+                tags=("pendente",) if missing else (),
+            )
+        self.tree.selection_set(self.tree.get_children())
+
+        actions = tk.Frame(frame, bg=UI_THEME["surface"])
+        actions.grid(row=2, column=0, sticky="ew", pady=(10, 0))
+        _build_button(actions, "Finalizar selecionados", self.finalizar_selecionados, "success").pack(side="left")
+        _build_button(actions, "Adiar selecionados", self.adiar_selecionados, "warning").pack(side="left", padx=(8, 0))
+        ttk.Combobox(
+            actions,
+            textvariable=self.intervalo_var,
+            state="readonly",
+            values=list(self.intervalo_map.keys()),
+            style="AFIS.TCombobox",
+            width=18,
+        ).pack(side="left", padx=(6, 0))
+        _build_button(actions, "Editar", self.editar_selecionado, "neutral").pack(side="left", padx=(8, 0))
+        _build_button(actions, "Fechar", self.fechar, "neutral").pack(side="right")
+
+        tk.Label(
+            frame,
+            text="Talões com pendências não são finalizados em lote; use Editar.\n"
+            "Fechar adia os restantes pelo intervalo de alerta de cada talão.",
+            justify="left",
+            bg=UI_THEME["surface"],
+            fg=UI_THEME["muted"],
+            font=("Segoe UI", 9),
+        ).grid(row=3, column=0, sticky="w", pady=(8, 0))
+
+        self._atualizar_resumo()
+        self.protocol("WM_DELETE_WINDOW", self.fechar)
+        intervalo_ms = max(1000, self.repo.alert_lease_seconds * 1000 // 2)
+        self.renovacao = self.after(intervalo_ms, lambda: self._renovar_reservas(intervalo_ms))
+
+        _center_toplevel_on_parent(self, parent)
+        self.transient(parent)
+        self.grab_set()
+
+    def _atualizar_resumo(self):
+        """Mostra quantos alertas vencidos ainda estao no painel."""
+        self.resumo_var.set(f"{len(self.records)} talões com alerta vencido")
+
+    def _renovar_reservas(self, intervalo_ms):
+        """Mantem as reservas dos alertas abertos no painel (um UPDATE para todos)."""
+        self.db.submit(
+            self.repo.renew_monitoring_claims,
+            list(self.records),
+            on_error=lambda exc: logger.warning("Falha ao renovar reservas do painel de alertas", exc_info=exc),
+            key="reserva_painel_alertas",
+        )
+        self.renovacao = self.after(intervalo_ms, lambda: self._renovar_reservas(intervalo_ms))
+
+    def _selecionados(self):
+        """Ids dos taloes selecionados na lista."""
+        return [int(iid) for iid in self.tree.selection()]
+
+    def _remover(self, talao_ids):
+        """Retira taloes tratados do painel; fecha quando nao sobra nenhum."""
+        for talao_id in talao_ids:
+            if self.records.pop(talao_id, None) is not None:
+                self.tree.delete(str(talao_id))
+        self._atualizar_resumo()
+        if not self.records:
+            self._encerrar()
+
+    def _iniciar(self):
+        """Marca operacao em andamento; retorna False se ja houver outra."""
+        if self.processando:
+            return False
+        self.processando = True
+        return True
+
+    def _on_error(self, exc, mensagem):
+        """Trata falha de operacao em lote mantendo os alertas no painel."""
+        self.processando = False
+        logger.error(mensagem, exc_info=exc)
+        if self.winfo_exists():
+            messagebox.showerror("Erro", f"{mensagem}.", parent=self)
+
+    def finalizar_selecionados(self):
+        """Finaliza em um unico comando os selecionados sem pendencias."""
+        selecionados = self._selecionados()
+        prontos = [talao_id for talao_id in selecionados if not self.pendencias[talao_id]]
+        pendentes = len(selecionados) - len(prontos)
+        if not prontos:
+            messagebox.showwarning(
+                "Pendências",
+                "Selecione talões sem pendências para finalizar. Os demais devem ser completados em Editar.",
+                parent=self,
+            )
+            return
+        pergunta = self.alerta_service.build_final_boletim_confirmation_question()
+        if not messagebox.askyesno(
+            "Confirmação obrigatória",
+            f"{pergunta}\n\n{len(prontos)} talões serão finalizados.",
+            parent=self,
+        ):
+            return
+        if not self._iniciar():
+            return
+
+        def _on_success(finalizados):
+            self.processando = False
+            finalizados = set(finalizados)
+            conflitos = [talao_id for talao_id in prontos if talao_id not in finalizados]
+            for talao_id in finalizados:
+                self.alertas.remove(talao_id)
+            if conflitos:
+                # Alterados em outro terminal: voltam a alertar com os dados atuais.
+                self._liberar(conflitos)
+            if not self.winfo_exists():
+                return
+            if conflitos:
+                messagebox.showwarning(
+                    "Conflito de edição",
+                    f"{len(conflitos)} talões foram alterados em outro terminal e não foram finalizados.",
+                    parent=self,
+                )
+            if pendentes:
+                messagebox.showinfo(
+                    "Pendências",
+                    f"{pendentes} talões com pendências continuam na lista.",
+                    parent=self,
+                )
+            self._remover(prontos)
+
+        self.db.submit(
+            self.repo.finalize_many,
+            [self.records[talao_id] for talao_id in prontos],
+            on_success=_on_success,
+            on_error=lambda exc: self._on_error(exc, "Falha ao finalizar talões"),
+        )
+
+    def adiar_selecionados(self):
+        """Adia em um unico comando os selecionados pelo intervalo escolhido."""
+        selecionados = self._selecionados()
+        if not selecionados:
+            messagebox.showwarning("Seleção", "Selecione ao menos um talão.", parent=self)
+            return
+        intervalo_min = self.intervalo_map.get(self.intervalo_var.get(), DEFAULT_ALERT_INTERVAL_MIN)
+        self._adiar(selecionados, intervalo_min)
+
+    def _adiar(self, talao_ids, intervalo_min, on_done=None):
+        """Grava o adiamento em lote, reagenda localmente e retira os taloes do painel."""
+        if not self._iniciar():
+            return
+
+        def _on_success(_adiados):
+            self.processando = False
+            for talao_id in talao_ids:
+                self.alertas.schedule(talao_id, intervalo_min * 60)
+            if self.winfo_exists():
+                self._remover(talao_ids)
+            if on_done is not None:
+                on_done()
+
+        self.db.submit(
+            self.repo.postpone_monitoring_many,
+            talao_ids,
+            intervalo_min,
+            on_success=_on_success,
+            on_error=lambda exc: self._on_error(exc, "Falha ao adiar alertas"),
+        )
+
+    def _liberar(self, talao_ids):
+        """Libera as reservas de taloes que saem do painel sem adiamento."""
+        self.db.submit(
+            self.repo.release_monitoring_claims,
+            talao_ids,
+            on_error=lambda exc: logger.warning("Falha ao liberar reservas de alertas", exc_info=exc),
+        )
+
+    def editar_selecionado(self):
+        """Adia o alerta do talao selecionado pelo proprio intervalo e abre o editor."""
+        selecionados = self._selecionados()
+        if len(selecionados) != 1:
+            messagebox.showwarning("Seleção", "Selecione um único talão para editar.", parent=self)
+            return
+        talao_id = selecionados[0]
+        intervalo_min = self.records[talao_id]["intervalo_min"]
+        self._adiar([talao_id], intervalo_min, on_done=lambda: self.on_edit(talao_id, intervalo_min))
+
+    def fechar(self):
+        """Adia os alertas restantes pelo intervalo de cada talao e fecha o painel."""
+        if self.processando:
+            return
+        por_intervalo = {}
+        for talao_id, record in self.records.items():
+            por_intervalo.setdefault(record["intervalo_min"], []).append(talao_id)
+        for intervalo_min, talao_ids in por_intervalo.items():
+            for talao_id in talao_ids:
+                self.alertas.schedule(talao_id, intervalo_min * 60)
+            self.db.submit(
+                self.repo.postpone_monitoring_many,
+                talao_ids,
+                intervalo_min,
+                on_error=lambda exc, ids=talao_ids: self._on_fechar_error(exc, ids),
+            )
+        self.records.clear()
+        self._encerrar()
+
+    def _on_fechar_error(self, exc, talao_ids):
+        """Falha ao adiar na saida: libera as reservas para os alertas voltarem."""
+        logger.error("Falha ao adiar alertas restantes do painel", exc_info=exc)
+        self._liberar(talao_ids)
+
+    def _encerrar(self):
+        """Fecha o painel e devolve o controle da agenda ao dashboard."""
+        self.after_cancel(self.renovacao)
+        self.db.cancel("reserva_painel_alertas")
+        self.destroy()
+        self.on_close()
 
 
 class AFISDashboard:
     """Tela principal do sistema AFIS com operacoes de cadastro e monitoramento."""
 
-    ALERT_POLL_MS = 30000
+    ALERT_RESYNC_MS = 120000
+    ALERT_RETRY_MS = 5000
+    # Alertas vencidos reservados por disparo; mais de um abre o painel em lote.
+    ALERT_BATCH_LIMIT = 50
     AUTO_REFRESH_MS = 60000
 
     def __init__(self, root, repo: TalaoRepository):
@@ -1245,14 +1681,23 @@ class AFISDashboard:
         self.whatsapp_icon_image = None
         self.data_bo_placeholder_active = False
         self.proximo_talao_var = tk.StringVar(value="-")
+        self.contadores_var = tk.StringVar(value="")
         self.alerta_var = tk.StringVar(value=DEFAULT_ALERT_INTERVAL_LABEL)
+        self.ocupado_var = tk.StringVar(value="")
+        self.salvando = False
+        # Estado da atualizacao incremental da grade (marca d'agua de versao).
+        self.grade_watermark = None
+        self.grade_ultimo_id = None
+        self.grade_dia = None
+        self.db = DBExecutor(self.root, on_busy_change=self._set_busy)
+        self.alertas = AlertScheduler(self.root, on_due=self.processar_alertas)
 
         self._setup_watermark()
         self._build_layout()
         self._set_defaults()
         self.refresh_tree()
         self.root.after(self.AUTO_REFRESH_MS, self._auto_refresh)
-        self.root.after(self.ALERT_POLL_MS, self.processar_alertas)
+        self._auto_sincronizar_alertas()
 
     def _apply_theme(self):
         """Configura estilos visuais globais da interface principal."""
@@ -1290,6 +1735,14 @@ class AFISDashboard:
         )
         titulo.grid(row=0, column=1)
 
+        tk.Label(
+            header,
+            textvariable=self.ocupado_var,
+            font=("Segoe UI", 9, "italic"),
+            bg=UI_THEME["bg"],
+            fg=UI_THEME["white"],
+        ).grid(row=0, column=0, sticky="w")
+
         self.help_icon_image = self._load_help_icon()
         if self.help_icon_image is not None:
             ajuda_btn = tk.Button(
@@ -1340,6 +1793,13 @@ class AFISDashboard:
             bg=UI_THEME["surface"],
             font=("Segoe UI", 10, "bold"),
         ).pack(side="left", padx=6)
+        tk.Label(
+            info_left,
+            textvariable=self.contadores_var,
+            fg=UI_THEME["muted"],
+            bg=UI_THEME["surface"],
+            font=("Segoe UI", 9),
+        ).pack(side="left", padx=(12, 0))
         tk.Label(
             info_right,
             text="Alerta (min)",
@@ -1429,7 +1889,7 @@ class AFISDashboard:
         # Distribui os botões em uma única linha com colunas de largura uniforme.
         self._build_button(botoes, "Salvar", self.criar_talao, "success").grid(row=0, column=0, padx=3, sticky="ew")
         self._build_button(botoes, "Editar", self.editar_selecionado, "primary").grid(row=0, column=1, padx=3, sticky="ew")
-        self._build_button(botoes, "Atualizar", self.refresh_tree, "neutral").grid(row=0, column=2, padx=3, sticky="ew")
+        self._build_button(botoes, "Atualizar", lambda: self.refresh_tree(full=True), "neutral").grid(row=0, column=2, padx=3, sticky="ew")
         self._build_button(botoes, "Limpar", self._set_defaults, "neutral").grid(row=0, column=3, padx=3, sticky="ew")
         self._build_button(botoes, "Busca", self.abrir_busca, "gold").grid(row=0, column=4, padx=3, sticky="ew")
         self._build_button(botoes, "Relatórios", self.abrir_relatorios, "warning").grid(row=0, column=5, padx=3, sticky="ew")
@@ -1500,6 +1960,7 @@ class AFISDashboard:
         )
 
         self.tree.pack(fill="both", expand=True)
+        self.grade = TreeSync(self.tree)
 
     def _set_defaults(self):
         """Restaura valores padrao dos campos de abertura."""
@@ -1681,14 +2142,20 @@ class AFISDashboard:
             widget.configure(fg=UI_THEME["text"])
             self.data_bo_placeholder_active = False
 
+    def _set_busy(self, busy):
+        """Exibe indicador de consulta em andamento no cabecalho."""
+        self.ocupado_var.set("Consultando banco de dados..." if busy else "")
+
     def _refresh_proximo_talao(self):
         """Atualiza informacao de proximo numero de talao na interface."""
-        try:
-            ano = datetime.now().year
-            numero = self.repo.get_next_talao(ano)
-            self.proximo_talao_var.set(format_talao(ano, numero))
-        except Exception:
-            self.proximo_talao_var.set("indisponível")
+        ano = datetime.now().year
+        self.db.submit(
+            self.repo.get_next_talao,
+            ano,
+            on_success=lambda numero: self.proximo_talao_var.set(format_talao(ano, numero)),
+            on_error=lambda _exc: self.proximo_talao_var.set("indisponível"),
+            key="proximo_talao",
+        )
 
     def _format_message_value(self, value):
         """Normaliza valor para exibicao no template de mensagem."""
@@ -1725,6 +2192,8 @@ class AFISDashboard:
 
     def criar_talao(self):
         """Processa criacao de novo talao a partir do formulario principal."""
+        if self.salvando:
+            return
         data = self._collect_form_data()
 
         try:
@@ -1739,18 +2208,26 @@ class AFISDashboard:
 
         intervalo = self.intervalo_map.get(self.alerta_var.get(), DEFAULT_ALERT_INTERVAL_MIN)
 
-        try:
-            novo_talao = self.repo.insert_talao(normalized, intervalo)
+        def _on_success(novo_talao):
+            self.salvando = False
             messagebox.showinfo("Sucesso", f"Talão {format_talao(now.year, novo_talao)} registrado com status monitorado.")
             self._set_defaults()
             self.refresh_tree()
-        except DuplicateTalaoError as exc:
-            messagebox.showwarning("Conflito de numeração", str(exc))
-            self.refresh_tree()
-        except Exception:
-            logger.exception("Falha ao gravar novo talão")
+            # O id do novo talao nao e conhecido aqui; a agenda e recarregada.
+            self._sincronizar_alertas()
+
+        def _on_error(exc):
+            self.salvando = False
+            if isinstance(exc, DuplicateTalaoError):
+                messagebox.showwarning("Conflito de numeração", str(exc))
+                self.refresh_tree()
+                return
+            logger.error("Falha ao gravar novo talão", exc_info=exc)
             messagebox.showerror("Erro", "Falha ao gravar talão. Verifique os dados e tente novamente.")
 
+        self.salvando = True
+        self.db.submit(self.repo.insert_talao, normalized, intervalo, on_success=_on_success, on_error=_on_error)
+
     def editar_selecionado(self):
         """Abre a janela de edicao para o talao selecionado na grade."""
         selected = self.tree.selection()
@@ -1765,31 +2242,58 @@ class AFISDashboard:
             messagebox.showinfo("Info", "Talões finalizados ou cancelados não podem ser editados.")
             return
 
-        talao_id = int(item_id)
-        intervalo = self.repo.get_monitoring_interval(talao_id)
-        if intervalo is None:
-            intervalo = DEFAULT_ALERT_INTERVAL_MIN
-        TalaoEditor(
-            self.root,
-            self.repo,
-            self.talao_service,
-            self.alerta_service,
+        self._abrir_editor(int(item_id))
+
+    def _load_editor_data(self, talao_id, intervalo_min):
+        """Carrega registro e intervalo para o editor (executa fora da thread do Tk)."""
+        record = self.repo.get_talao(talao_id)
+        if record and intervalo_min is None:
+            intervalo_min = self.repo.get_monitoring_interval(talao_id)
+        return record, intervalo_min
+
+    def _abrir_editor(self, talao_id, intervalo_min=None):
+        """Carrega o talao em segundo plano e abre a janela de edicao."""
+
+        def _on_loaded(loaded):
+            record, intervalo = loaded
+            if not record:
+                messagebox.showerror("Erro", "Talão não encontrado.")
+                return
+            TalaoEditor(
+                self.root,
+                self.repo,
+                self.db,
+                self.talao_service,
+                self.alerta_service,
+                record,
+                intervalo if intervalo is not None else DEFAULT_ALERT_INTERVAL_MIN,
+                self._on_talao_salvo,
+            )
+
+        def _on_error(exc):
+            logger.error("Falha ao carregar talão %s para edição", talao_id, exc_info=exc)
+            messagebox.showerror("Erro", "Falha ao carregar talão para edição.")
+
+        self.db.submit(
+            self._load_editor_data,
             talao_id,
-            intervalo,
-            self.refresh_tree,
+            intervalo_min,
+            on_success=_on_loaded,
+            on_error=_on_error,
+            key="abrir_editor",
         )
 
     def abrir_relatorios(self):
         """Abre janela modal de relatorios por periodo."""
-        RelatorioPeriodoWindow(self.root, self.repo)
+        RelatorioPeriodoWindow(self.root, self.repo, self.db)
 
     def abrir_busca(self):
         """Abre janela modal de busca de taloes por filtros."""
-        BuscaTaloesWindow(self.root, self.repo)
+        BuscaTaloesWindow(self.root, self.repo, self.db)
 
     def abrir_backup(self):
         """Abre janela modal de backup anual."""
-        BackupAnoWindow(self.root, self.repo)
+        BackupAnoWindow(self.root, self.repo, self.db)
 
     def gerar_mensagem_whatsapp_selecionado(self):
         """Gera template de mensagem WhatsApp para o talao selecionado."""
@@ -1799,41 +2303,77 @@ class AFISDashboard:
             return
 
         talao_id = int(selected[0])
-        try:
-            record = self.repo.get_talao(talao_id)
+
+        def _on_loaded(record):
             if not record:
                 messagebox.showwarning("WhatsApp", "Talão não encontrado para gerar mensagem.")
                 return
-            mensagem = self._build_whatsapp_message(record.get("ano"), record.get("talao"), record)
-            self._open_message_text("mensagem_whatsapp_talao", mensagem)
-        except Exception:
-            logger.exception("Falha ao gerar mensagem WhatsApp do talão %s", talao_id)
+            try:
+                mensagem = self._build_whatsapp_message(record.get("ano"), record.get("talao"), record)
+                self._open_message_text("mensagem_whatsapp_talao", mensagem)
+            except Exception:
+                logger.exception("Falha ao gerar mensagem WhatsApp do talão %s", talao_id)
+                messagebox.showerror("Erro", "Falha ao gerar mensagem para WhatsApp.")
+
+        def _on_error(exc):
+            logger.error("Falha ao gerar mensagem WhatsApp do talão %s", talao_id, exc_info=exc)
             messagebox.showerror("Erro", "Falha ao gerar mensagem para WhatsApp.")
 
-    def refresh_tree(self, silent=False):
-        """Recarrega a grade principal com os taloes visiveis."""
-        for iid in self.tree.get_children():
-            self.tree.delete(iid)
+        self.db.submit(self.repo.get_talao, talao_id, on_success=_on_loaded, on_error=_on_error)
 
-        try:
-            rows = self.repo.list_initial_taloes()
-        except Exception:
-            logger.exception("Falha ao carregar talões")
-            if not silent:
-                messagebox.showerror("Erro", "Falha ao carregar talões.")
-            return
+    def refresh_tree(self, silent=False, full=False):
+        """Atualiza a grade principal com o que mudou desde a ultima carga.
 
-        for row in rows:
-            talao_id, ano, talao, boletim, delegacia, natureza, status = row
-            self.tree.insert(
-                "",
-                "end",
-                iid=str(talao_id),
-                values=(format_talao(ano, talao), boletim or "", delegacia or "", natureza or "", status),
-                tags=(status,),
-            )
+        A carga completa acontece na abertura, no botao Atualizar e na virada
+        do dia (quando a janela "desde ontem" da grade se desloca).
+        """
+        if full or self.grade_dia != date.today():
+            watermark = ultimo_id = None
+        else:
+            watermark, ultimo_id = self.grade_watermark, self.grade_ultimo_id
+        # Uma nova atualizacao substitui (e cancela) a anterior ainda pendente.
+        self.db.submit(
+            self._load_tree_data,
+            watermark,
+            ultimo_id,
+            on_success=self._apply_tree_data,
+            on_error=lambda exc: self._on_refresh_error(exc, silent),
+            key="refresh_tree",
+        )
 
-        self._refresh_proximo_talao()
+    def _load_tree_data(self, watermark, ultimo_id):
+        """Consulta alteracoes da grade, proximo numero e contadores (executa fora da thread do Tk)."""
+        dia = date.today()
+        snapshot = self.repo.get_dashboard_snapshot(datetime.now().year, watermark, ultimo_id)
+        return snapshot, dia
+
+    def _on_refresh_error(self, exc, silent):
+        """Trata falha de carga da grade principal."""
+        logger.error("Falha ao carregar talões", exc_info=exc)
+        if not silent:
+            messagebox.showerror("Erro", "Falha ao carregar talões.")
+
+    def _apply_tree_data(self, loaded):
+        """Aplica na grade as linhas carregadas em segundo plano."""
+        changes, dia = loaded
+        rows = [self._tree_row(row) for row in changes["rows"]]
+        if changes["full"]:
+            # Carga completa tambem e reconciliada: selecao e rolagem se mantem.
+            self.grade.reconcile(rows)
+            self.grade_dia = dia
+        else:
+            self.grade.apply_changes(rows, changes["removed_ids"])
+        self.grade_watermark = changes["watermark"]
+        self.grade_ultimo_id = changes["latest_id"]
+
+        self.proximo_talao_var.set(format_talao(changes["ano"], changes["next_talao"]))
+        self.contadores_var.set(f"Monitorados: {changes['monitored']}  |  Alertas vencidos: {changes['due_alerts']}")
+
+    def _tree_row(self, row):
+        """Converte linha do repositorio em (iid, chave, values, tags) da grade."""
+        talao_id, ano, talao, boletim, delegacia, natureza, status = row
+        values = (format_talao(ano, talao), boletim or "", delegacia or "", natureza or "", status)
+        return str(talao_id), (ano, talao), values, (status,)
 
     def _auto_refresh(self):
         """Executa atualizacao periodica silenciosa da grade."""
@@ -1848,45 +2388,176 @@ class AFISDashboard:
                     return True
         return False
 
-    def processar_alertas(self):
-        """Processa alertas vencidos de monitoramento em ciclos."""
+    def _on_talao_salvo(self, talao_id, status, intervalo_min):
+        """Atualiza grade e agenda de alertas apos edicao concluida no editor."""
+        self.refresh_tree()
+        if status is None:
+            self._sincronizar_alertas()
+        elif self.alerta_service.is_monitorado(status):
+            self.alertas.schedule(talao_id, intervalo_min * 60)
+        else:
+            self.alertas.remove(talao_id)
+
+    def _sincronizar_alertas(self, retomar=False):
+        """Recarrega a agenda de alertas do banco (inclui mudancas de outros terminais)."""
+
+        def _on_loaded(schedule):
+            self.alertas.load(schedule)
+            if retomar:
+                self.alertas.resume()
+
+        def _on_error(exc):
+            logger.error("Falha ao carregar agenda de alertas", exc_info=exc)
+            if retomar:
+                self.alertas.resume(self.ALERT_RETRY_MS)
+
+        self.db.submit(
+            self.repo.list_monitoring_schedule,
+            on_success=_on_loaded,
+            on_error=_on_error,
+            key="agenda_alertas",
+        )
+
+    def _auto_sincronizar_alertas(self):
+        """Ressincroniza a agenda de alertas periodicamente (consulta leve)."""
+        self._sincronizar_alertas()
+        self.root.after(self.ALERT_RESYNC_MS, self._auto_sincronizar_alertas)
+
+    def processar_alertas(self, _talao_ids=None):
+        """Trata alertas vencidos quando a agenda dispara (a agenda fica pausada ate o fim)."""
         if self._has_active_modal():
-            self.root.after(self.ALERT_POLL_MS, self.processar_alertas)
+            self.alertas.resume(self.ALERT_RETRY_MS)
             return
 
-        try:
-            due_rows = self.repo.list_due_monitoring()
-        except Exception:
-            logger.exception("Falha ao consultar alertas de monitoramento")
-            self.root.after(self.ALERT_POLL_MS, self.processar_alertas)
-            return
+        def _on_error(exc):
+            logger.error("Falha ao consultar alertas de monitoramento", exc_info=exc)
+            self.alertas.resume(self.ALERT_RETRY_MS)
+
+        # O banco confirma o que esta vencido e reserva o alerta para este terminal;
+        # alertas reservados por outro terminal nao voltam aqui ate a reserva expirar.
+        # O registro completo ja vem na reserva: finalizar pelo alerta nao rele o talao.
+        self.db.submit(
+            self.repo.claim_due_monitoring,
+            limit=self.ALERT_BATCH_LIMIT,
+            with_records=True,
+            on_success=self._tratar_alertas_vencidos,
+            on_error=_on_error,
+            key="alertas",
+        )
 
-        # Processa apenas um alerta por ciclo para evitar sequência de pop-ups
-        # e garantir foco no preenchimento/validação do talão em questão.
-        for row in due_rows:
-            talao_id, intervalo_min, ano, talao, boletim, status = row
-            if not self.alerta_service.is_monitorado(status):
-                continue
+    def _tratar_alertas_vencidos(self, due_rows):
+        """Exibe o alerta vencido (ou o painel, quando ha varios) e retoma a agenda."""
+        # A consulta roda em segundo plano; uma modal pode ter sido aberta nesse meio tempo.
+        if self._has_active_modal():
+            if due_rows:
+                self.db.submit(
+                    self.repo.release_monitoring_claims,
+                    [record["id"] for record in due_rows],
+                    on_error=lambda exc: logger.warning("Falha ao liberar reservas de alertas", exc_info=exc),
+                )
+            self.alertas.resume(self.ALERT_RETRY_MS)
+            return
 
+        vencidos = [record for record in due_rows if self.alerta_service.is_monitorado(record["status"])]
+        if len(vencidos) > 1:
+            # Varios vencidos: um painel trata todos de uma vez, em vez de um pop-up por ciclo.
             self.root.bell()
-            pergunta = self.alerta_service.build_monitoring_question(ano, talao, boletim)
-            confirmar = messagebox.askyesno("Alerta de monitoramento", pergunta)
+            AlertasPainelWindow(
+                self.root,
+                self.repo,
+                self.db,
+                self.talao_service,
+                self.alerta_service,
+                vencidos,
+                self.alertas,
+                on_edit=self._abrir_editor,
+                on_close=self._on_painel_alertas_fechado,
+            )
+            return
 
+        for record in vencidos:
+            talao_id, intervalo_min = record["id"], record["intervalo_min"]
+            self.root.bell()
+            pergunta = self.alerta_service.build_monitoring_question(record["ano"], record["talao"], record["boletim"])
+            renovacao = self._manter_reserva_alerta(talao_id)
             try:
-                if confirmar:
-                    self._tentar_finalizar_por_alerta(talao_id, intervalo_min)
-                else:
-                    self.repo.postpone_monitoring(talao_id, intervalo_min)
-            except Exception:
-                logger.exception("Falha ao processar alerta do talão %s", talao_id)
-                messagebox.showerror("Erro", "Falha ao processar alerta de monitoramento.")
-            break
+                confirmar = messagebox.askyesno("Alerta de monitoramento", pergunta)
+            finally:
+                self.root.after_cancel(renovacao[0])
+
+            # Reagenda localmente ja na resposta; a gravacao (adiar/finalizar) libera a reserva.
+            self.alertas.schedule(talao_id, intervalo_min * 60)
+            if confirmar:
+                self._finalizar_registro_por_alerta(talao_id, intervalo_min, record)
+            else:
+                self._adiar_monitoramento(talao_id, intervalo_min)
+            self.alertas.resume(self.ALERT_RETRY_MS)
+            return
 
-        self.root.after(self.ALERT_POLL_MS, self.processar_alertas)
+        # Nada vencido no banco: a agenda local estava defasada (ex.: outro terminal tratou).
+        self._sincronizar_alertas(retomar=True)
 
-    def _tentar_finalizar_por_alerta(self, talao_id, intervalo_min):
-        """Tenta finalizar talao via alerta, com validacoes e confirmacoes."""
-        record = self.repo.get_talao(talao_id)
+    def _on_painel_alertas_fechado(self):
+        """Atualiza a grade e retoma a agenda quando o painel de alertas fecha."""
+        self.refresh_tree()
+        self.alertas.resume(self.ALERT_RETRY_MS)
+
+    def _manter_reserva_alerta(self, talao_id):
+        """Renova a reserva do alerta enquanto a pergunta estiver aberta.
+
+        Retorna lista com o id do ``after`` pendente (atualizada a cada renovacao).
+        """
+        intervalo_ms = max(1000, self.repo.alert_lease_seconds * 1000 // 2)
+        pendente = []
+
+        def _renovar():
+            self.db.submit(
+                self.repo.renew_monitoring_claim,
+                talao_id,
+                on_error=lambda exc: logger.warning("Falha ao renovar reserva do alerta %s", talao_id, exc_info=exc),
+                key=f"reserva_alerta_{talao_id}",
+            )
+            pendente[0] = self.root.after(intervalo_ms, _renovar)
+
+        pendente.append(self.root.after(intervalo_ms, _renovar))
+        return pendente
+
+    def _liberar_reserva_alerta(self, talao_id):
+        """Libera a reserva do alerta para que outro terminal possa trata-lo."""
+        self.db.submit(
+            self.repo.release_monitoring_claim,
+            talao_id,
+            on_error=lambda exc: logger.warning("Falha ao liberar reserva do alerta %s", talao_id, exc_info=exc),
+        )
+
+    def _on_alerta_error(self, exc, talao_id):
+        """Informa falha no processamento de um alerta de monitoramento."""
+        logger.error("Falha ao processar alerta do talão %s", talao_id, exc_info=exc)
+        self._liberar_reserva_alerta(talao_id)
+        messagebox.showerror("Erro", "Falha ao processar alerta de monitoramento.")
+
+    def _adiar_monitoramento(self, talao_id, intervalo_min, on_done=None):
+        """Posterga o alerta do talao em segundo plano e reagenda localmente."""
+
+        def _on_success(_result):
+            self.alertas.schedule(talao_id, intervalo_min * 60)
+            if on_done is not None:
+                on_done()
+
+        self.db.submit(
+            self.repo.postpone_monitoring,
+            talao_id,
+            intervalo_min,
+            on_success=_on_success,
+            on_error=lambda exc: self._on_alerta_error(exc, talao_id),
+        )
+
+    def _finalizar_registro_por_alerta(self, talao_id, intervalo_min, record):
+        """Valida o registro recebido na reserva do alerta e conclui a finalizacao.
+
+        O registro pode ter mudado enquanto a pergunta estava aberta; a
+        ``versao`` enviada ao ``update_talao`` detecta isso (``ConcurrencyError``).
+        """
         if not record:
             return
 
@@ -1894,16 +2565,8 @@ class AFISDashboard:
             normalized, missing = self.talao_service.prepare_finalize_from_record(record)
         except ValueError as exc:
             messagebox.showwarning("Validação", str(exc))
-            self.repo.postpone_monitoring(talao_id, intervalo_min)
-            TalaoEditor(
-                self.root,
-                self.repo,
-                self.talao_service,
-                self.alerta_service,
-                talao_id,
-                intervalo_min,
-                self.refresh_tree,
-            )
+            self._adiar_monitoramento(talao_id, intervalo_min)
+            self._abrir_editor(talao_id, intervalo_min)
             return
 
         if missing:
@@ -1912,16 +2575,8 @@ class AFISDashboard:
                 "Não foi possível finalizar automaticamente. Campos obrigatórios ausentes:\n- "
                 + "\n- ".join(missing),
             )
-            self.repo.postpone_monitoring(talao_id, intervalo_min)
-            TalaoEditor(
-                self.root,
-                self.repo,
-                self.talao_service,
-                self.alerta_service,
-                talao_id,
-                intervalo_min,
-                self.refresh_tree,
-            )
+            self._adiar_monitoramento(talao_id, intervalo_min)
+            self._abrir_editor(talao_id, intervalo_min)
             return
 
         confirmar_envio = messagebox.askyesno(
@@ -1930,30 +2585,34 @@ class AFISDashboard:
             parent=self.root,
         )
         if not confirmar_envio:
-            self.repo.postpone_monitoring(talao_id, intervalo_min)
+            self._adiar_monitoramento(talao_id, intervalo_min, on_done=self.refresh_tree)
             messagebox.showinfo(
                 "Status mantido",
                 "O talão permanecerá como MONITORADO porque o boletim finalizado ainda não foi enviado.",
                 parent=self.root,
             )
-            self.refresh_tree()
             return
 
-        try:
-            self.repo.update_talao(
-                talao_id,
-                normalized,
-                intervalo_min,
-                expected_updated_at=record.get("atualizado_em"),
-            )
-            self.refresh_tree()
-        except ConcurrencyError as exc:
-            messagebox.showwarning("Conflito de edição", str(exc))
-            self.refresh_tree()
-        except Exception:
-            logger.exception("Falha ao finalizar talão %s", talao_id)
+        def _on_error(exc):
+            self._liberar_reserva_alerta(talao_id)
+            if isinstance(exc, ConcurrencyError):
+                messagebox.showwarning("Conflito de edição", str(exc))
+                self.refresh_tree()
+                self._sincronizar_alertas()
+                return
+            logger.error("Falha ao finalizar talão %s", talao_id, exc_info=exc)
             messagebox.showerror("Erro", "Falha ao finalizar talão.")
 
+        self.db.submit(
+            self.repo.update_talao,
+            talao_id,
+            normalized,
+            intervalo_min,
+            expected_version=record.get("versao"),
+            on_success=lambda _result: self._on_talao_salvo(talao_id, normalized.get("status"), intervalo_min),
+            on_error=_on_error,
+        )
+
 
 def build_root():
     """Cria janela raiz usando CTk quando disponivel, senao Tk padrao."""
@@ -1,5 +1,6 @@
 from datetime import datetime
 import re
+import unicodedata
 
 from .constants import FIELD_LABELS
 
@@ -35,6 +36,12 @@ def _normalize_and_validate_boletim(value):
     return boletim
 
 
+def normalize_search_text(value):
+    """Normaliza texto para busca: sem espacos nas pontas, sem acentos e em maiusculas."""
+    text = unicodedata.normalize("NFKD", str(value or "").strip())
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).upper()
+
+
 def normalize_and_validate(data, required_fields):
     """Normaliza campos de data/hora e retorna lista de obrigatorios faltantes."""
     normalized = dict(data)
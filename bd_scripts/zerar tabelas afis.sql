@@ -6,6 +6,14 @@ BEGIN TRY
     DELETE FROM dbo.monitoramento;
     DELETE FROM dbo.taloes;
 
+    -- Contador de numeracao por ano e marcas de exclusao (gravadas pelo trigger
+    -- no DELETE acima) recomecam vazios: numeracao volta a 1 e o proximo
+    -- backup incremental nao leva exclusoes antigas.
+    IF OBJECT_ID('dbo.talao_contador', 'U') IS NOT NULL
+        DELETE FROM dbo.talao_contador;
+    IF OBJECT_ID('dbo.taloes_excluidos', 'U') IS NOT NULL
+        DELETE FROM dbo.taloes_excluidos;
+
     -- Reseta os IDs (IDENTITY) para comear novamente em 1
     DBCC CHECKIDENT ('dbo.monitoramento', RESEED, 0);
     DBCC CHECKIDENT ('dbo.taloes', RESEED, 0);
@@ -3,9 +3,11 @@ from pathlib import Path
 import tkinter as tk
 from tkinter import messagebox
 
+from afis_app.cache import build_cached_repository
 from afis_app.config import get_env, load_env_file
+from afis_app.instrumentation import build_instrumented_repository
 from afis_app.interfaces import TalaoRepository
-from afis_app.repository import SQLServerRepository
+from afis_app.repository import build_repository
 from afis_app.ui import AFISDashboard, build_root
 
 
@@ -52,7 +54,8 @@ def main():
     _configure_app_icon(root)
 
     try:
-        repository: TalaoRepository = SQLServerRepository()
+        # Cache por cima da medicao: acertos do cache nao contam como chamada ao banco.
+        repository: TalaoRepository = build_cached_repository(build_instrumented_repository(build_repository()))
     except Exception:
         logging.getLogger(__name__).exception("Falha na inicialização da aplicação")
         messagebox.showerror(
@@ -0,0 +1,25 @@
+"""Dados compartilhados pelos testes que populam o banco SQLite."""
+
+from afis_app.constants import STATUS_MONITORADO
+
+
+def talao_payload(data_solic, **overrides):
+    """Payload normalizado minimo para popular o banco de teste."""
+    data = {
+        "data_solic": data_solic,
+        "hora_solic": "08:00",
+        "delegacia": "1 DP",
+        "autoridade": "DELEGADO A",
+        "solicitante": "UNIDADE B",
+        "endereco": "RUA D'AJUDA, 123",
+        "boletim": "AB1234",
+        "natureza": "FURTO",
+        "data_bo": "",
+        "vitimas": "",
+        "equipe": "",
+        "operador": "OPERADOR 1",
+        "status": STATUS_MONITORADO,
+        "observacao": "",
+    }
+    data.update(overrides)
+    return data
@@ -0,0 +1,153 @@
+import unittest
+
+from afis_app.alert_scheduler import AlertScheduler
+
+
+class FakeRoot:
+    """Substituto minimo de janela Tk que registra os after() armados."""
+
+    def __init__(self):
+        self.scheduled = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.scheduled[self.next_id] = (ms, callback)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.scheduled.pop(after_id, None)
+
+    def pending_delays(self):
+        return [ms for ms, _ in self.scheduled.values()]
+
+    def fire(self):
+        """Executa os callbacks armados ate o momento."""
+        pending, self.scheduled = self.scheduled, {}
+        for _, callback in pending.values():
+            callback()
+
+
+class FakeClock:
+    """Relogio monotonico controlado pelo teste."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class AlertSchedulerTests(unittest.TestCase):
+    """Testes da agenda de alertas orientada a eventos."""
+
+    def setUp(self):
+        """Cria agenda com raiz e relogio falsos."""
+        self.root = FakeRoot()
+        self.clock = FakeClock()
+        self.fired = []
+        self.scheduler = AlertScheduler(self.root, on_due=self.fired.append, clock=self.clock)
+
+    def test_single_after_armed_for_earliest_alert(self):
+        """Garante um unico after() armado para o alerta mais cedo."""
+        self.scheduler.load([(1, 600), (2, 30), (3, 120)])
+
+        self.assertEqual([30000], self.root.pending_delays())
+
+    def test_empty_schedule_arms_nothing(self):
+        """Garante zero wakeups sem taloes monitorados."""
+        self.scheduler.load([])
+
+        self.assertEqual([], self.root.pending_delays())
+
+    def test_schedule_and_remove_rearm(self):
+        """Garante rearme ao incluir alerta mais cedo e ao remover o primeiro."""
+        self.scheduler.load([(1, 600)])
+        self.scheduler.schedule(2, 10)
+        self.assertEqual([10000], self.root.pending_delays())
+
+        self.scheduler.remove(2)
+
+        self.assertEqual([600000], self.root.pending_delays())
+        self.assertNotIn(2, self.scheduler)
+
+    def test_reschedule_replaces_previous_entry(self):
+        """Garante que reagendar descarta o horario anterior do mesmo talao."""
+        self.scheduler.load([(1, 10)])
+        self.scheduler.schedule(1, 300)
+
+        self.assertEqual([300000], self.root.pending_delays())
+        self.assertEqual(1, len(self.scheduler))
+
+    def test_fire_calls_on_due_and_pauses_until_resume(self):
+        """Garante disparo com os vencidos e pausa ate resume()."""
+        self.scheduler.load([(1, 10), (2, 5), (3, 100)])
+        self.clock.now += 10
+
+        self.root.fire()
+
+        self.assertEqual([[2, 1]], self.fired)
+        self.assertEqual([], self.root.pending_delays())
+
+        self.scheduler.schedule(2, 60)
+        self.scheduler.schedule(1, 60)
+        self.assertEqual([], self.root.pending_delays())
+
+        self.scheduler.resume(5000)
+        self.assertEqual([60000], self.root.pending_delays())
+
+    def test_resume_waits_at_least_delay(self):
+        """Garante espacamento minimo entre alertas ja vencidos."""
+        self.scheduler.load([(1, 0), (2, 0)])
+        self.root.fire()
+        self.scheduler.schedule(1, 60)
+
+        self.scheduler.resume(5000)
+
+        self.assertEqual([5000], self.root.pending_delays())
+
+    def test_early_wakeup_rearms_without_calling(self):
+        """Garante que after() adiantado apenas rearma para o restante."""
+        self.scheduler.load([(1, 10)])
+        self.clock.now += 4
+
+        self.root.fire()
+
+        self.assertEqual([], self.fired)
+        self.assertEqual([6000], self.root.pending_delays())
+
+    def test_long_waits_are_capped(self):
+        """Garante teto de espera para tolerar suspensao do relogio."""
+        self.scheduler.load([(1, 86400)])
+
+        self.assertEqual([AlertScheduler.MAX_WAIT_MS], self.root.pending_delays())
+
+    def test_handler_error_retries_later(self):
+        """Garante nova tentativa apos falha no tratamento."""
+
+        def _falha(_ids):
+            raise RuntimeError("falha")
+
+        self.scheduler.on_due = _falha
+        self.scheduler.load([(1, 0)])
+
+        with self.assertLogs("afis_app.alert_scheduler", level="ERROR"):
+            self.root.fire()
+
+        self.assertEqual([AlertScheduler.ERROR_RETRY_MS], self.root.pending_delays())
+
+    def test_load_replaces_schedule_and_stop_cancels(self):
+        """Garante que load substitui a agenda e stop cancela o after()."""
+        self.scheduler.load([(1, 10), (2, 20)])
+        self.scheduler.load([(3, 50)])
+
+        self.assertEqual([3], [tid for tid in (1, 2, 3) if tid in self.scheduler])
+        self.assertEqual([50000], self.root.pending_delays())
+
+        self.scheduler.stop()
+
+        self.assertEqual([], self.root.pending_delays())
+
+
+if __name__ == "__main__":
+    unittest.main()
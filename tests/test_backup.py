@@ -0,0 +1,193 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, time
+
+from afis_app.backup import (
+    BackupManifestError,
+    backup_year,
+    manifest_path,
+    open_backup,
+    sql_literal,
+    write_year_backup,
+)
+from afis_app.exports import ExportCancelled
+from afis_app.repository import MONITORAMENTO_BACKUP_COLUMNS, TALAO_DETAIL_COLUMNS
+from afis_app.sqlite_repository import SQLiteRepository
+from tests.support import talao_payload
+
+
+class SqlLiteralTests(unittest.TestCase):
+    """Testes da conversao de valores para literais SQL."""
+
+    def test_literals(self):
+        """Garante escape de aspas e formatos de data/hora."""
+        self.assertEqual("NULL", sql_literal(None))
+        self.assertEqual("1", sql_literal(True))
+        self.assertEqual("42", sql_literal(42))
+        self.assertEqual("N'D''AJUDA'", sql_literal("D'AJUDA"))
+        self.assertEqual("'2026-03-01'", sql_literal(date(2026, 3, 1)))
+        self.assertEqual("'08:30:00'", sql_literal(time(8, 30)))
+        self.assertEqual("'2026-03-01 08:30:00.000250'", sql_literal(datetime(2026, 3, 1, 8, 30, 0, 250)))
+
+
+class YearBackupTests(unittest.TestCase):
+    """Testes do backup anual gerado em fluxo."""
+
+    def setUp(self):
+        """Cria banco em memoria com taloes em dois anos e pasta de saida."""
+        self.repo = SQLiteRepository(":memory:")
+        self.addCleanup(self.repo.close)
+        for dia in range(1, 6):
+            self.repo.insert_talao(talao_payload(f"2025-03-{dia:02d}"), 30)
+        self.repo.insert_talao(talao_payload("2026-01-10"), 30)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def _tables(self, ano=2025, batch_size=2):
+        return [
+            ("dbo.taloes", list(TALAO_DETAIL_COLUMNS), self.repo.iter_taloes_by_year(ano, batch_size=batch_size)),
+            (
+                "dbo.monitoramento",
+                list(MONITORAMENTO_BACKUP_COLUMNS),
+                self.repo.iter_monitoramento_by_year(ano, batch_size=batch_size),
+            ),
+        ]
+
+    def _read(self, path):
+        with open_backup(path) as backup_file:
+            return backup_file.read()
+
+    def test_iter_by_year_yields_batches_of_the_year(self):
+        """Garante lotes de fetchmany com as linhas da listagem completa do ano."""
+        batches = list(self.repo.iter_taloes_by_year(2025, batch_size=2))
+
+        self.assertEqual([2, 2, 1], [len(batch) for batch in batches])
+        _columns, rows = self.repo.list_taloes_by_year(2025)
+        self.assertEqual([tuple(row) for row in rows], [tuple(row) for batch in batches for row in batch])
+        columns, _rows = self.repo.list_monitoramento_by_year(2025)
+        self.assertEqual(list(MONITORAMENTO_BACKUP_COLUMNS), columns)
+        self.assertEqual(5, sum(len(batch) for batch in self.repo.iter_monitoramento_by_year(2025)))
+
+    def test_rows_are_grouped_in_multi_row_inserts(self):
+        """Garante INSERTs de ate ``rows_per_insert`` linhas e IDENTITY_INSERT por tabela."""
+        path = os.path.join(self.folder, "backup.sql")
+        progresso = []
+
+        totais = write_year_backup(path, 2025, self._tables(), rows_per_insert=2, progress=progresso.append)
+
+        self.assertEqual({"dbo.taloes": 5, "dbo.monitoramento": 5}, totais)
+        self.assertEqual([2, 4, 5, 7, 9, 10], progresso)
+        script = self._read(path)
+        self.assertEqual(3, script.count("INSERT INTO dbo.taloes "))
+        self.assertEqual(3, script.count("INSERT INTO dbo.monitoramento "))
+        self.assertEqual(1, script.count("SET IDENTITY_INSERT dbo.taloes ON;"))
+        self.assertEqual(1, script.count("SET IDENTITY_INSERT dbo.monitoramento OFF;"))
+        self.assertIn("N'RUA D''AJUDA, 123'", script)
+        self.assertNotIn("claimed_by", script)
+        self.assertTrue(script.startswith("-- Backup AFIS ano 2025"))
+        self.assertIn("COMMIT TRANSACTION;", script)
+
+    def test_empty_year_writes_comment(self):
+        """Garante comentario no lugar dos INSERTs quando o ano nao tem registros."""
+        path = os.path.join(self.folder, "vazio.sql")
+
+        totais = write_year_backup(path, 2024, self._tables(ano=2024))
+
+        self.assertEqual({"dbo.taloes": 0, "dbo.monitoramento": 0}, totais)
+        script = self._read(path)
+        self.assertIn("-- Nenhum registro para dbo.taloes.", script)
+        self.assertNotIn("IDENTITY_INSERT", script)
+
+    def test_gzip_extension_compresses_output(self):
+        """Garante arquivo gzip valido quando a extensao e ``.gz``."""
+        path = os.path.join(self.folder, "backup.sql.gz")
+
+        write_year_backup(path, 2025, self._tables())
+
+        with gzip.open(path, "rt", encoding="utf-8-sig") as compressed:
+            self.assertIn("INSERT INTO dbo.taloes ", compressed.read())
+        self.assertIn("INSERT INTO dbo.monitoramento ", self._read(path))
+
+    def test_cancel_removes_partial_file(self):
+        """Garante interrupcao entre lotes, sem arquivo parcial e com geradores fechados."""
+        path = os.path.join(self.folder, "backup.sql")
+        cancel = threading.Event()
+        tables = self._tables()
+
+        with self.assertRaises(ExportCancelled):
+            write_year_backup(path, 2025, tables, progress=lambda _total: cancel.set(), cancel=cancel)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual([], list(tables[1][2]))
+
+
+class IncrementalBackupTests(unittest.TestCase):
+    """Testes do backup incremental por versao de linha e do manifesto."""
+
+    def setUp(self):
+        """Cria banco em memoria com taloes de 2025 e pasta de backups."""
+        self.repo = SQLiteRepository(":memory:")
+        self.addCleanup(self.repo.close)
+        for dia in range(1, 6):
+            self.repo.insert_talao(talao_payload(f"2025-03-{dia:02d}"), 30)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def test_incremental_backup_writes_only_changes(self):
+        """Garante so os taloes alterados (substituidos) e os excluidos desde o ultimo backup."""
+        backup_year(self.repo, self._path("completo.sql"), 2025)
+        with self.repo._write_transaction() as cur:
+            cur.execute("UPDATE taloes SET natureza = 'ROUBO' WHERE id = 2")
+            cur.execute("DELETE FROM taloes WHERE id = 4")
+
+        totais = backup_year(self.repo, self._path("incremental_1.sql"), 2025, incremental=True)
+
+        self.assertEqual({"dbo.taloes": 1, "dbo.monitoramento": 1, "excluidos": 1}, totais)
+        with open_backup(self._path("incremental_1.sql")) as backup_file:
+            script = backup_file.read()
+        self.assertTrue(script.startswith("-- Backup incremental AFIS ano 2025"))
+        self.assertIn("DELETE FROM dbo.taloes WHERE id IN (4);", script)
+        self.assertLess(script.index("DELETE FROM dbo.taloes WHERE id IN (2);"), script.index("INSERT INTO dbo.taloes "))
+        self.assertIn("N'ROUBO'", script)
+
+        vazio = backup_year(self.repo, self._path("incremental_2.sql"), 2025, incremental=True)
+
+        self.assertEqual({"dbo.taloes": 0, "dbo.monitoramento": 0, "excluidos": 0}, vazio)
+        with open(manifest_path(self.folder, 2025), encoding="utf-8") as manifest_file:
+            arquivos = json.load(manifest_file)["arquivos"]
+        self.assertEqual(["completo", "incremental", "incremental"], [item["tipo"] for item in arquivos])
+        self.assertIsNone(arquivos[0]["de"])
+        self.assertEqual([arquivos[0]["ate"], arquivos[1]["ate"]], [arquivos[1]["de"], arquivos[2]["de"]])
+
+    def test_full_backup_starts_new_chain(self):
+        """Garante que um novo backup completo reinicia o manifesto."""
+        backup_year(self.repo, self._path("completo.sql"), 2025)
+        backup_year(self.repo, self._path("incremental.sql"), 2025, incremental=True)
+
+        backup_year(self.repo, self._path("completo_2.sql"), 2025)
+
+        with open(manifest_path(self.folder, 2025), encoding="utf-8") as manifest_file:
+            arquivos = json.load(manifest_file)["arquivos"]
+        self.assertEqual(["completo_2.sql"], [item["arquivo"] for item in arquivos])
+
+    def test_incremental_requires_full_backup_in_folder(self):
+        """Garante erro claro, sem arquivo gerado, quando a pasta nao tem backup completo."""
+        path = self._path("incremental.sql")
+
+        with self.assertRaises(BackupManifestError):
+            backup_year(self.repo, path, 2025, incremental=True)
+
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
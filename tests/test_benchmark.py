@@ -0,0 +1,103 @@
+import contextlib
+import json
+import os
+import tempfile
+import unittest
+
+from afis_app.benchmark import (
+    SEARCH_FILTER_GROUPS,
+    compare_results,
+    main,
+    run_benchmarks,
+    search_cases,
+    summarize,
+)
+from afis_app.repository import TALAO_DETAIL_COLUMNS
+
+
+def _resultado(medianas):
+    """Documento de resultados minimo com as medianas informadas por caso (escala 1000)."""
+    return {
+        "escalas": [
+            {"linhas_alvo": 1000, "casos": {caso: {"mediana_ms": valor} for caso, valor in medianas.items()}}
+        ]
+    }
+
+
+class BenchmarkHelpersTests(unittest.TestCase):
+    """Testes das funcoes auxiliares da suite de benchmarks."""
+
+    def test_summarize_orders_and_rounds(self):
+        """Garante minimo, mediana, p95 e maximo a partir de tempos fora de ordem."""
+        resumo = summarize([5.0, 1.0, 3.0, 2.0, 4.0], 7)
+        tempos = (resumo["min_ms"], resumo["mediana_ms"], resumo["p95_ms"], resumo["max_ms"])
+        self.assertEqual((1.0, 3.0, 5.0, 5.0), tempos)
+        self.assertEqual((5, 7), (resumo["repeticoes"], resumo["linhas"]))
+
+    def test_search_cases_cover_every_combination(self):
+        """Garante um caso por combinacao de filtros, mais os modos ``contem``."""
+        amostra = [None] * len(TALAO_DETAIL_COLUMNS)
+        valores = {
+            "ano": 2025,
+            "talao": 12,
+            "boletim": "AB1234",
+            "delegacia": "1 DP",
+            "equipe": "EQUIPE A",
+            "operador": "JOSE SILVA",
+        }
+        for coluna, valor in valores.items():
+            amostra[TALAO_DETAIL_COLUMNS.index(coluna)] = valor
+        casos = search_cases(amostra)
+        self.assertEqual(2 ** len(SEARCH_FILTER_GROUPS) - 1 + 3, len(casos))
+        self.assertEqual({"ano": 2025, "talao_num": 12, "equipe": "EQUIPE A"}, casos["search_taloes[talao+equipe]"])
+        self.assertEqual({"delegacia": " D", "modo_texto": "contem"}, casos["search_taloes[delegacia~contem]"])
+
+    def test_compare_flags_only_relevant_regressions(self):
+        """Garante regressao so acima da tolerancia e da diferenca minima, ignorando casos novos."""
+        referencia = _resultado({"lento": 10.0, "estavel": 10.0, "ruido": 0.1, "removido": 1.0})
+        atual = _resultado({"lento": 15.0, "estavel": 11.0, "ruido": 0.5, "novo": 3.0})
+        comparacao = {item["caso"]: item for item in compare_results(atual, referencia, tolerancia=0.2)}
+        self.assertEqual({"lento", "estavel", "ruido"}, set(comparacao))
+        self.assertTrue(comparacao["lento"]["regressao"])
+        self.assertEqual(0.5, comparacao["lento"]["variacao"])
+        self.assertFalse(comparacao["estavel"]["regressao"])
+        self.assertFalse(comparacao["ruido"]["regressao"])
+
+
+class RunBenchmarksTests(unittest.TestCase):
+    """Testes da execucao da suite em escala pequena."""
+
+    def test_run_measures_every_case(self):
+        """Garante todos os casos medidos e linhas coerentes com a massa carregada."""
+        with tempfile.TemporaryDirectory() as pasta:
+            documento = run_benchmarks([1500], pasta, seed=1, ate=2025, repeticoes=1)
+            self.assertTrue(os.path.exists(os.path.join(pasta, "relatorio.xlsx")))
+        escala = documento["escalas"][0]
+        casos = escala["casos"]
+        self.assertEqual(1500, escala["linhas_alvo"])
+        self.assertGreater(escala["taloes"], 1000)
+        for caso in ("list_initial_taloes", "list_taloes_by_period[mes]", "gerar_modelo_xlsx[ano]", "gerar_backup[ano]"):
+            self.assertIn(caso, casos)
+        self.assertEqual(1, casos["search_taloes[talao]"]["linhas"])
+        self.assertEqual(casos["gerar_csv[ano]"]["linhas"], casos["gerar_modelo_xlsx[ano]"]["linhas"])
+        self.assertEqual(200, casos["insert_talao[concorrente]"]["linhas"])
+
+    def test_main_writes_json_and_returns_regression_code(self):
+        """Garante gravacao do JSON e codigo 1 quando a referencia e bem mais rapida."""
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = os.path.join(pasta, "atual.json")
+            referencia = os.path.join(pasta, "referencia.json")
+            with open(referencia, "w", encoding="utf-8") as file:
+                json.dump(_resultado({"gerar_backup[ano]": 0.001}), file)
+            args = ["--escalas", "1000", "--repeticoes", "1", "--pasta", pasta, "--saida", saida]
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                    codigo = main(args + ["--comparar", referencia])
+            with open(saida, encoding="utf-8") as file:
+                documento = json.load(file)
+        self.assertEqual(1, codigo)
+        self.assertEqual(1000, documento["escalas"][0]["linhas_alvo"])
+
+
+if __name__ == "__main__":
+    unittest.main()
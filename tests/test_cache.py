@@ -0,0 +1,155 @@
+from datetime import date
+import os
+import tempfile
+import unittest
+
+from afis_app.cache import CachedRepository
+from afis_app.sqlite_repository import SQLiteRepository
+from tests.support import talao_payload
+
+
+class FakeClock:
+    """Relogio manual para controlar validade das entradas e da sonda."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRepository:
+    """Repassa ao SQLite contando as chamadas que chegam ao banco."""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+        if not callable(attr):
+            return attr
+
+        def _counted(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attr(*args, **kwargs)
+
+        return _counted
+
+
+class CachedRepositoryTests(unittest.TestCase):
+    """Testes do cache de leitura sobre o repositorio SQLite."""
+
+    def setUp(self):
+        """Cria dois terminais sobre o mesmo banco em arquivo, o primeiro com cache."""
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, "afis.db")
+        self.base = SQLiteRepository(path)
+        self.addCleanup(self.base.close)
+        self.outro = SQLiteRepository(path)
+        self.addCleanup(self.outro.close)
+        self.clock = FakeClock()
+        self.counting = CountingRepository(self.base)
+        self.repo = CachedRepository(self.counting, max_entries=3, probe_interval=2.0, clock=self.clock)
+
+    def _insert(self, **overrides):
+        """Insere talao pelo repositorio sem cache e devolve o id."""
+        numero = self.outro.insert_talao(talao_payload("2026-02-23", **overrides), 30)
+        columns, rows = self.outro.search_taloes({"talao_num": numero, "ano": 2026})
+        return rows[0][columns.index("id")]
+
+    def test_repeated_reads_hit_cache_and_return_copies(self):
+        """Garante uma ida ao banco por chave e copia independente a cada leitura."""
+        talao_id = self._insert()
+
+        primeiro = self.repo.get_talao(talao_id)
+        primeiro["delegacia"] = "ALTERADA"
+        segundo = self.repo.get_talao(talao_id)
+        self.assertEqual("1 DP", segundo["delegacia"])
+        self.assertEqual(30, self.repo.get_monitoring_interval(talao_id))
+        self.assertEqual(30, self.repo.get_monitoring_interval(talao_id))
+
+        self.assertEqual(1, self.counting.calls["get_talao"])
+        self.assertEqual(1, self.counting.calls["get_monitoring_interval"])
+        self.assertEqual(1, self.counting.calls["get_cache_version"])
+        stats = self.repo.cache_stats()
+        self.assertEqual((2, 2), (stats["hits"], stats["misses"]))
+        self.assertEqual({"hits": 1, "misses": 1}, stats["methods"]["get_talao"])
+        self.assertIsNone(self.repo.get_talao(999))
+        self.assertIsNone(self.repo.get_talao(999))
+        self.assertEqual(3, self.counting.calls["get_talao"])
+
+    def test_local_writes_invalidate_immediately(self):
+        """Garante invalidacao na gravacao deste terminal, sem esperar a sonda."""
+        talao_id = self._insert()
+        record = self.repo.get_talao(talao_id)
+        self.assertEqual(2, self.repo.get_next_talao(2026))
+
+        payload = talao_payload("2026-02-23", delegacia="2 DP")
+        self.repo.update_talao(talao_id, payload, 45, expected_version=record["versao"])
+        self.assertEqual("2 DP", self.repo.get_talao(talao_id)["delegacia"])
+        self.assertEqual(45, self.repo.get_monitoring_interval(talao_id))
+
+        self.repo.postpone_monitoring(talao_id, 60)
+        self.assertEqual(60, self.repo.get_monitoring_interval(talao_id))
+
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        self.assertEqual(3, self.repo.get_next_talao(2026))
+
+    def test_other_terminal_writes_seen_after_probe(self):
+        """Garante que a sonda de versao descarta o cache apos gravacao de outro terminal."""
+        talao_id = self._insert()
+        self.assertEqual(30, self.repo.get_monitoring_interval(talao_id))
+        self.assertEqual("1 DP", self.repo.get_talao(talao_id)["delegacia"])
+
+        self.outro.postpone_monitoring(talao_id, 90)
+        record = self.outro.get_talao(talao_id)
+        payload = talao_payload("2026-02-23", delegacia="3 DP")
+        self.outro.update_talao(talao_id, payload, 90, expected_version=record["versao"])
+        self.assertEqual("1 DP", self.repo.get_talao(talao_id)["delegacia"])
+
+        self.clock.now = 2.0
+        self.assertEqual("3 DP", self.repo.get_talao(talao_id)["delegacia"])
+        self.assertEqual(90, self.repo.get_monitoring_interval(talao_id))
+        self.assertEqual(1, self.repo.cache_stats()["resets"])
+
+        # Adiamento sozinho nao muda o talao; a sonda tambem cobre os intervalos.
+        self.outro.postpone_monitoring(talao_id, 120)
+        self.clock.now = 4.0
+        self.assertEqual(120, self.repo.get_monitoring_interval(talao_id))
+
+    def test_entries_expire_and_lru_is_bounded(self):
+        """Garante validade por metodo e descarte da entrada menos usada."""
+        ids = [self._insert() for _ in range(4)]
+        for talao_id in ids[:3]:
+            self.repo.get_talao(talao_id)
+        self.repo.get_talao(ids[0])
+        self.repo.get_talao(ids[3])
+
+        stats = self.repo.cache_stats()
+        self.assertEqual(3, stats["size"])
+        self.assertEqual(1, stats["evictions"])
+        self.repo.get_talao(ids[0])
+        self.assertEqual(4, self.counting.calls["get_talao"])
+        self.repo.get_talao(ids[1])
+        self.assertEqual(5, self.counting.calls["get_talao"])
+
+        self.repo.get_next_talao(2026)
+        self.clock.now = 1.0
+        self.repo.get_next_talao(2026)
+        self.clock.now = 5.5
+        self.repo.get_next_talao(2026)
+        self.assertEqual(2, self.counting.calls["get_next_talao"])
+
+    def test_unwrapped_methods_are_delegated(self):
+        """Garante repasse ao repositorio real dos metodos e atributos sem cache."""
+        self._insert()
+        self.assertEqual(self.base.terminal_id, self.repo.terminal_id)
+        self.assertEqual(1, self.repo.count_taloes_by_period(date(2026, 2, 1), date(2026, 2, 28)))
+        self.assertEqual(1, self.counting.calls["count_taloes_by_period"])
+        self.assertNotIn("get_cache_version", self.counting.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
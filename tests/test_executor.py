@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+
+from afis_app.executor import DBExecutor
+
+
+class FakeRoot:
+    """Substituto minimo de janela Tk que executa callbacks de after() sob demanda."""
+
+    def __init__(self):
+        self.scheduled = {}
+        self.next_id = 0
+
+    def after(self, _ms, callback):
+        self.next_id += 1
+        self.scheduled[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.scheduled.pop(after_id, None)
+
+    def pump(self):
+        """Executa os callbacks agendados ate o momento."""
+        pending, self.scheduled = self.scheduled, {}
+        for callback in pending.values():
+            callback()
+
+
+class DBExecutorTests(unittest.TestCase):
+    """Testes unitarios do executor de chamadas ao banco."""
+
+    def setUp(self):
+        """Prepara executor com raiz falsa e registro de estado ocupado."""
+        self.root = FakeRoot()
+        self.busy_changes = []
+        self.executor = DBExecutor(self.root, on_busy_change=self.busy_changes.append)
+
+    def tearDown(self):
+        """Encerra as threads de trabalho do executor."""
+        self.executor.shutdown()
+
+    def _pump_until(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Tempo esgotado aguardando callback do executor.")
+            self.root.pump()
+            time.sleep(0.005)
+
+    def test_delivers_result_on_polling_thread(self):
+        """Garante entrega do resultado na thread que consulta a fila."""
+        received = []
+
+        self.executor.submit(lambda a, b: a + b, 2, 3, on_success=lambda r: received.append((r, threading.current_thread())))
+        self._pump_until(lambda: received)
+
+        self.assertEqual(5, received[0][0])
+        self.assertIs(threading.main_thread(), received[0][1])
+        self.assertEqual([True, False], self.busy_changes)
+
+    def test_delivers_errors_to_on_error(self):
+        """Garante encaminhamento de excecoes para o callback de erro."""
+        errors = []
+
+        def _falha():
+            raise ValueError("falhou")
+
+        self.executor.submit(_falha, on_error=errors.append)
+        self._pump_until(lambda: errors)
+
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_newer_request_with_same_key_supersedes_older(self):
+        """Garante descarte do resultado de requisicao substituida pela mesma chave."""
+        release = threading.Event()
+        received = []
+
+        def _lenta(valor):
+            release.wait(5)
+            return valor
+
+        self.executor.submit(_lenta, "antiga", on_success=received.append, key="refresh")
+        self.executor.submit(_lenta, "nova", on_success=received.append, key="refresh")
+        release.set()
+        self._pump_until(lambda: not self.executor.busy)
+
+        self.assertEqual(["nova"], received)
+
+    def test_post_runs_callback_on_polling_thread(self):
+        """Garante execucao de callbacks postados por threads de trabalho."""
+        received = []
+        worker = threading.Thread(target=lambda: self.executor.post(received.append, "progresso"))
+        worker.start()
+        worker.join(5)
+
+        self._pump_until(lambda: received)
+
+        self.assertEqual(["progresso"], received)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import csv
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+from datetime import date
+from pathlib import Path
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+from afis_app.exports import ExportCancelled, report_xlsx_cells, write_csv, write_xlsx_template
+from afis_app.repository import TALAO_DETAIL_COLUMNS
+from afis_app.sqlite_repository import SQLiteRepository
+from tests.support import talao_payload
+
+
+OBSERVACAO = "linha; com separador"
+
+
+class StreamingExportTests(unittest.TestCase):
+    """Testes da exportacao em fluxo a partir do repositorio."""
+
+    def setUp(self):
+        """Cria banco em memoria com taloes em dois meses e pasta de saida."""
+        self.repo = SQLiteRepository(":memory:")
+        self.addCleanup(self.repo.close)
+        for dia in range(1, 8):
+            self.repo.insert_talao(talao_payload(f"2026-03-{dia:02d}", observacao=OBSERVACAO), 30)
+        self.repo.insert_talao(talao_payload("2026-04-01", observacao=OBSERVACAO), 30)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "relatorio.csv")
+
+    def _batches(self, batch_size=3):
+        return self.repo.iter_taloes_by_period(date(2026, 3, 1), date(2026, 3, 31), batch_size=batch_size)
+
+    def test_iter_by_period_yields_batches_in_report_order(self):
+        """Garante lotes de fetchmany com as mesmas linhas da listagem completa."""
+        batches = list(self._batches())
+
+        self.assertEqual([3, 3, 1], [len(batch) for batch in batches])
+        columns, rows = self.repo.list_taloes_by_period(date(2026, 3, 1), date(2026, 3, 31))
+        self.assertEqual(list(TALAO_DETAIL_COLUMNS), columns)
+        self.assertEqual([tuple(row) for row in rows], [tuple(row) for batch in batches for row in batch])
+        self.assertEqual(7, self.repo.count_taloes_by_period(date(2026, 3, 1), date(2026, 3, 31)))
+
+    def test_report_xlsx_cells_maps_report_columns(self):
+        """Garante o mapeamento A..H do relatorio, com vazio no lugar de nulos."""
+        columns, rows = self.repo.list_taloes_by_period(date(2026, 3, 2), date(2026, 3, 2))
+        col_idx = {name: idx for idx, name in enumerate(columns)}
+
+        self.assertEqual(
+            ["02/03/2026", "0002/2026", "", "AB1234", "1 DP", "FURTO", "", ""], report_xlsx_cells(rows[0], col_idx)
+        )
+
+    def test_write_csv_streams_rows_and_reports_progress(self):
+        """Garante CSV completo e progresso a cada lote."""
+        progresso = []
+
+        total = write_csv(self.path, list(TALAO_DETAIL_COLUMNS), self._batches(), progress=progresso.append)
+
+        self.assertEqual(7, total)
+        self.assertEqual([3, 6, 7], progresso)
+        with open(self.path, encoding="utf-8-sig", newline="") as csv_file:
+            linhas = list(csv.reader(csv_file, delimiter=";"))
+        self.assertEqual(list(TALAO_DETAIL_COLUMNS), linhas[0])
+        self.assertEqual(8, len(linhas))
+        self.assertEqual(OBSERVACAO, linhas[1][TALAO_DETAIL_COLUMNS.index("observacao")])
+
+    def test_cancel_removes_partial_file_and_closes_stream(self):
+        """Garante interrupcao entre lotes, sem arquivo parcial e com gerador fechado."""
+        cancel = threading.Event()
+        batches = self._batches(batch_size=2)
+
+        with self.assertRaises(ExportCancelled):
+            write_csv(self.path, list(TALAO_DETAIL_COLUMNS), batches, progress=lambda _total: cancel.set(), cancel=cancel)
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual([], list(batches))
+
+
+MODELO_PATH = Path(__file__).resolve().parent.parent / "assets" / "modelo.xlsx"
+
+
+def _xlsx_cells(row, col_idx):
+    """Mapeamento simplificado de colunas para o modelo (A..H)."""
+    return [
+        row[col_idx["data_solic"]].strftime("%d/%m/%Y"),
+        f"{row[col_idx['talao']]:04d}/{row[col_idx['ano']]}",
+        "",
+        row[col_idx["boletim"]],
+        row[col_idx["delegacia"]],
+        row[col_idx["natureza"]],
+        None,
+        "<equipe & cia>",
+    ]
+
+
+@unittest.skipIf(load_workbook is None, "openpyxl nao instalado")
+class StreamingXlsxTests(unittest.TestCase):
+    """Testes do relatorio XLSX gerado em fluxo a partir do modelo."""
+
+    def setUp(self):
+        """Cria banco em memoria e caminho de saida temporario."""
+        self.repo = SQLiteRepository(":memory:")
+        self.addCleanup(self.repo.close)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "relatorio.xlsx")
+
+    def _export(self, quantidade, **kwargs):
+        for dia in range(1, quantidade + 1):
+            self.repo.insert_talao(talao_payload(f"2026-03-{dia:02d}", observacao=OBSERVACAO), 30)
+        batches = self.repo.iter_taloes_by_period(date(2026, 3, 1), date(2026, 3, 31), batch_size=4)
+        return write_xlsx_template(
+            self.path, MODELO_PATH, _xlsx_cells, list(TALAO_DETAIL_COLUMNS), batches, **kwargs
+        )
+
+    def test_rows_follow_template_header_and_styles(self):
+        """Garante cabecalho do modelo preservado e dados a partir da linha 7."""
+        total = self._export(10)
+
+        self.assertEqual(10, total)
+        modelo = load_workbook(MODELO_PATH).active
+        ws = load_workbook(self.path).active
+        for linha in range(1, 7):
+            self.assertEqual(modelo.cell(row=linha, column=1).value, ws.cell(row=linha, column=1).value)
+        self.assertEqual(["01/03/2026", "0001/2026", None, "AB1234", "1 DP", "FURTO", None, "<equipe & cia>"],
+                         [ws.cell(row=7, column=col).value for col in range(1, 9)])
+        self.assertEqual("10/03/2026", ws.cell(row=16, column=1).value)
+        self.assertIsNone(ws.cell(row=17, column=1).value)
+        for coluna in (5, 8):
+            self.assertEqual(modelo.cell(row=7, column=coluna).style_id, ws.cell(row=7, column=coluna).style_id)
+
+    def test_table_and_print_area_cover_all_rows(self):
+        """Garante que tabela e area de impressao do modelo acompanham os dados."""
+        self._export(31)
+
+        wb = load_workbook(self.path)
+        ws = wb.active
+        self.assertEqual(["A6:H37"], [table.ref for table in ws.tables.values()])
+        self.assertIn("$H$37", str(ws.print_area))
+        with zipfile.ZipFile(self.path) as pacote, zipfile.ZipFile(MODELO_PATH) as modelo:
+            self.assertEqual(modelo.read("xl/media/image1.gif"), pacote.read("xl/media/image1.gif"))
+            self.assertEqual(modelo.namelist()[0], pacote.namelist()[0])
+
+    def test_cancel_removes_partial_xlsx(self):
+        """Garante remocao do arquivo parcial ao cancelar."""
+        cancel = threading.Event()
+        cancel.set()
+
+        with self.assertRaises(ExportCancelled):
+            self._export(5, cancel=cancel)
+
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
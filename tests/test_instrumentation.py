@@ -0,0 +1,145 @@
+from datetime import date
+import logging
+import pickle
+import unittest
+
+from afis_app.cache import CachedRepository
+from afis_app.instrumentation import (
+    SLOW_QUERY_LOGGER,
+    InstrumentedRepository,
+    LatencyHistogram,
+    RepositoryMetrics,
+    parameter_shapes,
+)
+from afis_app.repository import DatabaseError
+from afis_app.sqlite_repository import SQLiteRepository
+from tests.support import talao_payload
+
+
+class LatencyHistogramTests(unittest.TestCase):
+    """Testes do histograma de latencias."""
+
+    def test_percentiles_within_bucket_error(self):
+        """Garante percentis com erro maximo de um balde (25%) e maximo exato."""
+        histogram = LatencyHistogram()
+        for value in range(1, 101):
+            histogram.add(float(value))
+
+        summary = histogram.summary()
+        self.assertEqual(100, summary["count"])
+        self.assertEqual(100.0, summary["max_ms"])
+        self.assertAlmostEqual(50.5, summary["mean_ms"])
+        for pct in (50, 95, 99):
+            self.assertGreaterEqual(summary[f"p{pct}_ms"], pct)
+            self.assertLessEqual(summary[f"p{pct}_ms"], pct * 1.25)
+        self.assertEqual(0.0, LatencyHistogram().percentile(99))
+
+    def test_parameter_shapes_hide_values(self):
+        """Garante que o formato dos parametros mostra tipo e tamanho, nunca o valor."""
+        self.assertEqual("(str(6), int, None)", parameter_shapes(("senha1", 7, None)))
+        self.assertEqual("{ano: int}", parameter_shapes({"ano": 2026}))
+        self.assertEqual("2 x (int, date)", parameter_shapes([(1, date(2026, 1, 1)), (2, date(2026, 1, 2))], many=True))
+
+
+class InstrumentedRepositoryTests(unittest.TestCase):
+    """Testes da medicao das chamadas sobre o repositorio SQLite."""
+
+    def setUp(self):
+        """Cria repositorio em memoria medido com limite de lentidao alto."""
+        self.base = SQLiteRepository(":memory:")
+        self.addCleanup(self.base.close)
+        self.metrics = RepositoryMetrics(slow_ms=60000.0)
+        self.repo = InstrumentedRepository(self.base, self.metrics)
+
+    def test_calls_record_phases_and_rows(self):
+        """Garante contagem, fases e linhas por metodo, inclusive em geradores e erros."""
+        for _ in range(3):
+            self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        columns, rows = self.repo.search_taloes({"ano": 2026})
+        self.assertEqual(3, len(rows))
+        lotes = list(self.repo.iter_taloes_by_period(date(2026, 2, 1), date(2026, 2, 28), batch_size=2))
+        self.assertEqual([2, 1], [len(lote) for lote in lotes])
+        with self.assertRaises(DatabaseError):
+            self.repo.update_talao(999, talao_payload("2026-02-23"), 30)
+
+        methods = self.repo.metrics_snapshot()["methods"]
+        self.assertEqual(3, methods["insert_talao"]["calls"])
+        self.assertEqual(3, methods["search_taloes"]["rows"])
+        self.assertEqual(3, methods["iter_taloes_by_period"]["rows"])
+        self.assertEqual(1, methods["iter_taloes_by_period"]["calls"])
+        self.assertEqual((1, 1), (methods["update_talao"]["calls"], methods["update_talao"]["errors"]))
+        search = methods["search_taloes"]
+        self.assertGreater(search["execute"]["max_ms"], 0.0)
+        self.assertGreater(search["fetch"]["max_ms"], 0.0)
+        self.assertLessEqual(
+            search["connect"]["max_ms"] + search["execute"]["max_ms"] + search["fetch"]["max_ms"],
+            search["total"]["max_ms"] + 0.01,
+        )
+        self.assertEqual(self.base.terminal_id, self.repo.terminal_id)
+
+    def test_connection_hook_is_registered_and_detachable(self):
+        """Garante medicao por hook registrado, sem trocar ``_connect``, e remocao com ``detach``."""
+        self.assertNotIn("_connect", vars(self.base))
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        self.assertEqual(1, self.repo.metrics_snapshot()["methods"]["insert_talao"]["lock"]["count"])
+
+        self.repo.detach()
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+
+        insert = self.repo.metrics_snapshot()["methods"]["insert_talao"]
+        self.assertEqual((2, 1), (insert["calls"], insert["lock"]["count"]))
+        self.assertEqual((), self.base._connection_hooks)
+
+    def test_slow_calls_log_sql_and_parameter_shapes(self):
+        """Garante log de chamada lenta com SQL e formato dos parametros, sem os valores."""
+        self.repo.insert_talao(talao_payload("2026-02-23", delegacia="DP SIGILOSA"), 30)
+        self.metrics.slow_ms = 0.0
+        with self.assertLogs(SLOW_QUERY_LOGGER, logging.WARNING) as captured:
+            _, rows = self.repo.search_taloes({"delegacia": "dp sig"})
+        self.assertEqual(1, len(rows))
+        message = "\n".join(captured.output)
+        self.assertIn("search_taloes:", message)
+        self.assertIn("SQL: SELECT", message)
+        self.assertIn("parâmetros: (str(", message)
+        self.assertNotIn("SIG", message)
+        self.assertEqual(1, self.repo.metrics_snapshot()["slow_calls"])
+
+    def test_cache_hits_do_not_reach_instrumented_repository(self):
+        """Garante que, com o cache por cima, so as leituras reais sao medidas."""
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        _, rows = self.repo.search_taloes({"ano": 2026})
+        cached = CachedRepository(self.repo)
+        cached.get_talao(rows[0][0])
+        cached.get_talao(rows[0][0])
+
+        methods = self.repo.metrics_snapshot()["methods"]
+        self.assertEqual(1, methods["get_talao"]["calls"])
+        self.assertEqual(1, methods["get_cache_version"]["calls"])
+
+    def test_lock_waits_only_for_write_transactions(self):
+        """Garante espera de lock registrada so nas chamadas com ``BEGIN IMMEDIATE``."""
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        self.repo.search_taloes({"ano": 2026})
+
+        methods = self.repo.metrics_snapshot()["methods"]
+        self.assertEqual(2, methods["insert_talao"]["lock"]["count"])
+        self.assertEqual(0, methods["search_taloes"]["lock"]["count"])
+
+    def test_merge_adds_metrics_of_other_terminals(self):
+        """Garante soma de chamadas e histogramas, inclusive apos copia entre processos."""
+        self.repo.insert_talao(talao_payload("2026-02-23"), 30)
+        outro = RepositoryMetrics(slow_ms=60000.0)
+        InstrumentedRepository(self.base, outro).insert_talao(talao_payload("2026-02-23"), 30)
+
+        total = RepositoryMetrics()
+        total.merge(self.metrics)
+        total.merge(pickle.loads(pickle.dumps(outro)))
+        insert = total.snapshot()["methods"]["insert_talao"]
+        self.assertEqual(2, insert["calls"])
+        self.assertEqual(2, insert["total"]["count"])
+        self.assertEqual(2, insert["lock"]["count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
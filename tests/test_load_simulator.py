@@ -0,0 +1,150 @@
+import argparse
+from datetime import date, time
+import os
+import tempfile
+import unittest
+
+from afis_app.constants import STATUS_MONITORADO
+from afis_app.load_simulator import (
+    VirtualTerminal,
+    _parse_mix,
+    format_report,
+    prepare_database,
+    simulate,
+)
+from afis_app.repository import ConcurrencyError, DuplicateTalaoError
+
+
+class ConflictingRepository:
+    """Repositorio falso: um talao monitorado e conflitos nas primeiras gravacoes."""
+
+    def __init__(self, update_conflicts=0, insert_conflicts=0):
+        self.update_conflicts = update_conflicts
+        self.insert_conflicts = insert_conflicts
+        self.updates = []
+
+    def get_dashboard_snapshot(self, ano, watermark=None, latest_id=None):
+        return {
+            "full": watermark is None,
+            "rows": [(7, ano, 1, "AB1234", "1 DP", None, STATUS_MONITORADO)],
+            "removed_ids": [],
+            "watermark": 1,
+            "latest_id": 7,
+        }
+
+    def get_talao(self, talao_id):
+        return {
+            "id": talao_id,
+            "data_solic": date(2026, 3, 1),
+            "hora_solic": time(8, 30),
+            "delegacia": "1 DP",
+            "autoridade": "DR. A",
+            "solicitante": "CB B",
+            "endereco": "RUA C",
+            "boletim": "AB1234",
+            "natureza": None,
+            "data_bo": None,
+            "vitimas": None,
+            "equipe": None,
+            "status": STATUS_MONITORADO,
+            "versao": len(self.updates),
+        }
+
+    def update_talao(self, talao_id, data, intervalo_min, expected_version=None):
+        if self.update_conflicts:
+            self.update_conflicts -= 1
+            raise ConcurrencyError("conflito")
+        self.updates.append((talao_id, data, expected_version))
+
+    def insert_talao(self, data, intervalo_min):
+        if self.insert_conflicts:
+            self.insert_conflicts -= 1
+            raise DuplicateTalaoError("duplicado")
+        return 1
+
+
+def _config(**overrides):
+    """Configuracao de terminal para os testes (sem espera de largada)."""
+    config = {
+        "indice": 1,
+        "semente": 0,
+        "mix": {"update": 1},
+        "largada": 0.0,
+        "fim": 0.0,
+        "pausa_ms": 0.0,
+        "edicao_ms": 0.0,
+        "tentativas": 3,
+        "quentes": 5,
+    }
+    config.update(overrides)
+    return config
+
+
+class VirtualTerminalTests(unittest.TestCase):
+    """Testes das repeticoes e contadores de um terminal virtual."""
+
+    def test_conflicts_are_retried_and_counted(self):
+        """Garante repeticao com nova leitura ate gravar, contando conflitos."""
+        repo = ConflictingRepository(update_conflicts=2, insert_conflicts=1)
+        terminal = VirtualTerminal(repo, _config())
+        terminal.run()
+        terminal._execute("update")
+        terminal._execute("insert")
+
+        update = terminal.stats["update"]
+        contadores = tuple(update[key] for key in ("total", "ok", "conflitos", "repeticoes", "falhas"))
+        self.assertEqual((1, 1, 2, 2, 0), contadores)
+        self.assertEqual(7, repo.updates[0][0])
+        self.assertEqual("2026-03-01", repo.updates[0][1]["data_solic"])
+        self.assertEqual("08:30", repo.updates[0][1]["hora_solic"])
+        insert = terminal.stats["insert"]
+        self.assertEqual((1, 1, 1), (insert["ok"], insert["conflitos"], insert["repeticoes"]))
+
+    def test_persistent_conflict_becomes_failure(self):
+        """Garante falha registrada quando as tentativas acabam."""
+        terminal = VirtualTerminal(ConflictingRepository(update_conflicts=5), _config(tentativas=2))
+        terminal.run()
+        terminal._execute("update")
+
+        update = terminal.stats["update"]
+        self.assertEqual((0, 2, 1, 1), (update["ok"], update["conflitos"], update["repeticoes"], update["falhas"]))
+        self.assertEqual({"ConcurrencyError": 1}, update["erros"])
+        self.assertEqual(0, update["latencia"].count)
+
+    def test_parse_mix_validates_operations(self):
+        """Garante pesos por operacao e rejeicao de nomes ou pesos invalidos."""
+        self.assertEqual({"insert": 3.0, "refresh": 1.0}, _parse_mix("insert=3, refresh=1"))
+        for texto in ("apagar=1", "insert=x", "insert=0"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                _parse_mix(texto)
+
+
+class SimulateTests(unittest.TestCase):
+    """Testes da simulacao com terminais em threads sobre SQLite em arquivo."""
+
+    def test_threads_report_throughput_conflicts_and_lock_waits(self):
+        """Garante relatorio coerente com varios terminais disputando o mesmo banco."""
+        with tempfile.TemporaryDirectory() as pasta:
+            banco = os.path.join(pasta, "carga.db")
+            vencidos = prepare_database(banco, por_dia=5, tempestade=True)
+            self.assertGreater(vencidos, 0)
+            relatorio = simulate(banco, terminais=3, duracao=0.5, edicao_ms=1.0)
+
+        self.assertEqual(3, relatorio["terminais"])
+        for operacao, item in relatorio["operacoes"].items():
+            self.assertEqual(item["total"], item["ok"] + item["sem_alvo"] + item["falhas"], operacao)
+            self.assertEqual(item["ok"] + item["sem_alvo"], item["latencia"]["count"], operacao)
+        self.assertGreater(relatorio["operacoes"]["insert"]["ok"], 0)
+        self.assertGreater(relatorio["operacoes"]["postpone"]["ok"], 0)
+        self.assertEqual(0.0, relatorio["taxa_talao_duplicado"])
+        self.assertIn("insert_talao", relatorio["espera_lock"])
+        self.assertNotIn("get_talao", relatorio["espera_lock"])
+        self.assertEqual(
+            relatorio["operacoes"]["insert"]["total"] + relatorio["operacoes"]["insert"]["repeticoes"],
+            relatorio["repositorio"]["insert_talao"]["chamadas"],
+        )
+        self.assertIn("Espera de lock insert_talao", format_report(relatorio))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sqlite3
+import unittest
+
+from afis_app.migrations import (
+    SQLITE,
+    SQLSERVER,
+    MigrationError,
+    applied_versions,
+    apply_migrations,
+    latest_version,
+    render_sqlserver_script,
+)
+from afis_app.sqlite_repository import SCHEMA_STATEMENTS, SQLiteRepository, register_functions
+
+
+class MigrationTests(unittest.TestCase):
+    """Testes das migracoes versionadas de schema."""
+
+    def _base_connection(self):
+        """Abre banco em memoria apenas com as tabelas base."""
+        conn = sqlite3.connect(":memory:", isolation_level=None)
+        register_functions(conn)
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_applies_pending_migrations_once(self):
+        """Garante aplicacao em ordem e idempotencia ao reexecutar."""
+        conn = self._base_connection()
+
+        applied = apply_migrations(conn, SQLITE)
+
+        self.assertEqual(list(range(1, latest_version() + 1)), applied)
+        self.assertEqual([], apply_migrations(conn, SQLITE))
+        self.assertEqual(set(applied), applied_versions(conn.cursor(), SQLITE))
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn("ix_taloes_monitorados", indexes)
+
+    def test_verify_only_mode_rejects_outdated_schema(self):
+        """Garante erro quando auto_apply esta desligado e ha migracoes pendentes."""
+        conn = self._base_connection()
+
+        with self.assertRaises(MigrationError):
+            apply_migrations(conn, SQLITE, auto_apply=False)
+
+        apply_migrations(conn, SQLITE)
+        self.assertEqual([], apply_migrations(conn, SQLITE, auto_apply=False))
+
+    def test_repository_starts_at_latest_version(self):
+        """Garante schema atualizado ao abrir o repositorio SQLite."""
+        repo = SQLiteRepository(":memory:")
+        self.addCleanup(repo.close)
+
+        with repo._connect() as conn:
+            versions = applied_versions(conn.cursor(), SQLITE)
+
+        self.assertEqual(latest_version(), max(versions))
+
+    def test_sqlserver_script_guards_each_version(self):
+        """Garante script manual idempotente por versao."""
+        script = render_sqlserver_script()
+
+        self.assertIn("IF NOT EXISTS (SELECT 1 FROM dbo.schema_version WHERE versao = 1)", script)
+        self.assertIn("ix_monitoramento_proximo_alerta", script)
+
+    def test_sqlserver_lock_failure_aborts_migration(self):
+        """Garante que sp_getapplock sem sucesso (retorno < 0) interrompe antes dos scripts."""
+        executed = []
+
+        class LockTimeoutCursor:
+            def execute(self, sql, params=()):
+                executed.append(sql)
+                if "sp_getapplock" in sql:
+                    raise RuntimeError("Lock de migracao de schema indisponivel.")
+
+            def fetchone(self):
+                return (0,)
+
+        class LockTimeoutConnection:
+            def __init__(self):
+                self.rolled_back = False
+
+            def cursor(self):
+                return LockTimeoutCursor()
+
+            def commit(self):
+                pass
+
+            def rollback(self):
+                self.rolled_back = True
+
+        conn = LockTimeoutConnection()
+        with self.assertRaises(MigrationError):
+            apply_migrations(conn, SQLSERVER)
+
+        self.assertTrue(conn.rolled_back)
+        self.assertIn("EXEC @r = sp_getapplock", executed[-1])
+        self.assertIn("IF @r < 0 THROW", executed[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
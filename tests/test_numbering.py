@@ -0,0 +1,38 @@
+import unittest
+
+from afis_app.numbering import TalaoBlockCache
+
+
+class TalaoBlockCacheTests(unittest.TestCase):
+    """Testes do cache de blocos de numeracao reservados pelo terminal."""
+
+    def test_hands_out_block_in_order_per_year(self):
+        """Garante distribuicao crescente e independente por ano."""
+        cache = TalaoBlockCache(3)
+
+        self.assertIsNone(cache.take(2026))
+        self.assertEqual(10, cache.add_block(2026, 10))
+        cache.add_block(2025, 40)
+
+        self.assertEqual([11, 12, None], [cache.take(2026) for _ in range(3)])
+        self.assertEqual(41, cache.peek(2025))
+        self.assertEqual({2025: 2}, cache.pending())
+
+    def test_given_back_number_is_reused_first(self):
+        """Garante reuso do numero devolvido antes dos demais do bloco."""
+        cache = TalaoBlockCache(5)
+        primeiro = cache.add_block(2026, 1)
+        cache.take(2026)
+
+        cache.give_back(2026, primeiro)
+
+        self.assertEqual(1, cache.take(2026))
+
+    def test_rejects_block_size_without_reservation(self):
+        """Garante que bloco unitario usa a numeracao sem cache."""
+        with self.assertRaises(ValueError):
+            TalaoBlockCache(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
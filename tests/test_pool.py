@@ -0,0 +1,143 @@
+import threading
+import unittest
+
+from afis_app.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """Conexao falsa que registra rollback/close e pode falhar na validacao."""
+
+    def __init__(self, number):
+        self.number = number
+        self.rollbacks = 0
+        self.closed = False
+        self.broken = False
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    """Relogio manual para simular expiracao de conexoes ociosas."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    """Testes unitarios do pool de conexoes."""
+
+    def setUp(self):
+        """Prepara fabrica de conexoes falsas e relogio controlado."""
+        self.created = []
+        self.clock = FakeClock()
+
+    def _factory(self):
+        conn = FakeConnection(len(self.created) + 1)
+        self.created.append(conn)
+        return conn
+
+    def _validate(self, conn):
+        if conn.broken:
+            raise RuntimeError("conexao quebrada")
+
+    def _pool(self, **kwargs):
+        kwargs.setdefault("reset", lambda conn: conn.rollback())
+        return ConnectionPool(self._factory, clock=self.clock, **kwargs)
+
+    def test_reuses_released_connection_and_resets_it(self):
+        """Garante reuso da conexao devolvida, com rollback na devolucao."""
+        pool = self._pool(max_size=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(1, len(self.created))
+        self.assertEqual(2, first.rollbacks)
+        stats = pool.stats()
+        self.assertEqual(1, stats["created"])
+        self.assertEqual(1, stats["reused"])
+        self.assertEqual(0, stats["in_use"])
+        self.assertEqual(1, stats["idle"])
+
+    def test_discards_idle_connection_after_timeout(self):
+        """Garante descarte de conexao ociosa alem do tempo limite."""
+        pool = self._pool(max_size=2, idle_timeout=10)
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.clock.now = 11
+        novo = pool.acquire()
+
+        self.assertIsNot(conn, novo)
+        self.assertTrue(conn.closed)
+        self.assertEqual(1, pool.stats()["expired"])
+
+    def test_replaces_connection_that_fails_validation(self):
+        """Garante troca de conexao que falha na validacao de emprestimo."""
+        pool = self._pool(max_size=1, validate=self._validate)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.broken = True
+
+        novo = pool.acquire()
+
+        self.assertIsNot(conn, novo)
+        self.assertTrue(conn.closed)
+        self.assertEqual(1, pool.stats()["validation_failures"])
+
+    def test_skips_validation_for_recently_released_connection(self):
+        """Garante que conexoes recem devolvidas nao pagam nova validacao."""
+        pool = self._pool(max_size=1, validate=self._validate, validate_idle_after=5)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.broken = True
+
+        self.assertIs(conn, pool.acquire())
+
+    def test_times_out_when_pool_is_exhausted(self):
+        """Garante erro de timeout quando todas as conexoes estao emprestadas."""
+        pool = ConnectionPool(self._factory, max_size=1)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire(timeout=0.01)
+        self.assertEqual(1, pool.stats()["timeouts"])
+
+    def test_waiting_borrower_receives_released_connection(self):
+        """Garante que thread em espera recebe a conexao devolvida."""
+        pool = ConnectionPool(self._factory, max_size=1)
+        conn = pool.acquire()
+        received = []
+
+        worker = threading.Thread(target=lambda: received.append(pool.acquire(timeout=5)))
+        worker.start()
+        pool.release(conn)
+        worker.join(5)
+
+        self.assertEqual([conn], received)
+        self.assertEqual(1, len(self.created))
+
+    def test_discards_connection_after_disconnect_error(self):
+        """Garante descarte da conexao quando o erro indica desconexao."""
+        pool = self._pool(max_size=1)
+
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as conn:
+                raise RuntimeError("08S01", "Communication link failure")
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(0, pool.stats()["idle"])
+
+
+if __name__ == "__main__":
+    unittest.main()
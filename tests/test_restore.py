@@ -0,0 +1,209 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, time
+
+from afis_app.backup import backup_year, manifest_path, write_year_backup
+from afis_app.constants import STATUS_FINALIZADO, STATUS_MONITORADO
+from afis_app.repository import (
+    MONITORAMENTO_BACKUP_COLUMNS,
+    RESTORE_OVERWRITE,
+    RESTORE_SKIP,
+    TALAO_DETAIL_COLUMNS,
+    RestoreConflictError,
+)
+from afis_app.restore import BackupFormatError, parse_insert, read_backup, restore_backup
+from afis_app.sqlite_repository import SQLiteRepository
+from tests.support import talao_payload
+
+
+class ParseInsertTests(unittest.TestCase):
+    """Testes da leitura dos comandos INSERT do backup."""
+
+    def test_multi_row_insert_with_typed_literals(self):
+        """Garante conversao de NULL, numeros, textos N'' e datas/horas."""
+        statement = (
+            "INSERT INTO dbo.taloes ([id], [nome], [data], [hora], [criado]) VALUES\n"
+            "(1, N'D''AJUDA, (centro)', '2025-03-01', '08:30:00', '2025-03-01 08:30:00.250'),\n"
+            "(2, NULL, NULL, NULL, NULL);\n"
+        )
+
+        table, columns, rows = parse_insert(statement)
+
+        self.assertEqual("taloes", table)
+        self.assertEqual(["id", "nome", "data", "hora", "criado"], columns)
+        self.assertEqual(
+            [
+                [1, "D'AJUDA, (centro)", date(2025, 3, 1), time(8, 30), datetime(2025, 3, 1, 8, 30, 0, 250000)],
+                [2, None, None, None, None],
+            ],
+            rows,
+        )
+
+    def test_invalid_values_raise(self):
+        """Garante erro de formato em vez de gravacao parcial silenciosa."""
+        with self.assertRaises(BackupFormatError):
+            parse_insert("INSERT INTO dbo.taloes ([id], [nome]) VALUES (1);")
+
+
+class RestoreBackupTests(unittest.TestCase):
+    """Testes da restauracao de backups anuais no SQLite."""
+
+    def setUp(self):
+        """Cria banco de origem com taloes de 2025 e gera o backup."""
+        self.origem = SQLiteRepository(":memory:")
+        self.addCleanup(self.origem.close)
+        for dia in range(1, 6):
+            status = STATUS_FINALIZADO if dia == 5 else STATUS_MONITORADO
+            payload = talao_payload(f"2025-03-{dia:02d}", status=status, observacao="linha 1\nlinha 2; fim")
+            self.origem.insert_talao(payload, 30)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "backup.sql.gz")
+        write_year_backup(
+            self.path,
+            2025,
+            [
+                ("dbo.taloes", list(TALAO_DETAIL_COLUMNS), self.origem.iter_taloes_by_year(2025)),
+                ("dbo.monitoramento", list(MONITORAMENTO_BACKUP_COLUMNS), self.origem.iter_monitoramento_by_year(2025)),
+            ],
+            rows_per_insert=2,
+        )
+        self.destino = SQLiteRepository(":memory:")
+        self.addCleanup(self.destino.close)
+
+    def _rows(self, repo):
+        _columns, rows = repo.list_taloes_by_year(2025)
+        return [tuple(row) for row in rows]
+
+    def _monitoramento(self, repo):
+        # Sem o id: a restauracao grava o monitoramento com id novo.
+        return sorted(tuple(row[1:]) for batch in repo.iter_monitoramento_by_year(2025) for row in batch)
+
+    def test_read_backup_regroups_batches(self):
+        """Garante lotes do tamanho pedido, separados por tabela."""
+        batches = list(read_backup(self.path, batch_size=3))
+
+        self.assertEqual(
+            [("taloes", 3), ("taloes", 2), ("monitoramento", 3), ("monitoramento", 1)],
+            [(table, len(rows)) for table, rows in batches],
+        )
+
+    def test_restore_into_empty_database_round_trips(self):
+        """Garante taloes identicos (ids inclusive), monitoramento e contador do ano."""
+        progresso = []
+
+        totais = restore_backup(self.destino, self.path, batch_size=2, progress=progresso.append)
+
+        self.assertEqual(5, totais["taloes"])
+        self.assertEqual(4, totais["monitoramento"])
+        self.assertEqual(9, totais["linhas"])
+        self.assertEqual(9, progresso[-1])
+        self.assertGreater(totais["linhas_por_segundo"], 0)
+        self.assertEqual(self._rows(self.origem), self._rows(self.destino))
+        self.assertEqual(4, len(self.destino.list_monitoring_schedule()))
+        self.assertEqual(6, self.destino.get_next_talao(2025))
+
+    def test_fail_policy_rolls_back_everything(self):
+        """Garante que um conflito desfaz a restauracao inteira."""
+        self.destino.insert_talao(talao_payload("2025-01-01"), 30)
+        antes = self._rows(self.destino)
+
+        with self.assertRaises(RestoreConflictError):
+            restore_backup(self.destino, self.path)
+
+        self.assertEqual(antes, self._rows(self.destino))
+
+    def test_skip_policy_keeps_existing_rows(self):
+        """Garante que taloes existentes (e seu monitoramento) ficam como estao."""
+        restore_backup(self.destino, self.path)
+        self.destino.postpone_monitoring(1, 90)
+        alerta = self.destino.get_monitoring_interval(1)
+
+        totais = restore_backup(self.destino, self.path, policy=RESTORE_SKIP)
+
+        self.assertEqual({"taloes": 0, "monitoramento": 0, "ignorados": 5, "substituidos": 0},
+                         {key: totais[key] for key in ("taloes", "monitoramento", "ignorados", "substituidos")})
+        self.assertEqual(alerta, self.destino.get_monitoring_interval(1))
+
+    def test_overwrite_policy_replaces_rows(self):
+        """Garante substituicao dos taloes existentes pelos do backup."""
+        restore_backup(self.destino, self.path)
+        with self.destino._write_transaction() as cur:
+            cur.execute("UPDATE taloes SET natureza = 'ROUBO' WHERE id = 2")
+
+        totais = restore_backup(self.destino, self.path, policy=RESTORE_OVERWRITE)
+
+        self.assertEqual(5, totais["substituidos"])
+        self.assertEqual(4, totais["monitoramento"])
+        self.assertEqual(self._rows(self.origem), self._rows(self.destino))
+
+    def test_id_taken_by_other_talao_raises(self):
+        """Garante erro quando o id do backup pertence a outro talao no destino."""
+        self.destino.insert_talao(talao_payload("2024-12-31"), 30)
+
+        with self.assertRaises(RestoreConflictError):
+            restore_backup(self.destino, self.path, policy=RESTORE_SKIP)
+
+    def test_legacy_single_row_backup(self):
+        """Garante leitura dos backups antigos (um INSERT por linha, monitoramento com m.*)."""
+        legado = os.path.join(os.path.dirname(self.path), "legado.sql")
+        with open(legado, "w", encoding="utf-8-sig") as old:
+            columns = ", ".join(f"[{col}]" for col in (*MONITORAMENTO_BACKUP_COLUMNS, "claimed_by", "lease_until"))
+            old.write(
+                "SET IDENTITY_INSERT dbo.taloes ON;\n"
+                f"INSERT INTO dbo.taloes ({', '.join(f'[{col}]' for col in TALAO_DETAIL_COLUMNS)}) VALUES "
+                "(7, 2025, 7, '2025-03-01', '08:00:00', N'1 DP', N'A', N'B', N'RUA', NULL, NULL, NULL, NULL, NULL, "
+                "N'OP', N'MONITORADO', NULL, '2025-03-01 11:00:00.000', '2025-03-01 11:00:00.000');\n"
+                f"INSERT INTO dbo.monitoramento ({columns}) VALUES "
+                "(3, 7, '2025-03-01 11:30:00.000', 30, '2025-03-01 11:00:00.000', NULL, NULL);\n"
+            )
+
+        totais = restore_backup(self.destino, legado)
+
+        self.assertEqual((1, 1), (totais["taloes"], totais["monitoramento"]))
+        self.assertEqual(30, self.destino.get_monitoring_interval(7))
+
+
+    def test_manifest_chain_reproduces_source(self):
+        """Garante que completo + incrementais reproduzem insercoes, alteracoes e exclusoes."""
+        folder = os.path.join(os.path.dirname(self.path), "cadeia")
+        os.mkdir(folder)
+        backup_year(self.origem, os.path.join(folder, "completo.sql.gz"), 2025)
+        self.origem.insert_talao(talao_payload("2025-03-06"), 30)
+        with self.origem._write_transaction() as cur:
+            cur.execute("UPDATE taloes SET natureza = 'ROUBO' WHERE id = 2")
+            cur.execute("DELETE FROM taloes WHERE id = 3")
+        backup_year(self.origem, os.path.join(folder, "incremental_1.sql"), 2025, incremental=True)
+        with self.origem._write_transaction() as cur:
+            cur.execute("UPDATE taloes SET status = 'FINALIZADO' WHERE id = 1")
+            cur.execute("DELETE FROM monitoramento WHERE talao_id = 1")
+        backup_year(self.origem, os.path.join(folder, "incremental_2.sql"), 2025, incremental=True)
+
+        totais = restore_backup(self.destino, manifest_path(folder, 2025))
+
+        self.assertEqual(self._rows(self.origem), self._rows(self.destino))
+        self.assertEqual(
+            sorted(talao_id for talao_id, _ in self.origem.list_monitoring_schedule()),
+            sorted(talao_id for talao_id, _ in self.destino.list_monitoring_schedule()),
+        )
+        self.assertEqual(4, totais["excluidos"])
+        self.assertEqual(7, self.destino.get_next_talao(2025))
+
+    def test_incremental_carries_postponed_monitoring(self):
+        """Garante que o adiamento (so o monitoramento muda) entra no incremental e substitui o anterior."""
+        folder = os.path.join(os.path.dirname(self.path), "adiamento")
+        os.mkdir(folder)
+        backup_year(self.origem, os.path.join(folder, "completo.sql"), 2025)
+        self.origem.postpone_monitoring(2, 600)
+        backup_year(self.origem, os.path.join(folder, "incremental_1.sql"), 2025, incremental=True)
+
+        totais = restore_backup(self.destino, manifest_path(folder, 2025))
+
+        self.assertEqual(600, self.destino.get_monitoring_interval(2))
+        self.assertEqual(self._monitoramento(self.origem), self._monitoramento(self.destino))
+        self.assertEqual(0, totais["excluidos"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,532 @@
+from datetime import date, datetime, time, timedelta
+import os
+import tempfile
+import threading
+import unittest
+
+from afis_app.constants import SEARCH_MODE_CONTAINS, STATUS_CANCELADO, STATUS_FINALIZADO, STATUS_MONITORADO
+from afis_app.repository import ConcurrencyError, DatabaseError, DuplicateTalaoError, RepositoryBase
+from afis_app.services import TalaoService
+from afis_app.sqlite_repository import SQLiteRepository
+from tests.support import talao_payload
+
+DATA_SOLIC = "2026-02-23"
+
+
+class SQLiteRepositoryTests(unittest.TestCase):
+    """Testes do repositorio SQLite usado como substituto local do SQL Server."""
+
+    def setUp(self):
+        """Cria banco em memoria isolado para cada teste."""
+        self.repo = SQLiteRepository(":memory:")
+
+    def tearDown(self):
+        """Fecha as conexoes do banco em memoria."""
+        self.repo.close()
+
+    def _insert(self, **overrides):
+        """Insere talao e devolve (numero, id)."""
+        data_solic = overrides.pop("data_solic", DATA_SOLIC)
+        numero = self.repo.insert_talao(talao_payload(data_solic, **overrides), 30)
+        columns, rows = self.repo.search_taloes({"talao_num": numero, "ano": int(data_solic[:4])})
+        return numero, rows[0][columns.index("id")]
+
+    def test_numbering_restarts_each_year(self):
+        """Garante numeracao sequencial independente por ano."""
+        self.assertEqual(1, self.repo.insert_talao(talao_payload("2025-12-31"), 30))
+        self.assertEqual(2, self.repo.insert_talao(talao_payload("2025-12-31"), 30))
+        self.assertEqual(1, self.repo.insert_talao(talao_payload("2026-01-01"), 30))
+        self.assertEqual(3, self.repo.get_next_talao(2025))
+        self.assertEqual(2, self.repo.get_next_talao(2026))
+
+    def _file_repo(self, **kwargs):
+        """Cria repositorio em arquivo temporario compartilhavel entre instancias."""
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, "afis.db")
+        repo = SQLiteRepository(path, **kwargs)
+        self.addCleanup(repo.close)
+        return path, repo
+
+    def test_concurrent_inserts_get_gapless_unique_numbers(self):
+        """Garante numeracao unica e sem lacunas com varias threads inserindo."""
+        _, repo = self._file_repo()
+        numeros = []
+        lock = threading.Lock()
+
+        def _worker():
+            for _ in range(20):
+                numero = repo.insert_talao(talao_payload(DATA_SOLIC), 30)
+                with lock:
+                    numeros.append(numero)
+
+        threads = [threading.Thread(target=_worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(list(range(1, 81)), sorted(numeros))
+        self.assertEqual(81, repo.get_next_talao(2026))
+
+    def test_block_reservation_per_terminal(self):
+        """Garante blocos distintos por terminal e reaproveitamento local."""
+        path, terminal_a = self._file_repo(talao_block_size=10)
+        terminal_b = SQLiteRepository(path, talao_block_size=10)
+        self.addCleanup(terminal_b.close)
+
+        self.assertEqual(1, terminal_a.insert_talao(talao_payload(DATA_SOLIC), 30))
+        self.assertEqual(11, terminal_b.insert_talao(talao_payload(DATA_SOLIC), 30))
+        self.assertEqual(2, terminal_a.insert_talao(talao_payload(DATA_SOLIC), 30))
+        self.assertEqual(3, terminal_a.get_next_talao(2026))
+        self.assertEqual({2026: 8}, terminal_a.talao_blocks.pending())
+
+    def test_counter_recovers_from_external_rows(self):
+        """Garante ressincronizacao do contador apos talao gravado fora do app."""
+        self.repo.insert_talao(talao_payload(DATA_SOLIC), 30)
+        with self.repo._connect() as conn:
+            conn.execute(
+                "INSERT INTO taloes (ano, talao, data_solic, hora_solic, delegacia, autoridade, solicitante, "
+                "endereco, operador, status, criado_em, atualizado_em) "
+                "VALUES (2026, 2, '2026-02-23', '10:00:00', 'D', 'A', 'S', 'E', 'O', 'FINALIZADO', "
+                "'2026-02-23 10:00:00.000000', '2026-02-23 10:00:00.000000')"
+            )
+
+        with self.assertRaises(DuplicateTalaoError):
+            self.repo.insert_talao(talao_payload(DATA_SOLIC), 30)
+        self.assertEqual(3, self.repo.insert_talao(talao_payload(DATA_SOLIC), 30))
+
+    def test_get_talao_returns_typed_values(self):
+        """Garante retorno de date/time/datetime como no driver SQL Server."""
+        _, talao_id = self._insert(data_bo="2026-02-22", natureza="")
+
+        record = self.repo.get_talao(talao_id)
+
+        self.assertEqual(date(2026, 2, 23), record["data_solic"])
+        self.assertEqual(time(8, 0), record["hora_solic"])
+        self.assertEqual(date(2026, 2, 22), record["data_bo"])
+        self.assertIsInstance(record["atualizado_em"], datetime)
+        self.assertIsNone(record["natureza"])
+        self.assertIsNone(self.repo.get_talao(9999))
+
+    def test_monitoring_follows_status(self):
+        """Garante criacao do monitoramento e remocao ao finalizar."""
+        _, talao_id = self._insert()
+        self.assertEqual(30, self.repo.get_monitoring_interval(talao_id))
+
+        record = self.repo.get_talao(talao_id)
+        self.repo.update_talao(
+            talao_id,
+            talao_payload(DATA_SOLIC, status=STATUS_CANCELADO, observacao="DUPLICADO"),
+            15,
+            expected_version=record["versao"],
+        )
+
+        self.assertIsNone(self.repo.get_monitoring_interval(talao_id))
+        self.assertEqual(STATUS_CANCELADO, self.repo.get_talao(talao_id)["status"])
+
+    def test_update_with_stale_version_raises_concurrency_error(self):
+        """Garante controle otimista de concorrencia pela versao de linha."""
+        _, talao_id = self._insert()
+        versao = self.repo.get_talao(talao_id)["versao"]
+        self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC, natureza="ROUBO"), 30, expected_version=versao)
+
+        with self.assertRaises(ConcurrencyError):
+            self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC, natureza="DANO"), 30, expected_version=versao)
+        self.assertEqual("ROUBO", self.repo.get_talao(talao_id)["natureza"])
+
+    def test_update_rejects_closed_talao_and_year_change(self):
+        """Garante bloqueio de edicao de finalizados e de troca de ano."""
+        _, talao_id = self._insert()
+        with self.assertRaises(DatabaseError):
+            self.repo.update_talao(talao_id, talao_payload("2025-02-23"), 30)
+
+        self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC, status=STATUS_FINALIZADO), 30)
+        with self.assertRaises(DatabaseError):
+            self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC), 30)
+        with self.assertRaisesRegex(DatabaseError, "não encontrado"):
+            self.repo.update_talao(9999, talao_payload(DATA_SOLIC), 30)
+
+    def test_rejected_update_reports_rule_before_conflict(self):
+        """Garante que talao fechado com versao antiga gera DatabaseError, nao conflito."""
+        _, talao_id = self._insert()
+        original = self.repo.get_talao(talao_id)
+        self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC, status=STATUS_CANCELADO, observacao="DUPLICADO"), 30)
+
+        with self.assertRaises(DatabaseError) as ctx:
+            self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC), 30, expected_version=original["versao"])
+        self.assertNotIsInstance(ctx.exception, ConcurrencyError)
+        self.assertIsNone(self.repo.get_monitoring_interval(talao_id))
+
+    def test_due_monitoring_and_postpone(self):
+        """Garante listagem de alertas vencidos e adiamento."""
+        numero = self.repo.insert_talao(talao_payload(DATA_SOLIC), 0)
+        due = self.repo.list_due_monitoring()
+        self.assertEqual(1, len(due))
+        talao_id, intervalo_min, ano, talao, boletim, status = due[0]
+        self.assertEqual((0, 2026, numero, "AB1234", STATUS_MONITORADO), (intervalo_min, ano, talao, boletim, status))
+
+        self.repo.postpone_monitoring(talao_id, 60)
+
+        self.assertEqual([], self.repo.list_due_monitoring())
+        self.assertEqual(60, self.repo.get_monitoring_interval(talao_id))
+
+    def test_due_records_match_get_talao_and_finalize_directly(self):
+        """Garante registro completo no alerta, suficiente para finalizar sem reler o talao."""
+        self.repo.insert_talao(talao_payload(DATA_SOLIC, natureza="FURTO", data_bo="2026-02-22"), 0)
+
+        (listado,) = self.repo.list_due_monitoring(with_records=True)
+        (reservado,) = self.repo.claim_due_monitoring(with_records=True)
+        self.assertEqual(listado, reservado)
+        talao_id = reservado["id"]
+        self.assertEqual(0, reservado.pop("intervalo_min"))
+        self.assertEqual(self.repo.get_talao(talao_id), reservado)
+
+        normalized, _ = TalaoService().prepare_finalize_from_record(reservado)
+        self.repo.update_talao(talao_id, normalized, 0, expected_version=reservado["versao"])
+        self.assertEqual(STATUS_FINALIZADO, self.repo.get_talao(talao_id)["status"])
+        self.assertEqual([], self.repo.list_due_monitoring(with_records=True))
+
+    def test_monitoring_schedule_lists_seconds_until_alert(self):
+        """Garante agenda so de monitorados, com segundos ate o alerta."""
+        _, vencido = self._insert()
+        _, finalizado = self._insert(status=STATUS_FINALIZADO)
+        self.repo.postpone_monitoring(vencido, 0)
+        _, futuro = self._insert()
+
+        agenda = dict(self.repo.list_monitoring_schedule())
+
+        self.assertEqual({vencido, futuro}, set(agenda))
+        self.assertNotIn(finalizado, agenda)
+        self.assertLessEqual(agenda[vencido], 0)
+        self.assertAlmostEqual(30 * 60, agenda[futuro], delta=5)
+
+    def test_alert_claim_is_exclusive_until_lease_expires(self):
+        """Garante que so um terminal recebe o alerta vencido durante a reserva."""
+        path, terminal_a = self._file_repo(terminal_id="A", alert_lease_seconds=120)
+        terminal_b = SQLiteRepository(path, terminal_id="B", alert_lease_seconds=120)
+        self.addCleanup(terminal_b.close)
+        terminal_a.insert_talao(talao_payload(DATA_SOLIC), 0)
+
+        claimed = terminal_a.claim_due_monitoring()
+
+        self.assertEqual(1, len(claimed))
+        talao_id = claimed[0][0]
+        self.assertEqual([], terminal_b.claim_due_monitoring())
+        self.assertEqual(claimed, terminal_a.claim_due_monitoring())
+        self.assertTrue(terminal_a.renew_monitoring_claim(talao_id))
+        self.assertFalse(terminal_b.renew_monitoring_claim(talao_id))
+        self.assertGreater(dict(terminal_b.list_monitoring_schedule())[talao_id], 100)
+
+        with terminal_a._connect() as conn:
+            conn.execute("UPDATE monitoramento SET lease_until = ?", (terminal_a._utcnow() - timedelta(seconds=1),))
+
+        self.assertEqual(claimed, terminal_b.claim_due_monitoring())
+        self.assertFalse(terminal_a.renew_monitoring_claim(talao_id))
+
+    def test_alert_claim_uses_time_after_lock_wait(self):
+        """Garante corte e prazo da reserva calculados depois da espera pelo lock."""
+        _, talao_id = self._insert()
+        relogio = [self.repo._utcnow()]
+        self.repo._utcnow = lambda: relogio[0]
+        write_transaction = self.repo._write_transaction
+
+        def _transacao_apos_espera():
+            # Espera pelo BEGIN IMMEDIATE maior que o intervalo do alerta (30 min).
+            relogio[0] += timedelta(minutes=31)
+            return write_transaction()
+
+        self.repo._write_transaction = _transacao_apos_espera
+
+        self.assertEqual([talao_id], [row[0] for row in self.repo.claim_due_monitoring()])
+        with self.repo._connect() as conn:
+            query = "SELECT lease_until FROM monitoramento WHERE talao_id = ?"
+            (lease_until,) = conn.execute(query, (talao_id,)).fetchone()
+        self.assertEqual(relogio[0] + timedelta(seconds=self.repo.alert_lease_seconds), lease_until)
+
+    def test_alert_claim_released_on_answer(self):
+        """Garante liberacao da reserva ao adiar ou liberar explicitamente."""
+        path, terminal_a = self._file_repo(terminal_id="A")
+        terminal_b = SQLiteRepository(path, terminal_id="B")
+        self.addCleanup(terminal_b.close)
+        terminal_a.insert_talao(talao_payload(DATA_SOLIC), 0)
+        talao_id = terminal_a.claim_due_monitoring()[0][0]
+
+        terminal_a.release_monitoring_claim(talao_id)
+        self.assertEqual(talao_id, terminal_b.claim_due_monitoring()[0][0])
+
+        terminal_b.postpone_monitoring(talao_id, 0)
+
+        self.assertEqual(talao_id, terminal_a.claim_due_monitoring()[0][0])
+
+    def test_batch_postpone_and_claim_maintenance(self):
+        """Garante adiamento, renovacao e liberacao de varios alertas em lote."""
+        path, terminal_a = self._file_repo(terminal_id="A")
+        terminal_b = SQLiteRepository(path, terminal_id="B")
+        self.addCleanup(terminal_b.close)
+        for _ in range(4):
+            terminal_a.insert_talao(talao_payload(DATA_SOLIC), 0)
+        ids = [row[0] for row in terminal_a.claim_due_monitoring(limit=4)]
+
+        self.assertEqual(0, terminal_b.renew_monitoring_claims(ids))
+        self.assertEqual(4, terminal_a.renew_monitoring_claims(ids))
+        terminal_b.release_monitoring_claims(ids)
+        self.assertEqual([], terminal_b.claim_due_monitoring(limit=4))
+
+        terminal_a.release_monitoring_claims(ids[:1])
+        self.assertEqual(3, terminal_a.postpone_monitoring_many(ids[1:], 60))
+        self.assertEqual(0, terminal_a.postpone_monitoring_many([], 60))
+        self.assertEqual([ids[0]], [row[0] for row in terminal_b.claim_due_monitoring(limit=4)])
+        agenda = dict(terminal_a.list_monitoring_schedule())
+        self.assertTrue(all(agenda[talao_id] > 3500 for talao_id in ids[1:]))
+        self.assertEqual(60, terminal_a.get_monitoring_interval(ids[1]))
+
+    def test_finalize_many_skips_changed_and_closed_taloes(self):
+        """Garante finalizacao em lote so de monitorados na versao informada."""
+        ids = [self._insert()[1] for _ in range(4)]
+        records = [self.repo.get_talao(talao_id) for talao_id in ids]
+        self.repo.update_talao(ids[1], talao_payload(DATA_SOLIC, natureza="FURTO"), 30)
+        self.repo.update_talao(ids[2], talao_payload(DATA_SOLIC, status=STATUS_CANCELADO, observacao="DUPLICADO"), 30)
+
+        finalizados = self.repo.finalize_many(records + [{"id": 9999, "versao": records[0]["versao"]}])
+
+        self.assertEqual([ids[0], ids[3]], finalizados)
+        status = {talao_id: self.repo.get_talao(talao_id)["status"] for talao_id in ids}
+        self.assertEqual(
+            {ids[0]: STATUS_FINALIZADO, ids[1]: STATUS_MONITORADO, ids[2]: STATUS_CANCELADO, ids[3]: STATUS_FINALIZADO},
+            status,
+        )
+        self.assertIsNone(self.repo.get_monitoring_interval(ids[0]))
+        self.assertEqual(30, self.repo.get_monitoring_interval(ids[1]))
+        self.assertEqual([], self.repo.finalize_many([]))
+
+    def test_finalize_many_rejects_record_without_version(self):
+        """Garante erro, sem finalizar nada, quando um registro do lote nao traz versao."""
+        ids = [self._insert()[1] for _ in range(2)]
+        records = [self.repo.get_talao(talao_id) for talao_id in ids]
+        records[1]["versao"] = None
+
+        with self.assertRaises(ValueError):
+            self.repo.finalize_many(records)
+
+        self.assertEqual([STATUS_MONITORADO] * 2, [self.repo.get_talao(talao_id)["status"] for talao_id in ids])
+
+    def test_concurrent_alert_claims_have_single_winner(self):
+        """Garante um unico dono por alerta com varios terminais disputando."""
+        path, primeiro = self._file_repo(terminal_id="T0")
+        for _ in range(3):
+            primeiro.insert_talao(talao_payload(DATA_SOLIC), 0)
+        terminais = [primeiro] + [SQLiteRepository(path, terminal_id=f"T{i}") for i in range(1, 6)]
+        for terminal in terminais[1:]:
+            self.addCleanup(terminal.close)
+        donos = []
+        lock = threading.Lock()
+
+        def _worker(terminal):
+            for row in terminal.claim_due_monitoring(limit=2):
+                with lock:
+                    donos.append((row[0], terminal.terminal_id))
+
+        threads = [threading.Thread(target=_worker, args=(terminal,)) for terminal in terminais]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(3, len(donos))
+        self.assertEqual(3, len({talao_id for talao_id, _ in donos}))
+
+    def test_search_and_period_listing(self):
+        """Garante filtros combinados da busca e listagem por periodo."""
+        self._insert(delegacia="1 DP", equipe="ALFA")
+        self._insert(delegacia="2 DP", equipe="BRAVO", data_solic="2026-03-01")
+
+        columns, rows = self.repo.search_taloes({"delegacia": "dp", "equipe": "bra", "modo_texto": SEARCH_MODE_CONTAINS})
+        self.assertEqual(1, len(rows))
+        self.assertEqual("2 DP", rows[0][columns.index("delegacia")])
+
+        columns, rows = self.repo.list_taloes_by_period(date(2026, 2, 1), date(2026, 2, 28))
+        self.assertEqual(["1 DP"], [row[columns.index("delegacia")] for row in rows])
+
+    def test_search_pages_follow_full_search_order(self):
+        """Garante que as paginas da busca, em sequencia, reproduzem a busca completa."""
+        for dia in ("2025-12-30", "2025-12-31", "2026-01-02"):
+            for _ in range(3):
+                self._insert(data_solic=dia)
+        columns, expected = self.repo.search_taloes({})
+
+        ids, cursor, paginas = [], None, 0
+        while True:
+            page = self.repo.search_taloes_page({}, page_size=4, cursor=cursor)
+            ids.extend(row[page["columns"].index("id")] for row in page["rows"])
+            paginas += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual([row[columns.index("id")] for row in expected], ids)
+        self.assertEqual(3, paginas)
+
+        page = self.repo.search_taloes_page({"ano": 2025}, page_size=6)
+        self.assertEqual(6, len(page["rows"]))
+        self.assertIsNone(page["next_cursor"])
+
+    def test_period_pages_and_capped_count(self):
+        """Garante paginas do relatorio por periodo e contagem limitada da busca."""
+        for hora in ("09:00", "08:00", "10:00", "08:00"):
+            self._insert(hora_solic=hora)
+        columns, expected = self.repo.list_taloes_by_period(date(2026, 2, 1), date(2026, 2, 28))
+
+        first = self.repo.list_taloes_by_period_page(date(2026, 2, 1), date(2026, 2, 28), page_size=2)
+        second = self.repo.list_taloes_by_period_page(
+            date(2026, 2, 1), date(2026, 2, 28), page_size=2, cursor=first["next_cursor"]
+        )
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(
+            [row[columns.index("id")] for row in expected],
+            [row[columns.index("id")] for row in first["rows"] + second["rows"]],
+        )
+
+        self.assertEqual((4, True), self.repo.estimate_search_count({}))
+        self.assertEqual((3, False), self.repo.estimate_search_count({}, cap=3))
+        self.assertEqual((0, True), self.repo.estimate_search_count({"ano": 2020}))
+        with self.assertRaises(ValueError):
+            self.repo.search_taloes_page({}, cursor="nao-e-cursor")
+        with self.assertRaises(ValueError):
+            self.repo.search_taloes_page({}, cursor=first["next_cursor"])
+
+    def test_initial_listing_combines_latest_monitored_and_recent(self):
+        """Garante grade inicial com ultimo talao, monitorados antigos e recentes."""
+        self._insert(data_solic="2020-01-10", status=STATUS_FINALIZADO)
+        self._insert(data_solic="2020-01-11")
+        self._insert(data_solic="2020-01-12", status=STATUS_FINALIZADO)
+        self._insert(data_solic=date.today().isoformat(), status=STATUS_FINALIZADO)
+
+        rows = self.repo.list_initial_taloes()
+
+        self.assertEqual(
+            [(date.today().year, 1), (2020, 2)],
+            [(row[1], row[2]) for row in rows],
+        )
+
+    def test_prefix_search_is_accent_insensitive(self):
+        """Garante busca por prefixo em colunas normalizadas, sem acento e sem caixa."""
+        self._insert(delegacia="São Paulo DP", operador="José")
+        self._insert(delegacia="SANTOS DP", data_solic="2026-02-24")
+
+        columns, rows = self.repo.search_taloes({"delegacia": "sao"})
+        self.assertEqual(["São Paulo DP"], [row[columns.index("delegacia")] for row in rows])
+
+        _, rows = self.repo.search_taloes({"delegacia": "paulo"})
+        self.assertEqual([], rows)
+        _, rows = self.repo.search_taloes({"delegacia": "paulo", "modo_texto": SEARCH_MODE_CONTAINS})
+        self.assertEqual(1, len(rows))
+
+        _, rows = self.repo.search_taloes({"operador": "jose", "data_solic": date(2026, 2, 23)})
+        self.assertEqual(1, len(rows))
+        _, rows = self.repo.search_taloes({"data_inicio": date(2026, 2, 24), "data_fim": date(2026, 2, 24)})
+        self.assertEqual(1, len(rows))
+
+    def test_boletim_exact_and_prefix_search(self):
+        """Garante igualdade para boletim com sufixo e prefixo nos demais casos."""
+        self._insert(boletim="AB1234")
+        self._insert(boletim="AB1234-1")
+        self._insert(boletim="AC0001")
+
+        _, rows = self.repo.search_taloes({"boletim": "ab1234-1"})
+        self.assertEqual(1, len(rows))
+        _, rows = self.repo.search_taloes({"boletim": "AB1234"})
+        self.assertEqual(2, len(rows))
+        _, rows = self.repo.search_taloes({"boletim": "a"})
+        self.assertEqual(3, len(rows))
+
+    def test_incomplete_backend_fails_on_construction(self):
+        """Garante erro ao instanciar backend sem reserva de bloco ou comparacoes de busca do dialeto."""
+
+        class IncompleteRepository(RepositoryBase):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteRepository()
+        self.assertLessEqual({"_reserve_talao_block", "_prefix_clause", "_contains_clause"}, RepositoryBase.__abstractmethods__)
+
+    def test_search_columns_follow_updates(self):
+        """Garante atualizacao das colunas de busca quando o talao e editado."""
+        _, talao_id = self._insert(equipe="ALFA")
+        self.repo.update_talao(talao_id, talao_payload(DATA_SOLIC, equipe="Ômega"), 30)
+
+        _, rows = self.repo.search_taloes({"equipe": "omeg"})
+        self.assertEqual(1, len(rows))
+        self.assertNotIn("equipe_busca", self.repo.get_talao(talao_id))
+
+    def test_initial_listing_changes_return_only_deltas(self):
+        """Garante atualizacao incremental: alterados, saidos da janela e excluidos."""
+        _, antigo_id = self._insert(data_solic="2020-01-10")
+        _, ultimo_id = self._insert(data_solic="2020-01-11", status=STATUS_FINALIZADO)
+        carga = self.repo.list_initial_taloes_changes()
+        self.assertTrue(carga["full"])
+        self.assertEqual([ultimo_id, antigo_id], [row[0] for row in carga["rows"]])
+
+        vazio = self.repo.list_initial_taloes_changes(carga["watermark"], carga["latest_id"])
+        self.assertEqual(([], []), (vazio["rows"], vazio["removed_ids"]))
+        self.assertEqual(carga["watermark"], vazio["watermark"])
+
+        self.repo.update_talao(antigo_id, talao_payload("2020-01-10", status=STATUS_FINALIZADO), 30)
+        _, novo_id = self._insert(data_solic=date.today().isoformat())
+        delta = self.repo.list_initial_taloes_changes(vazio["watermark"], vazio["latest_id"])
+
+        self.assertFalse(delta["full"])
+        self.assertEqual([novo_id], [row[0] for row in delta["rows"]])
+        # O antigo ultimo sai da janela sem ter sido alterado.
+        self.assertEqual({antigo_id, ultimo_id}, set(delta["removed_ids"]))
+        self.assertEqual(novo_id, delta["latest_id"])
+
+        with self.repo._connect() as conn:
+            conn.execute("DELETE FROM taloes WHERE id = ?", (novo_id,))
+        excluido = self.repo.list_initial_taloes_changes(delta["watermark"], delta["latest_id"])
+        self.assertIn(novo_id, excluido["removed_ids"])
+        self.assertEqual([ultimo_id], [row[0] for row in excluido["rows"]])
+
+    def test_dashboard_snapshot_combines_grid_and_counters(self):
+        """Garante grade, proximo talao e contadores do dashboard na mesma consulta."""
+        _, vencido_id = self._insert()
+        self._insert(status=STATUS_FINALIZADO)
+        with self.repo._connect() as conn:
+            conn.execute(
+                "UPDATE monitoramento SET proximo_alerta = ? WHERE talao_id = ?",
+                (self.repo._utcnow() - timedelta(minutes=1), vencido_id),
+            )
+            conn.commit()
+        self._insert()
+
+        carga = self.repo.get_dashboard_snapshot(2026)
+        self.assertTrue(carga["full"])
+        self.assertEqual(
+            (2026, 4, 2, 1),
+            (carga["ano"], carga["next_talao"], carga["monitored"], carga["due_alerts"]),
+        )
+        self.assertEqual(
+            self.repo.list_initial_taloes_changes()["rows"],
+            carga["rows"],
+        )
+
+        self.repo.update_talao(vencido_id, talao_payload(DATA_SOLIC, status=STATUS_FINALIZADO), 30)
+        delta = self.repo.get_dashboard_snapshot(2026, carga["watermark"], carga["latest_id"])
+        self.assertFalse(delta["full"])
+        # Finalizado fora da janela de datas: sai da grade.
+        self.assertEqual(([], [vencido_id]), (delta["rows"], delta["removed_ids"]))
+        self.assertEqual((1, 0), (delta["monitored"], delta["due_alerts"]))
+
+    def test_yearly_listings_for_backup(self):
+        """Garante listagens anuais de taloes e monitoramento."""
+        self._insert()
+        self._insert(data_solic="2025-05-05")
+
+        _, taloes = self.repo.list_taloes_by_year(2026)
+        _, monitoramento = self.repo.list_monitoramento_by_year(2026)
+
+        self.assertEqual(1, len(taloes))
+        self.assertEqual(1, len(monitoramento))
+
+
+if __name__ == "__main__":
+    unittest.main()
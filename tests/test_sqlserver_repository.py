@@ -0,0 +1,95 @@
+import unittest
+
+from afis_app.pool import ConnectionPool
+from afis_app.repository import UPDATE_OK, SQLServerRepository
+from tests.support import talao_payload
+
+
+class RecordingCursor:
+    """Cursor falso: guarda os comandos e devolve os resultados programados."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, *params):
+        self.connection.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.connection.results.pop(0)
+
+    def fetchall(self):
+        return []
+
+    def nextset(self):
+        return True
+
+
+class RecordingConnection:
+    """Conexao falsa com resultados de ``fetchone`` em fila."""
+
+    def __init__(self):
+        self.executed = []
+        self.results = []
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class SQLServerBindingTests(unittest.TestCase):
+    """Testes dos parametros enviados ao SQL Server (sem servidor, por conexao falsa)."""
+
+    def setUp(self):
+        """Cria repositorio sem conexao real, com pool de uma conexao gravadora."""
+        self.conn = RecordingConnection()
+        self.repo = SQLServerRepository.__new__(SQLServerRepository)
+        self.repo.pool = ConnectionPool(lambda: self.conn, max_size=1)
+        self.repo.talao_blocks = None
+
+    def test_dashboard_binds_watermark_as_hex_text(self):
+        """Garante marca d'agua em texto com CONVERT explicito, inclusive sem marca (None)."""
+        self.conn.results = [(b"\x00" * 7 + b"\x09", 5, 3, 1, 0), (b"\x00" * 7 + b"\x0a", 5, 3, 1, 0)]
+
+        primeira = self.repo.get_dashboard_snapshot(2026)
+        self.repo.get_dashboard_snapshot(2026, primeira["watermark"], primeira["latest_id"])
+
+        (sql, (_, watermark, _)), (_, (_, proxima, _)) = self.conn.executed
+        self.assertIn("@watermark BINARY(8) = CONVERT(BINARY(8), ?, 1)", sql)
+        self.assertIsNone(watermark)
+        self.assertEqual("0x0000000000000009", proxima)
+
+    def test_update_binds_version_as_hex_text(self):
+        """Garante versao em texto com CONVERT explicito, inclusive na edicao sem versao (None)."""
+        self.conn.results = [(UPDATE_OK,), (UPDATE_OK,)]
+        data = talao_payload("2026-03-01")
+
+        self.repo.update_talao(7, data, 30)
+        self.repo.update_talao(7, data, 30, expected_version=b"\x00" * 6 + b"\x01\xff")
+
+        (sql, sem_versao), (sql_versao, com_versao) = self.conn.executed
+        self.assertIn("@versao BINARY(8) = CONVERT(BINARY(8), ?, 1)", sql)
+        self.assertNotIn("versao = @versao", sql)
+        self.assertIn("versao = @versao", sql_versao)
+        self.assertEqual((7, 2026, 30, None), sem_versao[:4])
+        self.assertEqual("0x00000000000001ff", com_versao[3])
+
+    def test_finalize_many_requires_version(self):
+        """Garante versao obrigatoria no lote e comparacao exata, sem ramo para versao nula."""
+        with self.assertRaises(ValueError):
+            self.repo.finalize_many([{"id": 1, "versao": b"\x00" * 7 + b"\x02"}, {"id": 2}])
+        self.assertEqual([], self.conn.executed)
+
+        self.repo.finalize_many([{"id": 1, "versao": b"\x00" * 7 + b"\x02"}])
+
+        ((sql, (alvos,)),) = self.conn.executed
+        self.assertNotIn("IS NULL", sql)
+        self.assertEqual('[{"id": 1, "versao": "0x0000000000000002"}]', alvos)
+
+
+if __name__ == "__main__":
+    unittest.main()
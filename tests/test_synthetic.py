@@ -0,0 +1,96 @@
+from datetime import date
+import os
+import tempfile
+import unittest
+
+from afis_app.constants import STATUS_MONITORADO
+from afis_app.repository import TALAO_DETAIL_COLUMNS
+from afis_app.restore import read_backup, restore_backup
+from afis_app.sqlite_repository import SQLiteRepository
+from afis_app.synthetic import generate_batches, generate_year, load_repository, write_backup_files
+from afis_app.validators import BOLETIM_PATTERN
+
+STATUS_INDEX = TALAO_DETAIL_COLUMNS.index("status")
+BOLETIM_INDEX = TALAO_DETAIL_COLUMNS.index("boletim")
+
+
+class GenerateYearTests(unittest.TestCase):
+    """Testes do gerador de massa sintetica."""
+
+    def test_same_seed_gives_same_rows(self):
+        """Garante resultado igual pela semente, com ou sem lista de monitoramento."""
+        monitoramento = []
+        primeiro = list(generate_year(2025, 20, seed=3, monitoramento=monitoramento))
+        self.assertEqual(primeiro, list(generate_year(2025, 20, seed=3)))
+        self.assertNotEqual(primeiro, list(generate_year(2025, 20, seed=4)))
+        self.assertTrue(monitoramento)
+
+    def test_rows_are_valid_and_sequential(self):
+        """Garante numeros e ids sequenciais, boletins validos e monitoramento so de monitorados."""
+        monitoramento = []
+        rows = list(generate_year(2025, 10, primeiro_id=50, hoje=date(2025, 12, 30), monitoramento=monitoramento))
+        self.assertEqual(list(range(50, 50 + len(rows))), [row[0] for row in rows])
+        self.assertEqual(list(range(1, len(rows) + 1)), [row[2] for row in rows])
+        for row in rows:
+            boletim = row[BOLETIM_INDEX]
+            self.assertTrue(boletim == "NÃO INFORMADO" or BOLETIM_PATTERN.fullmatch(boletim), boletim)
+        monitorados = {row[0] for row in rows if row[STATUS_INDEX] == STATUS_MONITORADO}
+        self.assertEqual(monitorados, {linha[1] for linha in monitoramento})
+        self.assertTrue(all(row[3] <= date(2025, 12, 30) for row in rows))
+
+    def test_ids_continue_across_years(self):
+        """Garante ids continuos entre anos e numeracao reiniciada a cada ano."""
+        lotes = list(generate_batches([2024, 2025], 5, batch_size=300))
+        taloes = [row for tabela, lote in lotes if tabela == "taloes" for row in lote]
+        monitoramento = [row for tabela, lote in lotes if tabela == "monitoramento" for row in lote]
+        self.assertEqual(list(range(1, len(taloes) + 1)), [row[0] for row in taloes])
+        self.assertEqual(list(range(1, len(monitoramento) + 1)), [row[0] for row in monitoramento])
+        self.assertEqual(1, next(row for row in taloes if row[1] == 2025)[2])
+
+
+class LoadSyntheticTests(unittest.TestCase):
+    """Testes da gravacao da massa sintetica no banco e em arquivos."""
+
+    def setUp(self):
+        """Cria repositorio SQLite em memoria."""
+        self.repo = SQLiteRepository(":memory:")
+        self.addCleanup(self.repo.close)
+
+    def test_load_repository_counts_match_database(self):
+        """Garante que os totais da carga batem com o que o banco devolve."""
+        totais = load_repository(self.repo, [2024, 2025], 8, seed=1, batch_size=500)
+        self.assertEqual(totais["linhas"], totais["taloes"] + totais["monitoramento"])
+        self.assertEqual(
+            totais["taloes"], self.repo.count_taloes_by_period(date(2024, 1, 1), date(2025, 12, 31))
+        )
+        taloes_2025 = self.repo.count_taloes_by_period(date(2025, 1, 1), date(2025, 12, 31))
+        self.assertEqual(taloes_2025 + 1, self.repo.get_next_talao(2025))
+
+    def test_backup_files_restore_same_rows(self):
+        """Garante que os arquivos gerados restauram as mesmas linhas da carga direta."""
+        with tempfile.TemporaryDirectory() as pasta:
+            resultado = write_backup_files(pasta, [2025], 6, seed=2, suffix=".sql")
+            self.assertEqual([os.path.join(pasta, "backup_afis_2025_sintetico.sql")], resultado["arquivos"])
+            totais = restore_backup(self.repo, resultado["arquivos"][0])
+        self.assertEqual(resultado["linhas"], totais["taloes"] + totais["monitoramento"])
+        columns, rows = self.repo.search_taloes({"ano": 2025})
+        self.assertEqual(totais["taloes"], len(rows))
+        esperado = {row[0]: row[BOLETIM_INDEX] for row in generate_year(2025, 6, seed=2)}
+        restaurado = {row[columns.index("id")]: row[columns.index("boletim")] for row in rows}
+        self.assertEqual(esperado, restaurado)
+
+    def test_backup_files_do_not_repeat_monitoring_ids(self):
+        """Garante ids de monitoramento continuos entre os scripts de cada ano (rodados no mesmo banco)."""
+        with tempfile.TemporaryDirectory() as pasta:
+            resultado = write_backup_files(pasta, [2024, 2025], 6, seed=2, suffix=".sql")
+            por_ano = [
+                [row[0] for tabela, lote in read_backup(path) if tabela == "monitoramento" for row in lote]
+                for path in resultado["arquivos"]
+            ]
+        self.assertTrue(all(por_ano))
+        ids = [monitoramento_id for ids_ano in por_ano for monitoramento_id in ids_ano]
+        self.assertEqual(list(range(1, len(ids) + 1)), ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import random
+import unittest
+
+from afis_app.tree_sync import TreeSync, compute_diff
+
+
+class FakeTree:
+    """Substituto de ttk.Treeview plano que registra as chamadas recebidas."""
+
+    def __init__(self):
+        self.children = []
+        self.data = {}
+        self.selected = ()
+        self.focused = ""
+        self.calls = []
+
+    def get_children(self):
+        return tuple(self.children)
+
+    def insert(self, _parent, index, iid, values, tags):
+        self.calls.append("insert")
+        self.children.insert(len(self.children) if index == "end" else index, iid)
+        self.data[iid] = (tuple(values), tuple(tags))
+
+    def delete(self, *iids):
+        self.calls.append("delete")
+        for iid in iids:
+            self.children.remove(iid)
+            self.data.pop(iid)
+        self.selected = tuple(iid for iid in self.selected if iid not in iids)
+
+    def detach(self, *iids):
+        self.calls.append("detach")
+        for iid in iids:
+            self.children.remove(iid)
+
+    def move(self, iid, _parent, index):
+        self.calls.append("move")
+        if iid in self.children:
+            self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def item(self, iid, values, tags):
+        self.calls.append("item")
+        self.data[iid] = (tuple(values), tuple(tags))
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, items):
+        self.selected = tuple(items)
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self.focused
+        self.focused = iid
+        return None
+
+
+def _rows(ids, status="MONITORADO"):
+    """Monta linhas (iid, chave, values, tags) em ordem decrescente de chave."""
+    return [(str(i), i, (f"{i:04d}/2026", status), (status,)) for i in ids]
+
+
+class TreeSyncTests(unittest.TestCase):
+    """Testes da reconciliacao incremental da grade."""
+
+    def setUp(self):
+        """Cria grade falsa sincronizada com cinco linhas."""
+        self.tree = FakeTree()
+        self.sync = TreeSync(self.tree)
+        self.sync.reconcile(_rows([5, 4, 3, 2, 1]))
+        self.tree.calls.clear()
+
+    def test_unchanged_rows_cost_no_widget_calls(self):
+        """Garante zero chamadas Tk quando nada mudou."""
+        diff = self.sync.reconcile(_rows([5, 4, 3, 2, 1]))
+
+        self.assertTrue(diff.empty)
+        self.assertEqual([], self.tree.calls)
+
+    def test_update_insert_and_remove_touch_only_differences(self):
+        """Garante item() so na linha alterada e exclusao em lote."""
+        rows = _rows([6, 5, 4, 2])
+        rows[2] = ("4", 4, ("0004/2026", "FINALIZADO"), ("FINALIZADO",))
+        self.tree.selection_set(("5",))
+
+        self.sync.reconcile(rows)
+
+        self.assertEqual(["delete", "insert", "item"], self.tree.calls)
+        self.assertEqual(["6", "5", "4", "2"], self.tree.children)
+        self.assertEqual(("FINALIZADO",), self.tree.data["4"][1])
+        self.assertEqual(("5",), self.tree.selection())
+
+    def test_moves_are_minimal(self):
+        """Garante um unico movimento quando uma linha muda de posicao."""
+        diff = self.sync.reconcile(_rows([4, 3, 2, 1, 5]))
+
+        self.assertEqual(1, len(diff.placements))
+        self.assertEqual(["4", "3", "2", "1", "5"], self.tree.children)
+
+    def test_apply_changes_merges_deltas_in_key_order(self):
+        """Garante mescla de alteracoes incrementais na posicao da chave."""
+        self.tree.focus("3")
+
+        self.sync.apply_changes(_rows([7, 3], status="FINALIZADO"), removed_ids=[1])
+
+        self.assertEqual(["7", "5", "4", "3", "2"], self.tree.children)
+        self.assertEqual("3", self.tree.focus())
+        self.assertEqual(["delete", "insert", "item"], self.tree.calls)
+
+    def test_random_reconciliations_match_desired_state(self):
+        """Garante que o widget termina igual ao estado desejado em cenarios aleatorios."""
+        rng = random.Random(7)
+        for _ in range(200):
+            ids = rng.sample(range(40), rng.randint(0, 25))
+            rows = [(str(i), i, (str(i), str(rng.randint(0, 2))), ()) for i in ids]
+
+            self.sync.reconcile(rows)
+
+            self.assertEqual([str(i) for i in ids], self.tree.children)
+            self.assertEqual({row[0]: (row[2], ()) for row in rows}, self.tree.data)
+
+    def test_compute_diff_is_independent_of_widget(self):
+        """Garante calculo puro da diferenca (usado em benchmarks sem display)."""
+        diff = compute_diff(["a", "b"], {"a": ((1,), ()), "b": ((2,), ())}, ["b", "c"], {"b": ((2,), ()), "c": ((3,), ())})
+
+        self.assertEqual(["a"], diff.removed)
+        self.assertEqual([(1, "c", True)], diff.placements)
+        self.assertEqual(2, diff.tk_calls())
+
+
+if __name__ == "__main__":
+    unittest.main()